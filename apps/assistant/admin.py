@@ -16,7 +16,7 @@ from django.utils import timezone
 from datetime import timedelta
 
 from .models import Documento, DocumentoChunk, Conversa, Mensagem, HelixConfig
-from .services import get_helix_status
+from .status import get_helix_status_snapshot
 from .gpu_manager import GPUManager
 
 
@@ -42,7 +42,7 @@ class HelixAdminSite(AdminSite):
         
         # Obter status do sistema
         try:
-            system_status = get_helix_status()
+            system_status = get_helix_status_snapshot()
             gpu_info = GPUManager.get_performance_metrics()
         except Exception:
             system_status = {}
@@ -214,7 +214,7 @@ class MensagemAdmin(admin.ModelAdmin):
             'fields': ('content', 'context_sources')
         }),
         ('Metadados', {
-            'fields': ('tokens_used', 'created_at', 'updated_at')
+            'fields': ('tokens_used', 'prompt_tokens', 'completion_tokens', 'created_at', 'updated_at')
         }),
     )
     
@@ -18,7 +18,9 @@ from django_filters.rest_framework import DjangoFiltrarVoltarend
 from rest_framework.filters import PesquisarFiltrar, OrderingFiltrar
 
 from .models import Documento, DocumentoChunk, Conversa, Mensagem
-from .services import HelixAssistant, DocumentoIngestion, RAGPipeline
+from django.http import StreamingHttpResponse
+
+from .services import HelixAssistant, DocumentoIngestion, RAGPipeline, format_sse
 
 
 # ===== Serializers =====
@@ -96,6 +98,7 @@ class ChatMensagemSerializer(serializers.Serializer):
     
     conversation_id = serializers.IntegerField()
     message = serializers.CharField()
+    stream = serializers.BooleanField(required=False, default=False)
     
     class ResponseSerializer(serializers.Serializer):
         response = serializers.CharField()
@@ -186,7 +189,13 @@ class MensagemViewSet(viewsets.ReadOnlyModelViewSet):
     
     @action(detail=False, methods=['post'])
     def send_message(self, request):
-        """Send message and get AI response"""
+        """
+        Send message and get AI response
+        
+        With "stream": true the answer is sent as Server-Sent Events
+        (token/done/busy/error). ASGI deployments should prefer the async
+        /assistant/api/chat/stream/ endpoint, which doesn't hold a worker.
+        """
         serializer = ChatMensagemSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
@@ -205,6 +214,16 @@ class MensagemViewSet(viewsets.ReadOnlyModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
+        if serializer.validated_data['stream']:
+            events = (
+                format_sse(event, data)
+                for event, data in HelixAssistant.stream_chat(message_text, conversation)
+            )
+            response = StreamingHttpResponse(events, content_type='text/event-stream')
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'
+            return response
+        
         # Generate response
         response_data = HelixAssistant.chat(
             user_message=message_text,
@@ -20,3 +20,10 @@ class AssistantConfig(AppConfig):
             from . import signals  # noqa
         except ImportError:
             pass
+        
+        # Opt-in: ready() also runs for migrate/collectstatic, and loading may
+        # download the BPE file (deploy runs warm_tokenizer instead)
+        from django.conf import settings
+        if getattr(settings, 'HELIX_TOKENIZER_PRELOAD', False):
+            from .tokenization import preload
+            preload()
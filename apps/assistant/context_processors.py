@@ -2,13 +2,13 @@
 Context Processor for Helix Assistant
 
 Provides global context variables to all templates:
-- helix_status: System health check (Ollama running, models available, etc)
+- helix_status: Cached system health snapshot (Ollama running, models available, etc)
 - has_conversations: Whether user has active conversations
 - current_conversation: Current conversation (if any)
 """
 
 import logging
-from .services import get_helix_status, check_ollama_connection
+from .status import get_helix_status_snapshot
 from .models import Conversa
 
 logger = logging.getLogger(__name__)
@@ -41,8 +41,8 @@ def helix_context(request):
         return context
     
     try:
-        # Get system status
-        status = get_helix_status()
+        # Get system status (cached snapshot - no network I/O on the request path)
+        status = get_helix_status_snapshot()
         context['helix']['status'] = status
         context['helix']['ollama_available'] = status.get('ollama_running', False)
         context['helix']['models_available'] = status.get('models_available', [])
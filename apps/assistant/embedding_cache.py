@@ -0,0 +1,144 @@
+"""
+Query embedding cache for Helix retrieval
+
+Every retrieval starts with an Ollama round-trip (embeddings.embed_query).
+Repeated and normalized-identical queries are served from two tiers:
+
+1. In-process LRU (HELIX_EMBEDDING_CACHE_SIZE entries) - no I/O at all
+2. Shared Django cache (HELIX_EMBEDDING_CACHE_TTL seconds) - one GET,
+   populated for every worker by whichever computed the vector first
+
+Keys combine EMBEDDING_MODEL with a hash of the normalized text
+(NFC, casefold, collapsed whitespace), so switching models never serves
+stale vectors. Vectors are stored as packed float32 bytes (6 KB for 1536
+dims instead of ~30 KB of JSON/pickled floats).
+"""
+
+import hashlib
+import threading
+import unicodedata
+import logging
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, List
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(text: str) -> str:
+    """Canonical form used for cache keys ('  Férias ?' == 'férias ?')"""
+    return ' '.join(unicodedata.normalize('NFC', text).casefold().split())
+
+
+class QueryEmbeddingCache:
+    """
+    Two-tier (LRU + Django cache) cache of query embeddings
+
+    Usage:
+        vector = QueryEmbeddingCache.get_or_embed(query, EMBEDDING_MODEL, embeddings.embed_query)
+    """
+
+    _lru: 'OrderedDict[str, array]' = OrderedDict()
+    _lock = threading.Lock()
+    _counters = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+    @staticmethod
+    def max_entries() -> int:
+        return getattr(settings, 'HELIX_EMBEDDING_CACHE_SIZE', 2048)
+
+    @staticmethod
+    def ttl() -> int:
+        return getattr(settings, 'HELIX_EMBEDDING_CACHE_TTL', 86400)
+
+    @staticmethod
+    def cache_key(text: str, model: str) -> str:
+        digest = hashlib.sha256(normalize_query(text).encode('utf-8')).hexdigest()
+        return f'helix:embedding:{model}:{digest}'
+
+    @staticmethod
+    def pack(vector: List[float]) -> bytes:
+        return array('f', vector).tobytes()
+
+    @staticmethod
+    def unpack(data: bytes) -> array:
+        vector = array('f')
+        vector.frombytes(data)
+        return vector
+
+    @staticmethod
+    def _count(counter: str) -> None:
+        with QueryEmbeddingCache._lock:
+            QueryEmbeddingCache._counters[counter] += 1
+
+    @staticmethod
+    def _remember(key: str, vector: array) -> None:
+        with QueryEmbeddingCache._lock:
+            QueryEmbeddingCache._lru[key] = vector
+            QueryEmbeddingCache._lru.move_to_end(key)
+            while len(QueryEmbeddingCache._lru) > QueryEmbeddingCache.max_entries():
+                QueryEmbeddingCache._lru.popitem(last=False)
+
+    @staticmethod
+    def get_or_embed(text: str, model: str, embed: Callable[[str], List[float]]) -> List[float]:
+        """
+        Return the embedding of `text`, calling `embed` only on a miss
+
+        Args:
+            text: Raw user query (normalized only for the key)
+            model: Embedding model name (part of the key)
+            embed: Function computing the embedding (e.g. embeddings.embed_query)
+        """
+        key = QueryEmbeddingCache.cache_key(text, model)
+
+        with QueryEmbeddingCache._lock:
+            vector = QueryEmbeddingCache._lru.get(key)
+            if vector is not None:
+                QueryEmbeddingCache._lru.move_to_end(key)
+                QueryEmbeddingCache._counters['local_hits'] += 1
+                return vector.tolist()
+
+        try:
+            data = cache.get(key)
+        except Exception as e:
+            logger.warning(f"Embedding cache unavailable: {e}")
+            data = None
+        if data is not None:
+            vector = QueryEmbeddingCache.unpack(data)
+            QueryEmbeddingCache._remember(key, vector)
+            QueryEmbeddingCache._count('shared_hits')
+            return vector.tolist()
+
+        QueryEmbeddingCache._count('misses')
+        computed = embed(text)
+        data = QueryEmbeddingCache.pack(computed)
+        try:
+            cache.set(key, data, QueryEmbeddingCache.ttl())
+        except Exception as e:
+            logger.warning(f"Embedding cache unavailable: {e}")
+        QueryEmbeddingCache._remember(key, QueryEmbeddingCache.unpack(data))
+        return list(computed)
+
+    @staticmethod
+    def stats() -> Dict:
+        """
+        Returns (this worker):
+            {'local_hits', 'shared_hits', 'misses', 'hit_rate', 'entries'}
+        """
+        with QueryEmbeddingCache._lock:
+            stats = dict(QueryEmbeddingCache._counters)
+            stats['entries'] = len(QueryEmbeddingCache._lru)
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        hits = stats['local_hits'] + stats['shared_hits']
+        stats['hit_rate'] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
+
+    @staticmethod
+    def clear() -> None:
+        """Drop this worker's LRU and reset its counters"""
+        with QueryEmbeddingCache._lock:
+            QueryEmbeddingCache._lru.clear()
+            for counter in QueryEmbeddingCache._counters:
+                QueryEmbeddingCache._counters[counter] = 0
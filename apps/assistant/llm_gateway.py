@@ -0,0 +1,484 @@
+"""
+LLM inference gateway for Helix
+
+Every generation goes through LLMGateway instead of calling the Ollama
+client directly:
+
+- Admission: at most HELIX_GATEWAY_MAX_IN_FLIGHT[model] generations per
+  model run at once; the rest wait in a bounded queue
+  (HELIX_GATEWAY_MAX_QUEUE per model)
+- Fairness: waiting requests are queued per tenant and served round-robin,
+  so one tenant's burst can't starve the others
+- Routing: short, self-contained questions go to the smaller quantized
+  model from ModelQuantizer (HELIX_LIGHT_MODEL_QUANTIZATION), but only
+  when the Helix status snapshot lists it as installed; if Ollama still
+  answers "model not found" the request is retried on the primary model
+  and the light model is skipped for the rest of the process
+- Load shedding: a full queue or a wait longer than
+  HELIX_GATEWAY_QUEUE_TIMEOUT raises GatewayOverloaded; callers answer
+  with BUSY_MESSAGE instead of piling onto the model server
+- Metrics: queue depth, in-flight, wait times, shed/timeouts per model
+  (LLMGateway.stats())
+- Usage: pass a dict as `usage` to invoke/stream/astream and it is filled
+  with the token counts Ollama reports for the generation
+  (prompt_eval_count / eval_count) once it ends
+
+The scheduler is guarded by a threading lock and wakes waiters through a
+threading.Event (sync views) or an asyncio future (async views), so both
+share the same limits inside a worker.
+"""
+
+import time
+import asyncio
+import threading
+import logging
+from collections import OrderedDict, deque
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, Optional, Set
+
+from django.conf import settings
+
+try:
+    from langchain_core.callbacks import BaseCallbackHandler
+except ImportError:
+    # Langchain optional dependency
+    BaseCallbackHandler = object
+
+try:
+    from .multilang import ModelQuantizer, QuantizationType
+except ImportError:
+    # multilang needs langdetect (optional dependency)
+    ModelQuantizer = None
+    QuantizationType = None
+
+from .tokenization import count_tokens
+
+logger = logging.getLogger(__name__)
+
+BUSY_MESSAGE = (
+    "O assistente está com muitas solicitações no momento. "
+    "Por favor, tente novamente em alguns instantes."
+)
+
+
+class GatewayOverloaded(Exception):
+    """Request shed: queue full or waited longer than the queue timeout"""
+
+
+class UsageCollector(BaseCallbackHandler):
+    """Copies Ollama's token counts from the finished generation into `usage`"""
+
+    def __init__(self, usage: Dict):
+        super().__init__()
+        self.usage = usage
+
+    def on_llm_end(self, response, **kwargs) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                info = generation.generation_info or {}
+                if 'prompt_eval_count' in info or 'eval_count' in info:
+                    self.usage['prompt_tokens'] = info.get('prompt_eval_count')
+                    self.usage['completion_tokens'] = info.get('eval_count')
+
+
+def _with_tag(model: str) -> str:
+    """Ollama name with its tag ('llama3' -> 'llama3:latest')"""
+    return model if ':' in model else f'{model}:latest'
+
+
+def _usage_kwargs(usage: Optional[Dict]) -> Dict:
+    return {} if usage is None else {'config': {'callbacks': [UsageCollector(usage)]}}
+
+
+class _Ticket:
+    """One request waiting for (or holding) a model slot"""
+
+    __slots__ = ('model', 'tenant', 'enqueued_at', 'granted', 'event', 'loop', 'future')
+
+    def __init__(self, model, tenant):
+        self.model = model
+        self.tenant = tenant
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.event = None
+        self.loop = None
+        self.future = None
+
+    def wake(self):
+        if self.event is not None:
+            self.event.set()
+        elif self.future is not None:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(True)
+
+
+class _ModelLane:
+    """Slots and per-tenant queues of one model"""
+
+    __slots__ = ('limit', 'in_flight', 'queues', 'queued')
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.queues: 'OrderedDict[str, deque]' = OrderedDict()
+        self.queued = 0
+
+    def enqueue(self, ticket):
+        self.queues.setdefault(ticket.tenant, deque()).append(ticket)
+        self.queued += 1
+
+    def remove(self, ticket):
+        queue = self.queues.get(ticket.tenant)
+        if queue and ticket in queue:
+            queue.remove(ticket)
+            self.queued -= 1
+            if not queue:
+                del self.queues[ticket.tenant]
+
+    def next_ticket(self):
+        """Round-robin: first tenant in line gets one slot, then goes to the back"""
+        if not self.queues:
+            return None
+        tenant, queue = next(iter(self.queues.items()))
+        ticket = queue.popleft()
+        self.queued -= 1
+        if queue:
+            self.queues.move_to_end(tenant)
+        else:
+            del self.queues[tenant]
+        return ticket
+
+
+class LLMGateway:
+    """
+    Bounded, tenant-fair access to the Ollama models
+
+    Usage:
+        model = LLMGateway.route(query, prompt_tokens, has_history)
+        text = LLMGateway.invoke(prompt, model, tenant)
+        for token in LLMGateway.stream(prompt, model, tenant): ...
+        async for token in LLMGateway.astream(prompt, model, tenant): ...
+    """
+
+    _lanes: Dict[str, _ModelLane] = {}
+    _clients: Dict[str, object] = {}
+    _missing: Set[str] = set()
+    _lock = threading.Lock()
+    _metrics = {
+        'admitted': 0,
+        'shed': 0,
+        'timeouts': 0,
+        'wait_total_ms': 0.0,
+        'wait_max_ms': 0.0,
+    }
+
+    # ----- Configuração -----
+
+    @staticmethod
+    def primary_model() -> str:
+        from .services import LLM_MODEL
+        return LLM_MODEL
+
+    @staticmethod
+    def light_model() -> Optional[str]:
+        """Smaller quantized model for simple queries (None = routing off)"""
+        if not getattr(settings, 'HELIX_LIGHT_MODEL_ENABLED', True):
+            return None
+        explicit = getattr(settings, 'HELIX_LIGHT_MODEL', None)
+        if explicit:
+            return explicit
+        if ModelQuantizer is None:
+            return None
+        level = getattr(settings, 'HELIX_LIGHT_MODEL_QUANTIZATION', 'q3')
+        return ModelQuantizer.get_model_tag(QuantizationType(level))
+
+    @staticmethod
+    def max_in_flight(model: str) -> int:
+        limits = getattr(settings, 'HELIX_GATEWAY_MAX_IN_FLIGHT', {})
+        return limits.get(model, limits.get('default', 2))
+
+    @staticmethod
+    def max_queue() -> int:
+        return getattr(settings, 'HELIX_GATEWAY_MAX_QUEUE', 32)
+
+    @staticmethod
+    def queue_timeout() -> float:
+        return getattr(settings, 'HELIX_GATEWAY_QUEUE_TIMEOUT', 30.0)
+
+    # ----- Clients -----
+
+    @staticmethod
+    def register_client(model: str, client) -> None:
+        LLMGateway._clients[model] = client
+
+    @staticmethod
+    def get_client(model: str):
+        """Ollama client for model (created on first use)"""
+        client = LLMGateway._clients.get(model)
+        if client is not None:
+            return client
+
+        from . import services
+        if model == services.LLM_MODEL and services.llm is not None:
+            return services.llm
+        if services.Ollama is None:
+            raise ValueError(f"No client available for model {model}")
+        client = services.Ollama(
+            base_url=services.OLLAMA_BASE_URL,
+            model=model,
+            temperature=0.1,
+            top_k=40,
+            top_p=0.9,
+            num_ctx=getattr(settings, 'HELIX_CONTEXT_WINDOW', 4096),
+        )
+        LLMGateway._clients[model] = client
+        return client
+
+    # ----- Routing -----
+
+    @staticmethod
+    def is_simple_query(query: str, prompt_tokens: int = 0, has_history: bool = False) -> bool:
+        """
+        Short, single, self-contained question with a small prompt
+
+        Follow-ups (history) and long/multi-part questions stay on the
+        primary model.
+        """
+        if has_history:
+            return False
+        if query.count('?') > 1 or '\n' in query.strip():
+            return False
+        if count_tokens(query) > getattr(settings, 'HELIX_ROUTER_SIMPLE_MAX_TOKENS', 32):
+            return False
+        return prompt_tokens <= getattr(settings, 'HELIX_ROUTER_LIGHT_MAX_PROMPT_TOKENS', 2048)
+
+    @staticmethod
+    def is_installed(model: str) -> bool:
+        """Model listed by the last status probe (one cache read, no network I/O)"""
+        if model in LLMGateway._missing:
+            return False
+        from .status import HelixStatusMonitor
+        installed = HelixStatusMonitor.read().get('installed_models') or []
+        return _with_tag(model) in {_with_tag(name) for name in installed}
+
+    @staticmethod
+    def route(query: str, prompt_tokens: int = 0, has_history: bool = False) -> str:
+        """Model that should answer this query"""
+        light = LLMGateway.light_model()
+        if (
+            light and LLMGateway.is_simple_query(query, prompt_tokens, has_history)
+            and LLMGateway.is_installed(light)
+        ):
+            return light
+        return LLMGateway.primary_model()
+
+    @staticmethod
+    def _fallback(model: str, error: Exception) -> Optional[str]:
+        """Primary model when `model` is not installed in Ollama, else None"""
+        primary = LLMGateway.primary_model()
+        message = str(error).lower()
+        if model == primary or 'model' not in message or 'not found' not in message:
+            return None
+        LLMGateway._missing.add(model)
+        logger.warning(f"✗ Model {model} not found in Ollama - falling back to {primary}")
+        return primary
+
+    # ----- Admission -----
+
+    @staticmethod
+    def _lane(model: str) -> _ModelLane:
+        lane = LLMGateway._lanes.get(model)
+        if lane is None:
+            lane = LLMGateway._lanes[model] = _ModelLane(LLMGateway.max_in_flight(model))
+        return lane
+
+    @staticmethod
+    def _admit(ticket: _Ticket) -> bool:
+        """Grant now (True), enqueue (False) or shed (GatewayOverloaded); lock held"""
+        lane = LLMGateway._lane(ticket.model)
+        if lane.in_flight < lane.limit and not lane.queued:
+            lane.in_flight += 1
+            ticket.granted = True
+            LLMGateway._record_wait(ticket)
+            return True
+        if lane.queued >= LLMGateway.max_queue():
+            LLMGateway._metrics['shed'] += 1
+            logger.warning(f"✗ LLM gateway shedding request for {ticket.model} (queue full)")
+            raise GatewayOverloaded(BUSY_MESSAGE)
+        lane.enqueue(ticket)
+        return False
+
+    @staticmethod
+    def _record_wait(ticket: _Ticket) -> None:
+        waited = (time.monotonic() - ticket.enqueued_at) * 1000
+        metrics = LLMGateway._metrics
+        metrics['admitted'] += 1
+        metrics['wait_total_ms'] += waited
+        metrics['wait_max_ms'] = max(metrics['wait_max_ms'], waited)
+
+    @staticmethod
+    def _abandon(ticket: _Ticket, timed_out: bool = True) -> bool:
+        """Waiter gave up; True if the slot was granted meanwhile"""
+        with LLMGateway._lock:
+            if ticket.granted:
+                return True
+            LLMGateway._lane(ticket.model).remove(ticket)
+            if timed_out:
+                LLMGateway._metrics['timeouts'] += 1
+        if timed_out:
+            logger.warning(f"✗ LLM gateway timeout waiting for {ticket.model}")
+        return False
+
+    @staticmethod
+    def _release(model: str) -> None:
+        """Free a slot and hand it to the next tenant in line"""
+        with LLMGateway._lock:
+            lane = LLMGateway._lane(model)
+            lane.in_flight -= 1
+            ticket = lane.next_ticket()
+            if ticket is not None:
+                lane.in_flight += 1
+                ticket.granted = True
+                LLMGateway._record_wait(ticket)
+        if ticket is not None:
+            ticket.wake()
+
+    @staticmethod
+    @contextmanager
+    def slot(model: str, tenant: str):
+        """Hold one generation slot of model (blocking wait)"""
+        ticket = _Ticket(model, tenant)
+        with LLMGateway._lock:
+            granted = LLMGateway._admit(ticket)
+            if not granted:
+                ticket.event = threading.Event()
+        if not granted and not ticket.event.wait(LLMGateway.queue_timeout()):
+            if not LLMGateway._abandon(ticket):
+                raise GatewayOverloaded(BUSY_MESSAGE)
+        try:
+            yield
+        finally:
+            LLMGateway._release(model)
+
+    @staticmethod
+    @asynccontextmanager
+    async def aslot(model: str, tenant: str):
+        """Hold one generation slot of model (awaits without blocking the loop)"""
+        ticket = _Ticket(model, tenant)
+        with LLMGateway._lock:
+            granted = LLMGateway._admit(ticket)
+            if not granted:
+                ticket.loop = asyncio.get_running_loop()
+                ticket.future = ticket.loop.create_future()
+        if not granted:
+            try:
+                await asyncio.wait_for(asyncio.shield(ticket.future), LLMGateway.queue_timeout())
+            except asyncio.TimeoutError:
+                if not LLMGateway._abandon(ticket):
+                    raise GatewayOverloaded(BUSY_MESSAGE)
+            except asyncio.CancelledError:
+                # Client went away while queued - give back a late grant
+                if LLMGateway._abandon(ticket, timed_out=False):
+                    LLMGateway._release(model)
+                raise
+        try:
+            yield
+        finally:
+            LLMGateway._release(model)
+
+    # ----- Generation -----
+
+    @staticmethod
+    def invoke(prompt: str, model: Optional[str] = None, tenant: str = 'public',
+               usage: Optional[Dict] = None) -> str:
+        model = model or LLMGateway.primary_model()
+        try:
+            with LLMGateway.slot(model, tenant):
+                return LLMGateway.get_client(model).invoke(prompt, **_usage_kwargs(usage))
+        except Exception as e:
+            fallback = LLMGateway._fallback(model, e)
+            if fallback is None:
+                raise
+        return LLMGateway.invoke(prompt, fallback, tenant, usage)
+
+    @staticmethod
+    def stream(prompt: str, model: Optional[str] = None, tenant: str = 'public',
+               usage: Optional[Dict] = None):
+        """Sync token iterator; the slot is held until the stream ends"""
+        model = model or LLMGateway.primary_model()
+        started = False
+        try:
+            with LLMGateway.slot(model, tenant):
+                for token in LLMGateway.get_client(model).stream(prompt, **_usage_kwargs(usage)):
+                    started = True
+                    yield token
+                return
+        except Exception as e:
+            # Only before the first token: a retry must not repeat output
+            fallback = None if started else LLMGateway._fallback(model, e)
+            if fallback is None:
+                raise
+        yield from LLMGateway.stream(prompt, fallback, tenant, usage)
+
+    @staticmethod
+    async def astream(prompt: str, model: Optional[str] = None, tenant: str = 'public',
+                      usage: Optional[Dict] = None):
+        """Async token iterator; the slot is held until the stream ends"""
+        model = model or LLMGateway.primary_model()
+        started = False
+        try:
+            async with LLMGateway.aslot(model, tenant):
+                async for token in LLMGateway.get_client(model).astream(prompt, **_usage_kwargs(usage)):
+                    started = True
+                    yield token
+                return
+        except Exception as e:
+            fallback = None if started else LLMGateway._fallback(model, e)
+            if fallback is None:
+                raise
+        async for token in LLMGateway.astream(prompt, fallback, tenant, usage):
+            yield token
+
+    # ----- Metrics -----
+
+    @staticmethod
+    def stats() -> Dict:
+        """
+        Returns (this worker):
+            {'models': {model: {'in_flight', 'limit', 'queued', 'tenants_waiting'}},
+             'queued', 'admitted', 'shed', 'timeouts', 'avg_wait_ms', 'max_wait_ms'}
+        """
+        with LLMGateway._lock:
+            models = {
+                model: {
+                    'in_flight': lane.in_flight,
+                    'limit': lane.limit,
+                    'queued': lane.queued,
+                    'tenants_waiting': len(lane.queues),
+                }
+                for model, lane in LLMGateway._lanes.items()
+            }
+            metrics = dict(LLMGateway._metrics)
+        admitted = metrics['admitted']
+        return {
+            'models': models,
+            'queued': sum(lane['queued'] for lane in models.values()),
+            'admitted': admitted,
+            'shed': metrics['shed'],
+            'timeouts': metrics['timeouts'],
+            'avg_wait_ms': round(metrics['wait_total_ms'] / admitted, 2) if admitted else 0.0,
+            'max_wait_ms': round(metrics['wait_max_ms'], 2),
+        }
+
+    @staticmethod
+    def reset() -> None:
+        """Forget lanes, clients and metrics (tests / settings reload)"""
+        with LLMGateway._lock:
+            LLMGateway._lanes.clear()
+            LLMGateway._clients.clear()
+            LLMGateway._missing.clear()
+            for key in LLMGateway._metrics:
+                LLMGateway._metrics[key] = 0 if key in ('admitted', 'shed', 'timeouts') else 0.0
@@ -0,0 +1,54 @@
+"""
+Rebuild the Helix RAG vector index
+
+Usage:
+    python manage.py rebuild_vector_index                      # HNSW (pgvector)
+    python manage.py rebuild_vector_index --method ivfflat --lists 500
+    python manage.py rebuild_vector_index --local              # NumPy fallback
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.assistant.vector_index import (
+    ANN_METHODS,
+    LocalVectorIndex,
+    PgVectorIndex,
+    VectorIndex,
+    tenant_key,
+)
+
+
+class Command(BaseCommand):
+    help = "Recria o índice vetorial (pgvector HNSW/IVFFlat ou matriz local NumPy) do SyncRH"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--method', choices=ANN_METHODS, default='hnsw')
+        parser.add_argument('--m', type=int, default=16, help="HNSW: conexões por nó")
+        parser.add_argument('--ef-construction', type=int, default=64, help="HNSW: lista de candidatos na construção")
+        parser.add_argument('--lists', type=int, default=None, help="IVFFlat: número de listas (default: automático)")
+        parser.add_argument('--no-concurrently', action='store_true', help="Bloqueia a tabela durante a construção")
+        parser.add_argument('--local', action='store_true', help="Recria a matriz local NumPy (fallback)")
+        parser.add_argument('--tenant', default=None, help="Tenant da matriz local (default: schema atual)")
+
+    def handle(self, *args, **options):
+        if options['local'] or VectorIndex.backend() == 'local':
+            if not LocalVectorIndex.is_available():
+                raise CommandError("NumPy não instalado - índice local indisponível")
+            tenant = options['tenant'] or tenant_key()
+            LocalVectorIndex.invalidate(tenant)
+            rows = LocalVectorIndex.build(tenant)
+            self.stdout.write(self.style.SUCCESS(f"✓ Índice local '{tenant}' recriado ({rows} chunks)"))
+            return
+
+        if not PgVectorIndex.is_available():
+            raise CommandError("Extensão pgvector não disponível neste banco")
+
+        sql = PgVectorIndex.rebuild(
+            method=options['method'],
+            m=options['m'],
+            ef_construction=options['ef_construction'],
+            lists=options['lists'],
+            concurrently=not options['no_concurrently'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"✓ Índice {options['method']} recriado"))
+        self.stdout.write(sql)
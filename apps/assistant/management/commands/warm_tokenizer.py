@@ -0,0 +1,33 @@
+"""
+Download and load the Helix tokenizer vocabulary
+
+Run at deploy/build time so workers find the BPE file in
+HELIX_TOKENIZER_CACHE_DIR and never download it while serving.
+
+Usage:
+    python manage.py warm_tokenizer
+    python manage.py warm_tokenizer --encoding o200k_base
+"""
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.assistant.tokenization import get_encoding, tiktoken
+
+
+class Command(BaseCommand):
+    help = "Baixa e carrega o vocabulário do tokenizer do Helix (HELIX_TOKENIZER_CACHE_DIR)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--encoding', default=None, help="Encoding (default: HELIX_TOKENIZER_ENCODING)")
+
+    def handle(self, *args, **options):
+        if tiktoken is None:
+            raise CommandError("tiktoken não instalado - contagem heurística em uso")
+        name = options['encoding'] or settings.HELIX_TOKENIZER_ENCODING
+        encoding = get_encoding(name)
+        if encoding is None:
+            raise CommandError(f"Não foi possível carregar o encoding '{name}'")
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Encoding '{name}' pronto ({encoding.n_vocab} tokens) em {settings.HELIX_TOKENIZER_CACHE_DIR}"
+        ))
@@ -0,0 +1,49 @@
+# HNSW index for RAG similarity search (pgvector)
+
+from django.conf import settings
+from django.db import migrations
+
+INDEX_NAME = "assistant_chunk_embedding_ann_idx"
+
+# Same expression as PgVectorIndex.embedding_expression(), or queries skip the index
+CREATE_INDEX_SQL = (
+    f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} "
+    "ON assistant_documentochunk "
+    "USING hnsw ((embedding::vector({dimensions})) vector_cosine_ops) "
+    "WITH (m = 16, ef_construction = 64)"
+)
+DROP_INDEX_SQL = f"DROP INDEX IF EXISTS {INDEX_NAME}"
+
+
+def _pgvector_available(schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'vector'")
+        return cursor.fetchone() is not None
+
+
+def create_ann_index(apps, schema_editor):
+    # SQLite/test runs and servers without pgvector use the local NumPy index
+    if not _pgvector_available(schema_editor):
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    dimensions = int(getattr(settings, "HELIX_EMBEDDING_DIMENSIONS", 1536))
+    schema_editor.execute(CREATE_INDEX_SQL.format(dimensions=dimensions))
+
+
+def drop_ann_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(DROP_INDEX_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("assistant", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_ann_index, drop_ann_index),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-17 04:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0003_documentochunk_embedding_ann_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='documento',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 do conteúdo (re-ingestão ignora arquivos inalterados)', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='documentochunk',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 do conteúdo do chunk (embedding reaproveitado se inalterado)', max_length=64),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.3 on 2026-10-17 04:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('assistant', '0004_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mensagem',
+            name='completion_tokens',
+            field=models.IntegerField(default=0, help_text='Tokens gerados pelo modelo'),
+        ),
+        migrations.AddField(
+            model_name='mensagem',
+            name='prompt_tokens',
+            field=models.IntegerField(default=0, help_text='Tokens do prompt enviado ao modelo (0 em respostas do cache)'),
+        ),
+        migrations.AlterField(
+            model_name='mensagem',
+            name='tokens_used',
+            field=models.IntegerField(default=0, help_text='Tokens consumidos por esta mensagem (prompt + resposta)'),
+        ),
+    ]
@@ -70,6 +70,12 @@ class Documento(TenantAwareModel):
         default=True,
         help_text="Incluir na base de conhecimento RAG"
     )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        help_text="SHA-256 do conteúdo (re-ingestão ignora arquivos inalterados)"
+    )
     ingested_at = models.DateTimeField(
         auto_now_add=True
     )
@@ -108,6 +114,12 @@ class DocumentoChunk(models.Model):
     content = models.TextField(
         help_text="Conteúdo de texto deste chunk"
     )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        help_text="SHA-256 do conteúdo do chunk (embedding reaproveitado se inalterado)"
+    )
     
     # Vector embedding (pgvector - 1536 dimensions for text-embedding-3-small)
     embedding = ArrayField(
@@ -217,7 +229,17 @@ class Mensagem(models.Model):
     # Metadados
     tokens_used = models.IntegerField(
         default=0,
-        help_text="Tokens OpenAI consumidos por esta mensagem"
+        help_text="Tokens consumidos por esta mensagem (prompt + resposta)"
+    )
+    
+    prompt_tokens = models.IntegerField(
+        default=0,
+        help_text="Tokens do prompt enviado ao modelo (0 em respostas do cache)"
+    )
+    
+    completion_tokens = models.IntegerField(
+        default=0,
+        help_text="Tokens gerados pelo modelo"
     )
     
     created_at = models.DateTimeField(auto_now_add=True)
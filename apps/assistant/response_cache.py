@@ -0,0 +1,306 @@
+"""
+Semantic response cache for the Helix assistant
+
+Repeated HR-policy questions ("quantos dias de férias?") are answered from
+a per-tenant cache keyed on the query embedding instead of a new LLM call:
+
+- Lookup: cosine similarity between the (normalized) query embedding and
+  every cached query of the tenant; best match >= HELIX_RESPONSE_CACHE_THRESHOLD
+  is a hit and returns the stored response + citations
+- Eviction: LRU bounded by HELIX_RESPONSE_CACHE_MAX_ENTRIES per tenant,
+  plus HELIX_RESPONSE_CACHE_TTL seconds
+- Invalidation: every entry remembers the version stamp of each Documento
+  in its retrieved context; re-ingesting or deactivating a document bumps
+  its stamp in the Django cache, so stale entries miss in every worker
+- Metrics: hits/misses/evictions/invalidations per tenant (Django cache
+  counters, shared by all workers)
+
+Entries live in process memory (the similarity scan needs the vectors
+locally); only version stamps and counters are shared.
+"""
+
+import time
+import threading
+import logging
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+try:
+    import numpy as np
+except ImportError:
+    # NumPy optional dependency (cache disabled without it)
+    np = None
+
+from .vector_index import tenant_key
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('hits', 'misses', 'stores', 'evictions', 'invalidations')
+
+
+class _CacheEntry:
+    """One cached answer"""
+
+    __slots__ = ('namespace', 'response', 'citations', 'document_versions', 'created_at')
+
+    def __init__(self, namespace, response, citations, document_versions, created_at):
+        self.namespace = namespace
+        self.response = response
+        self.citations = citations
+        self.document_versions = document_versions
+        self.created_at = created_at
+
+
+class _TenantBucket:
+    """LRU-ordered entries of a tenant plus their stacked query matrix"""
+
+    __slots__ = ('entries', 'vectors', 'matrix', 'keys', 'next_key')
+
+    def __init__(self):
+        self.entries: 'OrderedDict[int, _CacheEntry]' = OrderedDict()
+        self.vectors: Dict[int, 'np.ndarray'] = {}
+        self.matrix = None
+        self.keys: List[int] = []
+        self.next_key = 0
+
+    def remove(self, key: int) -> None:
+        self.entries.pop(key, None)
+        self.vectors.pop(key, None)
+        self.matrix = None
+
+    def stacked(self):
+        """(keys, matrix) - rebuilt lazily after inserts/evictions"""
+        if self.matrix is None and self.vectors:
+            self.keys = list(self.vectors)
+            self.matrix = np.vstack([self.vectors[key] for key in self.keys])
+        return self.keys, self.matrix
+
+
+class SemanticResponseCache:
+    """
+    Per-tenant semantic cache of assistant answers
+
+    Usage:
+        cached = SemanticResponseCache.lookup(query_embedding, namespace=ns)
+        if cached is None:
+            ...call the LLM...
+            SemanticResponseCache.store(query_embedding, response, citations, namespace=ns)
+    """
+
+    _buckets: Dict[str, _TenantBucket] = {}
+    _lock = threading.RLock()
+
+    # ----- Configuração -----
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return np is not None and getattr(settings, 'HELIX_RESPONSE_CACHE_ENABLED', True)
+
+    @staticmethod
+    def threshold() -> float:
+        return getattr(settings, 'HELIX_RESPONSE_CACHE_THRESHOLD', 0.95)
+
+    @staticmethod
+    def ttl() -> int:
+        return getattr(settings, 'HELIX_RESPONSE_CACHE_TTL', 3600)
+
+    @staticmethod
+    def max_entries() -> int:
+        return getattr(settings, 'HELIX_RESPONSE_CACHE_MAX_ENTRIES', 1000)
+
+    # ----- Document version stamps (shared) -----
+
+    @staticmethod
+    def _document_key(tenant: str, document_id: int) -> str:
+        return f'helix:response_cache:{tenant}:document:{document_id}'
+
+    @staticmethod
+    def document_versions(document_ids: Iterable[int], tenant: str) -> Dict[int, int]:
+        """Current version stamp of each document (0 = never invalidated)"""
+        keys = {
+            SemanticResponseCache._document_key(tenant, doc_id): doc_id
+            for doc_id in set(document_ids)
+        }
+        stored = cache.get_many(list(keys)) if keys else {}
+        return {doc_id: stored.get(key, 0) for key, doc_id in keys.items()}
+
+    @staticmethod
+    def invalidate_documents(document_ids: Iterable[int], tenant: Optional[str] = None) -> None:
+        """Documents re-ingested/deactivated - every answer citing them goes stale"""
+        tenant = tenant or tenant_key()
+        for doc_id in set(document_ids):
+            key = SemanticResponseCache._document_key(tenant, doc_id)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, 1, None)
+
+    # ----- Metrics -----
+
+    @staticmethod
+    def _metric_key(tenant: str, metric: str) -> str:
+        return f'helix:response_cache:{tenant}:{metric}'
+
+    @staticmethod
+    def _count(tenant: str, metric: str) -> None:
+        key = SemanticResponseCache._metric_key(tenant, metric)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 0, None)
+            try:
+                cache.incr(key)
+            except ValueError:
+                pass
+
+    @staticmethod
+    def stats(tenant: Optional[str] = None) -> Dict:
+        """
+        Returns:
+            {'hits', 'misses', 'stores', 'evictions', 'invalidations',
+             'hit_rate', 'entries'}  (entries = this worker's bucket)
+        """
+        tenant = tenant or tenant_key()
+        stored = cache.get_many([SemanticResponseCache._metric_key(tenant, m) for m in METRICS])
+        stats = {m: stored.get(SemanticResponseCache._metric_key(tenant, m), 0) for m in METRICS}
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        bucket = SemanticResponseCache._buckets.get(tenant)
+        stats['entries'] = len(bucket.entries) if bucket else 0
+        return stats
+
+    # ----- Lookup / store -----
+
+    @staticmethod
+    def _normalize(vector) -> Optional['np.ndarray']:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if not norm:
+            return None
+        return vector / norm
+
+    @staticmethod
+    def lookup(query_embedding: List[float], namespace: str = '', tenant: Optional[str] = None) -> Optional[Dict]:
+        """
+        Find a cached answer for a semantically equivalent query
+
+        Args:
+            query_embedding: Embedding of the user query
+            namespace: Partition inside the tenant (model + system prompt),
+                so a config change never serves answers built for another prompt
+            tenant: Defaults to the current schema
+
+        Returns:
+            {'response', 'citations', 'similarity'} or None on miss
+        """
+        if not SemanticResponseCache.is_enabled():
+            return None
+
+        tenant = tenant or tenant_key()
+        vector = SemanticResponseCache._normalize(query_embedding)
+        if vector is None:
+            return None
+
+        with SemanticResponseCache._lock:
+            bucket = SemanticResponseCache._buckets.get(tenant)
+            keys, matrix = bucket.stacked() if bucket else ([], None)
+            if matrix is None or matrix.shape[1] != vector.shape[0]:
+                SemanticResponseCache._count(tenant, 'misses')
+                return None
+
+            scores = matrix @ vector
+            threshold = SemanticResponseCache.threshold()
+            now = time.time()
+            expired = []
+            hit_key = None
+            for position in np.argsort(scores)[::-1]:
+                if scores[position] < threshold:
+                    break
+                key = keys[position]
+                entry = bucket.entries[key]
+                if now - entry.created_at > SemanticResponseCache.ttl():
+                    expired.append(key)
+                    continue
+                if entry.namespace == namespace:
+                    hit_key = key
+                    similarity = float(scores[position])
+                    break
+
+            for key in expired:
+                bucket.remove(key)
+                SemanticResponseCache._count(tenant, 'evictions')
+
+            if hit_key is None:
+                SemanticResponseCache._count(tenant, 'misses')
+                return None
+
+            entry = bucket.entries[hit_key]
+            current = SemanticResponseCache.document_versions(entry.document_versions, tenant)
+            if current != entry.document_versions:
+                bucket.remove(hit_key)
+                SemanticResponseCache._count(tenant, 'invalidations')
+                SemanticResponseCache._count(tenant, 'misses')
+                return None
+
+            bucket.entries.move_to_end(hit_key)
+
+        SemanticResponseCache._count(tenant, 'hits')
+        logger.debug(f"✓ Response cache hit (similarity {similarity:.4f})")
+        return {
+            'response': entry.response,
+            'citations': entry.citations,
+            'similarity': similarity,
+        }
+
+    @staticmethod
+    def store(
+        query_embedding: List[float],
+        response: str,
+        citations: List[Dict],
+        namespace: str = '',
+        tenant: Optional[str] = None
+    ) -> None:
+        """Cache an answer; the cited documents' versions are captured now"""
+        if not SemanticResponseCache.is_enabled() or not response:
+            return
+
+        tenant = tenant or tenant_key()
+        vector = SemanticResponseCache._normalize(query_embedding)
+        if vector is None:
+            return
+
+        document_ids = [c['document_id'] for c in citations if c.get('document_id') is not None]
+        entry = _CacheEntry(
+            namespace=namespace,
+            response=response,
+            citations=citations,
+            document_versions=SemanticResponseCache.document_versions(document_ids, tenant),
+            created_at=time.time(),
+        )
+
+        with SemanticResponseCache._lock:
+            bucket = SemanticResponseCache._buckets.setdefault(tenant, _TenantBucket())
+            key = bucket.next_key
+            bucket.next_key += 1
+            bucket.entries[key] = entry
+            bucket.vectors[key] = vector
+            bucket.matrix = None
+
+            while len(bucket.entries) > SemanticResponseCache.max_entries():
+                oldest = next(iter(bucket.entries))
+                bucket.remove(oldest)
+                SemanticResponseCache._count(tenant, 'evictions')
+
+        SemanticResponseCache._count(tenant, 'stores')
+
+    @staticmethod
+    def clear(tenant: Optional[str] = None) -> None:
+        """Drop this worker's entries (all tenants when tenant is None)"""
+        with SemanticResponseCache._lock:
+            if tenant is None:
+                SemanticResponseCache._buckets.clear()
+            else:
+                SemanticResponseCache._buckets.pop(tenant, None)
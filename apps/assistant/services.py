@@ -5,24 +5,31 @@ Core RAG pipeline implementation using:
 - LangChain for orchestration
 - Ollama (qwen2.5:14b) for LLM generation (localhost:11434)
 - Nãomic embeddings for vector representation
-- PostgreSQL pgvector for similarity search
+- PostgreSQL pgvector for similarity search (HNSW index, NumPy fallback)
 - LangChain-Postgres for vector storage integration
 
 Hardware: 32GB RAM (sufficient for 14B model)
 
 Modules:
 1. HelixConfig - Configuração management
-2. DocumentoIngestion - Read docs/, parse, chunk, embed (async)
+2. DocumentoIngestion - Read docs/, parse, chunk, embed (incremental, batched)
 3. RAGPipeline - Query processing with pgvector retrieval
 4. HelixAssistant - LLM interaction with conversational memory
 """
 
 import os
+import time
+import random
+import hashlib
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Optional, Tuple
 from pathlib import Path
 import json
 
+from django.db import transaction
+from django.utils import timezone
+
 try:
     from langchain.text_splitter import RecursiveCharacterTextSplitter
     from langchain_community.embeddings import OllamaEmbeddings
@@ -42,6 +49,12 @@ except ImportError as e:
     PromptTemplate = None
 
 from .models import Documento, DocumentoChunk, Conversa, Mensagem, HelixConfig
+from .vector_index import VectorIndex, RetrievedChunk, LocalVectorIndex, tenant_key
+from . import similarity
+from .response_cache import SemanticResponseCache
+from .embedding_cache import QueryEmbeddingCache
+from .tokenization import count_tokens, truncate_to_tokens
+from .llm_gateway import LLMGateway, GatewayOverloaded, BUSY_MESSAGE
 
 logger = logging.getLogger(__name__)
 
@@ -114,6 +127,11 @@ def check_ollama_connection() -> bool:
         return False
 
 
+def embed_query(query: str) -> List[float]:
+    """Query embedding through the LRU + Django cache (Ollama only on miss)"""
+    return QueryEmbeddingCache.get_or_embed(query, EMBEDDING_MODEL, embeddings.embed_query)
+
+
 def get_vector_db() -> Optional[PGVector]:
     """Initialize or retrieve vector database connection."""
     if not DATABASE_URL or not embeddings:
@@ -164,10 +182,11 @@ class DocumentoIngestion:
     
     Process:
     1. Discover docs in docs/ folder
-    2. Parse content (markdown, text, html)
-    3. Split into chunks with overlap
-    4. Generate embeddings via Ollama (nomic-embed-text)
-    5. Store in PostgreSQL with pgvector
+    2. Parse content (markdown, text, html) in a thread pool
+    3. Split into chunks with overlap (skipped for unchanged files)
+    4. Generate embeddings via Ollama (nomic-embed-text) in bounded,
+       concurrent batches with retry/backoff
+    5. Store in PostgreSQL with pgvector (bulk_create)
     """
     
     TEXT_SPLITTER_CONFIG = {
@@ -236,29 +255,237 @@ class DocumentoIngestion:
         return chunks
     
     @staticmethod
-    def ingest_documents(company_id: int) -> Dict[str, int]:
+    def content_hash(text: str) -> str:
+        """SHA-256 hex digest used for change detection"""
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def get_pipeline_config() -> Dict[str, any]:
+        """Ingestion tuning (threads, batch sizes, retries) from settings"""
+        from django.conf import settings
+        return {
+            'parse_workers': getattr(settings, 'HELIX_INGEST_PARSE_WORKERS', 4),
+            'embed_batch_size': getattr(settings, 'HELIX_EMBED_BATCH_SIZE', 32),
+            'embed_concurrency': getattr(settings, 'HELIX_EMBED_CONCURRENCY', 2),
+            'embed_max_retries': getattr(settings, 'HELIX_EMBED_MAX_RETRIES', 3),
+            'embed_backoff': getattr(settings, 'HELIX_EMBED_BACKOFF', 1.0),
+            'bulk_size': getattr(settings, 'HELIX_CHUNK_BULK_SIZE', 500),
+        }
+    
+    @staticmethod
+    def prepare_document(
+        file_path: Path,
+        known_hash: Optional[str] = None,
+        folder: Path = DOCS_FOLDER
+    ) -> Optional[Dict]:
+        """
+        Parse, hash and chunk one file (runs in the parse thread pool)
+        
+        Files whose hash matches known_hash are returned without chunking.
+        
+        Returns:
+            {source_path, title, content, content_type, content_hash,
+             unchanged, chunks} or None if the file couldn't be parsed
+        """
+        content, content_type = DocumentoIngestion.parse_document(file_path)
+        if not content:
+            return None
+        
+        digest = DocumentoIngestion.content_hash(content)
+        unchanged = digest == known_hash
+        return {
+            'source_path': str(file_path.relative_to(folder)),
+            'title': file_path.stem,
+            'content': content,
+            'content_type': content_type,
+            'content_hash': digest,
+            'unchanged': unchanged,
+            'chunks': [] if unchanged else DocumentoIngestion.chunk_text(content),
+        }
+    
+    @staticmethod
+    def embed_with_retry(
+        texts: List[str],
+        max_retries: int = 3,
+        backoff: float = 1.0
+    ) -> List[List[float]]:
+        """
+        Embed one batch, retrying with exponential backoff + jitter
+        
+        Raises the last error once max_retries is exhausted.
+        """
+        attempt = 0
+        while True:
+            try:
+                return embeddings.embed_documents(texts)
+            except Exception as e:
+                attempt += 1
+                if attempt > max_retries:
+                    raise
+                delay = backoff * (2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+                logger.warning(
+                    f"✗ Embedding batch failed ({e}) - retry {attempt}/{max_retries} in {delay:.1f}s"
+                )
+                time.sleep(delay)
+    
+    @staticmethod
+    def embed_batches(
+        texts: List[str],
+        config: Dict,
+        executor: ThreadPoolExecutor
+    ) -> List[List[float]]:
+        """
+        Embed texts in batches of embed_batch_size
+        
+        Concurrency is bounded by the executor's max_workers
+        (embed_concurrency), so Ollama never sees more than that many
+        batch requests at once. Output order matches `texts`.
+        """
+        size = max(1, config['embed_batch_size'])
+        batches = [texts[i:i + size] for i in range(0, len(texts), size)]
+        vectors = []
+        for batch_vectors in executor.map(
+            lambda batch: DocumentoIngestion.embed_with_retry(
+                batch, config['embed_max_retries'], config['embed_backoff']
+            ),
+            batches,
+        ):
+            vectors.extend(batch_vectors)
+        return vectors
+    
+    @staticmethod
+    def diff_chunks(document_id: int, chunks: List[str]) -> Tuple[List[DocumentoChunk], List[DocumentoChunk], List[int], int]:
+        """
+        Compare new chunk texts against the stored ones by content hash
+        
+        Returns:
+            (to_embed, reused, stale_ids, unchanged_count)
+            - to_embed: new chunks that need an embedding
+            - reused: chunks whose text moved to another index (embedding copied)
+            - stale_ids: stored chunk ids to delete before inserting
+            - unchanged_count: chunks kept as-is (same index, same hash)
+        """
+        existing = {
+            chunk_index: (chunk_id, digest)
+            for chunk_id, chunk_index, digest in DocumentoChunk.objects.filter(
+                document_id=document_id
+            ).values_list('id', 'chunk_index', 'content_hash')
+        }
+        
+        new_chunks = []
+        stale_ids = []
+        unchanged = 0
+        for chunk_index, chunk_content in enumerate(chunks):
+            digest = DocumentoIngestion.content_hash(chunk_content)
+            stored = existing.get(chunk_index)
+            if stored and stored[1] == digest:
+                unchanged += 1
+                continue
+            if stored:
+                stale_ids.append(stored[0])
+            new_chunks.append(DocumentoChunk(
+                document_id=document_id,
+                chunk_index=chunk_index,
+                content=chunk_content,
+                content_hash=digest,
+                token_count=len(chunk_content.split()),
+                embedding_model=EMBEDDING_MODEL,
+            ))
+        stale_ids.extend(
+            chunk_id for chunk_index, (chunk_id, _) in existing.items()
+            if chunk_index >= len(chunks)
+        )
+        
+        # Reaproveitar embeddings de trechos que apenas mudaram de posição
+        reusable = {}
+        stale_hashes = {c.content_hash for c in new_chunks}
+        if stale_ids and stale_hashes:
+            reusable = dict(
+                DocumentoChunk.objects.filter(
+                    id__in=stale_ids,
+                    content_hash__in=stale_hashes,
+                    embedding_model=EMBEDDING_MODEL,
+                    embedding__isnull=False,
+                ).values_list('content_hash', 'embedding')
+            )
+        
+        to_embed, reused = [], []
+        for chunk in new_chunks:
+            if chunk.content_hash in reusable:
+                chunk.embedding = reusable[chunk.content_hash]
+                reused.append(chunk)
+            else:
+                to_embed.append(chunk)
+        
+        return to_embed, reused, stale_ids, unchanged
+    
+    @staticmethod
+    def _flush(batch: Dict, config: Dict, embed_pool: ThreadPoolExecutor, stats: Dict) -> None:
         """
-        Main ingestion pipeline - synchronous version
+        Embed pending chunks and write everything accumulated so far
+        
+        Documento.content_hash is only advanced once its chunks are stored,
+        so a failed batch is retried on the next ingestion.
+        """
+        to_embed, reused, documents = batch['to_embed'], batch['reused'], batch['documents']
+        try:
+            if to_embed:
+                vectors = DocumentoIngestion.embed_batches(
+                    [chunk.content for chunk in to_embed], config, embed_pool
+                )
+                for chunk, vector in zip(to_embed, vectors):
+                    chunk.embedding = vector
+            
+            with transaction.atomic():
+                DocumentoChunk.objects.bulk_create(
+                    reused + to_embed, batch_size=config['bulk_size']
+                )
+                if documents:
+                    Documento.objects.bulk_update(
+                        documents, ['content_hash'], batch_size=config['bulk_size']
+                    )
+            stats['chunks_created'] += len(reused) + len(to_embed)
+            stats['chunks_reused'] += len(reused)
+        except Exception as e:
+            logger.error(f"✗ Erro storing chunk batch ({len(to_embed)} to embed): {e}")
+            stats['errors'] += 1
+            stats['status'] = 'partial'
+        finally:
+            batch['to_embed'], batch['reused'], batch['documents'] = [], [], []
+    
+    @staticmethod
+    def ingest_documents(company_id: int, folder: Path = DOCS_FOLDER) -> Dict[str, int]:
+        """
+        Main ingestion pipeline - incremental, batched and concurrent
         
         Returns stats: {
-            'documents_ingested': N,
+            'documents_ingested': N,   # new documents
+            'documents_updated': U,
+            'documents_skipped': S,    # unchanged content hash
+            'documents_reactivated': A,  # unchanged file back in docs/
+            'documents_deactivated': D,  # file removed from docs/
             'chunks_created': M,
+            'chunks_skipped': K,
+            'chunks_reused': R,        # moved chunks, embedding copied
             'errors': E,
             'status': 'success'|'partial'|'failed'
         }
         
         Process:
         1. Check Ollama connection
-        2. Discover documents
-        3. Parse each document
-        4. Chunk content
-        5. Generate embeddings using Ollama
-        6. Create Documento + DocumentoChunk records in DB
-        7. Track statistics
+        2. Load known source_path -> content_hash map (one query)
+        3. Parse/hash/chunk files in a thread pool (unchanged files skip chunking)
+        4. Diff chunks by content hash; delete stale rows
+        5. Embed pending chunks in batches with bounded concurrency + retry
+        6. bulk_create chunks every HELIX_CHUNK_BULK_SIZE chunks
+        7. Deactivate documents whose files disappeared
+        
+        Tenancy comes from the django-tenants schema; company_id is kept
+        for logging and API compatibility.
         """
         
         if not check_ollama_connection():
-            logger.error("✗ Ollama not running at {OLLAMA_BASE_URL}")
+            logger.error(f"✗ Ollama not running at {OLLAMA_BASE_URL}")
             return {
                 'documents_ingested': 0,
                 'chunks_created': 0,
@@ -279,99 +506,175 @@ class DocumentoIngestion:
         
         stats = {
             'documents_ingested': 0,
+            'documents_updated': 0,
+            'documents_skipped': 0,
+            'documents_reactivated': 0,
+            'documents_deactivated': 0,
             'chunks_created': 0,
+            'chunks_skipped': 0,
+            'chunks_reused': 0,
             'errors': 0,
             'status': 'success'
         }
         
         # Discover documents
-        doc_paths = DocumentoIngestion.discover_documents()
+        doc_paths = DocumentoIngestion.discover_documents(folder)
         if not doc_paths:
             logger.warning("Não documents found in docs folder")
             stats['message'] = "Não documents to ingest"
             return stats
         
-        # Get or create company Documento objects
-        # from apps.core.models import Empresa
-        # try:
-        #     company = Empresa.objects.get(id=company_id)
-        # except Empresa.DoesNotExist:
-        #     logger.error(f"✗ Empresa {company_id} not found")
-        #     stats['errors'] = 1
-        #     return stats
-        company = None  # Temporarily disabled for demo
-        stats['status'] = 'failed'
-        return stats
+        config = DocumentoIngestion.get_pipeline_config()
+        known = {
+            source_path: (doc_id, digest, is_active)
+            for doc_id, source_path, digest, is_active in Documento.objects.values_list(
+                'id', 'source_path', 'content_hash', 'is_active'
+            )
+        }
+        seen = set()
+        changed_ids = []
+        batch = {'to_embed': [], 'reused': [], 'documents': []}
         
-        # Process each document
-        for doc_path in doc_paths:
+        def prepare(doc_path):
             try:
-                logger.info(f"Processing: {doc_path.name}")
-                
-                # Parse document
-                content, content_type = DocumentoIngestion.parse_document(doc_path)
-                if not content:
-                    stats['errors'] += 1
-                    continue
-                
-                # Create Documento record
-                document, created = Documento.objects.get_or_create(
-                    company=company,
-                    source_path=str(doc_path.relative_to(DOCS_FOLDER)),
-                    defaults={
-                        'title': doc_path.stem,
-                        'content': content,
-                        'content_type': content_type,
-                        'version': '1.0',
-                        'is_active': True,
-                    }
+                source_path = str(doc_path.relative_to(folder))
+                return DocumentoIngestion.prepare_document(
+                    doc_path, known.get(source_path, (None, None, None))[1], folder
                 )
-                
-                if created:
-                    stats['documents_ingested'] += 1
-                    logger.info(f"✓ Created Documento: {document.title}")
-                else:
-                    logger.debug(f"  Documento already exists: {document.title}")
-                
-                # Chunk and embed content
-                chunks = DocumentoIngestion.chunk_text(content)
-                
-                # Generate embeddings for chunks
-                logger.info(f"  Generating embeddings for {len(chunks)} chunks...")
-                try:
-                    chunk_embeddings = embeddings.embed_documents(chunks)
-                    
-                    # Create DocumentoChunk records
-                    for chunk_idx, (chunk_content, embedding_vec) in enumerate(
-                        zip(chunks, chunk_embeddings)
-                    ):
-                        chunk_obj, _ = DocumentoChunk.objects.get_or_create(
-                            document=document,
-                            chunk_index=chunk_idx,
-                            defaults={
-                                'content': chunk_content,
-                                'embedding': embedding_vec,
-                                'token_count': len(chunk_content.split()),
-                                'embedding_model': EMBEDDING_MODEL,
-                            }
-                        )
-                        stats['chunks_created'] += 1
+            except Exception as e:
+                logger.error(f"✗ Erro processing {doc_path}: {e}")
+                return {'error': str(e)}
+        
+        window = max(1, config['parse_workers']) * 4
+        with ThreadPoolExecutor(max_workers=config['parse_workers']) as parse_pool, \
+                ThreadPoolExecutor(max_workers=config['embed_concurrency']) as embed_pool:
+            
+            # Windows keep at most `window` parsed documents in memory
+            for offset in range(0, len(doc_paths), window):
+                for prepared in parse_pool.map(prepare, doc_paths[offset:offset + window]):
+                    if not prepared or 'error' in prepared:
+                        stats['errors'] += 1
+                        stats['status'] = 'partial'
+                        continue
                     
-                    logger.info(f"✓ Created {len(chunks)} chunks for {document.title}")
+                    source_path = prepared['source_path']
+                    seen.add(source_path)
+                    if prepared['unchanged']:
+                        stats['documents_skipped'] += 1
+                        document_id, _, is_active = known[source_path]
+                        if not is_active:
+                            # File is back with the same content: chunks and
+                            # embeddings are still stored, only the flag changes
+                            Documento.objects.filter(id=document_id).update(
+                                is_active=True, updated_at=timezone.now()
+                            )
+                            changed_ids.append(document_id)
+                            stats['documents_reactivated'] += 1
+                        continue
                     
-                except Exception as e:
-                    logger.error(f"✗ Erro generating embeddings: {e}")
-                    stats['errors'] += 1
-                    stats['status'] = 'partial'
+                    try:
+                        stored = known.get(source_path)
+                        if stored:
+                            Documento.objects.filter(id=stored[0]).update(
+                                title=prepared['title'],
+                                content=prepared['content'],
+                                content_type=prepared['content_type'],
+                                is_active=True,
+                                updated_at=timezone.now(),
+                            )
+                            document_id = stored[0]
+                            changed_ids.append(document_id)
+                            stats['documents_updated'] += 1
+                        else:
+                            document_id = Documento.objects.create(
+                                title=prepared['title'],
+                                source_path=source_path,
+                                content=prepared['content'],
+                                content_type=prepared['content_type'],
+                                version='1.0',
+                                is_active=True,
+                            ).id
+                            stats['documents_ingested'] += 1
+                        
+                        to_embed, reused, stale_ids, unchanged = DocumentoIngestion.diff_chunks(
+                            document_id, prepared['chunks']
+                        )
+                        if stale_ids:
+                            DocumentoChunk.objects.filter(id__in=stale_ids).delete()
+                        stats['chunks_skipped'] += unchanged
+                        
+                        batch['to_embed'].extend(to_embed)
+                        batch['reused'].extend(reused)
+                        batch['documents'].append(
+                            Documento(id=document_id, content_hash=prepared['content_hash'])
+                        )
+                        logger.info(
+                            f"✓ {prepared['title']}: {len(to_embed)} to embed, "
+                            f"{len(reused)} reused, {unchanged} unchanged"
+                        )
+                    except Exception as e:
+                        logger.error(f"✗ Erro processing {source_path}: {e}")
+                        stats['errors'] += 1
+                        stats['status'] = 'partial'
+                        continue
                     
-            except Exception as e:
-                logger.error(f"✗ Erro processing {doc_path}: {e}")
-                stats['errors'] += 1
-                stats['status'] = 'partial'
+                    if len(batch['to_embed']) + len(batch['reused']) >= config['bulk_size']:
+                        DocumentoIngestion._flush(batch, config, embed_pool, stats)
+            
+            DocumentoIngestion._flush(batch, config, embed_pool, stats)
+        
+        removed = [path for path in known if path not in seen]
+        if removed and not stats['errors']:
+            deactivated = list(Documento.objects.filter(
+                source_path__in=removed, is_active=True
+            ).values_list('id', flat=True))
+            stats['documents_deactivated'] = Documento.objects.filter(
+                id__in=deactivated
+            ).update(is_active=False, updated_at=timezone.now())
+            changed_ids.extend(deactivated)
         
-        stats['message'] = f"Ingested {stats['documents_ingested']} documents with {stats['chunks_created']} chunks"
+        # bulk_create/update don't send signals
+        if changed_ids:
+            SemanticResponseCache.invalidate_documents(changed_ids)
+        if stats['chunks_created'] or stats['documents_deactivated'] or stats['documents_reactivated']:
+            LocalVectorIndex.invalidate()
+        
+        stats['message'] = (
+            f"Ingested {stats['documents_ingested']} new and {stats['documents_updated']} "
+            f"updated documents with {stats['chunks_created']} chunks "
+            f"({stats['documents_skipped']} unchanged skipped)"
+        )
         logger.info(f"✓ Ingestion complete: {stats}")
         return stats
+    
+    @staticmethod
+    def embed_chunks(chunk_ids: List[int]) -> Dict[str, int]:
+        """
+        (Re)generate embeddings for existing chunks in batches
+        
+        Used by batch_embeddings_task, e.g. after switching EMBEDDING_MODEL.
+        """
+        if not embeddings:
+            raise ValueError("Incorporaçãos not initialized")
+        
+        config = DocumentoIngestion.get_pipeline_config()
+        chunks = list(DocumentoChunk.objects.filter(id__in=chunk_ids).only('id', 'content'))
+        if not chunks:
+            return {'processed': 0}
+        
+        with ThreadPoolExecutor(max_workers=config['embed_concurrency']) as embed_pool:
+            vectors = DocumentoIngestion.embed_batches(
+                [chunk.content for chunk in chunks], config, embed_pool
+            )
+        for chunk, vector in zip(chunks, vectors):
+            chunk.embedding = vector
+            chunk.embedding_model = EMBEDDING_MODEL
+        
+        DocumentoChunk.objects.bulk_update(
+            chunks, ['embedding', 'embedding_model'], batch_size=config['bulk_size']
+        )
+        LocalVectorIndex.invalidate()
+        return {'processed': len(chunks)}
 
 
 class RAGPipeline:
@@ -391,25 +694,32 @@ class RAGPipeline:
         query: str,
         company_id: int,
         k: int = 5,
-        threshold: float = 0.7
-    ) -> List[DocumentoChunk]:
+        threshold: float = 0.7,
+        query_embedding: Optional[List[float]] = None,
+        mmr_lambda: Optional[float] = None
+    ) -> List[RetrievedChunk]:
         """
-        Retrieve most relevant document chunks using pgvector similarity search
+        Retrieve most relevant document chunks using the vector index
         
         Process:
         1. Generate query embedding using Ollama
-        2. Find similar chunks using pgvector <-> operator (L2 distance)
+        2. Find top-K similar chunks via VectorIndex (pgvector HNSW/IVFFlat
+           index, or the local NumPy matrix on SQLite/without pgvector)
         3. Filtrar by similarity threshold
-        4. Return top K chunks sorted by relevance
+        4. Return top K chunks sorted by relevance, hydrated with document
+           title/source_path in the same round-trip
         
         Args:
             query: Usuário question
             company_id: Tenant identifier
             k: Number of chunks to retrieve
             threshold: Minimum similarity score (0.0 to 1.0)
+            query_embedding: Pre-computed embedding (skips the Ollama call)
+            mmr_lambda: MMR diversity trade-off (default HELIX_RETRIEVAL_MMR_LAMBDA,
+                None = plain top-k by similarity)
             
         Returns:
-            List of most relevant DocumentoChunk objects
+            List of RetrievedChunk objects, most relevant first
         """
         
         if not embeddings or not query.strip():
@@ -417,56 +727,175 @@ class RAGPipeline:
         
         try:
             # Generate query embedding
-            query_embedding = embeddings.embed_query(query)
+            if query_embedding is None:
+                query_embedding = embed_query(query)
             logger.debug(f"✓ Generated query embedding ({len(query_embedding)} dims)")
             
-            # Raw SQL for pgvector similarity search
-            from django.db import connection
+            from django.conf import settings
+            if mmr_lambda is None:
+                mmr_lambda = getattr(settings, 'HELIX_RETRIEVAL_MMR_LAMBDA', None)
             
-            with connection.cursor() as cursor:
-                # Using cosine similarity with pgvector
-                sql = """
-                    SELECT ac.id, ac.document_id, ac.chunk_index, ac.content,
-                           ac.embedding, ac.token_count, ac.created_at,
-                           (1 - (ac.embedding <=> %s::vector)) as similarity
-                    FROM assistant_documentchunk ac
-                    JOIN assistant_document ad ON ac.document_id = ad.id
-                    WHERE ad.company_id = %s 
-                          AND ad.is_active = true
-                          AND (1 - (ac.embedding <=> %s::vector)) >= %s
-                    ORDER BY similarity DESC
-                    LIMIT %s
-                """
-                
-                cursor.execute(sql, [
-                    json.dumps(query_embedding),  # Query embedding as JSON vector
-                    company_id,
-                    json.dumps(query_embedding),
-                    threshold,
-                    k
-                ])
-                
-                results = cursor.fetchall()
-                logger.info(f"✓ Retrieved {len(results)} similar chunks (threshold: {threshold})")
-                
-                # Convert results to DocumentoChunk objects
-                chunk_ids = [row[0] for row in results]
-                if chunk_ids:
-                    chunks = DocumentoChunk.objects.filter(id__in=chunk_ids)
-                    return list(chunks)
-                
-                return []
+            chunks = VectorIndex.retrieve(
+                query_embedding,
+                company_id=company_id,
+                k=k,
+                threshold=threshold,
+                mmr_lambda=mmr_lambda,
+                fetch_k=getattr(settings, 'HELIX_RETRIEVAL_MMR_FETCH_K', None),
+            )
+            logger.info(f"✓ Retrieved {len(chunks)} similar chunks (threshold: {threshold})")
+            return chunks
                 
         except Exception as e:
             logger.error(f"✗ Erro retrieving context: {e}")
             return []
     
+    @staticmethod
+    def get_history(
+        conversation: Conversa,
+        limit: int = 10,
+        exclude_message_id: Optional[int] = None
+    ) -> List[Tuple[str, str]]:
+        """
+        Recent (role, content) pairs, oldest first - one query
+        
+        Args:
+            exclude_message_id: The message being answered (already stored)
+        """
+        messages = Mensagem.objects.filter(conversation=conversation)
+        if exclude_message_id is not None:
+            messages = messages.exclude(id=exclude_message_id)
+        recent = messages.order_by('-created_at', '-id').values_list('role', 'content')[:limit]
+        return list(reversed(recent))
+    
+    @staticmethod
+    def get_budget_config() -> Dict[str, int]:
+        """Prompt token budget from settings"""
+        from django.conf import settings
+        context_window = getattr(settings, 'HELIX_CONTEXT_WINDOW', 4096)
+        completion_reserve = getattr(settings, 'HELIX_COMPLETION_TOKEN_RESERVE', 512)
+        return {
+            'prompt_budget': context_window - completion_reserve,
+            'history_budget': getattr(settings, 'HELIX_HISTORY_TOKEN_BUDGET', 768),
+            'history_messages': getattr(settings, 'HELIX_HISTORY_MAX_MESSAGES', 10),
+        }
+    
+    @staticmethod
+    def assemble_prompt(
+        query: str,
+        context_chunks: List[RetrievedChunk],
+        system_prompt: str = HELIX_SYSTEM_PROMPT,
+        enable_citation: bool = True,
+        history: Optional[List[Tuple[str, str]]] = None,
+        token_budget: Optional[int] = None,
+        history_budget: Optional[int] = None
+    ) -> Dict:
+        """
+        Pack history + retrieved chunks into a prompt under a token budget
+        
+        Priority:
+        1. System prompt, question and scaffolding (always included)
+        2. Most recent history turns, newest first, up to history_budget
+        3. Chunks in relevance order until the budget is spent (the first
+           chunk is truncated rather than dropped)
+        
+        Returns:
+            {
+                'prompt': str,
+                'chunks': [RetrievedChunk],   # chunks actually included
+                'history_turns': int,
+                'prompt_tokens': int,         # tokenizer count of the prompt
+            }
+        """
+        budget_config = RAGPipeline.get_budget_config()
+        if token_budget is None:
+            token_budget = budget_config['prompt_budget']
+        if history_budget is None:
+            history_budget = budget_config['history_budget']
+        
+        fixed = RAGPipeline._render_prompt(query, [], [], system_prompt)
+        remaining = token_budget - count_tokens(fixed)
+        
+        # History: newest turns first, restored to chronological order
+        history_lines = []
+        history_left = min(history_budget, remaining)
+        for role, content in reversed(history or []):
+            speaker = 'Usuário' if role == 'user' else 'Assistente'
+            line = f"{speaker}: {content.strip()}"
+            cost = count_tokens(line) + 1
+            if cost > history_left:
+                break
+            history_lines.insert(0, line)
+            history_left -= cost
+            remaining -= cost
+        
+        # Chunks: relevance order until the budget is spent
+        context_parts = []
+        included = []
+        for idx, chunk in enumerate(context_chunks, 1):
+            block = [f"[{idx}] {chunk.content.strip()}"]
+            if enable_citation:
+                block.append(f"  Fonte: {chunk.title} (Seção {chunk.chunk_index})")
+            block.append("---")
+            block_text = "\n".join(block)
+            cost = count_tokens(block_text) + 1
+            if cost > remaining:
+                if included:
+                    break
+                # Truncate the most relevant chunk instead of sending no context
+                overhead = cost - count_tokens(chunk.content.strip())
+                content = truncate_to_tokens(chunk.content.strip(), remaining - overhead)
+                if not content:
+                    break
+                block[0] = f"[{idx}] {content}"
+                block_text = "\n".join(block)
+                cost = remaining
+            context_parts.append(block_text)
+            included.append(chunk)
+            remaining -= cost
+        
+        prompt = RAGPipeline._render_prompt(query, context_parts, history_lines, system_prompt)
+        prompt_tokens = count_tokens(prompt)
+        
+        logger.debug(
+            f"✓ Built prompt ({prompt_tokens} tokens, {len(included)}/{len(context_chunks)} sources, "
+            f"{len(history_lines)} history turns)"
+        )
+        return {
+            'prompt': prompt,
+            'chunks': included,
+            'history_turns': len(history_lines),
+            'prompt_tokens': prompt_tokens,
+        }
+    
+    @staticmethod
+    def _render_prompt(
+        query: str,
+        context_parts: List[str],
+        history_lines: List[str],
+        system_prompt: str
+    ) -> str:
+        context_str = "\n".join(context_parts) if context_parts else "[Sem contexto disponível]"
+        history_str = ""
+        if history_lines:
+            history_str = "Histórico da conversa:\n" + "\n".join(history_lines) + "\n\n"
+        
+        return f"""{system_prompt}
+
+Contexto da documentação:
+{context_str}
+
+{history_str}Pergunta: {query}
+Resposta (em Português, concisa e objetiva):"""
+    
     @staticmethod
     def build_prompt(
         query: str,
-        context_chunks: List[DocumentoChunk],
+        context_chunks: List[RetrievedChunk],
         system_prompt: str = HELIX_SYSTEM_PROMPT,
-        enable_citation: bool = True
+        enable_citation: bool = True,
+        history: Optional[List[Tuple[str, str]]] = None,
+        token_budget: Optional[int] = None
     ) -> str:
         """
         Build LLM prompt with RAG context
@@ -482,70 +911,62 @@ class RAGPipeline:
         Source: {document_title} (Section {chunk_index})
         ...
         
+        Histórico da conversa: (when history is given)
+        Usuário: ...
+        Assistente: ...
+        
         Pergunta: {query}
         Resposta:
         
         Args:
             query: Usuário question
-            context_chunks: List of relevant document chunks
+            context_chunks: Retrieved chunks (document metadata already loaded)
             system_prompt: System instruction for model
             enable_citation: Include source references
+            history: Previous (role, content) turns, oldest first
+            token_budget: Max prompt tokens (default: HELIX_CONTEXT_WINDOW
+                minus HELIX_COMPLETION_TOKEN_RESERVE)
             
         Returns:
-            Formatted prompt string ready for LLM
+            Formatted prompt string ready for LLM (see assemble_prompt)
         """
-        
-        # Build context section
-        context_parts = []
-        for idx, chunk in enumerate(context_chunks, 1):
-            chunk_text = f"[{idx}] {chunk.content.strip()}"
-            context_parts.append(chunk_text)
-            
-            if enable_citation:
-                doc_title = chunk.document.title
-                section = f"Seção {chunk.chunk_index}"
-                citation = f"Fonte: {doc_title} ({section})"
-                context_parts.append(f"  {citation}")
-            
-            context_parts.append("---")
-        
-        context_str = "\n".join(context_parts) if context_parts else "[Sem contexto disponível]"
-        
-        # Build final prompt
-        prompt = f"""{system_prompt}
-
-Contexto da documentação:
-{context_str}
-
-Pergunta: {query}
-Resposta (em Português, concisa e objetiva):"""
-        
-        logger.debug(f"✓ Built prompt ({len(prompt)} chars, {len(context_chunks)} sources)")
-        return prompt
+        return RAGPipeline.assemble_prompt(
+            query, context_chunks, system_prompt, enable_citation, history, token_budget
+        )['prompt']
+    
+    @staticmethod
+    def cache_namespace(system_prompt: str) -> str:
+        """Response cache partition: same model + same system prompt"""
+        digest = hashlib.sha1(system_prompt.encode('utf-8')).hexdigest()[:12]
+        return f"{LLM_MODEL}:{digest}"
     
     @staticmethod
     def answer_query(
         query: str,
         conversation: Conversa,
-        context_chunks: Optional[List[DocumentoChunk]] = None,
-        use_conversation_history: bool = True
+        context_chunks: Optional[List[RetrievedChunk]] = None,
+        use_conversation_history: bool = True,
+        exclude_message_id: Optional[int] = None
     ) -> Tuple[str, List[Dict]]:
         """
         Process query and return answer with sources (synchronous version)
         
         Process:
-        1. Retrieve context if not provided
-        2. Build conversation history for context
-        3. Build prompt with context
-        4. Call Qwen 2.5 LLM
-        5. Extract citations from context chunks
-        6. Create Mensagem records
+        1. Load recent history (one query)
+        2. Embed query and check the semantic response cache (hit skips
+           retrieval and the LLM entirely)
+        3. Retrieve context if not provided
+        4. Pack history + context into the prompt token budget
+        5. Call Qwen 2.5 LLM
+        6. Extract citations from the chunks that made it into the prompt
+        7. Cache the answer (only when it cites documents)
         
         Args:
             query: Usuário question
             conversation: Conversa object (contains user, company context)
             context_chunks: Optional pre-retrieved chunks
             use_conversation_history: Include previous messages for context
+            exclude_message_id: Stored Mensagem of this query (kept out of history)
             
         Returns:
             Tuple of (response_text, citations_list)
@@ -553,55 +974,179 @@ Resposta (em Português, concisa e objetiva):"""
         Raises:
             ValueErro if LLM or embeddings not initialized
         """
+        state = RAGPipeline.generate_answer(
+            query, conversation, context_chunks, use_conversation_history, exclude_message_id
+        )
+        return state['response'], state['citations']
+    
+    @staticmethod
+    def generate_answer(
+        query: str,
+        conversation: Conversa,
+        context_chunks: Optional[List[RetrievedChunk]] = None,
+        use_conversation_history: bool = True,
+        exclude_message_id: Optional[int] = None
+    ) -> Dict:
+        """
+        answer_query() returning the full state
+        
+        Returns:
+            prepare_answer() state plus 'response', 'prompt_tokens' and
+            'completion_tokens'
+        
+        Raises:
+            GatewayOverloaded when the LLM queue sheds the request
+        """
         
         if not llm or not embeddings:
-            raise ValueErro("Ollama LLM or Incorporaçãos not initialized")
+            raise ValueError("Ollama LLM or Incorporaçãos not initialized")
         
         try:
             logger.info(f"Processing query: {query[:50]}...")
             
-            # Step 1: Retrieve context if not provided
-            if context_chunks is None:
-                context_chunks = RAGPipeline.retrieve_context(
-                    query=query,
-                    company_id=conversation.company_id,
-                    k=5,
-                    threshold=0.7
-                )
-            
-            # Step 2: Get Helix config for this company
-            config = HelixConfig.get_config(conversation.company_id)
-            
-            # Step 3: Build prompt with context
-            prompt = RAGPipeline.build_prompt(
-                query=query,
-                context_chunks=context_chunks,
-                system_prompt=config.get("system_prompt", HELIX_SYSTEM_PROMPT),
-                enable_citation=config.get("enable_citation", True)
+            # Step 1-4: history, cache lookup, retrieval and prompt
+            state = RAGPipeline.prepare_answer(
+                query, conversation, context_chunks, use_conversation_history, exclude_message_id
             )
+            if state['cached'] is not None:
+                response = state['cached']
+            else:
+                # Step 5: Call the LLM through the gateway (queue + limits)
+                logger.info(f"Calling Ollama LLM ({state['model']})...")
+                response = LLMGateway.invoke(
+                    state['prompt'], state['model'], state['tenant'], usage=state['usage']
+                )
+                logger.info(f"✓ Generated response ({len(response)} chars)")
             
-            # Step 4: Call Qwen 2.5 LLM
-            logger.info("Calling Ollama LLM (qwen2.5:14b)...")
-            response = llm.invoke(prompt)
-            
-            logger.info(f"✓ Generated response ({len(response)} chars)")
-            
-            # Step 5: Build citations list
-            citations = []
-            for chunk in context_chunks:
-                citations.append({
-                    'document_id': chunk.document.id,
-                    'title': chunk.document.title,
-                    'source_path': chunk.document.source_path,
-                    'chunk_index': chunk.chunk_index,
-                    'snippet': chunk.content[:200],  # First 200 chars
-                })
-            
-            return response, citations
+            # Step 6 & 7: citations are already built; cache the answer
+            state['response'] = response
+            state.update(RAGPipeline.finish_answer(state, response))
+            return state
             
         except Exception as e:
             logger.error(f"✗ Erro answering query: {e}")
             raise
+    
+    @staticmethod
+    def prepare_answer(
+        query: str,
+        conversation: Conversa,
+        context_chunks: Optional[List[RetrievedChunk]] = None,
+        use_conversation_history: bool = True,
+        exclude_message_id: Optional[int] = None
+    ) -> Dict:
+        """
+        Everything that happens before the LLM call
+        
+        Shared by answer_query (blocking) and the streaming endpoints.
+        Follow-up questions (conversation has history) bypass the semantic
+        response cache: their answer depends on the earlier turns.
+        
+        Returns:
+            {
+                'prompt': str|None,        # None on cache hit
+                'model': str|None,         # routed by LLMGateway
+                'tenant': str,
+                'prompt_tokens': int,      # tokenizer estimate (budgeting)
+                'usage': Dict,             # filled by LLMGateway with Ollama's counts
+                'citations': [Dict],
+                'cached': str|None,        # stored response on cache hit
+                'query_embedding': [float]|None,
+                'cache_namespace': str|None,  # None when history is used
+            }
+        """
+        # Get Helix config for this company (schema-scoped models have no company_id)
+        company_id = getattr(conversation, 'company_id', None)
+        config = HelixConfig.get_config(company_id)
+        system_prompt = config.get("system_prompt", HELIX_SYSTEM_PROMPT)
+        budget_config = RAGPipeline.get_budget_config()
+        history = []
+        if use_conversation_history:
+            history = RAGPipeline.get_history(
+                conversation, budget_config['history_messages'], exclude_message_id
+            )
+        
+        state = {
+            'prompt': None,
+            'model': None,
+            'tenant': tenant_key(company_id),
+            'prompt_tokens': 0,
+            'usage': {},
+            'citations': [],
+            'cached': None,
+            'query_embedding': None,
+            'cache_namespace': None if history else RAGPipeline.cache_namespace(system_prompt),
+        }
+        
+        # Semantic cache, then retrieve context if not provided
+        if context_chunks is None:
+            state['query_embedding'] = embed_query(query)
+            cached = None
+            if state['cache_namespace'] is not None:
+                cached = SemanticResponseCache.lookup(
+                    state['query_embedding'], namespace=state['cache_namespace']
+                )
+            if cached is not None:
+                logger.info(f"✓ Response cache hit (similarity {cached['similarity']:.3f})")
+                state['cached'] = cached['response']
+                state['citations'] = cached['citations']
+                return state
+            
+            context_chunks = RAGPipeline.retrieve_context(
+                query=query,
+                company_id=company_id,
+                k=5,
+                threshold=0.7,
+                query_embedding=state['query_embedding']
+            )
+        
+        # Pack history + context into the token budget
+        assembled = RAGPipeline.assemble_prompt(
+            query=query,
+            context_chunks=context_chunks,
+            system_prompt=system_prompt,
+            enable_citation=config.get("enable_citation", True),
+            history=history,
+            token_budget=budget_config['prompt_budget'],
+            history_budget=budget_config['history_budget'],
+        )
+        state['prompt'] = assembled['prompt']
+        state['prompt_tokens'] = assembled['prompt_tokens']
+        state['model'] = LLMGateway.route(query, assembled['prompt_tokens'], bool(history))
+        
+        # Build citations list (no queries - chunks are hydrated)
+        state['citations'] = [chunk.citation() for chunk in assembled['chunks']]
+        return state
+    
+    @staticmethod
+    def finish_answer(state: Dict, response: str) -> Dict[str, int]:
+        """
+        Cache a generated answer and count its tokens
+        
+        Uncited answers are never invalidated by re-ingestion, so they are
+        not cached.
+        
+        Token counts are the ones Ollama reported for the generation
+        (state['usage']); the tokenizer is only the fallback when the
+        client gave none (e.g. prompt fully served from Ollama's cache).
+        
+        Returns:
+            {'prompt_tokens', 'completion_tokens'} - both 0 on cache hits
+            (nothing was sent to the model)
+        """
+        if state['cached'] is not None:
+            return {'prompt_tokens': 0, 'completion_tokens': 0}
+        
+        if state['cache_namespace'] is not None and state['query_embedding'] is not None and state['citations']:
+            SemanticResponseCache.store(
+                state['query_embedding'], response, state['citations'],
+                namespace=state['cache_namespace']
+            )
+        usage = state.get('usage') or {}
+        return {
+            'prompt_tokens': usage.get('prompt_tokens') or state['prompt_tokens'],
+            'completion_tokens': usage.get('completion_tokens') or count_tokens(response),
+        }
 
 
 class HelixAssistant:
@@ -647,47 +1192,33 @@ class HelixAssistant:
             {
                 'response': str,           # Assistant response
                 'citations': [Dict],       # Source references
-                'status': 'success'|'error',
+                'status': 'success'|'busy'|'error',
                 'processing_time': float,  # Seconds
-                'tokens_used': int,        # Approximation
+                'tokens_used': int,        # prompt + completion tokens
                 'message_id': int,         # DB record ID
             }
         """
         
-        import time
-        from django.contrib.auth.models import Usuário
-        
         start_time = time.time()
         
         try:
             logger.info(f"Chat initiated: {user_message[:50]}...")
             
             # Step 1: Create user Mensagem record
-            user_obj = Usuário.objects.get(id=user_id)
-            user_msg = Mensagem.objects.create(
-                conversation=conversation,
-                role='user',
-                content=user_message,
-                context_sources=[],
-                tokens_used=0,
-            )
+            user_msg = HelixAssistant.create_user_message(user_message, conversation)
             logger.info(f"✓ Created user message: {user_msg.id}")
             
             # Step 2 & 3 & 4: RAG pipeline
-            response_text, citations = RAGPipeline.answer_query(
+            state = RAGPipeline.generate_answer(
                 query=user_message,
                 conversation=conversation,
-                use_conversation_history=True
+                use_conversation_history=True,
+                exclude_message_id=user_msg.id
             )
+            response_text, citations = state['response'], state['citations']
             
             # Step 5: Create assistant Mensagem record
-            assistant_msg = Mensagem.objects.create(
-                conversation=conversation,
-                role='assistant',
-                content=response_text,
-                context_sources=citations,
-                tokens_used=0,  # TODO: Implement token counting
-            )
+            assistant_msg = HelixAssistant.create_assistant_message(state, conversation)
             logger.info(f"✓ Created assistant message: {assistant_msg.id}")
             
             # Update conversation title if first message
@@ -704,10 +1235,22 @@ class HelixAssistant:
                 'citations': citations,
                 'status': 'success',
                 'processing_time': round(processing_time, 2),
-                'tokens_used': 0,
+                'tokens_used': assistant_msg.tokens_used,
+                'prompt_tokens': assistant_msg.prompt_tokens,
+                'completion_tokens': assistant_msg.completion_tokens,
                 'message_id': assistant_msg.id,
             }
             
+        except GatewayOverloaded:
+            # Load shed - friendly answer, nothing stored for the assistant
+            return {
+                'response': BUSY_MESSAGE,
+                'citations': [],
+                'status': 'busy',
+                'processing_time': round(time.time() - start_time, 2),
+                'tokens_used': 0,
+            }
+            
         except Exception as e:
             logger.error(f"✗ Chat error: {e}")
             processing_time = time.time() - start_time
@@ -721,6 +1264,144 @@ class HelixAssistant:
                 'error': str(e),
             }
     
+    @staticmethod
+    def create_user_message(user_message: str, conversation: Conversa) -> Mensagem:
+        """Store the user's turn (tokens_used = its token count)"""
+        return Mensagem.objects.create(
+            conversation=conversation,
+            role='user',
+            content=user_message,
+            context_sources=[],
+            tokens_used=count_tokens(user_message),
+        )
+    
+    @staticmethod
+    def create_assistant_message(state: Dict, conversation: Conversa) -> Mensagem:
+        """Store the assistant's turn with prompt/completion token counts"""
+        return Mensagem.objects.create(
+            conversation=conversation,
+            role='assistant',
+            content=state['response'],
+            context_sources=state['citations'],
+            prompt_tokens=state['prompt_tokens'],
+            completion_tokens=state['completion_tokens'],
+            tokens_used=state['prompt_tokens'] + state['completion_tokens'],
+        )
+    
+    @staticmethod
+    def start_stream(user_message: str, conversation: Conversa) -> Dict:
+        """
+        Streaming step 1 (sync): persist the user message, prepare prompt
+        
+        Returns the RAGPipeline.prepare_answer state plus 'started_at'.
+        """
+        if not llm or not embeddings:
+            raise ValueError("Ollama LLM or Incorporaçãos not initialized")
+        
+        started_at = time.time()
+        user_msg = HelixAssistant.create_user_message(user_message, conversation)
+        state = RAGPipeline.prepare_answer(
+            user_message, conversation, exclude_message_id=user_msg.id
+        )
+        state['started_at'] = started_at
+        return state
+    
+    @staticmethod
+    def finish_stream(
+        user_message: str,
+        conversation: Conversa,
+        state: Dict,
+        response_text: str
+    ) -> Dict:
+        """
+        Streaming step 3 (sync): persist the completed assistant message
+        
+        Returns the same metadata as chat() (without 'response').
+        """
+        state['response'] = response_text
+        state.update(RAGPipeline.finish_answer(state, response_text))
+        assistant_msg = HelixAssistant.create_assistant_message(state, conversation)
+        
+        if conversation.title is None or conversation.title == '':
+            conversation.title = HelixAssistant.summarize_conversation(user_message)
+            conversation.save(update_fields=['title'])
+        
+        return {
+            'citations': state['citations'],
+            'status': 'success',
+            'cached': state['cached'] is not None,
+            'model': state['model'],
+            'processing_time': round(time.time() - state['started_at'], 2),
+            'tokens_used': assistant_msg.tokens_used,
+            'prompt_tokens': assistant_msg.prompt_tokens,
+            'completion_tokens': assistant_msg.completion_tokens,
+            'message_id': assistant_msg.id,
+        }
+    
+    @staticmethod
+    def stream_chat(user_message: str, conversation: Conversa):
+        """
+        Sync generator of chat events (DRF / WSGI callers)
+        
+        Yields:
+            ('token', str) for every generated fragment, then
+            ('done', metadata) once the assistant Mensagem is stored, or
+            ('busy', BUSY_MESSAGE) when the LLM gateway sheds the request, or
+            ('error', message)
+        """
+        try:
+            state = HelixAssistant.start_stream(user_message, conversation)
+            if state['cached'] is not None:
+                parts = [state['cached']]
+                yield 'token', state['cached']
+            else:
+                parts = []
+                for token in LLMGateway.stream(
+                    state['prompt'], state['model'], state['tenant'], usage=state['usage']
+                ):
+                    parts.append(token)
+                    yield 'token', token
+            yield 'done', HelixAssistant.finish_stream(
+                user_message, conversation, state, ''.join(parts)
+            )
+        except GatewayOverloaded:
+            yield 'busy', BUSY_MESSAGE
+        except Exception as e:
+            logger.error(f"✗ Chat stream error: {e}")
+            yield 'error', str(e)
+    
+    @staticmethod
+    async def astream_chat(user_message: str, conversation: Conversa):
+        """
+        Async generator of chat events (ASGI streaming view)
+        
+        Same events as stream_chat(); DB work runs in a thread via
+        sync_to_async and tokens come from LLMGateway.astream(), so no
+        worker is blocked while the model generates or waits in the queue.
+        """
+        from asgiref.sync import sync_to_async
+        
+        try:
+            state = await sync_to_async(HelixAssistant.start_stream)(user_message, conversation)
+            if state['cached'] is not None:
+                parts = [state['cached']]
+                yield 'token', state['cached']
+            else:
+                parts = []
+                async for token in LLMGateway.astream(
+                    state['prompt'], state['model'], state['tenant'], usage=state['usage']
+                ):
+                    parts.append(token)
+                    yield 'token', token
+            yield 'done', await sync_to_async(HelixAssistant.finish_stream)(
+                user_message, conversation, state, ''.join(parts)
+            )
+        except GatewayOverloaded:
+            yield 'busy', BUSY_MESSAGE
+        except Exception as e:
+            logger.error(f"✗ Chat stream error: {e}")
+            yield 'error', str(e)
+    
     @staticmethod
     def summarize_conversation(first_message: str, max_length: int = 60) -> str:
         """
@@ -815,12 +1496,20 @@ def calculate_cosine_similarity(
     vec1: List[float],
     vec2: List[float]
 ) -> float:
-    """Calculate cosine similarity between two vectors"""
+    """
+    Calculate cosine similarity between two vectors
+    
+    Single pair only - for query-vs-many scoring use
+    apps.assistant.similarity.score/batch_score.
+    """
     import math
     
     if not vec1 or not vec2:
         return 0.0
     
+    if similarity.is_available():
+        return similarity.cosine_similarity(vec1, vec2)
+    
     dot_product = sum(a * b for a, b in zip(vec1, vec2))
     norm1 = math.sqrt(sum(a ** 2 for a in vec1))
     norm2 = math.sqrt(sum(b ** 2 for b in vec2))
@@ -832,15 +1521,23 @@ def calculate_cosine_similarity(
 
 
 def estimate_tokens(text: str) -> int:
-    """Rough token count estimation for text"""
-    # Approximate: 1 token ≈ 4 characters (for Portuguese)
-    return len(text) // 4
+    """Token count for text (tokenizer, or len//4 without tiktoken)"""
+    return count_tokens(text)
+
+
+def format_sse(event: str, data) -> str:
+    """Format one Server-Sent Event (data JSON-encoded)"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 
 # ===== Status & Health Check =====
 
 def get_helix_status() -> Dict[str, any]:
-    """Get system status for monitoring"""
+    """
+    Get system status for monitoring (live probe - performs network I/O)
+
+    Request-path callers should use status.get_helix_status_snapshot() instead.
+    """
     return {
         'ollama_running': check_ollama_connection(),
         'ollama_url': OLLAMA_BASE_URL,
@@ -870,8 +1567,7 @@ try:
     def batch_embeddings_task(chunk_ids: List[int]):
         """Generate embeddings for multiple chunks"""
         logger.info(f"Generating embeddings for {len(chunk_ids)} chunks")
-        # TODO: Implement batch embedding generation
-        return {'processed': len(chunk_ids)}
+        return DocumentoIngestion.embed_chunks(chunk_ids)
     
     @shared_task
     def cleanup_conversations_task():
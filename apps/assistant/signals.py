@@ -0,0 +1,36 @@
+"""
+Signals for Assistant (SyncRH)
+
+Keep derived retrieval structures in sync with the knowledge base.
+"""
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Documento, DocumentoChunk
+from .vector_index import LocalVectorIndex
+from .response_cache import SemanticResponseCache
+
+
+@receiver(post_save, sender=Documento)
+@receiver(post_delete, sender=Documento)
+@receiver(post_save, sender=DocumentoChunk)
+@receiver(post_delete, sender=DocumentoChunk)
+def invalidate_vector_index(sender, instance, **kwargs):
+    """Chunks or document activation changed - local index must be rebuilt"""
+    LocalVectorIndex.invalidate()
+
+
+@receiver(post_save, sender=Documento)
+@receiver(post_delete, sender=Documento)
+def invalidate_cached_answers(sender, instance, created=False, **kwargs):
+    """Re-ingested/deactivated document - cached answers citing it are stale"""
+    if not created:
+        SemanticResponseCache.invalidate_documents([instance.pk])
+
+
+@receiver(post_save, sender=DocumentoChunk)
+@receiver(post_delete, sender=DocumentoChunk)
+def invalidate_cached_answers_for_chunk(sender, instance, **kwargs):
+    """Chunk content changed - same as re-ingesting its document"""
+    SemanticResponseCache.invalidate_documents([instance.document_id])
@@ -0,0 +1,171 @@
+"""
+Vectorized similarity utilities for Helix retrieval
+
+All functions work on float32 NumPy arrays:
+
+- normalize / normalize_rows: L2-normalize once at write time so every
+  later cosine similarity is a plain dot product (matrix @ query)
+- score / batch_score: one query (or a batch of queries) against a whole
+  embedding matrix in a single BLAS call
+- top_k: O(N) np.argpartition, then a sort of the k survivors only
+- mmr: maximal marginal relevance reranking - trades relevance against
+  redundancy so the top-k isn't five copies of the same paragraph
+
+Benchmark: scripts/benchmark_similarity.py
+"""
+
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    # NumPy optional dependency (callers check is_available())
+    np = None
+
+
+def is_available() -> bool:
+    return np is not None
+
+
+def as_float32(vectors) -> 'np.ndarray':
+    """C-contiguous float32 view/copy of vectors"""
+    return np.ascontiguousarray(vectors, dtype=np.float32)
+
+
+def normalize(vector) -> Optional['np.ndarray']:
+    """Unit-length float32 copy of one vector (None for the zero vector)"""
+    vector = np.array(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    if not norm:
+        return None
+    vector /= norm
+    return vector
+
+
+def normalize_rows(matrix, copy: bool = True) -> 'np.ndarray':
+    """
+    L2-normalize every row (zero rows stay zero)
+
+    Args:
+        copy: False normalizes a float32 matrix in place
+    """
+    matrix = np.array(matrix, dtype=np.float32) if copy else as_float32(matrix)
+    if not matrix.size:
+        return matrix
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+    return matrix
+
+
+def cosine_similarity(vec1: Sequence[float], vec2: Sequence[float]) -> float:
+    """Cosine similarity of a single pair (0.0 if either is empty/zero)"""
+    if vec1 is None or vec2 is None or not len(vec1) or not len(vec2):
+        return 0.0
+    a = normalize(vec1)
+    b = normalize(vec2)
+    if a is None or b is None:
+        return 0.0
+    return float(a @ b)
+
+
+def score(query, matrix: 'np.ndarray', normalized: bool = True) -> 'np.ndarray':
+    """
+    Cosine similarity of one query against every row of matrix
+
+    Args:
+        matrix: (N, D) float32; rows already unit-length when normalized=True
+        normalized: False normalizes the rows on the fly (slower, copies)
+
+    Returns:
+        (N,) float32 scores (all zero for a zero query)
+    """
+    query = normalize(query)
+    if query is None:
+        return np.zeros(len(matrix), dtype=np.float32)
+    if not normalized:
+        matrix = normalize_rows(matrix)
+    return matrix @ query
+
+
+def batch_score(queries, matrix: 'np.ndarray', normalized: bool = True) -> 'np.ndarray':
+    """
+    Cosine similarity of Q queries against N rows in one matrix product
+
+    Returns:
+        (Q, N) float32 scores
+    """
+    queries = normalize_rows(queries)
+    if not normalized:
+        matrix = normalize_rows(matrix)
+    return queries @ matrix.T
+
+
+def top_k(scores: 'np.ndarray', k: int, threshold: Optional[float] = None) -> List[Tuple[int, float]]:
+    """
+    Indices and scores of the k best rows, best first
+
+    Args:
+        threshold: Drop results scoring below it
+    """
+    if k <= 0 or not len(scores):
+        return []
+    if k < len(scores):
+        top = np.argpartition(scores, -k)[-k:]
+    else:
+        top = np.arange(len(scores))
+    top = top[np.argsort(scores[top])[::-1]]
+    return [
+        (int(i), float(scores[i]))
+        for i in top
+        if threshold is None or scores[i] >= threshold
+    ]
+
+
+def mmr(
+    query,
+    candidates,
+    k: int,
+    lambda_mult: float = 0.5,
+    normalized: bool = False
+) -> List[int]:
+    """
+    Maximal marginal relevance selection
+
+    Greedily picks the candidate maximizing
+        lambda * sim(query, c) - (1 - lambda) * max sim(c, already selected)
+
+    Args:
+        query: Query embedding
+        candidates: (N, D) candidate embeddings (e.g. retrieval top fetch_k)
+        k: Number of results
+        lambda_mult: 1.0 = pure relevance, 0.0 = pure diversity
+        normalized: Candidates already unit-length
+
+    Returns:
+        Candidate indices in selection order
+    """
+    candidates = as_float32(candidates) if normalized else normalize_rows(candidates)
+    n = len(candidates)
+    if k <= 0 or not n:
+        return []
+    k = min(k, n)
+
+    relevance = score(query, candidates)
+    # Running max similarity of every candidate to the selected set
+    redundancy = np.full(n, -np.inf, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    selected = []
+
+    for _ in range(k):
+        if selected:
+            marginal = lambda_mult * relevance - (1.0 - lambda_mult) * redundancy
+        else:
+            marginal = relevance.copy()
+        marginal[~available] = -np.inf
+        best = int(np.argmax(marginal))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, candidates @ candidates[best], out=redundancy)
+
+    return selected
@@ -0,0 +1,271 @@
+"""
+Helix Status Snapshot - background-refreshed health of the Ollama stack
+
+The context processor runs on every authenticated template render, so it
+must never talk to Ollama directly. Instead a daemon thread per worker
+refreshes a status snapshot stored in the Django cache:
+
+- TTL + jitter: each worker wakes every HELIX_STATUS_TTL ± HELIX_STATUS_JITTER
+  seconds, but only refreshes if the shared snapshot is older than the TTL
+- Cross-worker lock: cache.add() guarantees a single probe per TTL window
+- Circuit breaker: after HELIX_STATUS_FAILURE_THRESHOLD consecutive failures
+  probing stops for HELIX_STATUS_COOLDOWN seconds (state kept in the snapshot)
+
+Readers (context processor, HelixAdminSite.index, /api/health/) only call
+get_helix_status_snapshot(), which is a single cache.get().
+"""
+
+import os
+import random
+import threading
+import time
+import logging
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_CACHE_KEY = 'helix:status:snapshot'
+REFRESH_LOCK_KEY = 'helix:status:refresh_lock'
+
+REQUIRED_MODELS = ['qwen2.5:14b', 'nomic-embed-text']
+
+CIRCUIT_CLOSED = 'closed'
+CIRCUIT_OPEN = 'open'
+CIRCUIT_HALF_OPEN = 'half_open'
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+class HelixStatusMonitor:
+    """
+    Keeps the shared Helix status snapshot fresh without blocking requests
+
+    Process:
+    1. ensure_started() lazily spawns one daemon refresher per process
+    2. The refresher sleeps TTL ± jitter and calls refresh()
+    3. refresh() takes the cross-worker lock, probes /api/tags once and
+       writes the snapshot (or skips the probe while the circuit is open)
+    """
+
+    _thread: Optional[threading.Thread] = None
+    _thread_lock = threading.Lock()
+
+    @staticmethod
+    def ttl() -> float:
+        return float(_setting('HELIX_STATUS_TTL', 30))
+
+    @staticmethod
+    def jitter() -> float:
+        return float(_setting('HELIX_STATUS_JITTER', 5))
+
+    @staticmethod
+    def failure_threshold() -> int:
+        return int(_setting('HELIX_STATUS_FAILURE_THRESHOLD', 3))
+
+    @staticmethod
+    def cooldown() -> float:
+        return float(_setting('HELIX_STATUS_COOLDOWN', 120))
+
+    @staticmethod
+    def probe_timeout() -> float:
+        return float(_setting('HELIX_STATUS_PROBE_TIMEOUT', 2))
+
+    @staticmethod
+    def default_snapshot() -> Dict[str, any]:
+        """Snapshot returned before the first probe has completed"""
+        from .services import (
+            OLLAMA_BASE_URL, LLM_MODEL, EMBEDDING_MODEL,
+            DATABASE_URL, embeddings, llm,
+        )
+        return {
+            'status': 'unknown',
+            'ollama_running': False,
+            'ollama_url': OLLAMA_BASE_URL,
+            'llm_model': LLM_MODEL,
+            'embedding_model': EMBEDDING_MODEL,
+            'models_available': {model: False for model in REQUIRED_MODELS},
+            'installed_models': [],
+            'embeddings_initialized': embeddings is not None,
+            'llm_initialized': llm is not None,
+            'database_available': DATABASE_URL is not None,
+            'checked_at': None,
+            'circuit_state': CIRCUIT_CLOSED,
+            'circuit_open_until': None,
+            'consecutive_failures': 0,
+            'last_error': None,
+        }
+
+    @staticmethod
+    def read() -> Dict[str, any]:
+        """Return the cached snapshot (never performs network I/O)"""
+        snapshot = cache.get(SNAPSHOT_CACHE_KEY)
+        if snapshot is None:
+            snapshot = HelixStatusMonitor.default_snapshot()
+        checked_at = snapshot.get('checked_at')
+        snapshot['stale'] = (
+            checked_at is None
+            or time.time() - checked_at > HelixStatusMonitor.ttl() * 2
+        )
+        return snapshot
+
+    @staticmethod
+    def probe() -> List[str]:
+        """
+        Single round-trip to Ollama's /api/tags
+
+        Returns the list of installed model names; raises on failure.
+        """
+        import requests
+        from .services import OLLAMA_BASE_URL
+
+        response = requests.get(
+            f"{OLLAMA_BASE_URL}/api/tags",
+            timeout=HelixStatusMonitor.probe_timeout(),
+        )
+        response.raise_for_status()
+        return [m['name'] for m in response.json().get('models', [])]
+
+    @staticmethod
+    def refresh(force: bool = False) -> Dict[str, any]:
+        """
+        Probe Ollama and store a new snapshot in the shared cache
+
+        Args:
+            force: Ignore snapshot freshness and the cross-worker lock
+
+        Returns:
+            The snapshot now stored in the cache
+        """
+        ttl = HelixStatusMonitor.ttl()
+        now = time.time()
+        current = cache.get(SNAPSHOT_CACHE_KEY) or HelixStatusMonitor.default_snapshot()
+
+        if not force:
+            checked_at = current.get('checked_at')
+            if checked_at is not None and now - checked_at < ttl:
+                return current
+            # Apenas um worker sonda o Ollama por janela de TTL
+            if not cache.add(REFRESH_LOCK_KEY, os.getpid(), timeout=max(1, int(ttl))):
+                return current
+
+        snapshot = dict(current)
+        snapshot['checked_at'] = now
+
+        open_until = current.get('circuit_open_until')
+        if open_until and now < open_until:
+            snapshot['circuit_state'] = CIRCUIT_OPEN
+            snapshot['status'] = 'unavailable'
+            HelixStatusMonitor._store(snapshot)
+            return snapshot
+
+        half_open = bool(open_until)
+        try:
+            installed = HelixStatusMonitor.probe()
+            installed_bases = {name.split(':')[0] for name in installed}
+            snapshot.update({
+                'status': 'ok',
+                'ollama_running': True,
+                'models_available': {
+                    model: model.split(':')[0] in installed_bases
+                    for model in REQUIRED_MODELS
+                },
+                'installed_models': sorted(installed),
+                'circuit_state': CIRCUIT_CLOSED,
+                'circuit_open_until': None,
+                'consecutive_failures': 0,
+                'last_error': None,
+            })
+            if half_open:
+                logger.info("✓ Ollama recovered - Helix status circuit closed")
+        except Exception as e:
+            failures = current.get('consecutive_failures', 0) + 1
+            snapshot.update({
+                'status': 'unavailable',
+                'ollama_running': False,
+                'models_available': {model: False for model in REQUIRED_MODELS},
+                'installed_models': [],
+                'consecutive_failures': failures,
+                'last_error': str(e),
+                'circuit_state': CIRCUIT_CLOSED,
+                'circuit_open_until': None,
+            })
+            if half_open or failures >= HelixStatusMonitor.failure_threshold():
+                snapshot['circuit_state'] = CIRCUIT_OPEN
+                snapshot['circuit_open_until'] = now + HelixStatusMonitor.cooldown()
+                logger.warning(
+                    f"✗ Ollama unreachable ({failures} failures) - "
+                    f"circuit open for {HelixStatusMonitor.cooldown():.0f}s"
+                )
+            else:
+                logger.debug(f"Ollama status probe failed: {e}")
+
+        HelixStatusMonitor._store(snapshot)
+        return snapshot
+
+    @staticmethod
+    def _store(snapshot: Dict[str, any]) -> None:
+        snapshot.pop('stale', None)
+        # Keep the last known snapshot well past its TTL so readers never hit a cold cache
+        timeout = int(max(HelixStatusMonitor.ttl(), HelixStatusMonitor.cooldown()) * 10)
+        cache.set(SNAPSHOT_CACHE_KEY, snapshot, timeout)
+
+    @staticmethod
+    def _next_delay() -> float:
+        jitter = HelixStatusMonitor.jitter()
+        return max(1.0, HelixStatusMonitor.ttl() + random.uniform(-jitter, jitter))
+
+    @staticmethod
+    def _run() -> None:
+        while True:
+            try:
+                HelixStatusMonitor.refresh()
+            except Exception as e:
+                logger.error(f"✗ Helix status refresher error: {e}")
+            time.sleep(HelixStatusMonitor._next_delay())
+
+    @classmethod
+    def ensure_started(cls) -> None:
+        """Start the per-process refresher thread if it's not running yet"""
+        if not _setting('HELIX_STATUS_BACKGROUND_REFRESH', True):
+            return
+        if cls._thread is not None and cls._thread.is_alive():
+            return
+        with cls._thread_lock:
+            if cls._thread is not None and cls._thread.is_alive():
+                return
+            cls._thread = threading.Thread(
+                target=cls._run,
+                name='helix-status-refresher',
+                daemon=True,
+            )
+            cls._thread.start()
+            logger.debug("Helix status refresher started")
+
+
+def get_helix_status_snapshot() -> Dict[str, any]:
+    """
+    Get the shared Helix status snapshot for request-path callers
+
+    Cheap enough for every template render: one cache read, no network I/O.
+    """
+    HelixStatusMonitor.ensure_started()
+    return HelixStatusMonitor.read()
+
+
+# ===== Celery Tasks =====
+
+try:
+    from celery import shared_task
+
+    @shared_task
+    def refresh_helix_status_task():
+        """Refresh the Helix status snapshot (for celery beat deployments)"""
+        return HelixStatusMonitor.refresh()
+
+except ImportError:
+    pass
@@ -0,0 +1,72 @@
+"""
+Token counting for Helix prompts
+
+Uses a real BPE tokenizer (tiktoken, HELIX_TOKENIZER_ENCODING) instead of
+the len//4 heuristic for prompt budgets. Mensagem token counts come from
+Ollama's own counts (LLMGateway usage); this is their fallback.
+
+The vocabulary is loaded once per process (lru_cache) on first use, or
+in AssistantConfig.ready with HELIX_TOKENIZER_PRELOAD. The BPE file lives
+in HELIX_TOKENIZER_CACHE_DIR, which settings hands to tiktoken as
+TIKTOKEN_CACHE_DIR; `manage.py warm_tokenizer` (run by deploy.sh)
+downloads it at deploy time so workers only read it from disk.
+
+Without tiktoken installed every function falls back to the heuristic.
+"""
+
+import logging
+from functools import lru_cache
+
+from django.conf import settings
+
+try:
+    import tiktoken
+except ImportError:
+    # tiktoken optional dependency (heuristic counting without it)
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Approximate: 1 token ≈ 4 characters (for Portuguese)
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=4)
+def get_encoding(name: str = None):
+    """Load (once per process) the tokenizer vocabulary, or None"""
+    if tiktoken is None:
+        return None
+    name = name or getattr(settings, 'HELIX_TOKENIZER_ENCODING', 'cl100k_base')
+    try:
+        return tiktoken.get_encoding(name)
+    except Exception as e:
+        logger.warning(f"✗ Tokenizer '{name}' unavailable, using heuristic: {e}")
+        return None
+
+
+def preload() -> bool:
+    """Load the configured vocabulary now (startup / warm_tokenizer)"""
+    return get_encoding() is not None
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens in text"""
+    if not text:
+        return 0
+    encoding = get_encoding()
+    if encoding is None:
+        return max(1, len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Longest prefix of text that fits in max_tokens"""
+    if max_tokens <= 0:
+        return ''
+    encoding = get_encoding()
+    if encoding is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
@@ -13,6 +13,7 @@ urlpatterns = [
     
     # Chat API endpoints (HTMX)
     path('api/chat/message/', views.chat_message, name='chat_message'),
+    path('api/chat/stream/', views.chat_stream, name='chat_stream'),
     path('api/chat/history/<int:conversation_id>/', views.chat_history, name='chat_history'),
     path('api/chat/new/', views.create_conversation, name='create_conversation'),
     
@@ -0,0 +1,588 @@
+"""
+Vector Index for Helix RAG retrieval
+
+Two interchangeable backends behind VectorIndex.search():
+
+1. PgVectorIndex - PostgreSQL + pgvector
+   - HNSW (default) or IVFFlat expression index on
+     (embedding::vector(N)) with vector_cosine_ops
+   - Distance computed once per candidate, ORDER BY served by the index
+   - Index lifecycle: migration 0003 + `manage.py rebuild_vector_index`
+
+2. LocalVectorIndex - in-process fallback (SQLite, tests, no pgvector)
+   - Per-tenant float32 matrix of L2-normalized embeddings, memory-mapped
+     from HELIX_VECTOR_INDEX_DIR so every worker shares the page cache
+   - Top-k via np.argpartition (O(N)) + sort of the k survivors only
+   - Version stamp in the Django cache; workers reload when it changes
+
+VectorIndex.search() returns [(chunk_id, similarity)] and VectorIndex.retrieve()
+returns RetrievedChunk objects, both ordered by similarity desc.
+"""
+
+import os
+import json
+import tempfile
+import threading
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+try:
+    import numpy as np
+except ImportError:
+    # NumPy optional dependency (local fallback disabled without it)
+    np = None
+
+from .models import Documento, DocumentoChunk
+from . import similarity
+
+logger = logging.getLogger(__name__)
+
+VECTOR_DIMENSIONS = getattr(settings, 'HELIX_EMBEDDING_DIMENSIONS', 1536)
+INDEX_NAME = 'assistant_chunk_embedding_ann_idx'
+
+ANN_METHODS = ('hnsw', 'ivfflat')
+
+
+def tenant_key(company_id: Optional[int] = None) -> str:
+    """
+    Identify the tenant owning the current chunk table
+
+    With django-tenants each tenant lives in its own schema, so the schema
+    name wins; otherwise fall back to the company id (or 'public').
+    """
+    schema = getattr(connection, 'schema_name', None)
+    return str(schema or company_id or 'public')
+
+
+def format_vector(vector: Iterable[float]) -> str:
+    """Format a vector as a pgvector literal ('[x,y,...]') at float32 precision"""
+    return '[' + ','.join(f'{float(v):.7g}' for v in vector) + ']'
+
+
+class RetrievedChunk:
+    """
+    Retrieval result: a chunk hydrated with its document metadata
+
+    Built from one joined query so prompt construction and citation
+    building never touch the ORM again. Slotted - thousands of these may
+    be created per second under load.
+    """
+
+    __slots__ = (
+        'chunk_id', 'document_id', 'chunk_index', 'content',
+        'score', 'title', 'source_path',
+    )
+
+    # Columns selected by every hydrating query, in constructor order
+    FIELDS = (
+        'id', 'document_id', 'chunk_index', 'content',
+        'document__title', 'document__source_path',
+    )
+
+    def __init__(self, chunk_id, document_id, chunk_index, content, title, source_path, score=0.0):
+        self.chunk_id = chunk_id
+        self.document_id = document_id
+        self.chunk_index = chunk_index
+        self.content = content
+        self.title = title
+        self.source_path = source_path
+        self.score = score
+
+    def __repr__(self):
+        return f"<RetrievedChunk {self.title} #{self.chunk_index} score={self.score:.3f}>"
+
+    def citation(self, snippet_length: int = 200) -> Dict:
+        """Citation dict stored in Mensagem.context_sources"""
+        return {
+            'document_id': self.document_id,
+            'title': self.title,
+            'source_path': self.source_path,
+            'chunk_index': self.chunk_index,
+            'score': round(self.score, 4),
+            'snippet': self.content[:snippet_length],
+        }
+
+    @staticmethod
+    def hydrate(results: List[Tuple[int, float]]) -> List['RetrievedChunk']:
+        """
+        Turn [(chunk_id, score)] into RetrievedChunk objects with one joined
+        query, preserving the relevance order of `results`
+        """
+        if not results:
+            return []
+        rows = {
+            row[0]: row
+            for row in DocumentoChunk.objects
+            .filter(id__in=[chunk_id for chunk_id, _ in results])
+            .values_list(*RetrievedChunk.FIELDS)
+        }
+        return [
+            RetrievedChunk(*rows[chunk_id], score=score)
+            for chunk_id, score in results
+            if chunk_id in rows
+        ]
+
+
+# ============================================================================
+# PGVECTOR BACKEND
+# ============================================================================
+
+class PgVectorIndex:
+    """ANN search and index management on PostgreSQL with pgvector"""
+
+    _available: Dict[str, bool] = {}
+
+    @staticmethod
+    def is_available() -> bool:
+        """pgvector usable on the default connection (checked once per alias)"""
+        if connection.vendor != 'postgresql':
+            return False
+        alias = connection.alias
+        if alias not in PgVectorIndex._available:
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'vector'")
+                    PgVectorIndex._available[alias] = cursor.fetchone() is not None
+                    cursor.execute("SELECT indexdef FROM pg_indexes WHERE indexname = %s", [INDEX_NAME])
+                    row = cursor.fetchone()
+                if row and not PgVectorIndex.index_matches(row[0]):
+                    logger.warning(
+                        f"✗ {INDEX_NAME} was built for another dimension than "
+                        f"HELIX_EMBEDDING_DIMENSIONS={VECTOR_DIMENSIONS}; searches won't use it "
+                        f"until `manage.py rebuild_vector_index`"
+                    )
+            except Exception as e:
+                logger.warning(f"pgvector extension status: {e}")
+                PgVectorIndex._available[alias] = False
+        return PgVectorIndex._available[alias]
+
+    @staticmethod
+    def index_matches(indexdef: str) -> bool:
+        """ANN index definition uses the same cast as the search queries"""
+        return f'vector({VECTOR_DIMENSIONS})' in indexdef
+
+    @staticmethod
+    def embedding_expression(alias: str = '') -> str:
+        column = f'{alias}.embedding' if alias else 'embedding'
+        return f'({column}::vector({VECTOR_DIMENSIONS}))'
+
+    @staticmethod
+    def retrieve(
+        query_embedding: List[float],
+        k: int = 5,
+        threshold: float = 0.0,
+    ) -> List[RetrievedChunk]:
+        """
+        Top-k cosine search served by the ANN index, hydrated in the same query
+
+        The inner query orders by the indexed expression so the planner walks
+        the HNSW/IVFFlat index and stops after k rows; the distance is
+        computed once per candidate and the threshold applied on the outside.
+        Document title/source_path come from the join already needed for the
+        is_active filter - one round-trip in total.
+        """
+        chunk_table = DocumentoChunk._meta.db_table
+        document_table = Documento._meta.db_table
+        expression = PgVectorIndex.embedding_expression('ac')
+
+        sql = f"""
+            SELECT id, document_id, chunk_index, content, title, source_path,
+                   1 - distance AS similarity
+            FROM (
+                SELECT ac.id, ac.document_id, ac.chunk_index, ac.content,
+                       ad.title, ad.source_path,
+                       {expression} <=> %s::vector({VECTOR_DIMENSIONS}) AS distance
+                FROM {chunk_table} ac
+                JOIN {document_table} ad ON ac.document_id = ad.id
+                WHERE ad.is_active = true AND ac.embedding IS NOT NULL
+                ORDER BY distance
+                LIMIT %s
+            ) candidates
+            WHERE distance <= %s
+            ORDER BY distance
+        """
+
+        # SET LOCAL only lasts inside a transaction block
+        with transaction.atomic(), connection.cursor() as cursor:
+            PgVectorIndex._set_search_params(cursor, k)
+            cursor.execute(sql, [format_vector(query_embedding), k, 1 - threshold])
+            return [
+                RetrievedChunk(*row[:6], score=float(row[6]))
+                for row in cursor.fetchall()
+            ]
+
+    @staticmethod
+    def search(
+        query_embedding: List[float],
+        k: int = 5,
+        threshold: float = 0.0,
+    ) -> List[Tuple[int, float]]:
+        """Top-k (chunk_id, similarity) pairs"""
+        return [
+            (chunk.chunk_id, chunk.score)
+            for chunk in PgVectorIndex.retrieve(query_embedding, k=k, threshold=threshold)
+        ]
+
+    @staticmethod
+    def _set_search_params(cursor, k: int) -> None:
+        """Widen the candidate list so filtering inactive docs doesn't starve top-k"""
+        ef_search = max(getattr(settings, 'HELIX_HNSW_EF_SEARCH', 40), k * 2)
+        probes = getattr(settings, 'HELIX_IVFFLAT_PROBES', 10)
+        cursor.execute(f"SET LOCAL hnsw.ef_search = {int(ef_search)}")
+        cursor.execute(f"SET LOCAL ivfflat.probes = {int(probes)}")
+
+    @staticmethod
+    def create_index_sql(
+        method: str = 'hnsw',
+        m: int = 16,
+        ef_construction: int = 64,
+        lists: Optional[int] = None,
+        concurrently: bool = False,
+    ) -> str:
+        """Build the CREATE INDEX statement for the chosen ANN method"""
+        if method not in ANN_METHODS:
+            raise ValueError(f"Unknown ANN method '{method}' (use {', '.join(ANN_METHODS)})")
+
+        if method == 'hnsw':
+            params = f"m = {int(m)}, ef_construction = {int(ef_construction)}"
+        else:
+            params = f"lists = {int(lists or 100)}"
+
+        return (
+            f"CREATE INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {INDEX_NAME} "
+            f"ON {DocumentoChunk._meta.db_table} "
+            f"USING {method} ({PgVectorIndex.embedding_expression()} vector_cosine_ops) "
+            f"WITH ({params})"
+        )
+
+    @staticmethod
+    def drop_index_sql(concurrently: bool = False) -> str:
+        return f"DROP INDEX {'CONCURRENTLY ' if concurrently else ''}IF EXISTS {INDEX_NAME}"
+
+    @staticmethod
+    def suggested_lists() -> int:
+        """IVFFlat rule of thumb: rows/1000 up to 1M rows, sqrt(rows) above"""
+        rows = DocumentoChunk.objects.filter(embedding__isnull=False).count()
+        if rows <= 1_000_000:
+            return max(1, rows // 1000)
+        return int(rows ** 0.5)
+
+    @staticmethod
+    def rebuild(
+        method: str = 'hnsw',
+        m: int = 16,
+        ef_construction: int = 64,
+        lists: Optional[int] = None,
+        concurrently: bool = True,
+    ) -> str:
+        """
+        Drop and recreate the ANN index
+
+        CONCURRENTLY keeps the chunk table writable during the build but
+        can't run inside a transaction (autocommit connection required).
+        """
+        if method == 'ivfflat' and not lists:
+            lists = PgVectorIndex.suggested_lists()
+
+        create_sql = PgVectorIndex.create_index_sql(
+            method=method, m=m, ef_construction=ef_construction,
+            lists=lists, concurrently=concurrently,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS vector")
+            cursor.execute(PgVectorIndex.drop_index_sql(concurrently=concurrently))
+            cursor.execute(create_sql)
+            cursor.execute(f"ANALYZE {DocumentoChunk._meta.db_table}")
+
+        PgVectorIndex._available.pop(connection.alias, None)
+        logger.info(f"✓ Rebuilt {method} index {INDEX_NAME}")
+        return create_sql
+
+
+# ============================================================================
+# LOCAL (NUMPY) FALLBACK
+# ============================================================================
+
+class LocalVectorIndex:
+    """
+    Memory-mapped per-tenant embedding matrix for exact top-k search
+
+    Files per tenant under HELIX_VECTOR_INDEX_DIR:
+        <tenant>.f32       - float32 matrix, shape (rows, dims), rows normalized
+        <tenant>.ids.npy   - int64 chunk ids aligned with the matrix rows
+        <tenant>.json      - {'rows', 'dims', 'version'}
+    """
+
+    _loaded: Dict[str, Tuple[int, 'np.ndarray', 'np.ndarray']] = {}
+    _lock = threading.RLock()
+
+    @staticmethod
+    def is_available() -> bool:
+        return np is not None
+
+    @staticmethod
+    def index_dir() -> Path:
+        default = os.path.join(tempfile.gettempdir(), 'helix_vector_index')
+        path = Path(getattr(settings, 'HELIX_VECTOR_INDEX_DIR', None) or default)
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
+    @staticmethod
+    def _paths(tenant: str) -> Tuple[Path, Path, Path]:
+        base = LocalVectorIndex.index_dir()
+        safe = ''.join(c if c.isalnum() or c in '-_' else '_' for c in tenant)
+        return base / f'{safe}.f32', base / f'{safe}.ids.npy', base / f'{safe}.json'
+
+    @staticmethod
+    def _version_key(tenant: str) -> str:
+        return f'helix:vector_index:{tenant}:version'
+
+    @staticmethod
+    def current_version(tenant: str) -> int:
+        version = cache.get(LocalVectorIndex._version_key(tenant))
+        if version is None:
+            cache.add(LocalVectorIndex._version_key(tenant), 1, None)
+            version = cache.get(LocalVectorIndex._version_key(tenant), 1)
+        return version
+
+    @staticmethod
+    def invalidate(tenant: Optional[str] = None) -> None:
+        """Bump the tenant's version stamp; every worker rebuilds/reloads lazily"""
+        tenant = tenant or tenant_key()
+        key = LocalVectorIndex._version_key(tenant)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 2, None)
+
+    @staticmethod
+    def iter_embeddings() -> Iterable[Tuple[int, List[float]]]:
+        """Stream (chunk_id, embedding) for active documents from the database"""
+        return (
+            DocumentoChunk.objects
+            .filter(document__is_active=True, embedding__isnull=False)
+            .order_by('id')
+            .values_list('id', 'embedding')
+            .iterator(chunk_size=2000)
+        )
+
+    @staticmethod
+    def build(
+        tenant: str,
+        rows: Optional[Iterable[Tuple[int, List[float]]]] = None,
+        version: Optional[int] = None,
+    ) -> int:
+        """
+        Write the tenant matrix to disk in one streaming pass
+
+        Rows are appended to a growable float32 buffer in blocks (no Python
+        list of vectors is kept), normalized, and flushed to the .f32 file.
+
+        Returns:
+            Number of indexed rows
+        """
+        if np is None:
+            raise RuntimeError("NumPy is required for the local vector index")
+
+        rows = LocalVectorIndex.iter_embeddings() if rows is None else rows
+        version = LocalVectorIndex.current_version(tenant) if version is None else version
+        matrix_path, ids_path, meta_path = LocalVectorIndex._paths(tenant)
+
+        block = 4096
+        ids = np.empty(block, dtype=np.int64)
+        matrix = np.empty((block, VECTOR_DIMENSIONS), dtype=np.float32)
+        count = 0
+        for chunk_id, embedding in rows:
+            if embedding is None or len(embedding) != VECTOR_DIMENSIONS:
+                continue
+            if count == len(ids):
+                ids = np.resize(ids, count * 2)
+                matrix = np.resize(matrix, (count * 2, VECTOR_DIMENSIONS))
+            ids[count] = chunk_id
+            matrix[count] = embedding
+            count += 1
+
+        ids = ids[:count]
+        matrix = similarity.normalize_rows(matrix[:count], copy=False)
+
+        # Write-then-rename so concurrent readers never see a partial file
+        suffix = f'.{os.getpid()}.tmp'
+        tmp_matrix = matrix_path.with_name(matrix_path.name + suffix)
+        tmp_ids = ids_path.with_name(ids_path.name + suffix)
+        tmp_meta = meta_path.with_name(meta_path.name + suffix)
+        matrix.tofile(tmp_matrix)
+        with open(tmp_ids, 'wb') as fh:
+            np.save(fh, ids)
+        tmp_meta.write_text(json.dumps({
+            'rows': count, 'dims': VECTOR_DIMENSIONS, 'version': version,
+        }))
+        os.replace(tmp_matrix, matrix_path)
+        os.replace(tmp_ids, ids_path)
+        os.replace(tmp_meta, meta_path)
+
+        with LocalVectorIndex._lock:
+            LocalVectorIndex._loaded.pop(tenant, None)
+        logger.info(f"✓ Built local vector index for {tenant} ({count} rows)")
+        return count
+
+    @staticmethod
+    def _load(tenant: str) -> Optional[Tuple['np.ndarray', 'np.ndarray']]:
+        version = LocalVectorIndex.current_version(tenant)
+        loaded = LocalVectorIndex._loaded.get(tenant)
+        if loaded and loaded[0] == version:
+            return loaded[1], loaded[2]
+
+        with LocalVectorIndex._lock:
+            loaded = LocalVectorIndex._loaded.get(tenant)
+            if loaded and loaded[0] == version:
+                return loaded[1], loaded[2]
+
+            matrix_path, ids_path, meta_path = LocalVectorIndex._paths(tenant)
+            meta = json.loads(meta_path.read_text()) if meta_path.exists() else None
+            if not meta or meta.get('version') != version or meta.get('dims') != VECTOR_DIMENSIONS:
+                LocalVectorIndex.build(tenant, version=version)
+                meta = json.loads(meta_path.read_text())
+
+            ids = np.load(ids_path)
+            if meta['rows']:
+                matrix = np.memmap(
+                    matrix_path, dtype=np.float32, mode='r',
+                    shape=(meta['rows'], meta['dims']),
+                )
+            else:
+                matrix = np.empty((0, VECTOR_DIMENSIONS), dtype=np.float32)
+            LocalVectorIndex._loaded[tenant] = (version, ids, matrix)
+            return ids, matrix
+
+    @staticmethod
+    def search(
+        query_embedding: List[float],
+        tenant: str,
+        k: int = 5,
+        threshold: float = 0.0,
+    ) -> List[Tuple[int, float]]:
+        """Exact cosine top-k over the tenant matrix"""
+        if np is None:
+            return []
+
+        ids, matrix = LocalVectorIndex._load(tenant)
+        if not len(ids) or k <= 0:
+            return []
+
+        query = similarity.normalize(query_embedding)
+        if query is None:
+            return []
+        scores = matrix @ query
+
+        return [
+            (int(ids[i]), score)
+            for i, score in similarity.top_k(scores, k, threshold)
+        ]
+
+
+# ============================================================================
+# FACADE
+# ============================================================================
+
+class VectorIndex:
+    """Pick the best available backend for the current connection"""
+
+    @staticmethod
+    def backend() -> str:
+        if PgVectorIndex.is_available():
+            return 'pgvector'
+        if LocalVectorIndex.is_available():
+            return 'local'
+        return 'none'
+
+    @staticmethod
+    def search(
+        query_embedding: List[float],
+        company_id: Optional[int] = None,
+        k: int = 5,
+        threshold: float = 0.0,
+    ) -> List[Tuple[int, float]]:
+        """
+        Top-k most similar chunk ids for the tenant
+
+        Returns:
+            [(chunk_id, similarity)] ordered by similarity desc
+        """
+        backend = VectorIndex.backend()
+        if backend == 'pgvector':
+            return PgVectorIndex.search(query_embedding, k=k, threshold=threshold)
+        if backend == 'local':
+            return LocalVectorIndex.search(
+                query_embedding, tenant_key(company_id), k=k, threshold=threshold
+            )
+        logger.warning("No vector index backend available (install pgvector or numpy)")
+        return []
+
+    @staticmethod
+    def retrieve(
+        query_embedding: List[float],
+        company_id: Optional[int] = None,
+        k: int = 5,
+        threshold: float = 0.0,
+        mmr_lambda: Optional[float] = None,
+        fetch_k: Optional[int] = None,
+    ) -> List[RetrievedChunk]:
+        """
+        Top-k chunks for the tenant, hydrated and ordered by similarity desc
+
+        pgvector: a single SQL round-trip. Local index: in-process search +
+        one joined query for the k winners.
+
+        With mmr_lambda set, fetch_k candidates are reranked by maximal
+        marginal relevance (see retrieve_mmr) and returned in MMR order.
+        """
+        if mmr_lambda is not None and similarity.is_available():
+            return VectorIndex.retrieve_mmr(
+                query_embedding, company_id, k, threshold, mmr_lambda, fetch_k
+            )
+        if VectorIndex.backend() == 'pgvector':
+            return PgVectorIndex.retrieve(query_embedding, k=k, threshold=threshold)
+        return RetrievedChunk.hydrate(
+            VectorIndex.search(query_embedding, company_id=company_id, k=k, threshold=threshold)
+        )
+
+    @staticmethod
+    def retrieve_mmr(
+        query_embedding: List[float],
+        company_id: Optional[int] = None,
+        k: int = 5,
+        threshold: float = 0.0,
+        mmr_lambda: float = 0.5,
+        fetch_k: Optional[int] = None,
+    ) -> List[RetrievedChunk]:
+        """
+        Diversified top-k: ANN top fetch_k, then MMR over their embeddings
+
+        Three round-trips (search, candidate embeddings, hydration) instead
+        of one - only worth it when near-duplicate chunks crowd the top-k.
+        """
+        fetch_k = fetch_k or max(k * 4, 20)
+        candidates = VectorIndex.search(
+            query_embedding, company_id=company_id, k=fetch_k, threshold=threshold
+        )
+        if len(candidates) <= k:
+            return RetrievedChunk.hydrate(candidates)
+
+        vectors = dict(
+            DocumentoChunk.objects.filter(
+                id__in=[chunk_id for chunk_id, _ in candidates]
+            ).values_list('id', 'embedding')
+        )
+        usable = [
+            (chunk_id, score) for chunk_id, score in candidates
+            if vectors.get(chunk_id) is not None and len(vectors[chunk_id]) == VECTOR_DIMENSIONS
+        ]
+        order = similarity.mmr(
+            query_embedding, [vectors[chunk_id] for chunk_id, _ in usable], k, mmr_lambda
+        )
+        return RetrievedChunk.hydrate([usable[i] for i in order])
@@ -45,8 +45,12 @@ from .services import (
     DocumentoIngestion, 
     RAGPipeline,
     check_ollama_connection,
-    get_helix_status
+    format_sse,
 )
+from .status import get_helix_status_snapshot
+from .response_cache import SemanticResponseCache
+from .embedding_cache import QueryEmbeddingCache
+from .llm_gateway import LLMGateway
 
 logger = logging.getLogger(__name__)
 
@@ -87,7 +91,7 @@ def chat_interface(request):
             'conversations': conversations,
             'active_conversation': default_conv,
             'history': history,
-            'helix_status': get_helix_status(),
+            'helix_status': get_helix_status_snapshot(),
         }
         return render(request, 'assistant/chat_interface.html', context)
         
@@ -172,6 +176,49 @@ def chat_message(request):
         return HttpResponse(error_html, status=500)
 
 
+@login_required
+@require_http_methods(["POST"])
+async def chat_stream(request):
+    """
+    Stream the assistant response as Server-Sent Events (async, ASGI)
+    
+    Endpoint: POST /api/chat/stream/
+    
+    Request (form): conversation_id, message
+    
+    Response: text/event-stream
+        event: token  data: "fragment"              (repeated)
+        event: done   data: {citations, message_id, processing_time, ...}
+        event: busy   data: "message"                (LLM queue full - load shed)
+        event: error  data: "message"
+    
+    The assistant Mensagem is persisted when the stream completes; time to
+    first token is the user-facing latency and no worker is held while the
+    model generates.
+    """
+    conversation_id = request.POST.get('conversation_id')
+    user_message = request.POST.get('message', '').strip()
+    
+    if not user_message:
+        return HttpResponse("Mensagem vazia", status=400)
+    
+    user = await request.auser()
+    conversation = await Conversa.objects.filter(id=conversation_id, user=user).afirst()
+    if conversation is None:
+        return HttpResponse("Conversa não encontrada", status=404)
+    
+    logger.info(f"Chat stream from {user}: {user_message[:50]}...")
+    
+    async def events():
+        async for event, data in HelixAssistant.astream_chat(user_message, conversation):
+            yield format_sse(event, data)
+    
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
 @login_required
 @require_http_methods(["GET"])
 def chat_history(request, conversation_id):
@@ -349,10 +396,14 @@ def health_check(request):
     """
     Health check endpoint
     
-    Returns: System status (Ollama, embeddings, database)
+    Returns: System status (Ollama, embeddings, database) from the shared
+    snapshot refreshed in background by HelixStatusMonitor
     """
     try:
-        status = get_helix_status()
+        status = dict(get_helix_status_snapshot())
+        status['response_cache'] = SemanticResponseCache.stats()
+        status['embedding_cache'] = QueryEmbeddingCache.stats()
+        status['llm_gateway'] = LLMGateway.stats()
         return JsonResponse(status)
     except Exception as e:
         logger.error(f"Health check error: {e}")
@@ -0,0 +1,164 @@
+"""
+SyncRH - Pipeline de Auditoria
+==============================
+Ponto único de captura de eventos de auditoria HTTP, usado por
+apps.security.middleware.AuditoriaLoggingMiddleware e
+apps.core.middleware.AuditLogMiddleware.
+
+- Captura uma vez por requisição (mesmo com os dois middlewares ativos),
+  já com status_code e duração
+- Evento serializado como lista compacta de primitivos (AUDIT_FIELDS):
+  nenhum objeto ORM fica retido na fila
+- Enfileirado num BatchWriter (apps.core.write_behind) e gravado com
+  bulk_create de AuditoriaLog em lotes
+- Banco indisponível: lotes vão para AUDIT_SPILL_DIR (JSON Lines, fsync)
+  e são regravados quando o banco volta - eventos de auditoria nunca são
+  descartados por backpressure
+- IP validado e path truncado ao max_length dos campos no build_event:
+  um evento malformado não derruba o lote (o BatchWriter isola e coloca
+  em quarentena o que o banco ainda rejeitar)
+"""
+
+import time
+import logging
+import threading
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, List, Optional
+
+from django.conf import settings
+
+from apps.core.request_context import get_request_context, valid_ip
+from apps.core.write_behind import BatchWriter
+
+logger = logging.getLogger(__name__)
+
+# Ordem dos campos do evento serializado
+AUDIT_FIELDS = (
+    'occurred_at', 'company_id', 'user_id', 'action', 'module', 'object_type',
+    'object_id', 'ip_address', 'user_agent', 'status_code', 'duration_ms',
+)
+
+ACTION_MAP = {
+    'POST': 'create',
+    'PUT': 'update',
+    'PATCH': 'update',
+    'DELETE': 'delete',
+}
+
+MAX_USER_AGENT = 512
+
+# max_length de AuditoriaLog.module/object_type/object_id
+MAX_MODULE = 50
+MAX_OBJECT_TYPE = 100
+MAX_OBJECT_ID = 255
+
+
+def get_client_ip(request) -> Optional[str]:
+    """IP real do cliente (primeiro X-Forwarded-For)"""
+    return get_request_context(request).ip
+
+
+class AuditPipeline:
+    """
+    Captura + gravação em lote de eventos de auditoria
+
+    Uso (middleware):
+        AuditPipeline.start(request)             # antes da view
+        AuditPipeline.capture(request, response) # depois da view
+    """
+
+    _writer: Optional[BatchWriter] = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def writer() -> BatchWriter:
+        if AuditPipeline._writer is None:
+            with AuditPipeline._lock:
+                if AuditPipeline._writer is None:
+                    AuditPipeline._writer = BatchWriter(
+                        'audit',
+                        AuditPipeline.write,
+                        max_queue=getattr(settings, 'AUDIT_QUEUE_SIZE', 10000),
+                        batch_size=getattr(settings, 'AUDIT_BATCH_SIZE', 200),
+                        flush_interval=getattr(settings, 'AUDIT_FLUSH_INTERVAL', 1.0),
+                        background=getattr(settings, 'AUDIT_BACKGROUND', True),
+                        spill_dir=getattr(settings, 'AUDIT_SPILL_DIR', None),
+                        replay_interval=getattr(settings, 'AUDIT_REPLAY_INTERVAL', 30.0),
+                    )
+        return AuditPipeline._writer
+
+    @staticmethod
+    def start(request) -> None:
+        """Marca o início da requisição (idempotente)"""
+        if not hasattr(request, '_audit_start'):
+            request._audit_start = time.perf_counter()
+
+    @staticmethod
+    def build_event(request, response, duration_ms: float = None) -> List:
+        """Evento compacto (lista na ordem de AUDIT_FIELDS)"""
+        context = get_request_context(request)
+        authenticated = context.is_authenticated
+        user = context.user
+        if duration_ms is None:
+            start = getattr(request, '_audit_start', None)
+            duration_ms = (time.perf_counter() - start) * 1000 if start is not None else None
+
+        # /api/v1/<module>/<object_type>/<object_id>/
+        path_parts = request.path.strip('/').split('/')
+        return [
+            time.time(),
+            getattr(user, 'company_id', None) if authenticated else None,
+            user.pk if authenticated else None,
+            ACTION_MAP.get(request.method, 'unknown'),
+            path_parts[2][:MAX_MODULE] if len(path_parts) > 2 else 'unknown',
+            path_parts[3][:MAX_OBJECT_TYPE] if len(path_parts) > 3 else 'unknown',
+            path_parts[4][:MAX_OBJECT_ID] if len(path_parts) > 4 else '',
+            valid_ip(context.ip),
+            context.user_agent[:MAX_USER_AGENT],
+            response.status_code,
+            round(duration_ms, 2) if duration_ms is not None else None,
+        ]
+
+    @staticmethod
+    def capture(request, response, duration_ms: float = None) -> bool:
+        """
+        Registra o evento da requisição (uma única vez por requisição)
+
+        Sempre gera a linha de log; só eventos com empresa (tenant) vão
+        para AuditoriaLog.
+        """
+        if getattr(request, '_audit_captured', False):
+            return False
+        request._audit_captured = True
+
+        event = AuditPipeline.build_event(request, response, duration_ms)
+        row = dict(zip(AUDIT_FIELDS, event))
+        logger.info(
+            f"AUDIT: {request.method} {request.path} - "
+            f"User: {row['user_id']} - "
+            f"Status: {row['status_code']} - "
+            f"Duration: {row['duration_ms']}ms"
+        )
+        if row['company_id'] is None:
+            return False
+        return AuditPipeline.writer().submit(event, critical=True)
+
+    @staticmethod
+    def write(events: List[List]) -> None:
+        """Grava um lote de eventos (thread do BatchWriter ou replay do spill)"""
+        from apps.core.models import AuditoriaLog
+
+        logs = []
+        for event in events:
+            row = dict(zip(AUDIT_FIELDS, event))
+            row['occurred_at'] = datetime.fromtimestamp(row['occurred_at'], tz=dt_timezone.utc)
+            logs.append(AuditoriaLog(**row))
+        AuditoriaLog.objects.bulk_create(logs, batch_size=getattr(settings, 'AUDIT_BATCH_SIZE', 200))
+
+    @staticmethod
+    def flush() -> int:
+        return AuditPipeline.writer().flush()
+
+    @staticmethod
+    def stats() -> Dict:
+        return AuditPipeline.writer().stats()
@@ -0,0 +1,132 @@
+"""
+SyncRH - Histograma de Latência
+===============================
+Histograma log-linear de tamanho fixo (estilo HDR) para latências em ms.
+
+- Buckets fixos: 10 por década (mantissas 1, 1.2, 1.5, 2, 2.5, 3, 4, 5,
+  6, 7.5) de 0.1 ms a 100 s, mais um bucket de overflow - erro relativo
+  dos quantis limitado pela largura do bucket (< 25%, tipicamente < 10%
+  com interpolação)
+- record(): um bisect (C) e três somas - sem alocação
+- Mergeable: histogramas de workers diferentes somam bucket a bucket,
+  então P95/P99 agregados são exatos no nível do bucket (ao contrário de
+  médias de percentis)
+- Serialização compacta (buckets esparsos) para o cache compartilhado
+"""
+
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional
+
+MANTISSAS = (1, 1.2, 1.5, 2, 2.5, 3, 4, 5, 6, 7.5)
+
+# Limites superiores (inclusivos, como o 'le' do Prometheus) em ms
+BOUNDS = tuple(
+    round(mantissa * 10 ** exponent, 3)
+    for exponent in range(-1, 5)
+    for mantissa in MANTISSAS
+) + (100000.0,)
+
+
+def bucket_index(value_ms: float) -> int:
+    """Índice do bucket de value_ms (len(BOUNDS) = overflow)"""
+    return bisect_left(BOUNDS, value_ms)
+
+
+class LatencyHistogram:
+    """Contagens por bucket + count/sum/min/max"""
+
+    __slots__ = ('counts', 'count', 'total', 'min', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def record(self, value_ms: float) -> None:
+        value_ms = max(float(value_ms), 0.0)
+        self.counts[bisect_left(BOUNDS, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        if self.min is None or value_ms < self.min:
+            self.min = value_ms
+        if self.max is None or value_ms > self.max:
+            self.max = value_ms
+
+    def merge(self, other: 'LatencyHistogram') -> 'LatencyHistogram':
+        """Soma other neste histograma (in place)"""
+        counts = self.counts
+        for index, value in enumerate(other.counts):
+            if value:
+                counts[index] += value
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None and (self.min is None or other.min < self.min):
+            self.min = other.min
+        if other.max is not None and (self.max is None or other.max > self.max):
+            self.max = other.max
+        return self
+
+    @classmethod
+    def merged(cls, histograms: Iterable['LatencyHistogram']) -> 'LatencyHistogram':
+        result = cls()
+        for histogram in histograms:
+            result.merge(histogram)
+        return result
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Quantil q (0-1), interpolado linearmente dentro do bucket"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, value in enumerate(self.counts):
+            if not value:
+                continue
+            if cumulative + value >= rank:
+                lower = BOUNDS[index - 1] if index > 0 else 0.0
+                upper = BOUNDS[index] if index < len(BOUNDS) else self.max
+                lower = max(lower, self.min)
+                upper = min(upper, self.max)
+                fraction = (rank - cumulative) / value
+                return round(lower + (upper - lower) * fraction, 3)
+            cumulative += value
+        return self.max
+
+    def cumulative(self, bounds_ms: Iterable[float]) -> List[int]:
+        """Contagens cumulativas (<= bound) para limites de BOUNDS"""
+        result = []
+        running = 0
+        position = 0
+        for bound in bounds_ms:
+            index = bucket_index(bound)
+            while position <= index and position < len(self.counts):
+                running += self.counts[position]
+                position += 1
+            result.append(running)
+        return result
+
+    def to_dict(self) -> Dict:
+        return {
+            'buckets': [[index, value] for index, value in enumerate(self.counts) if value],
+            'count': self.count,
+            'sum': self.total,
+            'min': self.min,
+            'max': self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'LatencyHistogram':
+        histogram = cls()
+        for index, value in data.get('buckets', ()):
+            histogram.counts[index] += value
+        histogram.count = data.get('count', 0)
+        histogram.total = data.get('sum', 0.0)
+        histogram.min = data.get('min')
+        histogram.max = data.get('max')
+        return histogram
@@ -0,0 +1,53 @@
+"""
+Metrics Endpoints
+
+GET /metrics - Prometheus text format (latency histograms per route)
+GET /api/v1/core/metrics/ - JSON summary for the admin (P50/P95/P99)
+GET /api/v1/core/queries/ - sampled SQL ring buffer (N+1, slow requests)
+
+Access: staff users, or `Authorization: Bearer <PERFORMANCE_METRICS_TOKEN>`
+for scrapers.
+"""
+
+import hmac
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+
+from apps.core.monitoring import PerformanceMonitor
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _authorized(request):
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated and user.is_staff:
+        return True
+    token = getattr(settings, 'PERFORMANCE_METRICS_TOKEN', '')
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    return bool(token) and hmac.compare_digest(header, f'Bearer {token}')
+
+
+def metrics(request):
+    """Prometheus scrape endpoint"""
+    if not _authorized(request):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    return HttpResponse(PerformanceMonitor.prometheus_text(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+
+def metrics_summary(request):
+    """Latency summary per route (JSON)"""
+    if not _authorized(request):
+        return JsonResponse({'error': 'forbidden'}, status=403)
+    return JsonResponse(PerformanceMonitor.summary())
+
+
+def query_samples(request):
+    """Sampled per-request SQL profiles from all workers (JSON)"""
+    if not _authorized(request):
+        return JsonResponse({'error': 'forbidden'}, status=403)
+    try:
+        limit = min(int(request.GET.get('limit', 50)), 500)
+    except ValueError:
+        limit = 50
+    return JsonResponse({'samples': PerformanceMonitor.query_samples(limit)})
@@ -6,11 +6,12 @@ Middleware para segurança, auditoria e controle de acesso
 
 import logging
 import time
-import hashlib
 from django.conf import settings
 from django.http import JsonResponse, HttpResponseForbidden
-from django.utils import timezone
-from django.core.cache import cache
+
+from apps.core.audit import AuditPipeline
+from apps.core.rate_limit import RateLimiter
+from apps.core.request_context import apply_security_headers, get_request_context, prefix_matcher
 
 logger = logging.getLogger(__name__)
 
@@ -35,91 +36,54 @@ class SecurityHeadersMiddleware:
     def __call__(self, request):
         response = self.get_response(request)
         
-        # Previne MIME type sniffing
-        response['X-Content-Type-Options'] = 'nosniff'
-        
-        # Previne clickjacking
-        response['X-Frame-Options'] = 'DENY'
-        
-        # Ativa proteção XSS do navegador
-        response['X-XSS-Protection'] = '1; mode=block'
-        
-        # HSTS - força HTTPS (apenas em produção)
-        if not settings.DEBUG:
-            response['Strict-Transport-Security'] = 'max-age=31536000; includeSubDomains'
-        
-        # Política de referrer
-        response['Referrer-Policy'] = 'strict-origin-when-cross-origin'
-        
-        # Política de permissões
-        response['Permissions-Policy'] = (
-            'accelerometer=(), camera=(), geolocation=(), '
-            'gyroscope=(), magnetometer=(), microphone=(), '
-            'payment=(), usb=()'
-        )
-        
-        return response
+        # Headers compartilhados (uma escrita por resposta, ver request_context)
+        return apply_security_headers(response)
 
 
 class RateLimitMiddleware:
     """
     Middleware para limitar requisições por IP/usuário.
     
+    Usa o motor compartilhado apps.core.rate_limit.RateLimiter (janela
+    deslizante, contadores atômicos, políticas por rota/tier).
+    
     Configuração via settings:
-    - RATE_LIMIT_REQUESTS: número máximo de requisições (default: 100)
-    - RATE_LIMIT_WINDOW: janela de tempo em segundos (default: 60)
+    - RATE_LIMIT_POLICIES / RATE_LIMIT_ROUTES: políticas por tier e rota
+    - RATE_LIMIT_REQUESTS / RATE_LIMIT_WINDOW: política 'default'
+      (default: 100 requisições por 60 segundos)
     """
     
     def __init__(self, get_response):
         self.get_response = get_response
-        self.max_requests = getattr(settings, 'RATE_LIMIT_REQUESTS', 100)
-        self.window = getattr(settings, 'RATE_LIMIT_WINDOW', 60)
     
     def __call__(self, request):
-        # Identifica o cliente
-        client_id = self._get_client_id(request)
-        cache_key = f'rate_limit:{client_id}'
-        
-        # Obtém contador atual
-        request_count = cache.get(cache_key, 0)
+        result = RateLimiter.check(request)
         
         # Verifica limite
-        if request_count >= self.max_requests:
-            logger.warning(f"Rate limit excedido para: {client_id}")
-            return JsonResponse(
+        if not result.allowed:
+            response = JsonResponse(
                 {
                     'error': 'Limite de requisições excedido',
-                    'detail': f'Máximo de {self.max_requests} requisições por {self.window} segundos',
-                    'retry_after': self.window
+                    'detail': f'Máximo de {result.limit} requisições por janela',
+                    'retry_after': result.retry_after
                 },
                 status=429
             )
-        
-        # Incrementa contador
-        cache.set(cache_key, request_count + 1, self.window)
+            response['Retry-After'] = str(result.retry_after)
+            return response
         
         response = self.get_response(request)
         
         # Adiciona headers de rate limit
-        response['X-RateLimit-Limit'] = str(self.max_requests)
-        response['X-RateLimit-Remaining'] = str(self.max_requests - request_count - 1)
-        response['X-RateLimit-Reset'] = str(self.window)
+        response['X-RateLimit-Limit'] = str(result.limit)
+        response['X-RateLimit-Remaining'] = str(result.remaining)
+        response['X-RateLimit-Reset'] = str(result.reset)
         
         return response
     
     def _get_client_id(self, request):
         """Obtém identificador único do cliente"""
-        if request.user.is_authenticated:
-            return f'user:{request.user.id}'
-        
-        # Usa IP para usuários anônimos
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0].strip()
-        else:
-            ip = request.META.get('REMOTE_ADDR', 'unknown')
-        
-        return f'ip:{ip}'
+        return RateLimiter.client_id(request)
 
 
 class AuditLogMiddleware:
@@ -144,16 +108,13 @@ class AuditLogMiddleware:
     
     def __call__(self, request):
         # Marca tempo de início
-        start_time = time.time()
+        AuditPipeline.start(request)
         
         response = self.get_response(request)
         
-        # Calcula duração
-        duration = time.time() - start_time
-        
-        # Registra se necessário
+        # Registra se necessário (mesmo pipeline do AuditoriaLoggingMiddleware)
         if self._should_log(request, response):
-            self._log_request(request, response, duration)
+            self._log_request(request, response)
         
         return response
     
@@ -164,9 +125,8 @@ class AuditLogMiddleware:
             return True
         
         # Registra acessos a paths sensíveis
-        for path in self.SENSITIVE_PATHS:
-            if request.path.startswith(path):
-                return True
+        if prefix_matcher(self.SENSITIVE_PATHS).matches(request.path):
+            return True
         
         # Registra erros de autenticação
         if response.status_code in [401, 403]:
@@ -174,39 +134,14 @@ class AuditLogMiddleware:
         
         return False
     
-    def _log_request(self, request, response, duration):
+    def _log_request(self, request, response):
         """Registra a requisição no log de auditoria"""
-        user = request.user if request.user.is_authenticated else None
-        
-        log_data = {
-            'timestamp': timezone.now().isoformat(),
-            'user_id': user.id if user else None,
-            'user_email': user.email if user else None,
-            'method': request.method,
-            'path': request.path,
-            'status_code': response.status_code,
-            'duration_ms': round(duration * 1000, 2),
-            'ip_address': self._get_client_ip(request),
-            'user_agent': request.META.get('HTTP_USER_AGENT', ''),
-        }
-        
-        # Log estruturado
-        logger.info(
-            f"AUDIT: {log_data['method']} {log_data['path']} - "
-            f"User: {log_data['user_email']} - "
-            f"Status: {log_data['status_code']} - "
-            f"Duration: {log_data['duration_ms']}ms"
-        )
-        
-        # Em produção, salvaria em tabela de auditoria
-        # AuditLog.objects.create(**log_data)
+        # Evento compacto enfileirado; gravado em lote em AuditoriaLog
+        AuditPipeline.capture(request, response)
     
     def _get_client_ip(self, request):
         """Obtém IP real do cliente"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            return x_forwarded_for.split(',')[0].strip()
-        return request.META.get('REMOTE_ADDR', 'unknown')
+        return get_request_context(request).ip or 'unknown'
 
 
 class RequestValidationMiddleware:
@@ -282,9 +217,7 @@ class IPWhitelistMiddleware:
             return self.get_response(request)
         
         # Verifica se é path administrativo
-        is_admin = any(
-            request.path.startswith(path) for path in self.ADMIN_PATHS
-        )
+        is_admin = prefix_matcher(self.ADMIN_PATHS).matches(request.path)
         
         if is_admin:
             client_ip = self._get_client_ip(request)
@@ -298,10 +231,7 @@ class IPWhitelistMiddleware:
         return self.get_response(request)
     
     def _get_client_ip(self, request):
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            return x_forwarded_for.split(',')[0].strip()
-        return request.META.get('REMOTE_ADDR', 'unknown')
+        return get_request_context(request).ip or 'unknown'
 
 
 class SessionSecurityMiddleware:
@@ -355,16 +285,13 @@ class SessionSecurityMiddleware:
     
     def _get_fingerprint(self, request):
         """Gera fingerprint baseado em características do cliente"""
-        data = (
-            request.META.get('HTTP_USER_AGENT', '') +
-            request.META.get('HTTP_ACCEPT_LANGUAGE', '') +
-            request.META.get('HTTP_ACCEPT_ENCODING', '')
-        )
-        return hashlib.sha256(data.encode()).hexdigest()[:32]
+        # Mesmo fingerprint do ZeroTrustMiddleware, calculado uma vez
+        return get_request_context(request).fingerprint
 
 
 # Lista de middlewares recomendados para adicionar ao settings
 SECURITY_MIDDLEWARE = [
+    'apps.core.request_context.RequestContextMiddleware',
     'apps.core.middleware.SecurityHeadersMiddleware',
     'apps.core.middleware.RateLimitMiddleware',
     'apps.core.middleware.AuditLogMiddleware',
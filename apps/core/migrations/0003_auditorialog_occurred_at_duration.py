@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-17 04:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditorialog',
+            name='duration_ms',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='auditorialog',
+            name='occurred_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -388,6 +388,10 @@ class AuditoriaLog(TenantAwareModel):
     user_agent = models.TextField(blank=True)
     status_code = models.IntegerField(null=True, blank=True)
     error_message = models.TextField(blank=True)
+    # Preenchidos pelo pipeline de auditoria (apps.core.audit): created_at
+    # é o momento da gravação em lote, occurred_at o da requisição
+    occurred_at = models.DateTimeField(null=True, blank=True)
+    duration_ms = models.FloatField(null=True, blank=True)
 
     class Meta:
         verbose_name = _("Auditoria Log")
@@ -8,52 +8,232 @@ Monitoring automático
 
 # apps/core/monitoring.py
 
+import os
+import socket
 import logging
+import threading
 import time
 from functools import wraps
+from typing import Dict, List, Tuple
 from django.conf import settings
 from django.core.cache import cache
 from django.db import connection
 from django.utils.decorators import method_decorator
 
+from apps.core.histogram import BOUNDS, LatencyHistogram, bucket_index
+from apps.core.query_tracker import QueryTracker
+
 logger = logging.getLogger(__name__)
 
+# Buckets exportados no /metrics (ms)
+DEFAULT_EXPORT_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+UNRESOLVED_ROUTE = '<unresolved>'
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def route_name(request) -> str:
+    """
+    Nome estável da rota (view_name ou padrão da URL), nunca o path cru:
+    IDs na URL não multiplicam as séries
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNRESOLVED_ROUTE
+    return match.view_name or match.route or UNRESOLVED_ROUTE
+
 
 class PerformanceMonitor:
-    """Monitor de performance da aplicação"""
+    """
+    Monitor de performance da aplicação
+
+    Latências vão para histogramas em memória por worker (um por rota
+    resolvida + método, apps.core.histogram) - nenhum acesso ao cache por
+    requisição. A cada PERFORMANCE_METRICS_FLUSH_INTERVAL segundos o
+    worker publica seu snapshot cumulativo no cache (perf:hist:<worker>);
+    aggregate() soma os snapshots de todos os workers ativos.
+    """
     
-    METRICS = {
-        'api_latency': [],
-        'db_queries': [],
-        'cache_hits': 0,
-        'cache_misses': 0,
-    }
+    REGISTRY_KEY = 'perf:workers'
+    
+    _histograms: Dict[Tuple[str, str], LatencyHistogram] = {}
+    _lock = threading.Lock()
+    _pid = None
+    _last_flush = 0.0
     
     @staticmethod
-    def record_api_call(endpoint, duration_ms):
-        """Registrar latência de API"""
-        key = f"perf:api:{endpoint}"
-        metrics = cache.get(key, [])
-        metrics.append(duration_ms)
-        if len(metrics) > 100:
-            metrics = metrics[-100:]
-        cache.set(key, metrics, 3600)
-        
-        # Log P95, P99
-        if len(metrics) >= 10:
-            sorted_metrics = sorted(metrics)
-            p95 = sorted_metrics[int(len(sorted_metrics) * 0.95)]
-            p99 = sorted_metrics[int(len(sorted_metrics) * 0.99)]
-            logger.info(f"API {endpoint} - P95: {p95}ms, P99: {p99}ms")
+    def worker_id() -> str:
+        return f"{socket.gethostname()}:{os.getpid()}"
+    
+    @staticmethod
+    def flush_interval() -> float:
+        return getattr(settings, 'PERFORMANCE_METRICS_FLUSH_INTERVAL', 10)
+    
+    @staticmethod
+    def ttl() -> int:
+        return getattr(settings, 'PERFORMANCE_METRICS_TTL', 300)
+    
+    @staticmethod
+    def record_api_call(endpoint, duration_ms, method=''):
+        """Registrar latência de API (endpoint = nome da rota, não o path)"""
+        now = time.monotonic()
+        with PerformanceMonitor._lock:
+            if PerformanceMonitor._pid != os.getpid():
+                # Processo filho (fork): não herda as contagens do pai
+                PerformanceMonitor._histograms = {}
+                PerformanceMonitor._pid = os.getpid()
+                PerformanceMonitor._last_flush = now
+            key = (endpoint, method)
+            histogram = PerformanceMonitor._histograms.get(key)
+            if histogram is None:
+                histogram = PerformanceMonitor._histograms[key] = LatencyHistogram()
+            histogram.record(duration_ms)
+            due = now - PerformanceMonitor._last_flush >= PerformanceMonitor.flush_interval()
+            if due:
+                PerformanceMonitor._last_flush = now
+        if due:
+            PerformanceMonitor.flush()
+    
+    @staticmethod
+    def snapshot() -> Dict[Tuple[str, str], LatencyHistogram]:
+        """Cópia dos histogramas deste worker"""
+        with PerformanceMonitor._lock:
+            return {
+                key: LatencyHistogram().merge(histogram)
+                for key, histogram in PerformanceMonitor._histograms.items()
+            }
+    
+    @staticmethod
+    def flush() -> int:
+        """Publica o snapshot cumulativo deste worker no cache"""
+        snapshot = PerformanceMonitor.snapshot()
+        worker = PerformanceMonitor.worker_id()
+        ttl = PerformanceMonitor.ttl()
+        try:
+            cache.set_many({
+                f"perf:hist:{worker}": {
+                    f"{route}\t{method}": histogram.to_dict()
+                    for (route, method), histogram in snapshot.items()
+                },
+                # Ring buffer de SQL (apps.core.query_tracker)
+                f"perf:sql:{worker}": QueryTracker.recent(),
+            }, ttl)
+            # Registro dos workers: read-modify-write sem lock; uma corrida
+            # só atrasa o aparecimento do worker até o próximo flush
+            now = time.time()
+            registry = {
+                other: seen for other, seen in (cache.get(PerformanceMonitor.REGISTRY_KEY) or {}).items()
+                if now - seen < ttl
+            }
+            registry[worker] = now
+            cache.set(PerformanceMonitor.REGISTRY_KEY, registry, ttl)
+        except Exception as e:
+            logger.warning(f"Falha ao publicar métricas de performance: {e}")
+            return 0
+        return len(snapshot)
+    
+    @staticmethod
+    def aggregate() -> Dict[Tuple[str, str], LatencyHistogram]:
+        """Histogramas de todos os workers ativos, somados por (rota, método)"""
+        worker = PerformanceMonitor.worker_id()
+        registry = cache.get(PerformanceMonitor.REGISTRY_KEY) or {}
+        keys = [f"perf:hist:{other}" for other in registry if other != worker]
+        merged: Dict[Tuple[str, str], LatencyHistogram] = {}
+        for published in cache.get_many(keys).values():
+            for label, data in published.items():
+                route, _, method = label.partition('\t')
+                histogram = merged.setdefault((route, method), LatencyHistogram())
+                histogram.merge(LatencyHistogram.from_dict(data))
+        # Este worker: estado em memória (mais recente que o publicado)
+        for key, histogram in PerformanceMonitor.snapshot().items():
+            merged.setdefault(key, LatencyHistogram()).merge(histogram)
+        return merged
+    
+    @staticmethod
+    def query_samples(limit: int = 200) -> List[Dict]:
+        """Ring buffers de SQL de todos os workers, mais recentes primeiro"""
+        worker = PerformanceMonitor.worker_id()
+        registry = cache.get(PerformanceMonitor.REGISTRY_KEY) or {}
+        keys = [f"perf:sql:{other}" for other in registry if other != worker]
+        samples = QueryTracker.recent()
+        for published in cache.get_many(keys).values():
+            samples.extend(published)
+        samples.sort(key=lambda entry: entry['timestamp'], reverse=True)
+        return samples[:limit]
+    
+    @staticmethod
+    def summary() -> Dict:
+        """Resumo JSON (admin): contagem, média e percentis por rota"""
+        routes = []
+        for (route, method), histogram in PerformanceMonitor.aggregate().items():
+            routes.append({
+                'route': route,
+                'method': method,
+                'count': histogram.count,
+                'mean_ms': round(histogram.mean, 2),
+                'p50_ms': histogram.quantile(0.50),
+                'p95_ms': histogram.quantile(0.95),
+                'p99_ms': histogram.quantile(0.99),
+                'max_ms': round(histogram.max, 2),
+            })
+        routes.sort(key=lambda row: row['count'], reverse=True)
+        registry = cache.get(PerformanceMonitor.REGISTRY_KEY) or {}
+        return {
+            'workers': len(set(registry) | {PerformanceMonitor.worker_id()}),
+            'routes': routes,
+        }
+    
+    @staticmethod
+    def export_bounds() -> List[float]:
+        """Buckets do /metrics (ms), alinhados aos limites do histograma"""
+        configured = getattr(settings, 'PERFORMANCE_METRICS_BUCKETS', DEFAULT_EXPORT_BUCKETS)
+        return sorted({BOUNDS[min(bucket_index(bound), len(BOUNDS) - 1)] for bound in configured})
+    
+    @staticmethod
+    def prometheus_text() -> str:
+        """Exposição no formato texto do Prometheus (histograma em segundos)"""
+        name = 'syncrh_http_request_duration_seconds'
+        bounds = PerformanceMonitor.export_bounds()
+        lines = [
+            f"# HELP {name} HTTP request latency by resolved route and method.",
+            f"# TYPE {name} histogram",
+        ]
+        for (route, method), histogram in sorted(PerformanceMonitor.aggregate().items()):
+            labels = f'route="{_escape_label(route)}",method="{_escape_label(method)}"'
+            for bound, cumulative in zip(bounds, histogram.cumulative(bounds)):
+                lines.append(f'{name}_bucket{{{labels},le="{bound / 1000:g}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+            lines.append(f'{name}_sum{{{labels}}} {histogram.total / 1000:.6f}')
+            lines.append(f'{name}_count{{{labels}}} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+    
+    @staticmethod
+    def reset() -> None:
+        with PerformanceMonitor._lock:
+            PerformanceMonitor._histograms = {}
+            PerformanceMonitor._last_flush = time.monotonic()
     
     @staticmethod
     def get_db_query_count():
         """Obter número de queries por request"""
+        stats = QueryTracker.current()
+        if stats is not None:
+            return stats.count
         return len(connection.queries)
     
     @staticmethod
     def get_slow_queries(threshold_ms=100):
         """Queries mais lentas"""
+        stats = QueryTracker.current()
+        if stats is not None:
+            return [
+                {'sql': query['sql'][:100], 'time': f"{query['time_ms'] / 1000:.3f}"}
+                for query in stats.slow
+                if query['time_ms'] > threshold_ms
+            ]
         slow_queries = []
         for query in connection.queries:
             if float(query['time']) > (threshold_ms / 1000):
@@ -69,14 +249,14 @@ def monitor_performance(endpoint_name=None):
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
-            start_time = time.time()
+            start_time = time.perf_counter()
             name = endpoint_name or func.__name__
             
             try:
                 result = func(*args, **kwargs)
                 return result
             finally:
-                duration = (time.time() - start_time) * 1000  # ms
+                duration = (time.perf_counter() - start_time) * 1000  # ms
                 PerformanceMonitor.record_api_call(name, duration)
                 
                 # Log se > 500ms
@@ -90,32 +270,45 @@ def monitor_performance(endpoint_name=None):
 
 
 class PerformanceMiddleware:
-    """Middleware para monitorar performance de requests"""
+    """
+    Middleware para monitorar performance de requests
+    
+    Queries contadas via connection.execute_wrapper (apps.core.query_tracker),
+    também com DEBUG=False.
+    """
+    
+    SLOW_REQUEST_MS = 500
     
     def __init__(self, get_response):
         self.get_response = get_response
     
     def __call__(self, request):
-        start_time = time.time()
+        start_time = time.perf_counter()
         
-        response = self.get_response(request)
+        with QueryTracker.track() as stats:
+            response = self.get_response(request)
         
-        duration = (time.time() - start_time) * 1000  # ms
+        duration = (time.perf_counter() - start_time) * 1000  # ms
+        route = route_name(request)
+        slow = duration > self.SLOW_REQUEST_MS
         
         # Adicionar header
         response['X-Response-Time'] = f"{duration:.0f}ms"
         
         # Log lento
-        if duration > 500:
-            queries = len(connection.queries) if settings.DEBUG else 0
+        if slow:
+            top = stats.top(1)
             logger.warning(
-                f"SLOW REQUEST: {request.method} {request.path} "
-                f"- {duration:.0f}ms ({queries} queries)"
+                f"SLOW REQUEST: {request.method} {request.path} ({route}) "
+                f"- {duration:.0f}ms ({stats.count} queries, {stats.total_ms:.0f}ms DB)"
+                + (f" | top: {top[0]['count']}x {top[0]['sql'][:120]}" if top else "")
             )
         
-        # Métricas
-        endpoint = f"{request.method} {request.path[:50]}"
-        PerformanceMonitor.record_api_call(endpoint, duration)
+        # N+1 e ring buffer amostrado
+        QueryTracker.finish(stats, route, request.path, request.method, duration, slow=slow)
+        
+        # Métricas (por rota resolvida, não pelo path)
+        PerformanceMonitor.record_api_call(route, duration, request.method)
         
         return response
 
@@ -0,0 +1,210 @@
+"""
+SyncRH - Instrumentação de SQL
+==============================
+Contagem de queries por requisição que funciona com DEBUG=False
+(connection.queries só é preenchido com DEBUG=True).
+
+O PerformanceMiddleware envolve a requisição em QueryTracker.track():
+um connection.execute_wrapper em cada alias registra, por query,
+fingerprint normalizado e duração no QueryStats da requisição
+(ContextVar - isolado por thread e por task async).
+
+- Fingerprint: literais, números e listas IN viram '?', espaços
+  colapsados - o mesmo SELECT com ids diferentes tem o mesmo fingerprint
+  (cacheado com lru_cache; parâmetros nunca são guardados)
+- N+1: fingerprint repetido >= SQL_N_PLUS_ONE_THRESHOLD vezes na mesma
+  requisição gera um warning com a view de origem
+- Ring buffer amostrado (SQL_RING_BUFFER_SIZE por worker): requisições
+  lentas ou com N+1 sempre entram; as demais com SQL_SAMPLE_RATE.
+  Publicado no cache junto com as métricas (PerformanceMonitor.flush) e
+  lido pela equipe em /api/v1/core/queries/
+"""
+
+import re
+import time
+import random
+import logging
+import threading
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w\"])-?\d+(?:\.\d+)?\b")
+_PLACEHOLDERS = re.compile(r"\(\s*(?:\?|%s)(?:\s*,\s*(?:\?|%s))*\s*\)")
+_SPACES = re.compile(r"\s+")
+
+MAX_FINGERPRINT = 500
+
+
+@lru_cache(maxsize=4096)
+def fingerprint(sql: str) -> str:
+    """SQL normalizado (sem literais) para agrupar queries equivalentes"""
+    normalized = _STRING.sub('?', sql)
+    normalized = _NUMBER.sub('?', normalized)
+    normalized = normalized.replace('%s', '?')
+    normalized = _PLACEHOLDERS.sub('(...)', normalized)
+    return _SPACES.sub(' ', normalized).strip()[:MAX_FINGERPRINT]
+
+
+class QueryStats:
+    """Queries de uma requisição: total, tempo e agregado por fingerprint"""
+
+    __slots__ = ('count', 'total_ms', 'fingerprints', 'slow')
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        # fingerprint -> [count, total_ms]
+        self.fingerprints: Dict[str, List] = {}
+        self.slow: List[Dict] = []
+
+    def record(self, sql: str, duration_ms: float) -> None:
+        self.count += 1
+        self.total_ms += duration_ms
+        key = fingerprint(sql)
+        entry = self.fingerprints.get(key)
+        if entry is None:
+            self.fingerprints[key] = [1, duration_ms]
+        else:
+            entry[0] += 1
+            entry[1] += duration_ms
+        if duration_ms >= QueryTracker.slow_query_ms():
+            self.slow.append({'sql': key, 'time_ms': round(duration_ms, 2)})
+
+    def repeated(self, threshold: int) -> List[Dict]:
+        """Fingerprints executados >= threshold vezes (suspeitos de N+1)"""
+        return sorted(
+            (
+                {'sql': key, 'count': count, 'total_ms': round(total, 2)}
+                for key, (count, total) in self.fingerprints.items()
+                if count >= threshold
+            ),
+            key=lambda row: row['count'],
+            reverse=True,
+        )
+
+    def top(self, limit: int = 5) -> List[Dict]:
+        rows = sorted(self.fingerprints.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return [{'sql': key, 'count': count, 'total_ms': round(total, 2)} for key, (count, total) in rows]
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar('query_stats', default=None)
+
+
+class QueryTracker:
+    """
+    Execute wrapper + ring buffer amostrado
+
+    Uso:
+        with QueryTracker.track() as stats:
+            response = get_response(request)
+        QueryTracker.finish(stats, view, path, method, duration_ms)
+    """
+
+    _recent = deque(maxlen=200)
+    _lock = threading.Lock()
+
+    @staticmethod
+    def enabled() -> bool:
+        return getattr(settings, 'SQL_INSTRUMENTATION_ENABLED', True)
+
+    @staticmethod
+    def slow_query_ms() -> float:
+        return getattr(settings, 'SQL_SLOW_QUERY_MS', 100)
+
+    @staticmethod
+    def n_plus_one_threshold() -> int:
+        return getattr(settings, 'SQL_N_PLUS_ONE_THRESHOLD', 10)
+
+    @staticmethod
+    def sample_rate() -> float:
+        return getattr(settings, 'SQL_SAMPLE_RATE', 0.01)
+
+    @staticmethod
+    def current() -> Optional[QueryStats]:
+        """QueryStats da requisição em andamento (None fora de track())"""
+        return _current.get()
+
+    @staticmethod
+    def _wrapper(execute, sql, params, many, context):
+        stats = _current.get()
+        if stats is None:
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            stats.record(sql, (time.perf_counter() - start) * 1000)
+
+    @staticmethod
+    @contextmanager
+    def track():
+        """Instala o wrapper em todos os aliases durante o bloco"""
+        stats = QueryStats()
+        if not QueryTracker.enabled():
+            yield stats
+            return
+        token = _current.set(stats)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    if QueryTracker._wrapper not in connection.execute_wrappers:
+                        stack.enter_context(connection.execute_wrapper(QueryTracker._wrapper))
+                yield stats
+        finally:
+            _current.reset(token)
+
+    @staticmethod
+    def finish(stats: QueryStats, view: str, path: str, method: str, duration_ms: float,
+               slow: bool = False) -> Optional[Dict]:
+        """Detecta N+1 e registra a requisição no ring buffer (amostrado)"""
+        repeated = stats.repeated(QueryTracker.n_plus_one_threshold())
+        for row in repeated:
+            logger.warning(
+                f"N+1 suspeito em {view} ({method} {path}): "
+                f"{row['count']}x {row['sql'][:200]}"
+            )
+        if not (slow or repeated or stats.slow) and random.random() >= QueryTracker.sample_rate():
+            return None
+        entry = {
+            'timestamp': time.time(),
+            'view': view,
+            'method': method,
+            'path': path[:200],
+            'duration_ms': round(duration_ms, 2),
+            'queries': stats.count,
+            'db_ms': round(stats.total_ms, 2),
+            'n_plus_one': repeated,
+            'slow_queries': stats.slow[:10],
+            'top': stats.top(),
+        }
+        buffer = QueryTracker._buffer()
+        with QueryTracker._lock:
+            buffer.append(entry)
+        return entry
+
+    @staticmethod
+    def _buffer() -> deque:
+        size = getattr(settings, 'SQL_RING_BUFFER_SIZE', 200)
+        if QueryTracker._recent.maxlen != size:
+            with QueryTracker._lock:
+                QueryTracker._recent = deque(QueryTracker._recent, maxlen=size)
+        return QueryTracker._recent
+
+    @staticmethod
+    def recent() -> List[Dict]:
+        with QueryTracker._lock:
+            return list(QueryTracker._recent)
+
+    @staticmethod
+    def reset() -> None:
+        with QueryTracker._lock:
+            QueryTracker._recent.clear()
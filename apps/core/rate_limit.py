@@ -0,0 +1,381 @@
+"""
+SyncRH - Rate Limiting
+======================
+Motor único de rate limiting usado por todos os middlewares
+(apps.core.middleware.RateLimitMiddleware,
+apps.security.zero_trust.middleware.RateLimitMiddleware e a avaliação de
+risco do ZeroTrustMiddleware).
+
+Algoritmo: janela deslizante aproximada (sliding window counter).
+Cada janela fixa tem um contador no cache compartilhado; a estimativa é
+
+    anterior * (1 - decorrido / janela) + atual
+
+O contador é incrementado com cache.incr (atômico no Redis e no LocMem),
+criado com cache.add uma vez por janela - nunca get + set, então acessos
+concorrentes não se perdem e o TTL não é renovado a cada hit.
+
+Custo por requisição (regime estável): 1 round-trip ao cache.
+- Limite mais curto da política: um incr por requisição
+- Limites mais longos (ex.: por hora): contados em memória e enviados
+  com incr(delta) a cada RATE_LIMIT_LOCAL_BATCH do limite, ou quando a
+  estimativa se aproxima do limite
+- Contador da janela anterior: lido uma vez por janela, por processo
+- Pré-filtro local: cliente bloqueado é rejeitado sem tocar no cache
+  até o fim do Retry-After
+
+Políticas (settings):
+- RATE_LIMIT_POLICIES: nome -> [(limite, janela_em_segundos), ...]
+  (tiers 'anonymous', 'authenticated' e, se configurado, 'staff';
+  'default' usa RATE_LIMIT_REQUESTS / RATE_LIMIT_WINDOW)
+- RATE_LIMIT_ROUTES: prefixo de path -> política (maior prefixo vence)
+"""
+
+import math
+import time
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.core.request_context import PrefixMatcher, get_request_context
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLICIES = {
+    'anonymous': [(30, 60), (300, 3600)],
+    'authenticated': [(100, 60), (2000, 3600)],
+    'api': [(60, 60), (1000, 3600)],
+}
+
+DEFAULT_ROUTES = {
+    '/api/': 'api',
+}
+
+
+@dataclass
+class RateLimitResult:
+    """Decisão de rate limiting de uma requisição"""
+    allowed: bool
+    policy: str
+    client_id: str
+    limit: int
+    remaining: int
+    reset: int
+    retry_after: int = 0
+    usage: float = 0.0
+
+
+class _WindowState:
+    """Estado local de um contador (política, cliente, janela)"""
+
+    __slots__ = ('start', 'count', 'previous', 'pending')
+
+    def __init__(self, start: int, previous: Optional[int] = None):
+        self.start = start
+        self.count = 0  # último valor visto no cache compartilhado
+        self.previous = previous  # contador da janela anterior (None = não lido)
+        self.pending = 0  # hits locais ainda não enviados
+
+
+class RateLimiter:
+    """
+    Rate limiter por janela deslizante com contadores atômicos compartilhados
+
+    Uso:
+        result = RateLimiter.check(request)
+        if not result.allowed:
+            ...  # 429 com Retry-After: result.retry_after
+    """
+
+    _windows: 'OrderedDict[Tuple[str, str, int], _WindowState]' = OrderedDict()
+    _blocked: 'OrderedDict[Tuple[str, str], Tuple[float, RateLimitResult]]' = OrderedDict()
+    _lock = threading.Lock()
+    _counters = {'checks': 0, 'denied': 0, 'local_rejects': 0, 'cache_errors': 0}
+    _compiled = (None, None, None)
+
+    @staticmethod
+    def policies() -> Dict[str, List[Tuple[int, int]]]:
+        """Políticas configuradas, mais 'default' (RATE_LIMIT_REQUESTS/WINDOW)"""
+        configured = getattr(settings, 'RATE_LIMIT_POLICIES', DEFAULT_POLICIES)
+        routes = getattr(settings, 'RATE_LIMIT_ROUTES', DEFAULT_ROUTES)
+        cached_policies, cached_routes, compiled = RateLimiter._compiled
+        if cached_policies is configured and cached_routes is routes:
+            return compiled[0]
+
+        policies = {
+            'default': [(
+                getattr(settings, 'RATE_LIMIT_REQUESTS', 100),
+                getattr(settings, 'RATE_LIMIT_WINDOW', 60),
+            )],
+        }
+        for name, limits in configured.items():
+            # Limite mais curto primeiro: é o contado exatamente a cada hit
+            policies[name] = sorted((int(limit), int(window)) for limit, window in limits)
+        ordered_routes = sorted(routes.items(), key=lambda item: len(item[0]), reverse=True)
+        RateLimiter._compiled = (configured, routes, (policies, ordered_routes, PrefixMatcher(routes)))
+        return policies
+
+    @staticmethod
+    def routes() -> List[Tuple[str, str]]:
+        RateLimiter.policies()
+        return RateLimiter._compiled[2][1]
+
+    @staticmethod
+    def route_matcher() -> PrefixMatcher:
+        RateLimiter.policies()
+        return RateLimiter._compiled[2][2]
+
+    @staticmethod
+    def local_batch() -> float:
+        return getattr(settings, 'RATE_LIMIT_LOCAL_BATCH', 0.01)
+
+    @staticmethod
+    def max_local_keys() -> int:
+        return getattr(settings, 'RATE_LIMIT_LOCAL_MAX_KEYS', 10000)
+
+    @staticmethod
+    def client_id(request) -> str:
+        """'user:<id>' para autenticados, 'ip:<ip>' para anônimos"""
+        context = get_request_context(request)
+        if context.is_authenticated:
+            return f'user:{context.user_id}'
+        return f'ip:{context.ip or "unknown"}'
+
+    @staticmethod
+    def client_ip(request) -> str:
+        return get_request_context(request).ip or 'unknown'
+
+    @staticmethod
+    def resolve_policy(path: str, is_authenticated: bool, tier: str = None) -> str:
+        """Política da rota (maior prefixo) ou do tier do cliente"""
+        policy = RateLimiter.route_matcher().match(path)
+        if policy is not None:
+            return policy
+        policies = RateLimiter.policies()
+        if tier in policies:
+            return tier
+        tier = 'authenticated' if is_authenticated else 'anonymous'
+        return tier if tier in policies else 'default'
+
+    @staticmethod
+    def check(request) -> RateLimitResult:
+        """
+        Consome um hit da requisição (uma única vez por requisição)
+
+        O resultado fica em request.rate_limit, então middlewares
+        seguintes (ou o ZeroTrustMiddleware) o reutilizam sem novo hit.
+        """
+        result = getattr(request, 'rate_limit', None)
+        if result is not None:
+            return result
+        context = get_request_context(request)
+        result = RateLimiter.hit(
+            RateLimiter.client_id(request),
+            RateLimiter.resolve_policy(context.path, context.is_authenticated, context.tier),
+        )
+        request.rate_limit = result
+        return result
+
+    @staticmethod
+    def hit(client_id: str, policy: str, now: float = None) -> RateLimitResult:
+        """Registra um hit de client_id na política e decide"""
+        now = time.time() if now is None else now
+        limits = RateLimiter.policies().get(policy) or RateLimiter.policies()['default']
+
+        with RateLimiter._lock:
+            RateLimiter._counters['checks'] += 1
+            blocked = RateLimiter._blocked.get((policy, client_id))
+            if blocked is not None:
+                until, result = blocked
+                if until > now:
+                    RateLimiter._counters['local_rejects'] += 1
+                    return RateLimitResult(
+                        allowed=False, policy=policy, client_id=client_id,
+                        limit=result.limit, remaining=0, reset=result.reset,
+                        retry_after=max(1, math.ceil(until - now)), usage=result.usage,
+                    )
+                del RateLimiter._blocked[(policy, client_id)]
+
+        try:
+            measures = [
+                RateLimiter._count(policy, client_id, index, limit, window, now)
+                for index, (limit, window) in enumerate(limits)
+            ]
+        except Exception as e:
+            # Cache indisponível: fail-open (não derrubar a aplicação)
+            logger.warning(f"Rate limit cache unavailable: {e}")
+            with RateLimiter._lock:
+                RateLimiter._counters['cache_errors'] += 1
+            limit, window = limits[0]
+            return RateLimitResult(True, policy, client_id, limit, limit, window)
+
+        result = RateLimiter._decide(policy, client_id, limits, measures, now)
+        if not result.allowed:
+            with RateLimiter._lock:
+                RateLimiter._counters['denied'] += 1
+                RateLimiter._block((policy, client_id), now + result.retry_after, result, now)
+            logger.warning(f"Rate limit excedido para: {client_id} ({policy})")
+        return result
+
+    @staticmethod
+    def _block(key: Tuple[str, str], until: float, result: RateLimitResult, now: float) -> None:
+        """Registra o bloqueio local (chamar com _lock); expirados saem pela frente"""
+        blocked = RateLimiter._blocked
+        blocked[key] = (until, result)
+        blocked.move_to_end(key)
+        while blocked:
+            oldest_until, _ = next(iter(blocked.values()))
+            if oldest_until > now and len(blocked) <= RateLimiter.max_local_keys():
+                break
+            blocked.popitem(last=False)
+
+    @staticmethod
+    def peek(client_id: str, policy: str, now: float = None) -> RateLimitResult:
+        """
+        Uso atual sem consumir hit
+
+        Usa o estado local quando existe para a janela corrente; caso
+        contrário um único get_many dos contadores.
+        """
+        now = time.time() if now is None else now
+        limits = RateLimiter.policies().get(policy) or RateLimiter.policies()['default']
+        measures = []
+        try:
+            for limit, window in limits:
+                start = int(now // window) * window
+                with RateLimiter._lock:
+                    state = RateLimiter._windows.get((policy, client_id, window))
+                    known = state is not None and state.start == start and state.previous is not None
+                    if known:
+                        measures.append((state.count + state.pending, state.previous, start))
+                        continue
+                current_key = RateLimiter.cache_key(policy, client_id, window, start)
+                previous_key = RateLimiter.cache_key(policy, client_id, window, start - window)
+                values = cache.get_many([current_key, previous_key])
+                measures.append((values.get(current_key, 0), values.get(previous_key, 0), start))
+        except Exception as e:
+            logger.warning(f"Rate limit cache unavailable: {e}")
+            limit, window = limits[0]
+            return RateLimitResult(True, policy, client_id, limit, limit, window)
+
+        result = RateLimiter._decide(policy, client_id, limits, measures, now, pending_hit=1)
+        return result
+
+    @staticmethod
+    def cache_key(policy: str, client_id: str, window: int, start: int) -> str:
+        return f'rl:{policy}:{client_id}:{window}:{start}'
+
+    @staticmethod
+    def _incr(key: str, delta: int, ttl: int) -> int:
+        """Incremento atômico; cria o contador (com TTL) no primeiro hit da janela"""
+        try:
+            return cache.incr(key, delta)
+        except ValueError:
+            if cache.add(key, delta, ttl):
+                return delta
+            # Outro processo criou entre o incr e o add
+            return cache.incr(key, delta)
+
+    @staticmethod
+    def _count(policy: str, client_id: str, index: int, limit: int, window: int, now: float):
+        """Conta o hit num limite e retorna (atual, anterior, início da janela)"""
+        start = int(now // window) * window
+        state_key = (policy, client_id, window)
+        flush = None
+
+        with RateLimiter._lock:
+            state = RateLimiter._windows.get(state_key)
+            if state is None or state.start != start:
+                if state is not None and state.pending:
+                    flush = (state.start, state.pending)
+                state = _WindowState(start)
+                RateLimiter._windows[state_key] = state
+            RateLimiter._windows.move_to_end(state_key)
+            while len(RateLimiter._windows) > RateLimiter.max_local_keys():
+                RateLimiter._windows.popitem(last=False)
+
+            state.pending += 1
+            estimate = state.count + state.pending + (state.previous or 0)
+            # Limite principal: sempre exato. Longos: lote local até
+            # RATE_LIMIT_LOCAL_BATCH do limite ou perto do estouro.
+            send = (
+                index == 0
+                or state.pending >= max(1, int(limit * RateLimiter.local_batch()))
+                or estimate >= limit * 0.9
+            )
+            delta = state.pending if send else 0
+            if send:
+                state.pending = 0
+            need_previous = state.previous is None
+
+        ttl = window * 2
+        if flush is not None:
+            old_start, old_pending = flush
+            RateLimiter._incr(RateLimiter.cache_key(policy, client_id, window, old_start), old_pending, ttl)
+        if delta:
+            count = RateLimiter._incr(RateLimiter.cache_key(policy, client_id, window, start), delta, ttl)
+        if need_previous:
+            previous = cache.get(RateLimiter.cache_key(policy, client_id, window, start - window), 0)
+
+        with RateLimiter._lock:
+            if delta:
+                state.count = max(state.count, count)
+            if need_previous:
+                state.previous = previous
+            return state.count + state.pending, state.previous, start
+
+    @staticmethod
+    def _decide(policy, client_id, limits, measures, now, pending_hit=0) -> RateLimitResult:
+        """Combina as estimativas de todos os limites da política"""
+        allowed = True
+        retry_after = 0
+        usage = 0.0
+        tightest = None  # (remaining, limit, reset)
+
+        for (limit, window), (current, previous, start) in zip(limits, measures):
+            elapsed = now - start
+            estimate = previous * (1 - elapsed / window) + current + pending_hit
+            usage = max(usage, (estimate - pending_hit) / limit if limit else 1.0)
+            remaining = max(0, int(limit - estimate))
+            reset = max(1, math.ceil(start + window - now))
+            if tightest is None or remaining < tightest[0]:
+                tightest = (remaining, limit, reset)
+
+            if estimate > limit:
+                allowed = False
+                if current + pending_hit > limit or not previous:
+                    wait = start + window - now
+                else:
+                    # Quando o peso da janela anterior cair o suficiente
+                    wait = window * (1 - (limit - current - pending_hit) / previous) - elapsed
+                retry_after = max(retry_after, max(1, math.ceil(wait)))
+
+        remaining, limit, reset = tightest
+        return RateLimitResult(
+            allowed=allowed, policy=policy, client_id=client_id, limit=limit,
+            remaining=remaining, reset=reset, retry_after=retry_after, usage=usage,
+        )
+
+    @staticmethod
+    def stats() -> Dict:
+        with RateLimiter._lock:
+            return {
+                **RateLimiter._counters,
+                'tracked_windows': len(RateLimiter._windows),
+                'blocked_clients': len(RateLimiter._blocked),
+            }
+
+    @staticmethod
+    def reset() -> None:
+        """Limpa o estado local (não os contadores compartilhados)"""
+        with RateLimiter._lock:
+            RateLimiter._windows.clear()
+            RateLimiter._blocked.clear()
+            RateLimiter._compiled = (None, None, None)
+            for key in RateLimiter._counters:
+                RateLimiter._counters[key] = 0
@@ -0,0 +1,236 @@
+"""
+SyncRH - Request Context
+========================
+Fatos da requisição derivados uma única vez e compartilhados por toda a
+pilha de middlewares (request.request_context):
+
+- ip / ip_type: primeiro X-Forwarded-For (ou REMOTE_ADDR), classificado
+- fingerprint: SHA-256 dos headers do cliente (calculado na 1ª leitura)
+- sensitivity: sensibilidade da rota via PrefixMatcher pré-compilado
+- user_id / tier / tenant: lidos de request.user no momento do acesso
+  (o contexto pode ser criado antes do AuthenticationMiddleware)
+
+Também centraliza os headers de segurança (apply_security_headers),
+antes escritos por três middlewares.
+
+Benchmark: scripts/benchmark_middleware.py
+"""
+
+import hashlib
+import ipaddress
+import threading
+from functools import cached_property, lru_cache
+from typing import Dict, Iterable, Optional, Union
+
+from django.conf import settings
+
+from apps.security.zero_trust.threat_matcher import classify_ip
+
+# Sensibilidade por prefixo de rota (maior prefixo vence)
+ROUTE_SENSITIVITY = {
+    '/api/lgpd/': 'high',
+    '/api/nist/': 'high',
+    '/api/security/': 'high',
+    '/admin/': 'elevated',
+    '/api/finance/': 'elevated',
+    '/api/hrm/employees/': 'elevated',
+    '/api/users/': 'elevated',
+}
+
+FINGERPRINT_HEADERS = (
+    'HTTP_USER_AGENT',
+    'HTTP_ACCEPT_LANGUAGE',
+    'HTTP_ACCEPT_ENCODING',
+    'HTTP_SEC_CH_UA',
+    'HTTP_SEC_CH_UA_PLATFORM',
+)
+
+
+class PrefixMatcher:
+    """
+    Casamento de prefixos de path pré-compilado (semântica de str.startswith)
+
+    - matches(path): um único path.startswith(tupla) - laço em C
+    - match(path): valor do maior prefixo; um dict.get por comprimento
+      distinto de prefixo (tipicamente 3-5), do maior para o menor,
+      independente do número de prefixos
+    """
+
+    _MISSING = object()
+
+    def __init__(self, prefixes: Union[Dict[str, object], Iterable[str]]):
+        items = dict(prefixes) if isinstance(prefixes, dict) else dict.fromkeys(prefixes, True)
+        self._values = items
+        self._prefixes = tuple(items)
+        self._lengths = sorted({len(prefix) for prefix in items}, reverse=True)
+        self.size = len(items)
+
+    def match(self, path: str, default=None):
+        """Valor do maior prefixo que casa com path (ou default)"""
+        if not path.startswith(self._prefixes):
+            return default
+        values = self._values
+        for length in self._lengths:
+            value = values.get(path[:length], self._MISSING)
+            if value is not self._MISSING:
+                return value
+        return default
+
+    def matches(self, path: str) -> bool:
+        return path.startswith(self._prefixes)
+
+
+_matchers: Dict[int, tuple] = {}
+_matchers_lock = threading.Lock()
+
+
+def prefix_matcher(prefixes) -> PrefixMatcher:
+    """
+    PrefixMatcher compilado (uma vez) para uma lista/dict de prefixos
+
+    Cacheado pela identidade do objeto (ex.: atributo de classe de um
+    middleware); recompila se o conteúdo mudar de tamanho.
+    """
+    cached = _matchers.get(id(prefixes))
+    if cached is not None and cached[0] is prefixes and cached[1].size == len(prefixes):
+        return cached[1]
+    matcher = PrefixMatcher(prefixes)
+    with _matchers_lock:
+        _matchers[id(prefixes)] = (prefixes, matcher)
+    return matcher
+
+
+def valid_ip(value: Optional[str]) -> Optional[str]:
+    """IP normalizado ou None (X-Forwarded-For é texto livre do cliente)"""
+    if not value:
+        return None
+    try:
+        return str(ipaddress.ip_address(value))
+    except ValueError:
+        return None
+
+
+def route_sensitivity() -> Dict[str, str]:
+    return getattr(settings, 'SECURITY_ROUTE_SENSITIVITY', ROUTE_SENSITIVITY)
+
+
+class RequestContext:
+    """Fatos da requisição calculados uma vez (ver get_request_context)"""
+
+    def __init__(self, request):
+        self.request = request
+        self.path = request.path
+        self.method = request.method
+        meta = request.META
+        x_forwarded_for = meta.get('HTTP_X_FORWARDED_FOR')
+        if x_forwarded_for:
+            self.ip = x_forwarded_for.split(',')[0].strip()
+        else:
+            self.ip = meta.get('REMOTE_ADDR')
+        self.user_agent = meta.get('HTTP_USER_AGENT', '')
+        self.is_pwa = meta.get('HTTP_X_PWA', 'false') == 'true'
+
+    @cached_property
+    def ip_type(self) -> str:
+        return classify_ip(self.ip or '')
+
+    @cached_property
+    def fingerprint(self) -> str:
+        meta = self.request.META
+        raw = '|'.join(meta.get(header, '') for header in FINGERPRINT_HEADERS)
+        return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+    @cached_property
+    def sensitivity(self) -> str:
+        return prefix_matcher(route_sensitivity()).match(self.path, 'normal')
+
+    @property
+    def user(self):
+        return getattr(self.request, 'user', None)
+
+    @property
+    def is_authenticated(self) -> bool:
+        user = self.user
+        return user is not None and user.is_authenticated
+
+    @property
+    def user_id(self) -> Optional[int]:
+        return self.user.pk if self.is_authenticated else None
+
+    @property
+    def tier(self) -> str:
+        """'anonymous', 'authenticated' ou 'staff'"""
+        if not self.is_authenticated:
+            return 'anonymous'
+        return 'staff' if getattr(self.user, 'is_staff', False) else 'authenticated'
+
+    @property
+    def tenant(self) -> Optional[int]:
+        """Empresa do usuário (ou request.tenant do roteamento por domínio)"""
+        if self.is_authenticated:
+            company_id = getattr(self.user, 'company_id', None)
+            if company_id is not None:
+                return company_id
+        tenant = getattr(self.request, 'tenant', None)
+        return getattr(tenant, 'pk', None)
+
+
+def get_request_context(request) -> RequestContext:
+    """request.request_context, criado na primeira chamada"""
+    context = getattr(request, 'request_context', None)
+    if context is None:
+        context = RequestContext(request)
+        request.request_context = context
+    return context
+
+
+@lru_cache(maxsize=2)
+def _security_headers(debug: bool) -> Dict[str, str]:
+    headers = {
+        'X-Content-Type-Options': 'nosniff',
+        'X-Frame-Options': 'DENY',
+        'X-XSS-Protection': '1; mode=block',
+        'Referrer-Policy': 'strict-origin-when-cross-origin',
+        'Permissions-Policy': (
+            'accelerometer=(), camera=(), geolocation=(), '
+            'gyroscope=(), magnetometer=(), microphone=(), '
+            'payment=(), usb=()'
+        ),
+    }
+    # HSTS - força HTTPS (apenas em produção)
+    if not debug:
+        headers['Strict-Transport-Security'] = 'max-age=31536000; includeSubDomains'
+    return headers
+
+
+def apply_security_headers(response, extra: Optional[Dict[str, str]] = None):
+    """
+    Escreve os headers de segurança padrão uma vez por resposta
+
+    extra é sempre aplicado (valores específicos de um middleware, ex.:
+    X-Request-ID, CSP do PWA).
+    """
+    if not getattr(response, '_security_headers_applied', False):
+        for header, value in _security_headers(settings.DEBUG).items():
+            response[header] = value
+        response._security_headers_applied = True
+    if extra:
+        for header, value in extra.items():
+            response[header] = value
+    return response
+
+
+class RequestContextMiddleware:
+    """
+    Cria o RequestContext no início da pilha
+
+    Opcional: get_request_context() o cria sob demanda; colocar este
+    middleware no topo apenas garante que todos leiam o mesmo objeto.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        get_request_context(request)
+        return self.get_response(request)
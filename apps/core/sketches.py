@@ -0,0 +1,128 @@
+"""
+SyncRH - Sketches de Streaming
+==============================
+Estruturas de memória fixa para resumir fluxos de eventos.
+
+- TopK: heavy hitters pelo algoritmo Space-Saving (Metwally et al.) -
+  no máximo `capacity` chaves; cada contagem guarda o erro máximo
+  herdado da chave despejada, então count - error é um limite inferior
+  garantido da frequência real
+- HyperLogLog: contagem aproximada de distintos com 2^p registradores
+  de um byte (p=10: 1 KB, erro padrão ~3.2%)
+
+Ambas são mergeable e serializáveis em JSON (para JSONField/cache).
+"""
+
+import base64
+import hashlib
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class TopK:
+    """Space-Saving: {chave: [contagem, erro]} com no máximo capacity chaves"""
+
+    __slots__ = ('capacity', 'counters')
+
+    def __init__(self, capacity: int = 32, counters: Optional[Dict[str, List[int]]] = None):
+        self.capacity = capacity
+        self.counters: Dict[str, List[int]] = counters if counters is not None else {}
+
+    def add(self, key: str, weight: int = 1) -> None:
+        counter = self.counters.get(key)
+        if counter is not None:
+            counter[0] += weight
+            return
+        if len(self.counters) < self.capacity:
+            self.counters[key] = [weight, 0]
+            return
+        victim = min(self.counters, key=lambda k: self.counters[k][0])
+        floor = self.counters.pop(victim)[0]
+        self.counters[key] = [floor + weight, floor]
+
+    def update(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self.add(key)
+
+    def __contains__(self, key) -> bool:
+        return key in self.counters
+
+    def __len__(self) -> int:
+        return len(self.counters)
+
+    def guaranteed(self, key) -> int:
+        """Limite inferior da frequência de key (0 se não monitorada)"""
+        counter = self.counters.get(key)
+        return counter[0] - counter[1] if counter else 0
+
+    def top(self, n: Optional[int] = None) -> List[Tuple[str, int]]:
+        items = sorted(self.counters.items(), key=lambda item: -item[1][0])
+        return [(key, counter[0]) for key, counter in items[:n]]
+
+    def merge(self, other: 'TopK') -> 'TopK':
+        """Soma as contagens e mantém as capacity maiores"""
+        merged: Dict[str, List[int]] = {key: list(counter) for key, counter in self.counters.items()}
+        for key, (count, error) in other.counters.items():
+            counter = merged.setdefault(key, [0, 0])
+            counter[0] += count
+            counter[1] += error
+        kept = sorted(merged.items(), key=lambda item: -item[1][0])[:self.capacity]
+        self.counters = dict(kept)
+        return self
+
+    def to_dict(self) -> Dict[str, List[int]]:
+        return self.counters
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict], capacity: int = 32) -> 'TopK':
+        counters = {key: [int(value[0]), int(value[1])] for key, value in (data or {}).items()}
+        return cls(capacity, counters)
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+
+class HyperLogLog:
+    """Contador de distintos com 2^precision registradores"""
+
+    __slots__ = ('precision', 'registers')
+
+    def __init__(self, precision: int = 10, registers: Optional[bytearray] = None):
+        self.precision = precision
+        self.registers = registers if registers is not None else bytearray(1 << precision)
+
+    def add(self, value: str) -> None:
+        hashed = _hash64(value)
+        index = hashed >> (64 - self.precision)
+        rest = hashed & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values: Iterable[str]) -> None:
+        for value in values:
+            self.add(value)
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def merge(self, other: 'HyperLogLog') -> 'HyperLogLog':
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def to_dict(self) -> str:
+        return base64.b64encode(bytes(self.registers)).decode('ascii')
+
+    @classmethod
+    def from_dict(cls, data: Optional[str], precision: int = 10) -> 'HyperLogLog':
+        if not data:
+            return cls(precision)
+        registers = bytearray(base64.b64decode(data))
+        return cls(len(registers).bit_length() - 1, registers)
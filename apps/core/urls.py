@@ -1,9 +1,15 @@
 """Core app URLs."""
 from django.urls import path
 
+from apps.core.metrics import metrics_summary, query_samples
+
 app_name = "core"
 
 urlpatterns = [
+    # Resumo de latência por rota (staff)
+    path('metrics/', metrics_summary, name='metrics-summary'),
+    # Amostras de SQL por requisição (N+1, requisições lentas)
+    path('queries/', query_samples, name='query-samples'),
     # Placeholder for future core endpoints
     # path('users/', UsuárioListView.as_view(), name='user-list'),
     # path('companies/', EmpresaListView.as_view(), name='company-list'),
@@ -0,0 +1,353 @@
+"""
+SyncRH - Write-Behind Buffer
+============================
+Fila em memória, limitada, drenada por uma thread em background que
+grava em lotes (bulk_create) - telemetria sem custo de latência na
+requisição.
+
+- Flush por tamanho (batch_size) ou tempo (flush_interval)
+- Backpressure: acima de high_water itens não críticos são descartados
+  (shed); críticos esperam até put_timeout por espaço antes do descarte
+- Falha na gravação: novas tentativas com backoff; o banco lento enche
+  a fila, que por sua vez aciona o descarte acima
+- Lote que continua falhando é bisseccionado: os itens bons são gravados
+  e os que o banco rejeita sozinhos vão para quarentena (nunca
+  regravados); se nenhum item passa, o banco está fora e o lote inteiro
+  segue para o spill
+- Spill-to-disk opcional (spill_dir): lotes que esgotaram as tentativas
+  e itens críticos sem espaço na fila vão para JSON Lines em disco e são
+  regravados pela thread quando o banco volta
+- Thread recriada após fork (workers gunicorn/celery) e flush no atexit
+"""
+
+import os
+import glob
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from django.db import DataError, IntegrityError, InterfaceError, OperationalError, close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# Erros do próprio item: não passam com nova tentativa
+POISON_ERRORS = (DataError, IntegrityError, TypeError, ValueError, KeyError)
+
+# Banco fora/conexão perdida: bissecção não ajuda
+UNAVAILABLE_ERRORS = (OperationalError, InterfaceError)
+
+
+class BatchWriter:
+    """
+    Buffer write-behind genérico
+
+    Uso:
+        writer = BatchWriter('access_context', lambda rows: Model.objects.bulk_create(rows))
+        writer.submit(row)                  # não bloqueia
+        writer.submit(row, critical=True)   # espera até put_timeout se cheia
+    """
+
+    def __init__(
+        self,
+        name: str,
+        write: Callable[[List], None],
+        max_queue: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        high_water: float = 0.8,
+        put_timeout: float = 0.05,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        background: bool = True,
+        spill_dir: Optional[str] = None,
+        replay_interval: float = 30.0,
+    ):
+        self.name = name
+        self.write = write
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.high_water = int(max_queue * high_water)
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.background = background  # False: só flush() grava (testes)
+        self.spill_dir = str(spill_dir) if spill_dir else None
+        self.replay_interval = replay_interval
+        self._replayed_at = 0.0
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pid = None
+        self._stopping = threading.Event()
+        self._atexit = False
+        self._counters = {
+            'submitted': 0, 'written': 0, 'batches': 0,
+            'shed': 0, 'dropped': 0, 'failed': 0, 'retries': 0,
+            'spilled': 0, 'replayed': 0, 'quarantined': 0,
+        }
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[counter] += amount
+
+    def submit(self, item, critical: bool = False) -> bool:
+        """Enfileira item; False se descartado por backpressure"""
+        self._ensure_worker()
+        if not critical and self._queue.qsize() >= self.high_water:
+            self._count('shed')
+            return False
+        try:
+            if critical:
+                self._queue.put(item, timeout=self.put_timeout)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            if critical and self.spill([item]):
+                return True
+            self._count('dropped')
+            return False
+        self._count('submitted')
+        return True
+
+    def _ensure_worker(self) -> None:
+        """Inicia a thread (ou a recria no processo filho após fork)"""
+        if not self.background or (self._worker is not None and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._worker is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stopping.clear()
+            self._worker = threading.Thread(
+                target=self._run, name=f'write-behind-{self.name}', daemon=True
+            )
+            self._worker.start()
+            if not self._atexit:
+                atexit.register(self.stop)
+                self._atexit = True
+
+    def _drain(self, block: bool) -> List:
+        """Até batch_size itens, esperando no máximo flush_interval pelo lote"""
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval) if block else self._queue.get_nowait())
+        except queue.Empty:
+            return batch
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if block and remaining > 0:
+                    batch.append(self._queue.get(timeout=remaining))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            batch = self._drain(block=True)
+            if batch:
+                # Conexão própria da thread: descarta se caiu/expirou
+                close_old_connections()
+                if self._write_batch(batch):
+                    self._maybe_replay()
+
+    def _write_batch(self, batch: List) -> int:
+        """Grava o lote; devolve quantos itens foram gravados"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                self.write(batch)
+                with self._lock:
+                    self._counters['written'] += len(batch)
+                    self._counters['batches'] += 1
+                return len(batch)
+            except Exception as e:
+                if isinstance(e, POISON_ERRORS) or attempt >= self.max_retries:
+                    error = e
+                    break
+                self._count('retries')
+                time.sleep(self.backoff * (2 ** attempt))
+
+        poisoned = isinstance(error, POISON_ERRORS)
+        if isinstance(error, UNAVAILABLE_ERRORS) or (len(batch) == 1 and not poisoned):
+            written, pending = 0, batch
+        elif len(batch) == 1:
+            # Nada a bisseccionar: o erro já indica o item
+            self.quarantine(batch)
+            written, pending = 0, []
+        else:
+            written, pending = self._settle(batch)
+            if written:
+                with self._lock:
+                    self._counters['written'] += written
+                    self._counters['batches'] += 1
+        if pending:
+            logger.error(f"✗ Write-behind '{self.name}': lote de {len(pending)} não gravado: {error}")
+            self.on_failure(pending)
+        return written
+
+    def _isolate(self, items: List) -> Tuple[int, List, List]:
+        """Bissecção: (gravados, rejeitados pelo banco, falhas indeterminadas)"""
+        try:
+            self.write(items)
+            return len(items), [], []
+        except UNAVAILABLE_ERRORS:
+            return 0, [], items
+        except Exception as e:
+            if len(items) == 1:
+                return (0, items, []) if isinstance(e, POISON_ERRORS) else (0, [], items)
+        middle = len(items) // 2
+        left, right = self._isolate(items[:middle]), self._isolate(items[middle:])
+        return left[0] + right[0], left[1] + right[1], left[2] + right[2]
+
+    def _settle(self, batch: List) -> Tuple[int, List]:
+        """
+        Grava o que der do lote e põe em quarentena os itens rejeitados
+
+        Devolve (gravados, pendentes). Pendentes só existem quando nenhum
+        item passou (banco fora): quem chama decide entre spill e descarte.
+        """
+        written, rejected, unknown = self._isolate(batch)
+        if written:
+            # O banco respondeu aos vizinhos: o problema é do item
+            rejected, unknown = rejected + unknown, []
+        if rejected:
+            self.quarantine(rejected)
+        return written, unknown
+
+    def on_failure(self, batch: List) -> None:
+        """Lote que esgotou as tentativas: disco (se configurado) ou descarte"""
+        if not self.spill(batch):
+            self._count('failed', len(batch))
+
+    # ------------------------------------------------------------------
+    # Spill-to-disk
+    # ------------------------------------------------------------------
+
+    def _spill_file(self, directory: Optional[str] = None) -> str:
+        # Um arquivo por processo: appends nunca se intercalam
+        return os.path.join(directory or self.spill_dir, f'{self.name}-{os.getpid()}.jsonl')
+
+    def _append(self, path: str, items: List, counter: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        lines = ''.join(json.dumps(item, separators=(',', ':'), default=str) + '\n' for item in items)
+        with self._lock:
+            with open(path, 'a', encoding='utf-8') as handle:
+                handle.write(lines)
+                handle.flush()
+                os.fsync(handle.fileno())
+            self._counters[counter] += len(items)
+
+    def spill(self, items: List) -> bool:
+        """Anexa itens (JSON, um por linha) ao arquivo de spill do processo"""
+        if not self.spill_dir or not items:
+            return False
+        try:
+            self._append(self._spill_file(), items, 'spilled')
+            logger.warning(f"Write-behind '{self.name}': {len(items)} itens em disco ({self.spill_dir})")
+            return True
+        except (OSError, TypeError, ValueError) as e:
+            logger.error(f"✗ Write-behind '{self.name}': spill falhou: {e}")
+            return False
+
+    def quarantine(self, items: List) -> None:
+        """
+        Itens que o banco rejeita isoladamente
+
+        Vão para <spill_dir>/quarantine (fora do replay) para inspeção
+        manual; sem spill_dir ficam só no log.
+        """
+        logger.error(f"✗ Write-behind '{self.name}': {len(items)} itens em quarentena")
+        if self.spill_dir:
+            try:
+                self._append(self._spill_file(os.path.join(self.spill_dir, 'quarantine')), items, 'quarantined')
+                return
+            except (OSError, TypeError, ValueError) as e:
+                logger.error(f"✗ Write-behind '{self.name}': quarentena em disco falhou: {e}")
+        for item in items:
+            logger.error(f"Write-behind '{self.name}': item descartado: {item!r:.500}")
+        self._count('quarantined', len(items))
+
+    def _maybe_replay(self) -> None:
+        if self.spill_dir and time.monotonic() - self._replayed_at >= self.replay_interval:
+            self._replayed_at = time.monotonic()
+            self.replay()
+
+    def replay(self) -> int:
+        """
+        Regrava os arquivos de spill (de qualquer processo) em lotes
+
+        O arquivo é renomeado antes da leitura, então só um processo o
+        processa. Itens rejeitados vão para quarentena e o replay segue;
+        só com o banco fora o restante volta para o spill deste processo.
+        """
+        if not self.spill_dir:
+            return 0
+        replayed = 0
+        pattern = os.path.join(self.spill_dir, f'{self.name}-*')
+        for path in sorted(glob.glob(pattern)):
+            if path.endswith('.jsonl'):
+                claimed = f'{path}.{os.getpid()}.replay'
+            elif path.endswith('.replay') and self._is_orphan(path):
+                # Processo morreu no meio do replay: entrega at-least-once
+                claimed = f'{path.rsplit(".", 2)[0]}.{os.getpid()}.replay'
+            else:
+                continue
+            try:
+                os.rename(path, claimed)
+            except OSError:
+                continue  # outro processo pegou
+            with open(claimed, encoding='utf-8') as handle:
+                items = [json.loads(line) for line in handle if line.strip()]
+            for start in range(0, len(items), self.batch_size):
+                batch = items[start:start + self.batch_size]
+                written, pending = self._settle(batch)
+                replayed += written
+                self._count('replayed', written)
+                if pending:
+                    logger.warning(f"Write-behind '{self.name}': replay interrompido (banco indisponível)")
+                    if self.spill(pending + items[start + len(batch):]):
+                        os.remove(claimed)
+                    return replayed
+            os.remove(claimed)
+        return replayed
+
+    @staticmethod
+    def _is_orphan(path: str) -> bool:
+        """'.replay' de um processo que morreu no meio do replay"""
+        try:
+            pid = int(path.rsplit('.', 2)[-2])
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        except (ValueError, IndexError, OSError):
+            return False
+        return False
+
+    def flush(self) -> int:
+        """Grava tudo que está na fila (síncrono; shutdown e testes)"""
+        written = 0
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                return written
+            written += self._write_batch(batch)
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Para a thread e grava o que restou"""
+        self._stopping.set()
+        worker = self._worker
+        if worker is not None and worker.is_alive() and worker is not threading.current_thread():
+            worker.join(timeout)
+        self._worker = None
+        self.flush()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**self._counters, 'queued': self._queue.qsize()}
@@ -308,8 +308,9 @@ class ContadorAdmin(admin.ModelAdmin):
 
 @admin.register(ExportacaoContabil)
 class ExportacaoContabilAdmin(admin.ModelAdmin):
-    list_display = ['contador', 'competencia', 'tipo', 'formato', 'status_badge', 'baixado_em']
+    list_display = ['contador', 'competencia', 'tipo', 'formato', 'status_badge', 'progresso', 'baixado_em']
     list_filter = ['status', 'tipo', 'formato']
+    readonly_fields = ['total_linhas', 'linhas_processadas', 'baixado_em', 'erro_mensagem']
     
     def status_badge(self, obj):
         colors = {
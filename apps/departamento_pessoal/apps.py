@@ -5,3 +5,6 @@ class DepartamentoPessoalConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.departamento_pessoal'
     verbose_name = 'Departamento Pessoal'
+    
+    def ready(self):
+        from . import signals  # noqa: F401
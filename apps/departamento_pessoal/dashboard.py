@@ -0,0 +1,92 @@
+"""
+SyncRH - Departamento Pessoal - Dashboard
+=========================================
+
+Métricas do dashboard de DP com duas queries e cache por tenant.
+
+- Contagens (ativos, admissões/demissões do mês, férias pendentes): um
+  aggregate condicional sobre Colaborador; férias entram por LEFT JOIN
+  filtrado (só solicitações pendentes) e os colaboradores são contados
+  com DISTINCT
+- Faixas de data (data__gte/data__lt) no lugar de __month/__year, que
+  impedem o uso de índice
+- Aniversariantes: filtro por ExtractMonth(data_nascimento), a mesma
+  expressão do índice dp_colab_aniversario_idx
+- Cache por tenant (schema do django-tenants ou 'public'), invalidado
+  pelos signals de Colaborador/SolicitacaoFerias com um stamp de versão
+  e expirado por DP_DASHBOARD_CACHE_TTL (virada do dia, gravações em lote)
+"""
+
+import time
+from datetime import date
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, FilteredRelation, Q
+from django.db.models.functions import ExtractDay, ExtractMonth
+from django.utils import timezone
+
+from .models import Colaborador
+from .timesheet import proxima_competencia
+
+MAX_ANIVERSARIANTES = 10
+
+
+def tenant_atual() -> str:
+    return str(getattr(connection, 'schema_name', None) or 'public')
+
+
+def _chave_versao(tenant: str) -> str:
+    return f'dp:dashboard:{tenant}:versao'
+
+
+def calcular_metricas(hoje: date) -> Dict:
+    """Métricas do dia (2 queries)"""
+    inicio = hoje.replace(day=1)
+    fim = proxima_competencia(inicio)
+
+    contagens = Colaborador.objects.annotate(
+        ferias_pendentes_rel=FilteredRelation(
+            'solicitacoes_ferias', condition=Q(solicitacoes_ferias__status='pendente')
+        )
+    ).aggregate(
+        total_colaboradores=Count('id', distinct=True, filter=Q(is_active=True, data_demissao__isnull=True)),
+        admissoes_mes=Count('id', distinct=True, filter=Q(data_admissao__gte=inicio, data_admissao__lt=fim)),
+        demissoes_mes=Count('id', distinct=True, filter=Q(data_demissao__gte=inicio, data_demissao__lt=fim)),
+        ferias_pendentes=Count('ferias_pendentes_rel'),
+    )
+
+    aniversariantes = Colaborador.objects.annotate(
+        mes_nascimento=ExtractMonth('data_nascimento'),
+        dia_nascimento=ExtractDay('data_nascimento'),
+    ).filter(is_active=True, mes_nascimento=hoje.month).order_by(
+        'dia_nascimento', 'nome_completo'
+    ).values('nome_completo', 'data_nascimento')[:MAX_ANIVERSARIANTES]
+
+    return {
+        **contagens,
+        'aniversariantes': list(aniversariantes),
+        'data_referencia': hoje,
+        'data_atualizacao': timezone.now(),
+    }
+
+
+def metricas_dashboard(hoje: Optional[date] = None) -> Dict:
+    """Métricas do tenant atual (cache; recalcula após invalidação ou virada do dia)"""
+    hoje = hoje or timezone.localdate()
+    tenant = tenant_atual()
+    versao = cache.get(_chave_versao(tenant), 0)
+    key = f'dp:dashboard:{tenant}:{versao}:{hoje.isoformat()}'
+
+    metricas = cache.get(key)
+    if metricas is None:
+        metricas = calcular_metricas(hoje)
+        cache.set(key, metricas, getattr(settings, 'DP_DASHBOARD_CACHE_TTL', 300))
+    return metricas
+
+
+def invalidar_dashboard(tenant: Optional[str] = None) -> None:
+    """Novo stamp de versão: entradas anteriores deixam de ser lidas"""
+    cache.set(_chave_versao(tenant or tenant_atual()), time.time_ns(), None)
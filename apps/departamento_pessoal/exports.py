@@ -0,0 +1,420 @@
+"""
+SyncRH - Departamento Pessoal - Exportação Contábil
+===================================================
+
+Gerador das ExportacaoContabil (folha, ponto, férias, admissões,
+demissões e pacote completo) em memória constante.
+
+- Escopo: só colaboradores da empresa do contador (user.company_id,
+  como payroll.colaboradores_da_competencia); contador sem empresa não
+  exporta
+- Leitura: values_list(...).iterator(chunk_size=DP_EXPORT_CHUNK_SIZE) -
+  cursor do lado do servidor no PostgreSQL, sem instâncias de modelo
+- Escrita incremental num arquivo temporário em disco: CSV/TXT
+  (csv.writer), XLSX (openpyxl em modo write_only) e XML (XMLGenerator);
+  o storage de `arquivo` copia o temporário em blocos
+- Progresso em total_linhas/linhas_processadas (um UPDATE a cada
+  DP_EXPORT_PROGRESS_INTERVAL linhas)
+- Geração no worker Celery (gerar_exportacao_task); sem Celery, numa
+  thread. Exportação em 'gerando' sem progresso há mais de
+  DP_EXPORT_STALE_SECONDS (worker reiniciado) é reagendada
+- Download por FileResponse (streaming em blocos de
+  DP_EXPORT_DOWNLOAD_BLOCK_SIZE)
+
+PDF e eSocial não têm gerador aqui: a exportação é recusada na criação.
+"""
+
+import csv
+import io
+import logging
+import os
+import tempfile
+import threading
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import XMLGenerator
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.db import connections, transaction
+from django.db.models import QuerySet
+from django.http import FileResponse
+from django.utils import timezone
+
+from .models import Colaborador, ExportacaoContabil, FolhaPagamento, RegistroPonto, SolicitacaoFerias
+from .timesheet import proxima_competencia
+
+try:
+    from openpyxl import Workbook
+except ImportError:
+    # openpyxl opcional (formato xlsx indisponível sem ele)
+    Workbook = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Secao:
+    """Bloco de uma exportação: consulta do mês na empresa + colunas (lookup, nome)"""
+    nome: str
+    titulo: str
+    consulta: Callable[[date, int], QuerySet]
+    campos: Tuple[Tuple[str, str], ...]
+
+    @property
+    def colunas(self) -> List[str]:
+        return [coluna for _, coluna in self.campos]
+
+    def linhas(self, competencia: date, empresa_id: int, chunk_size: int) -> Iterator[tuple]:
+        return self.consulta(competencia, empresa_id).values_list(
+            *(lookup for lookup, _ in self.campos)
+        ).iterator(chunk_size=chunk_size)
+
+
+def _no_mes(campo: str, competencia: date) -> dict:
+    return {f'{campo}__gte': competencia, f'{campo}__lt': proxima_competencia(competencia)}
+
+
+COLABORADOR = (('colaborador__cpf', 'cpf'), ('colaborador__nome_completo', 'nome'))
+
+SECOES = {
+    'folha': Secao(
+        'folha', 'Folha de Pagamento',
+        lambda competencia, empresa_id: FolhaPagamento.objects.filter(
+            competencia=competencia, is_active=True, colaborador__user__company_id=empresa_id
+        ).order_by('id'),
+        COLABORADOR + (
+            ('colaborador__departamento__nome', 'departamento'), ('salario_base', 'salario_base'),
+            ('horas_extras', 'horas_extras'), ('total_proventos', 'total_proventos'), ('inss', 'inss'),
+            ('irrf', 'irrf'), ('total_descontos', 'total_descontos'), ('salario_liquido', 'salario_liquido'),
+            ('status', 'status'),
+        ),
+    ),
+    'ponto': Secao(
+        'ponto', 'Relatório de Ponto',
+        # colaborador + data: índice único, sem sort em memória no banco
+        lambda competencia, empresa_id: RegistroPonto.objects.filter(
+            is_active=True, colaborador__user__company_id=empresa_id, **_no_mes('data', competencia)
+        ).order_by('colaborador_id', 'data'),
+        COLABORADOR + (
+            ('data', 'data'), ('entrada', 'entrada'), ('saida_almoco', 'saida_almoco'),
+            ('retorno_almoco', 'retorno_almoco'), ('saida', 'saida'),
+            ('minutos_trabalhados', 'minutos_trabalhados'), ('minutos_extras', 'minutos_extras'),
+            ('minutos_faltantes', 'minutos_faltantes'), ('status', 'status'),
+        ),
+    ),
+    'ferias': Secao(
+        'ferias', 'Relatório de Férias',
+        lambda competencia, empresa_id: SolicitacaoFerias.objects.filter(
+            is_active=True, colaborador__user__company_id=empresa_id,
+            data_inicio__lt=proxima_competencia(competencia), data_fim__gte=competencia
+        ).order_by('data_inicio', 'id'),
+        COLABORADOR + (
+            ('data_inicio', 'data_inicio'), ('data_fim', 'data_fim'), ('dias_solicitados', 'dias'),
+            ('vender_dias', 'dias_abono'), ('valor_abono', 'valor_abono'), ('status', 'status'),
+        ),
+    ),
+    'admissoes': Secao(
+        'admissoes', 'Admissões',
+        lambda competencia, empresa_id: Colaborador.objects.filter(
+            user__company_id=empresa_id, **_no_mes('data_admissao', competencia)
+        ).order_by('data_admissao', 'id'),
+        (
+            ('cpf', 'cpf'), ('nome_completo', 'nome'), ('data_admissao', 'data_admissao'),
+            ('cargo__nome', 'cargo'), ('cargo__cbo', 'cbo'), ('departamento__nome', 'departamento'),
+        ),
+    ),
+    'demissoes': Secao(
+        'demissoes', 'Demissões',
+        lambda competencia, empresa_id: Colaborador.objects.filter(
+            user__company_id=empresa_id, **_no_mes('data_demissao', competencia)
+        ).order_by('data_demissao', 'id'),
+        (
+            ('cpf', 'cpf'), ('nome_completo', 'nome'), ('data_admissao', 'data_admissao'),
+            ('data_demissao', 'data_demissao'), ('cargo__nome', 'cargo'), ('departamento__nome', 'departamento'),
+        ),
+    ),
+}
+
+PACOTES = {'completo': ('folha', 'ponto', 'ferias', 'admissoes', 'demissoes')}
+
+# Formatos com mais de uma seção por arquivo (abas / elementos <secao>)
+FORMATOS_MULTISECAO = frozenset({'xlsx', 'xml'})
+
+
+def secoes_da_exportacao(tipo: str, formato: str) -> List[Secao]:
+    """
+    Seções a gerar para tipo/formato
+
+    Raises:
+        ValidationError: combinação sem gerador
+    """
+    if formato not in ESCRITORES:
+        raise ValidationError(f'Formato {formato} não suportado na exportação contábil.')
+    if formato == 'xlsx' and Workbook is None:
+        raise ValidationError('Exportação em xlsx indisponível (openpyxl não instalado).')
+    if tipo in PACOTES:
+        if formato not in FORMATOS_MULTISECAO:
+            raise ValidationError('Pacote completo disponível apenas em xlsx ou xml.')
+        return [SECOES[nome] for nome in PACOTES[tipo]]
+    if tipo not in SECOES:
+        raise ValidationError(f'Tipo {tipo} não suportado na exportação contábil.')
+    return [SECOES[tipo]]
+
+
+# ===== Escritores =====
+
+def _texto(valor) -> str:
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return timezone.localtime(valor).strftime('%Y-%m-%d %H:%M') if timezone.is_aware(valor) else valor.isoformat()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return str(valor)
+
+
+class EscritorCSV:
+    """CSV com ';' (padrão do Excel pt-BR); BOM para acentuação correta"""
+
+    delimitador = ';'
+
+    def __init__(self, arquivo, exportacao):
+        self._texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+        self._csv = csv.writer(self._texto, delimiter=self.delimitador)
+
+    def secao(self, secao: Secao) -> None:
+        self._csv.writerow(secao.colunas)
+
+    def linha(self, valores: Sequence) -> None:
+        self._csv.writerow([_texto(valor) for valor in valores])
+
+    def fechar(self) -> None:
+        self._texto.flush()
+        self._texto.detach()
+
+
+class EscritorTXT(EscritorCSV):
+    """Texto delimitado por tabulação"""
+
+    delimitador = '\t'
+
+
+class EscritorXLSX:
+    """openpyxl write_only: linhas vão direto para o XML da aba"""
+
+    def __init__(self, arquivo, exportacao):
+        self._arquivo = arquivo
+        self._livro = Workbook(write_only=True)
+        self._aba = None
+
+    def secao(self, secao: Secao) -> None:
+        self._aba = self._livro.create_sheet(secao.titulo[:31])
+        self._aba.append(secao.colunas)
+
+    def linha(self, valores: Sequence) -> None:
+        # Excel não aceita datetime com fuso
+        self._aba.append([
+            timezone.localtime(valor).replace(tzinfo=None)
+            if isinstance(valor, datetime) and timezone.is_aware(valor) else valor
+            for valor in valores
+        ])
+
+    def fechar(self) -> None:
+        self._livro.save(self._arquivo)
+
+
+class EscritorXML:
+    """<exportacao><secao tipo=..><registro><campo>..</campo></registro></secao></exportacao>"""
+
+    def __init__(self, arquivo, exportacao):
+        self._texto = io.TextIOWrapper(arquivo, encoding='utf-8')
+        self._xml = XMLGenerator(self._texto, encoding='utf-8', short_empty_elements=True)
+        self._colunas: List[str] = []
+        self._aberta = False
+        self._xml.startDocument()
+        self._xml.startElement('exportacao', {
+            'tipo': exportacao.tipo, 'competencia': exportacao.competencia.strftime('%Y-%m'),
+        })
+
+    def secao(self, secao: Secao) -> None:
+        if self._aberta:
+            self._xml.endElement('secao')
+        self._xml.ignorableWhitespace('\n')
+        self._xml.startElement('secao', {'tipo': secao.nome})
+        self._colunas = secao.colunas
+        self._aberta = True
+
+    def linha(self, valores: Sequence) -> None:
+        self._xml.ignorableWhitespace('\n')
+        self._xml.startElement('registro', {})
+        for coluna, valor in zip(self._colunas, valores):
+            if valor is not None:
+                self._xml.startElement(coluna, {})
+                self._xml.characters(_texto(valor))
+                self._xml.endElement(coluna)
+        self._xml.endElement('registro')
+
+    def fechar(self) -> None:
+        if self._aberta:
+            self._xml.endElement('secao')
+        self._xml.ignorableWhitespace('\n')
+        self._xml.endElement('exportacao')
+        self._xml.endDocument()
+        self._texto.flush()
+        self._texto.detach()
+
+
+ESCRITORES = {'csv': EscritorCSV, 'txt': EscritorTXT, 'xlsx': EscritorXLSX, 'xml': EscritorXML}
+
+
+# ===== Geração =====
+
+def nome_arquivo(exportacao: ExportacaoContabil) -> str:
+    return f'{exportacao.tipo}_{exportacao.competencia:%Y_%m}_{exportacao.pk}.{exportacao.formato}'
+
+
+def _atualizar(exportacao: ExportacaoContabil, **campos) -> None:
+    """UPDATE só dos campos informados (não sobrescreve o resto da linha)"""
+    for campo, valor in campos.items():
+        setattr(exportacao, campo, valor)
+    ExportacaoContabil.objects.filter(pk=exportacao.pk).update(updated_at=timezone.now(), **campos)
+
+
+def empresa_do_contador(contador) -> Optional[int]:
+    """Empresa cujos dados o contador pode exportar (None: nenhuma)"""
+    if contador is None or not contador.user_id:
+        return None
+    return contador.user.company_id
+
+
+def escrever_exportacao(exportacao: ExportacaoContabil, arquivo) -> int:
+    """Grava a exportação em `arquivo` (binário) e devolve o número de linhas"""
+    secoes = secoes_da_exportacao(exportacao.tipo, exportacao.formato)
+    empresa_id = empresa_do_contador(exportacao.contador if exportacao.contador_id else None)
+    if empresa_id is None:
+        raise ValidationError('Contador sem empresa vinculada.')
+    chunk_size = getattr(settings, 'DP_EXPORT_CHUNK_SIZE', 2000)
+    intervalo = getattr(settings, 'DP_EXPORT_PROGRESS_INTERVAL', 5000)
+
+    total = sum(secao.consulta(exportacao.competencia, empresa_id).count() for secao in secoes)
+    _atualizar(exportacao, status='gerando', total_linhas=total, linhas_processadas=0, erro_mensagem='')
+
+    escritor = ESCRITORES[exportacao.formato](arquivo, exportacao)
+    processadas = 0
+    for secao in secoes:
+        escritor.secao(secao)
+        for valores in secao.linhas(exportacao.competencia, empresa_id, chunk_size):
+            escritor.linha(valores)
+            processadas += 1
+            if processadas % intervalo == 0:
+                _atualizar(exportacao, linhas_processadas=processadas)
+    escritor.fechar()
+    return processadas
+
+
+def gerar_exportacao(exportacao_id: int) -> ExportacaoContabil:
+    """Gera o arquivo da exportação (status disponivel ou erro)"""
+    exportacao = ExportacaoContabil.objects.select_related('contador__user').get(pk=exportacao_id)
+    try:
+        with tempfile.TemporaryFile(dir=getattr(settings, 'DP_EXPORT_TMP_DIR', None)) as arquivo:
+            processadas = escrever_exportacao(exportacao, arquivo)
+            arquivo.seek(0)
+            nome = nome_arquivo(exportacao)
+            exportacao.arquivo.save(nome, File(arquivo, name=nome), save=False)
+        _atualizar(
+            exportacao,
+            arquivo=exportacao.arquivo.name,
+            status='disponivel',
+            linhas_processadas=processadas,
+            total_linhas=max(exportacao.total_linhas, processadas),
+        )
+        logger.info(f"✓ Exportação {exportacao.pk} gerada: {processadas} linhas")
+    except Exception as e:
+        logger.exception(f"✗ Falha na exportação {exportacao.pk}")
+        _atualizar(exportacao, status='erro', erro_mensagem=str(e)[:1000])
+    return exportacao
+
+
+def _gerar_em_thread(exportacao_id: int) -> None:
+    try:
+        gerar_exportacao(exportacao_id)
+    finally:
+        connections.close_all()
+
+
+def _despachar(exportacao_id: int) -> None:
+    task = globals().get('gerar_exportacao_task')
+    if task is not None and getattr(settings, 'DP_EXPORT_CELERY', True):
+        try:
+            task.delay(exportacao_id)
+            return
+        except Exception as e:
+            logger.warning(f"Broker indisponível para exportação {exportacao_id}, gerando em thread: {e}")
+    threading.Thread(
+        target=_gerar_em_thread, args=(exportacao_id,), name=f'exportacao-{exportacao_id}', daemon=True
+    ).start()
+
+
+def agendar_exportacao(exportacao_id: int) -> None:
+    """Gera em segundo plano após o commit (DP_EXPORT_BACKGROUND=False: na hora)"""
+    if not getattr(settings, 'DP_EXPORT_BACKGROUND', True):
+        gerar_exportacao(exportacao_id)
+        return
+    transaction.on_commit(lambda: _despachar(exportacao_id))
+
+
+def retomar_exportacoes_paradas(exportacao_id: Optional[int] = None) -> int:
+    """
+    Reagenda exportações em 'gerando' sem progresso há DP_EXPORT_STALE_SECONDS
+
+    A geração grava updated_at a cada DP_EXPORT_PROGRESS_INTERVAL linhas;
+    linha parada indica worker morto. O UPDATE condicional garante um
+    único reagendamento mesmo com chamadas concorrentes.
+    """
+    agora = timezone.now()
+    limite = agora - timedelta(seconds=getattr(settings, 'DP_EXPORT_STALE_SECONDS', 900))
+    paradas = ExportacaoContabil.objects.filter(status='gerando', updated_at__lt=limite)
+    if exportacao_id is not None:
+        paradas = paradas.filter(pk=exportacao_id)
+
+    retomadas = 0
+    for pk in list(paradas.values_list('id', flat=True)):
+        if ExportacaoContabil.objects.filter(pk=pk, status='gerando', updated_at__lt=limite).update(
+            updated_at=agora, linhas_processadas=0
+        ):
+            logger.warning(f"Exportação {pk} parada em 'gerando', reagendando")
+            agendar_exportacao(pk)
+            retomadas += 1
+    return retomadas
+
+
+def resposta_download(exportacao: ExportacaoContabil) -> FileResponse:
+    """Download em streaming; marca a exportação como baixada"""
+    response = FileResponse(
+        exportacao.arquivo.open('rb'), as_attachment=True, filename=os.path.basename(exportacao.arquivo.name)
+    )
+    response.block_size = getattr(settings, 'DP_EXPORT_DOWNLOAD_BLOCK_SIZE', 64 * 1024)
+    _atualizar(exportacao, status='baixado', baixado_em=timezone.now())
+    return response
+
+
+# ===== Celery Tasks =====
+
+try:
+    from celery import shared_task
+
+    @shared_task
+    def gerar_exportacao_task(exportacao_id):
+        """Gera a exportação contábil num worker"""
+        return gerar_exportacao(exportacao_id).status
+
+    @shared_task
+    def retomar_exportacoes_paradas_task():
+        """Reagenda exportações interrompidas (agendar no beat)"""
+        return retomar_exportacoes_paradas()
+
+except ImportError:
+    pass
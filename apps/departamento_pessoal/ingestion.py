@@ -0,0 +1,282 @@
+"""
+SyncRH - Departamento Pessoal - Ingestão de Batidas
+===================================================
+
+Caminho de alta vazão para batidas de ponto (início de turno, fila
+offline do PWA).
+
+- Cada batida traz uma chave de idempotência gerada pelo cliente;
+  reenvios (retry, sync duplicado) são descartados pela constraint única
+  (colaborador, chave) de BatidaPonto
+- Na requisição: validação + put numa fila em memória (BatchWriter,
+  apps.core.write_behind) - sem query
+- Flush (thread do BatchWriter, lotes de DP_PONTO_BATCH_SIZE):
+  bulk_create(ignore_conflicts) das batidas, uma query com todas as
+  batidas dos colaborador/dia afetados, resolução dos campos
+  entrada/saida_almoco/retorno_almoco/saida numa passada ordenada por
+  horário (batidas offline fora de ordem se encaixam), upsert dos
+  RegistroPonto e recálculo do EspelhoPontoMensal
+- Dias aprovados ou ajustados manualmente não são reescritos, nem dias
+  com horários que não estão no log (lançados antes dele ou editados
+  no admin): as batidas ficam no log para revisão
+- Concorrência: a consolidação trava os Colaborador do lote (FOR NO KEY
+  UPDATE, em ordem de id) e os RegistroPonto existentes - dois workers
+  nunca consolidam o mesmo dia ao mesmo tempo, e o segundo lê o log já
+  com as batidas do primeiro
+- Banco indisponível: lotes vão para DP_PONTO_SPILL_DIR e são regravados
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal, InvalidOperation
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.core.write_behind import BatchWriter
+
+from .models import BatidaPonto, Colaborador, RegistroPonto
+from .timesheet import BATIDAS, ORIGENS_PONTO, TOTAIS, atualizar_dia, inicio_do_mes, recalcular_mensal
+
+logger = logging.getLogger(__name__)
+
+# Ordem dos campos da batida serializada (lista de primitivos, spill em JSON)
+PUNCH_FIELDS = ('chave', 'colaborador_id', 'momento', 'origem', 'latitude', 'longitude', 'observacao')
+
+# Dias revisados não são reescritos por batidas atrasadas
+STATUS_PRESERVADOS = ('aprovado', 'ajustado')
+
+CAMPOS_CONSOLIDADOS = [
+    *BATIDAS, *TOTAIS, 'horas_trabalhadas', 'horas_extras', 'horas_faltantes',
+    'tipo_registro', 'latitude_entrada', 'longitude_entrada', 'latitude_saida',
+    'longitude_saida', 'updated_at',
+]
+
+MAX_CHAVE = 64
+MAX_OBSERVACAO = 500
+
+
+def colaborador_id_do_usuario(user) -> Optional[int]:
+    """Colaborador do usuário (cache de DP_PONTO_COLABORADOR_CACHE_TTL)"""
+    key = f'dp:colaborador_id:{user.pk}'
+    colaborador_id = cache.get(key)
+    if colaborador_id is None:
+        colaborador_id = Colaborador.objects.filter(user_id=user.pk, is_active=True).values_list(
+            'id', flat=True
+        ).first() or 0
+        cache.set(key, colaborador_id, getattr(settings, 'DP_PONTO_COLABORADOR_CACHE_TTL', 300))
+    return colaborador_id or None
+
+
+def _coordenada(valor) -> Optional[float]:
+    if valor in (None, ''):
+        return None
+    try:
+        return float(Decimal(str(valor)))
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def normalizar_batida(colaborador_id: int, dados: Dict, agora=None) -> List:
+    """
+    Batida validada na ordem de PUNCH_FIELDS
+
+    Raises:
+        ValidationError: chave ausente, horário inválido, no futuro ou
+        mais antigo que DP_PONTO_SYNC_MAX_DIAS
+    """
+    agora = agora or timezone.now()
+    chave = str(dados.get('chave') or '').strip()
+    if not chave or len(chave) > MAX_CHAVE:
+        raise ValidationError(f'Chave de idempotência obrigatória (até {MAX_CHAVE} caracteres).')
+
+    momento = dados.get('momento')
+    if momento is None:
+        momento = agora
+    elif not isinstance(momento, datetime):
+        momento = parse_datetime(str(momento))
+        if momento is None:
+            raise ValidationError('Horário da batida inválido.')
+    if timezone.is_naive(momento):
+        momento = timezone.make_aware(momento)
+    if momento > agora + timedelta(seconds=getattr(settings, 'DP_PONTO_MAX_ADIANTAMENTO', 300)):
+        raise ValidationError('Horário da batida no futuro.')
+    if momento < agora - timedelta(days=getattr(settings, 'DP_PONTO_SYNC_MAX_DIAS', 7)):
+        raise ValidationError('Batida antiga demais para sincronização.')
+
+    origem = dados.get('origem') or 'web'
+    localizacao = dados.get('localizacao') or {}
+    return [
+        chave,
+        colaborador_id,
+        momento.timestamp(),
+        origem if origem in ORIGENS_PONTO else 'web',
+        _coordenada(localizacao.get('latitude')),
+        _coordenada(localizacao.get('longitude')),
+        str(dados.get('observacao') or '')[:MAX_OBSERVACAO],
+    ]
+
+
+def resolver_dia(colaborador_id: int, data, batidas: List[Dict], agora) -> RegistroPonto:
+    """
+    RegistroPonto (não salvo) a partir das batidas do dia ordenadas por horário
+
+    As quatro primeiras preenchem entrada, saida_almoco, retorno_almoco e
+    saida; excedentes ficam só no log de BatidaPonto.
+    """
+    registro = RegistroPonto(colaborador_id=colaborador_id, data=data, tipo_registro=batidas[0]['origem'])
+    for campo, batida in zip(BATIDAS, batidas):
+        setattr(registro, campo, batida['momento'])
+    registro.latitude_entrada = batidas[0]['latitude']
+    registro.longitude_entrada = batidas[0]['longitude']
+    if len(batidas) >= len(BATIDAS):
+        registro.latitude_saida = batidas[3]['latitude']
+        registro.longitude_saida = batidas[3]['longitude']
+    atualizar_dia(registro)
+    registro.updated_at = agora
+    return registro
+
+
+def _fora_do_log(registro: Dict, batidas: List[Dict]) -> bool:
+    """Dia com horário que não veio do log (anterior a ele ou editado no admin)"""
+    momentos = {batida['momento'] for batida in batidas}
+    return any(registro[campo] is not None and registro[campo] not in momentos for campo in BATIDAS)
+
+
+def consolidar_dias(dias: Set[Tuple[int, object]]) -> List[RegistroPonto]:
+    """
+    Recalcula os RegistroPonto dos (colaborador_id, data) a partir do log
+
+    Chamar dentro de transaction.atomic (IngestaoPonto.write): os locks
+    valem até o commit das batidas e dos registros.
+    """
+    if not dias:
+        return []
+    colaboradores = {colaborador_id for colaborador_id, _ in dias}
+    datas = {data for _, data in dias}
+
+    # Serializa a consolidação por colaborador (também para dias ainda sem
+    # RegistroPonto); NO KEY não conflita com o FK das batidas inseridas
+    list(Colaborador.objects.select_for_update(no_key=True).filter(
+        id__in=colaboradores
+    ).order_by('id').values_list('id', flat=True))
+    existentes = {
+        (registro['colaborador_id'], registro['data']): registro
+        for registro in RegistroPonto.objects.select_for_update().filter(
+            colaborador_id__in=colaboradores, data__in=datas
+        ).values('colaborador_id', 'data', 'status', *BATIDAS)
+    }
+
+    por_dia: Dict[Tuple, List[Dict]] = defaultdict(list)
+    for batida in BatidaPonto.objects.filter(colaborador_id__in=colaboradores, data__in=datas).order_by(
+        'momento', 'id'
+    ).values('colaborador_id', 'data', 'momento', 'origem', 'latitude', 'longitude'):
+        dia = (batida['colaborador_id'], batida['data'])
+        if dia in dias:
+            por_dia[dia].append(batida)
+
+    agora = timezone.now()
+    registros = []
+    for dia, batidas in por_dia.items():
+        registro = existentes.get(dia)
+        if registro is not None:
+            if registro['status'] in STATUS_PRESERVADOS:
+                continue
+            if _fora_do_log(registro, batidas):
+                logger.info(f"Ponto {dia}: horários fora do log, dia mantido para revisão")
+                continue
+        registros.append(resolver_dia(dia[0], dia[1], batidas, agora))
+    if registros:
+        RegistroPonto.objects.bulk_create(
+            registros,
+            update_conflicts=True,
+            unique_fields=['colaborador', 'data'],
+            update_fields=CAMPOS_CONSOLIDADOS,
+        )
+
+    # bulk_create não dispara os signals: espelho mensal refeito por competência
+    por_competencia: Dict[object, Set[int]] = defaultdict(set)
+    for registro in registros:
+        por_competencia[inicio_do_mes(registro.data)].add(registro.colaborador_id)
+    for competencia, colaborador_ids in por_competencia.items():
+        recalcular_mensal(competencia, colaborador_ids)
+    return registros
+
+
+class IngestaoPonto:
+    """
+    Buffer de batidas + consolidação em lote
+
+    Uso:
+        linha = normalizar_batida(colaborador_id, {'chave': ..., 'momento': ...})
+        IngestaoPonto.submit(linha)   # assíncrono (fila)
+        IngestaoPonto.write([linha])  # síncrono
+    """
+
+    _writer: Optional[BatchWriter] = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def assincrona() -> bool:
+        return getattr(settings, 'DP_PONTO_INGESTAO_ASSINCRONA', True)
+
+    @staticmethod
+    def writer() -> BatchWriter:
+        if IngestaoPonto._writer is None:
+            with IngestaoPonto._lock:
+                if IngestaoPonto._writer is None:
+                    IngestaoPonto._writer = BatchWriter(
+                        'ponto',
+                        IngestaoPonto.write,
+                        max_queue=getattr(settings, 'DP_PONTO_QUEUE_SIZE', 50000),
+                        batch_size=getattr(settings, 'DP_PONTO_BATCH_SIZE', 1000),
+                        flush_interval=getattr(settings, 'DP_PONTO_FLUSH_INTERVAL', 0.5),
+                        background=getattr(settings, 'DP_PONTO_BACKGROUND', True),
+                        spill_dir=getattr(settings, 'DP_PONTO_SPILL_DIR', None),
+                        replay_interval=getattr(settings, 'DP_PONTO_REPLAY_INTERVAL', 30.0),
+                    )
+        return IngestaoPonto._writer
+
+    @staticmethod
+    def submit(linha: List) -> bool:
+        """Enfileira a batida (crítica: espera por espaço, depois spill)"""
+        return IngestaoPonto.writer().submit(linha, critical=True)
+
+    @staticmethod
+    def write(linhas: Iterable[List]) -> List[RegistroPonto]:
+        """Grava um lote de batidas e consolida os dias afetados"""
+        unicas = {(linha[1], linha[0]): dict(zip(PUNCH_FIELDS, linha)) for linha in linhas}
+        batidas = []
+        for row in unicas.values():
+            momento = datetime.fromtimestamp(row['momento'], tz=dt_timezone.utc)
+            batidas.append(BatidaPonto(
+                chave=row['chave'],
+                colaborador_id=row['colaborador_id'],
+                data=timezone.localdate(momento),
+                momento=momento,
+                origem=row['origem'],
+                latitude=row['latitude'],
+                longitude=row['longitude'],
+                observacao=row['observacao'],
+            ))
+        if not batidas:
+            return []
+
+        with transaction.atomic():
+            BatidaPonto.objects.bulk_create(batidas, ignore_conflicts=True)
+            return consolidar_dias({(batida.colaborador_id, batida.data) for batida in batidas})
+
+    @staticmethod
+    def flush() -> int:
+        return IngestaoPonto.writer().flush()
+
+    @staticmethod
+    def stats() -> Dict:
+        return IngestaoPonto.writer().stats()
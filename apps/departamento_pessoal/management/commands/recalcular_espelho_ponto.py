@@ -0,0 +1,56 @@
+"""
+Recalcula os agregados de ponto (diário e EspelhoPontoMensal) de uma competência
+
+Usage:
+    python manage.py recalcular_espelho_ponto --mes 5 --ano 2024
+    python manage.py recalcular_espelho_ponto --mes 5 --ano 2024 --colaborador 42
+"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.departamento_pessoal.models import RegistroPonto
+from apps.departamento_pessoal.timesheet import (
+    TOTAIS,
+    atualizar_dia,
+    proxima_competencia,
+    recalcular_mensal,
+)
+
+CAMPOS_ATUALIZADOS = [*TOTAIS, 'horas_trabalhadas', 'horas_extras', 'horas_faltantes']
+
+
+class Command(BaseCommand):
+    help = "Recalcula minutos diários e o espelho mensal de ponto (backfill ou mudança de jornada)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mes', type=int, required=True)
+        parser.add_argument('--ano', type=int, required=True)
+        parser.add_argument('--colaborador', type=int, action='append', help="Restringe a colaboradores (repetível)")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        competencia = date(options['ano'], options['mes'], 1)
+        registros = RegistroPonto.objects.filter(data__gte=competencia, data__lt=proxima_competencia(competencia))
+        if options['colaborador']:
+            registros = registros.filter(colaborador_id__in=options['colaborador'])
+
+        lote, dias = [], 0
+        with transaction.atomic():
+            for registro in registros.iterator(chunk_size=options['batch_size']):
+                atualizar_dia(registro)
+                lote.append(registro)
+                if len(lote) >= options['batch_size']:
+                    RegistroPonto.objects.bulk_update(lote, CAMPOS_ATUALIZADOS)
+                    dias += len(lote)
+                    lote = []
+            if lote:
+                RegistroPonto.objects.bulk_update(lote, CAMPOS_ATUALIZADOS)
+                dias += len(lote)
+            espelhos = recalcular_mensal(competencia, options['colaborador'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ {competencia.strftime('%m/%Y')}: {dias} dias e {espelhos} espelhos mensais recalculados"
+        ))
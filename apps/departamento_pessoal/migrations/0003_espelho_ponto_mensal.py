@@ -0,0 +1,54 @@
+# Generated by Django 5.1.3 on 2026-10-17 05:31
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('departamento_pessoal', '0002_alter_colaborador_user_itemfolha'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='registroponto',
+            name='minutos_extras',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='registroponto',
+            name='minutos_faltantes',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='registroponto',
+            name='minutos_trabalhados',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='EspelhoPontoMensal',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_active', models.BooleanField(db_index=True, default=True)),
+                ('competencia', models.DateField(help_text='Primeiro dia do mês de referência')),
+                ('dias_trabalhados', models.IntegerField(default=0)),
+                ('minutos_trabalhados', models.IntegerField(default=0)),
+                ('minutos_extras', models.IntegerField(default=0)),
+                ('minutos_faltantes', models.IntegerField(default=0)),
+                ('colaborador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='espelhos_ponto', to='departamento_pessoal.colaborador')),
+                ('departamento', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='espelhos_ponto', to='departamento_pessoal.departamento')),
+            ],
+            options={
+                'verbose_name': 'Espelho de Ponto Mensal',
+                'verbose_name_plural': 'Espelhos de Ponto Mensais',
+                'ordering': ['-competencia', 'colaborador'],
+                'indexes': [models.Index(fields=['departamento', 'competencia'], name='departament_departa_df88d4_idx')],
+                'unique_together': {('colaborador', 'competencia')},
+            },
+        ),
+    ]
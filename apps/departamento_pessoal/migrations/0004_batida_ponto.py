@@ -0,0 +1,35 @@
+# Generated by Django 5.1.3 on 2026-10-17 05:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('departamento_pessoal', '0003_espelho_ponto_mensal'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BatidaPonto',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('chave', models.CharField(help_text='Chave de idempotência gerada pelo cliente', max_length=64, unique=True)),
+                ('data', models.DateField()),
+                ('momento', models.DateTimeField()),
+                ('origem', models.CharField(default='web', max_length=30)),
+                ('latitude', models.DecimalField(blank=True, decimal_places=8, max_digits=10, null=True)),
+                ('longitude', models.DecimalField(blank=True, decimal_places=8, max_digits=11, null=True)),
+                ('observacao', models.TextField(blank=True)),
+                ('recebido_em', models.DateTimeField(auto_now_add=True)),
+                ('colaborador', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batidas_ponto', to='departamento_pessoal.colaborador')),
+            ],
+            options={
+                'verbose_name': 'Batida de Ponto',
+                'verbose_name_plural': 'Batidas de Ponto',
+                'ordering': ['colaborador', 'momento'],
+                'indexes': [models.Index(fields=['colaborador', 'data'], name='departament_colabor_85cab5_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.3 on 2026-10-17 05:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('departamento_pessoal', '0004_batida_ponto'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportacaocontabil',
+            name='linhas_processadas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='exportacaocontabil',
+            name='total_linhas',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.3 on 2026-10-17 05:49
+
+import django.db.models.functions.datetime
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('departamento_pessoal', '0005_exportacao_progresso'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='colaborador',
+            index=models.Index(django.db.models.functions.datetime.ExtractMonth('data_nascimento'), django.db.models.functions.datetime.ExtractDay('data_nascimento'), name='dp_colab_aniversario_idx'),
+        ),
+    ]
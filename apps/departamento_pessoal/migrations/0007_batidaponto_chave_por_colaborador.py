@@ -0,0 +1,22 @@
+# Generated by Django 5.1.3 on 2026-10-17 06:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('departamento_pessoal', '0006_colaborador_aniversario_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='batidaponto',
+            name='chave',
+            field=models.CharField(help_text='Chave de idempotência gerada pelo cliente', max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name='batidaponto',
+            constraint=models.UniqueConstraint(fields=('colaborador', 'chave'), name='dp_batida_colab_chave_uniq'),
+        ),
+    ]
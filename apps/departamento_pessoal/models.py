@@ -11,6 +11,7 @@ Funcionalidades:
 """
 
 from django.db import models
+from django.db.models.functions import ExtractDay, ExtractMonth
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 import uuid
@@ -72,6 +73,10 @@ class Colaborador(BaseModel):
         verbose_name = 'Colaborador'
         verbose_name_plural = 'Colaboradores'
         ordering = ['nome_completo']
+        indexes = [
+            # Aniversariantes do mês (dashboard.py filtra pela mesma expressão)
+            models.Index(ExtractMonth('data_nascimento'), ExtractDay('data_nascimento'), name='dp_colab_aniversario_idx'),
+        ]
     
     def __str__(self):
         return self.nome_completo
@@ -194,6 +199,9 @@ class RegistroPonto(BaseModel):
     horas_trabalhadas = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     horas_extras = models.DecimalField(max_digits=5, decimal_places=2, default=0)
     horas_faltantes = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    minutos_trabalhados = models.IntegerField(default=0)
+    minutos_extras = models.IntegerField(default=0)
+    minutos_faltantes = models.IntegerField(default=0)
     
     # Status
     status = models.CharField(max_length=30, choices=[
@@ -221,6 +229,57 @@ class RegistroPonto(BaseModel):
         return f"{self.colaborador.nome_completo} - {self.data}"
 
 
+class BatidaPonto(models.Model):
+    """Batidas brutas (append-only), deduplicadas por colaborador + chave de idempotência do cliente"""
+    id = models.BigAutoField(primary_key=True)
+    chave = models.CharField(max_length=64, help_text='Chave de idempotência gerada pelo cliente')
+    colaborador = models.ForeignKey(Colaborador, on_delete=models.CASCADE, related_name='batidas_ponto')
+    data = models.DateField()
+    momento = models.DateTimeField()
+    origem = models.CharField(max_length=30, default='web')
+    latitude = models.DecimalField(max_digits=10, decimal_places=8, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=11, decimal_places=8, null=True, blank=True)
+    observacao = models.TextField(blank=True)
+    recebido_em = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        app_label = 'departamento_pessoal'
+        verbose_name = 'Batida de Ponto'
+        verbose_name_plural = 'Batidas de Ponto'
+        ordering = ['colaborador', 'momento']
+        indexes = [models.Index(fields=['colaborador', 'data'])]
+        constraints = [
+            # Chave vem do cliente: única por colaborador, não global
+            models.UniqueConstraint(fields=['colaborador', 'chave'], name='dp_batida_colab_chave_uniq'),
+        ]
+    
+    def __str__(self):
+        return f"{self.colaborador_id} - {self.momento}"
+
+
+class EspelhoPontoMensal(BaseModel):
+    """Totais mensais de ponto por colaborador (mantidos a cada batida)"""
+    colaborador = models.ForeignKey(Colaborador, on_delete=models.CASCADE, related_name='espelhos_ponto')
+    departamento = models.ForeignKey('Departamento', on_delete=models.SET_NULL, null=True, blank=True, related_name='espelhos_ponto')
+    competencia = models.DateField(help_text='Primeiro dia do mês de referência')
+    
+    dias_trabalhados = models.IntegerField(default=0)
+    minutos_trabalhados = models.IntegerField(default=0)
+    minutos_extras = models.IntegerField(default=0)
+    minutos_faltantes = models.IntegerField(default=0)
+    
+    class Meta:
+        app_label = 'departamento_pessoal'
+        verbose_name = 'Espelho de Ponto Mensal'
+        verbose_name_plural = 'Espelhos de Ponto Mensais'
+        ordering = ['-competencia', 'colaborador']
+        unique_together = ['colaborador', 'competencia']
+        indexes = [models.Index(fields=['departamento', 'competencia'])]
+    
+    def __str__(self):
+        return f"{self.colaborador.nome_completo} - {self.competencia.strftime('%m/%Y')}"
+
+
 class JustificativaPonto(BaseModel):
     """Justificativas para ausências ou ajustes"""
     registro = models.ForeignKey(RegistroPonto, on_delete=models.CASCADE, related_name='justificativas')
@@ -656,6 +715,10 @@ class ExportacaoContabil(BaseModel):
     baixado_em = models.DateTimeField(null=True, blank=True)
     erro_mensagem = models.TextField(blank=True)
     
+    # Progresso da geração (exports.py)
+    total_linhas = models.PositiveIntegerField(default=0)
+    linhas_processadas = models.PositiveIntegerField(default=0)
+    
     class Meta:
         app_label = 'departamento_pessoal'
         verbose_name = 'Exportação Contábil'
@@ -664,3 +727,12 @@ class ExportacaoContabil(BaseModel):
     
     def __str__(self):
         return f"{self.tipo} - {self.competencia.strftime('%m/%Y')}"
+    
+    @property
+    def progresso(self):
+        """Percentual de linhas gravadas (0-100)"""
+        if self.status in ('disponivel', 'baixado'):
+            return 100
+        if not self.total_linhas:
+            return 0
+        return min(99, self.linhas_processadas * 100 // self.total_linhas)
@@ -0,0 +1,346 @@
+"""
+SyncRH - Departamento Pessoal - Folha em Lote
+=============================================
+
+Processamento da folha de uma competência inteira (empresa/mês/ano).
+
+- Colaboradores e salário do cargo carregados numa única query por
+  departamento (values_list, sem instanciar models)
+- INSS/IRRF a partir de tabelas progressivas versionadas por vigência,
+  pré-compiladas (bisect nos limites das faixas)
+- Gravação em chunks de DP_FOLHA_CHUNK_SIZE: bulk_create das folhas
+  novas, bulk_update das existentes, delete + bulk_create dos itens
+  (~5 queries por chunk, independente do número de colaboradores)
+- Departamentos processados em paralelo em processos separados
+  (DP_FOLHA_WORKERS), criados com 'spawn': fork copiaria locks das
+  threads do processo (write-behind, monitor do Helix) em estado
+  inconsistente. Dentro de processo daemônico (worker prefork do Celery),
+  que não pode ter filhos, o processamento é sequencial
+- Idempotente: reprocessar recalcula as folhas em rascunho/calculada e
+  ignora as aprovadas, pagas ou canceladas
+"""
+
+import logging
+import multiprocessing
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+from itertools import repeat
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import django
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.utils import timezone
+
+from .models import Colaborador, FolhaPagamento, ItemFolha
+
+logger = logging.getLogger(__name__)
+
+CENTAVO = Decimal('0.01')
+
+# Folhas nestes status não são recalculadas
+STATUS_FECHADOS = ('aprovada', 'paga', 'cancelada')
+
+FOLHA_FIELDS = [
+    'salario_base', 'inss', 'irrf', 'total_proventos', 'total_descontos',
+    'salario_liquido', 'status', 'updated_at',
+]
+
+
+@dataclass(frozen=True)
+class TabelaProgressiva:
+    """
+    Tabela de faixas (limite superior, alíquota, parcela a deduzir)
+
+    O último limite pode ser None (sem limite). Com `teto`, a base é
+    limitada antes do enquadramento (INSS).
+    """
+
+    versao: str
+    vigencia: date
+    limites: Tuple[Decimal, ...]
+    aliquotas: Tuple[Decimal, ...]
+    deducoes: Tuple[Decimal, ...]
+    teto: Optional[Decimal] = None
+
+    @classmethod
+    def compilar(cls, versao: str, vigencia: date, faixas: Sequence[Tuple], teto=None) -> 'TabelaProgressiva':
+        limites = tuple(Decimal(str(limite)) for limite, _, _ in faixas if limite is not None)
+        return cls(
+            versao=versao,
+            vigencia=vigencia,
+            limites=limites,
+            aliquotas=tuple(Decimal(str(aliquota)) for _, aliquota, _ in faixas),
+            deducoes=tuple(Decimal(str(deducao)) for _, _, deducao in faixas),
+            teto=Decimal(str(teto)) if teto is not None else None,
+        )
+
+    def calcular(self, base: Decimal) -> Tuple[Decimal, Decimal]:
+        """(valor, alíquota) para a base"""
+        if self.teto is not None and base > self.teto:
+            base = self.teto
+        faixa = min(bisect_left(self.limites, base), len(self.aliquotas) - 1)
+        aliquota = self.aliquotas[faixa]
+        if not aliquota:
+            return Decimal('0'), aliquota
+        valor = (base * aliquota - self.deducoes[faixa]).quantize(CENTAVO, ROUND_HALF_UP)
+        return max(valor, Decimal('0')), aliquota
+
+
+# Tabelas 2024 (simplificadas: alíquota da faixa sobre a base inteira no INSS)
+TABELAS_INSS = (
+    TabelaProgressiva.compilar('INSS-2024', date(2024, 1, 1), (
+        ('1412.00', '0.075', '0'),
+        ('2666.68', '0.09', '0'),
+        ('4000.03', '0.12', '0'),
+        ('7786.02', '0.14', '0'),
+    ), teto='7786.02'),
+)
+
+TABELAS_IRRF = (
+    TabelaProgressiva.compilar('IRRF-2024', date(2024, 1, 1), (
+        ('2259.20', '0', '0'),
+        ('2826.65', '0.075', '169.44'),
+        ('3751.05', '0.15', '381.44'),
+        ('4664.68', '0.225', '662.77'),
+        (None, '0.275', '896.00'),
+    )),
+)
+
+
+def tabela_vigente(tabelas: Sequence[TabelaProgressiva], competencia: date) -> TabelaProgressiva:
+    """Tabela mais recente com vigência até a competência"""
+    vigentes = [tabela for tabela in tabelas if tabela.vigencia <= competencia]
+    return max(vigentes, key=lambda tabela: tabela.vigencia) if vigentes else min(tabelas, key=lambda t: t.vigencia)
+
+
+@dataclass(frozen=True)
+class CalculoFolha:
+    inss: Decimal
+    aliquota_inss: Decimal
+    irrf: Decimal
+    aliquota_irrf: Decimal
+
+
+class CalculadoraFolha:
+    """Tabelas vigentes de uma competência + cálculo por salário"""
+
+    def __init__(self, competencia: date, tabelas_inss=TABELAS_INSS, tabelas_irrf=TABELAS_IRRF):
+        self.competencia = competencia
+        self.inss = tabela_vigente(tabelas_inss, competencia)
+        self.irrf = tabela_vigente(tabelas_irrf, competencia)
+
+    @property
+    def versoes(self) -> Dict[str, str]:
+        return {'inss': self.inss.versao, 'irrf': self.irrf.versao}
+
+    def calcular(self, salario_base: Decimal) -> CalculoFolha:
+        inss, aliquota_inss = self.inss.calcular(salario_base)
+        irrf, aliquota_irrf = self.irrf.calcular(salario_base - inss)
+        return CalculoFolha(inss, aliquota_inss, irrf, aliquota_irrf)
+
+    def aplicar(self, folha, agora) -> List:
+        """Recalcula a folha (sem salvar) e devolve seus ItemFolha não salvos"""
+        calculo = self.calcular(folha.salario_base)
+        folha.inss = calculo.inss
+        folha.irrf = calculo.irrf
+        folha.total_proventos = (
+            folha.salario_base + folha.horas_extras + folha.adicional_noturno +
+            folha.comissoes + folha.bonus + folha.outros_proventos
+        )
+        folha.total_descontos = (
+            folha.inss + folha.irrf + folha.vale_transporte + folha.vale_alimentacao +
+            folha.plano_saude + folha.emprestimos + folha.faltas + folha.outros_descontos
+        )
+        folha.salario_liquido = folha.total_proventos - folha.total_descontos
+        folha.status = 'calculada'
+        folha.updated_at = agora
+
+        itens = [ItemFolha(folha=folha, codigo='001', descricao='Salário Base', tipo='provento',
+                           valor=folha.salario_base)]
+        itens.append(ItemFolha(folha=folha, codigo='101', descricao='INSS', tipo='desconto',
+                               referencia=(calculo.aliquota_inss * 100).quantize(CENTAVO), valor=calculo.inss))
+        if calculo.irrf > 0:
+            itens.append(ItemFolha(folha=folha, codigo='102', descricao='IRRF', tipo='desconto',
+                                   referencia=(calculo.aliquota_irrf * 100).quantize(CENTAVO), valor=calculo.irrf))
+        return itens
+
+
+def competencia_de(mes: int, ano: int) -> date:
+    return date(ano, mes, 1)
+
+
+def fim_do_mes(competencia: date) -> date:
+    proximo = date(competencia.year + competencia.month // 12, competencia.month % 12 + 1, 1)
+    return date.fromordinal(proximo.toordinal() - 1)
+
+
+def colaboradores_da_competencia(competencia: date, empresa_id=None):
+    """Colaboradores ativos em algum dia da competência"""
+    queryset = Colaborador.objects.filter(is_active=True, data_admissao__lte=fim_do_mes(competencia)).exclude(
+        data_demissao__lt=competencia
+    )
+    if empresa_id is not None:
+        queryset = queryset.filter(user__company_id=empresa_id)
+    return queryset.order_by()
+
+
+def _chunks(rows: Sequence, size: int) -> Iterable[Sequence]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def processar_chunk(linhas: Sequence[Tuple[int, Optional[Decimal]]], calculadora: CalculadoraFolha) -> Dict:
+    """
+    Processa um chunk de (colaborador_id, salário do cargo) numa transação
+
+    Folhas existentes mantêm o salario_base (como no processamento
+    individual); folhas novas usam o salário do cargo.
+    """
+    competencia = calculadora.competencia
+    agora = timezone.now()
+    resultado = {'criadas': 0, 'recalculadas': 0, 'ignoradas': 0, 'total_liquido': Decimal('0')}
+
+    with transaction.atomic():
+        existentes = {
+            folha.colaborador_id: folha
+            for folha in FolhaPagamento.objects.select_for_update().filter(
+                competencia=competencia, colaborador_id__in=[colaborador_id for colaborador_id, _ in linhas]
+            )
+        }
+        novas, recalcular = [], []
+        for colaborador_id, salario in linhas:
+            folha = existentes.get(colaborador_id)
+            if folha is None:
+                novas.append(FolhaPagamento(
+                    colaborador_id=colaborador_id, competencia=competencia, salario_base=salario or Decimal('0')
+                ))
+            elif folha.status in STATUS_FECHADOS:
+                resultado['ignoradas'] += 1
+            else:
+                recalcular.append(folha)
+
+        itens = []
+        for folha in novas + recalcular:
+            itens.extend(calculadora.aplicar(folha, agora))
+            resultado['total_liquido'] += folha.salario_liquido
+
+        if novas:
+            FolhaPagamento.objects.bulk_create(novas)
+        if recalcular:
+            FolhaPagamento.objects.bulk_update(recalcular, FOLHA_FIELDS)
+            ItemFolha.objects.filter(folha__in=recalcular).delete()
+        if itens:
+            ItemFolha.objects.bulk_create(itens)
+
+    resultado['criadas'] = len(novas)
+    resultado['recalculadas'] = len(recalcular)
+    return resultado
+
+
+def processar_departamento(departamento_id: Optional[int], competencia: date, empresa_id=None) -> Dict:
+    """Processa a folha de um departamento (unidade de paralelismo)"""
+    calculadora = CalculadoraFolha(competencia)
+    chunk_size = getattr(settings, 'DP_FOLHA_CHUNK_SIZE', 500)
+    linhas = list(
+        colaboradores_da_competencia(competencia, empresa_id)
+        .filter(departamento_id=departamento_id)
+        .values_list('id', 'cargo__salario_base')
+    )
+    resultado = _resultado_vazio()
+    for chunk in _chunks(linhas, chunk_size):
+        _somar(resultado, processar_chunk(chunk, calculadora))
+    resultado['departamentos'] = 1
+    return resultado
+
+
+def _processar_departamento_em_processo(departamento_id, competencia, empresa_id) -> Dict:
+    try:
+        return processar_departamento(departamento_id, competencia, empresa_id)
+    finally:
+        connections.close_all()
+
+
+def _resultado_vazio() -> Dict:
+    return {'criadas': 0, 'recalculadas': 0, 'ignoradas': 0, 'total_liquido': Decimal('0'), 'departamentos': 0}
+
+
+def _somar(total: Dict, parcial: Dict) -> Dict:
+    for chave, valor in parcial.items():
+        total[chave] = total.get(chave, 0) + valor
+    return total
+
+
+def workers_padrao(departamentos: int) -> int:
+    workers = getattr(settings, 'DP_FOLHA_WORKERS', 4)
+    # SQLite serializa escritas e bancos em memória não são vistos por outros processos
+    if connection.vendor == 'sqlite':
+        return 1
+    return max(1, min(workers, departamentos))
+
+
+def processar_competencia(empresa, mes: int, ano: int, workers: Optional[int] = None) -> Dict:
+    """
+    Processa a folha de todos os colaboradores da empresa na competência
+
+    Args:
+        empresa: Empresa (ou id); None processa todos os colaboradores
+        mes, ano: Competência
+        workers: Processos paralelos (padrão DP_FOLHA_WORKERS)
+
+    Returns:
+        Dict com criadas, recalculadas, ignoradas, total_liquido,
+        departamentos e versões das tabelas usadas
+    """
+    competencia = competencia_de(mes, ano)
+    empresa_id = getattr(empresa, 'pk', empresa)
+    departamentos = list(
+        colaboradores_da_competencia(competencia, empresa_id).values_list('departamento_id', flat=True).distinct()
+    )
+    workers = workers or workers_padrao(len(departamentos))
+    inicio = timezone.now()
+
+    if multiprocessing.current_process().daemon:
+        workers = 1
+
+    resultado = _resultado_vazio()
+    if workers <= 1 or len(departamentos) <= 1:
+        for departamento_id in departamentos:
+            _somar(resultado, processar_departamento(departamento_id, competencia, empresa_id))
+    else:
+        # Processo novo (spawn): configura o Django antes de importar este módulo
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup,
+        ) as pool:
+            for parcial in pool.map(_processar_departamento_em_processo, departamentos,
+                                    repeat(competencia), repeat(empresa_id)):
+                _somar(resultado, parcial)
+
+    resultado['competencia'] = competencia.strftime('%m/%Y')
+    resultado['tabelas'] = CalculadoraFolha(competencia).versoes
+    logger.info(
+        f"Folha {resultado['competencia']} (empresa {empresa_id}): {resultado['criadas']} criadas, "
+        f"{resultado['recalculadas']} recalculadas, {resultado['ignoradas']} ignoradas, "
+        f"{len(departamentos)} departamentos, {workers} processos, "
+        f"{(timezone.now() - inicio).total_seconds():.1f}s"
+    )
+    return resultado
+
+
+# ===== Celery Tasks =====
+
+try:
+    from celery import shared_task
+
+    @shared_task
+    def processar_competencia_task(empresa_id, mes, ano):
+        """Processa a folha da competência (fechamento agendado)"""
+        resultado = processar_competencia(empresa_id, mes, ano)
+        resultado['total_liquido'] = str(resultado['total_liquido'])
+        return resultado
+
+except ImportError:
+    pass
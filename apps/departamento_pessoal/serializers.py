@@ -7,6 +7,7 @@ Serializers para APIs do módulo Departamento Pessoal.
 
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError as DjangoValidationError
 
 from .models import (
     Colaborador, Departamento, Cargo, EscalaTrabalho,
@@ -15,6 +16,7 @@ from .models import (
     CategoriaDocumento, DocumentoGED, PeriodoAquisitivo,
     SolicitacaoFerias, FeriasColetivas, Contador, ExportacaoContabil
 )
+from .exports import secoes_da_exportacao
 from apps.core.base.validators import validate_cpf, validate_phone
 
 User = get_user_model()
@@ -120,11 +122,15 @@ class RegistroPontoSerializer(serializers.ModelSerializer):
     class Meta:
         model = RegistroPonto
         fields = [
-            'id', 'uuid', 'colaborador', 'colaborador_nome',
-            'data', 'hora', 'tipo', 'origem', 'localizacao',
-            'foto_registro', 'observacao', 'validado', 'created_at'
+            'id', 'uuid', 'colaborador', 'colaborador_nome', 'data',
+            'entrada', 'saida_almoco', 'retorno_almoco', 'saida', 'tipo_registro',
+            'minutos_trabalhados', 'minutos_extras', 'minutos_faltantes',
+            'status', 'observacao', 'validado_facial', 'created_at'
+        ]
+        read_only_fields = [
+            'id', 'uuid', 'minutos_trabalhados', 'minutos_extras',
+            'minutos_faltantes', 'created_at'
         ]
-        read_only_fields = ['id', 'uuid', 'created_at']
 
 
 class JustificativaPontoSerializer(serializers.ModelSerializer):
@@ -258,10 +264,23 @@ class ContadorSerializer(serializers.ModelSerializer):
 
 class ExportacaoContabilSerializer(serializers.ModelSerializer):
     """Serializer para exportação contábil"""
+    progresso = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = ExportacaoContabil
         fields = [
-            'id', 'uuid', 'mes', 'ano', 'tipo', 'formato',
-            'arquivo', 'enviado_para', 'data_envio', 'status'
+            'id', 'uuid', 'contador', 'competencia', 'tipo', 'formato',
+            'arquivo', 'status', 'total_linhas', 'linhas_processadas',
+            'progresso', 'baixado_em', 'erro_mensagem', 'created_at'
+        ]
+        read_only_fields = [
+            'arquivo', 'status', 'total_linhas', 'linhas_processadas',
+            'baixado_em', 'erro_mensagem', 'created_at'
         ]
+    
+    def validate(self, data):
+        try:
+            secoes_da_exportacao(data.get('tipo'), data.get('formato', 'xlsx'))
+        except DjangoValidationError as e:
+            raise serializers.ValidationError({'formato': e.messages})
+        return data
@@ -6,7 +6,8 @@ Camada de serviços com regras de negócio do módulo Departamento Pessoal.
 Separa a lógica de negócio das views para melhor organização e testabilidade.
 """
 
-from datetime import date, datetime, timedelta
+import uuid
+from datetime import date, timedelta
 from decimal import Decimal
 from typing import Optional, Dict, List, Any
 from django.db import transaction
@@ -15,9 +16,15 @@ from django.core.exceptions import ValidationError
 
 from .models import (
     Colaborador, RegistroPonto, JustificativaPonto,
-    FolhaPagamento, ItemFolha, PeriodoAquisitivo,
+    FolhaPagamento, PeriodoAquisitivo,
     SolicitacaoFerias, DocumentoGED
 )
+from .ingestion import IngestaoPonto, normalizar_batida
+from .timesheet import BATIDAS, espelho_colaborador, espelho_departamento
+from .payroll import (
+    STATUS_FECHADOS, CalculadoraFolha, competencia_de,
+    processar_chunk, processar_competencia
+)
 
 
 class PontoService:
@@ -36,58 +43,47 @@ class PontoService:
         colaborador: Colaborador,
         origem: str = 'web',
         localizacao: Optional[Dict] = None,
-        observacao: str = ''
+        observacao: str = '',
+        chave: Optional[str] = None
     ) -> Dict[str, Any]:
         """
-        Registra batida de ponto do colaborador.
+        Registra batida de ponto do colaborador (caminho síncrono).
+        
+        A batida entra no log (BatidaPonto) e o dia é reconsolidado na
+        mesma transação - ver ingestion.py para o caminho em lote.
         
         Args:
             colaborador: Colaborador que está registrando
             origem: Origem do registro (web, app, facial, etc)
             localizacao: Coordenadas GPS (opcional)
             observacao: Observação do registro
+            chave: Chave de idempotência do cliente (gerada se ausente)
             
         Returns:
-            Dict com dados do registro criado
+            Dict com dados do registro
         """
         agora = timezone.now()
-        hoje = agora.date()
-        
-        # Busca último registro do dia
-        ultimo_registro = RegistroPonto.objects.filter(
-            colaborador=colaborador,
-            data=hoje
-        ).order_by('-hora').first()
-        
-        # Determina o tipo do registro
-        if not ultimo_registro:
-            tipo = 'entrada'
-        elif ultimo_registro.tipo == 'entrada':
-            tipo = 'inicio_intervalo'
-        elif ultimo_registro.tipo == 'inicio_intervalo':
-            tipo = 'fim_intervalo'
-        elif ultimo_registro.tipo == 'fim_intervalo':
-            tipo = 'saida'
-        else:
-            tipo = 'entrada'  # Novo ciclo
-        
-        # Cria o registro
-        registro = RegistroPonto.objects.create(
-            colaborador=colaborador,
-            data=hoje,
-            hora=agora.time(),
-            tipo=tipo,
-            origem=origem,
-            localizacao=localizacao or {},
-            observacao=observacao
-        )
+        linha = normalizar_batida(colaborador.id, {
+            'chave': chave or uuid.uuid4().hex,
+            'momento': agora,
+            'origem': origem,
+            'localizacao': localizacao,
+            'observacao': observacao,
+        }, agora)
+        IngestaoPonto.write([linha])
+        
+        registro = RegistroPonto.objects.get(colaborador_id=colaborador.id, data=timezone.localdate(agora))
+        # None: quinta batida do dia ou dia já aprovado/ajustado (fica só no log)
+        tipo = next((campo for campo in BATIDAS if getattr(registro, campo) == agora), None)
         
         return {
             'id': registro.id,
             'uuid': str(registro.uuid),
-            'tipo': registro.tipo,
-            'hora': registro.hora.strftime('%H:%M:%S'),
-            'mensagem': f'Ponto de {tipo} registrado com sucesso!'
+            'chave': linha[0],
+            'tipo': tipo,
+            'hora': timezone.localtime(agora).strftime('%H:%M:%S'),
+            'minutos_trabalhados': registro.minutos_trabalhados,
+            'mensagem': f'Ponto de {tipo} registrado com sucesso!' if tipo else 'Batida registrada para revisão.'
         }
     
     def gerar_espelho(
@@ -107,59 +103,26 @@ class PontoService:
         Returns:
             Dict com espelho de ponto
         """
-        # Busca registros do mês
-        registros = RegistroPonto.objects.filter(
-            colaborador=colaborador,
-            data__month=mes,
-            data__year=ano
-        ).order_by('data', 'hora')
-        
-        # Agrupa por dia
-        dias = {}
-        for registro in registros:
-            dia = registro.data.strftime('%Y-%m-%d')
-            if dia not in dias:
-                dias[dia] = []
-            dias[dia].append({
-                'hora': registro.hora.strftime('%H:%M'),
-                'tipo': registro.tipo,
-                'origem': registro.origem
-            })
-        
-        # Calcula totais
-        total_horas = timedelta()
-        for dia, batidas in dias.items():
-            horas_dia = self._calcular_horas_dia(batidas)
-            total_horas += horas_dia
-        
-        return {
-            'colaborador': colaborador.nome_completo,
-            'mes': mes,
-            'ano': ano,
-            'dias': dias,
-            'total_dias': len(dias),
-            'total_horas': str(total_horas),
-            'gerado_em': timezone.now().isoformat()
-        }
+        return espelho_colaborador(colaborador, mes, ano)
     
-    def _calcular_horas_dia(self, batidas: List[Dict]) -> timedelta:
-        """Calcula horas trabalhadas em um dia"""
-        total = timedelta()
-        entrada = None
+    def gerar_espelho_departamento(
+        self,
+        departamento_id: int,
+        mes: int,
+        ano: int
+    ) -> Dict[str, Any]:
+        """
+        Gera espelho consolidado de um departamento.
         
-        for batida in batidas:
-            hora = datetime.strptime(batida['hora'], '%H:%M').time()
+        Args:
+            departamento_id: Departamento
+            mes: Mês de referência
+            ano: Ano de referência
             
-            if batida['tipo'] in ['entrada', 'fim_intervalo']:
-                entrada = hora
-            elif batida['tipo'] in ['saida', 'inicio_intervalo'] and entrada:
-                # Calcula diferença
-                entrada_dt = datetime.combine(date.today(), entrada)
-                saida_dt = datetime.combine(date.today(), hora)
-                total += saida_dt - entrada_dt
-                entrada = None
-        
-        return total
+        Returns:
+            Dict com totais mensais por colaborador
+        """
+        return espelho_departamento(departamento_id, mes, ano)
 
 
 class FeriasService:
@@ -334,7 +297,27 @@ class FolhaPagamentoService:
     - Integração contábil
     """
     
-    @transaction.atomic
+    def processar_competencia(
+        self,
+        empresa,
+        mes: int,
+        ano: int,
+        workers: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Processa a folha de todos os colaboradores da empresa na competência.
+        
+        Args:
+            empresa: Empresa (ou id); None processa todos
+            mes: Mês de referência
+            ano: Ano de referência
+            workers: Processos paralelos por departamento
+            
+        Returns:
+            Dict com contadores, total líquido e versões das tabelas
+        """
+        return processar_competencia(empresa, mes, ano, workers=workers)
+    
     def processar_folha(
         self,
         colaborador: Colaborador,
@@ -352,109 +335,14 @@ class FolhaPagamentoService:
         Returns:
             FolhaPagamento processada
         """
-        # Busca ou cria folha
-        folha, created = FolhaPagamento.objects.get_or_create(
-            colaborador=colaborador,
-            mes=mes,
-            ano=ano,
-            defaults={
-                'salario_base': colaborador.cargo.salario_base if colaborador.cargo else Decimal('0')
-            }
-        )
-        
-        if folha.status == 'fechada':
+        competencia = competencia_de(mes, ano)
+        folha = FolhaPagamento.objects.filter(colaborador=colaborador, competencia=competencia).first()
+        if folha and folha.status in STATUS_FECHADOS:
             raise ValidationError('Folha já está fechada.')
         
-        # Limpa itens existentes
-        folha.itens.all().delete()
-        
-        # Adiciona salário base
-        ItemFolha.objects.create(
-            folha=folha,
-            codigo='001',
-            descricao='Salário Base',
-            tipo='provento',
-            valor=folha.salario_base
-        )
-        
-        # Calcula descontos
-        self._calcular_inss(folha)
-        self._calcular_irrf(folha)
-        
-        # Atualiza totais
-        folha.total_proventos = sum(
-            item.valor for item in folha.itens.filter(tipo='provento')
-        )
-        folha.total_descontos = sum(
-            item.valor for item in folha.itens.filter(tipo='desconto')
-        )
-        folha.salario_liquido = folha.total_proventos - folha.total_descontos
-        folha.status = 'processada'
-        folha.save()
-        
-        return folha
-    
-    def _calcular_inss(self, folha: FolhaPagamento) -> None:
-        """Calcula desconto de INSS"""
-        # Tabela INSS 2024 (simplificada)
-        salario = folha.salario_base
-        
-        if salario <= Decimal('1412.00'):
-            aliquota = Decimal('0.075')
-        elif salario <= Decimal('2666.68'):
-            aliquota = Decimal('0.09')
-        elif salario <= Decimal('4000.03'):
-            aliquota = Decimal('0.12')
-        elif salario <= Decimal('7786.02'):
-            aliquota = Decimal('0.14')
-        else:
-            aliquota = Decimal('0.14')
-            salario = Decimal('7786.02')  # Teto
-        
-        valor_inss = salario * aliquota
-        
-        ItemFolha.objects.create(
-            folha=folha,
-            codigo='101',
-            descricao='INSS',
-            tipo='desconto',
-            referencia=f'{aliquota * 100}%',
-            valor=valor_inss
-        )
-    
-    def _calcular_irrf(self, folha: FolhaPagamento) -> None:
-        """Calcula desconto de IRRF"""
-        # Base de cálculo (salário - INSS)
-        inss = folha.itens.filter(codigo='101').first()
-        base = folha.salario_base - (inss.valor if inss else Decimal('0'))
-        
-        # Tabela IRRF 2024 (simplificada)
-        if base <= Decimal('2259.20'):
-            return  # Isento
-        elif base <= Decimal('2826.65'):
-            aliquota = Decimal('0.075')
-            deducao = Decimal('169.44')
-        elif base <= Decimal('3751.05'):
-            aliquota = Decimal('0.15')
-            deducao = Decimal('381.44')
-        elif base <= Decimal('4664.68'):
-            aliquota = Decimal('0.225')
-            deducao = Decimal('662.77')
-        else:
-            aliquota = Decimal('0.275')
-            deducao = Decimal('896.00')
-        
-        valor_irrf = (base * aliquota) - deducao
-        
-        if valor_irrf > 0:
-            ItemFolha.objects.create(
-                folha=folha,
-                codigo='102',
-                descricao='IRRF',
-                tipo='desconto',
-                referencia=f'{aliquota * 100}%',
-                valor=valor_irrf
-            )
+        salario = colaborador.cargo.salario_base if colaborador.cargo else Decimal('0')
+        processar_chunk([(colaborador.id, salario)], CalculadoraFolha(competencia))
+        return FolhaPagamento.objects.get(colaborador=colaborador, competencia=competencia)
 
 
 class DocumentoService:
@@ -0,0 +1,37 @@
+"""
+SyncRH - Departamento Pessoal - Signals
+=======================================
+
+Mantém os agregados de ponto (timesheet.py) a cada batida, inclusive
+edições pela API e pelo admin, e invalida o cache do dashboard
+(dashboard.py).
+"""
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .dashboard import invalidar_dashboard
+from .models import Colaborador, RegistroPonto, SolicitacaoFerias
+from .timesheet import atualizar_dia, inicio_do_mes, recalcular_mensal
+
+
+@receiver(pre_save, sender=RegistroPonto)
+def calcular_totais_dia(sender, instance, **kwargs):
+    """Minutos trabalhados/extras/faltantes a partir das batidas"""
+    atualizar_dia(instance)
+
+
+@receiver(post_save, sender=RegistroPonto)
+@receiver(post_delete, sender=RegistroPonto)
+def atualizar_espelho_mensal(sender, instance, **kwargs):
+    """Refaz o EspelhoPontoMensal do colaborador na competência"""
+    recalcular_mensal(inicio_do_mes(instance.data), [instance.colaborador_id])
+
+
+@receiver(post_save, sender=Colaborador)
+@receiver(post_delete, sender=Colaborador)
+@receiver(post_save, sender=SolicitacaoFerias)
+@receiver(post_delete, sender=SolicitacaoFerias)
+def invalidar_metricas_dashboard(sender, instance, **kwargs):
+    """Próxima leitura do dashboard recalcula as métricas"""
+    invalidar_dashboard()
@@ -0,0 +1,208 @@
+"""
+SyncRH - Departamento Pessoal - Espelho de Ponto
+================================================
+
+Agregados de ponto mantidos incrementalmente.
+
+- Diário: RegistroPonto (um por colaborador/dia) guarda minutos
+  trabalhados/extras/faltantes, calculados a partir das batidas no
+  pre_save - sem query
+- Mensal: EspelhoPontoMensal por colaborador/competência, refeito no
+  post_save/post_delete do RegistroPonto com um aggregate sobre o mês do
+  colaborador (índice colaborador+data) e um upsert
+- Espelho: uma query por faixa de data (data__gte/data__lt, usa o
+  índice) sobre linhas já calculadas; departamento inteiro lê só
+  EspelhoPontoMensal
+
+Jornada e tolerância: DP_JORNADA_DIARIA_MINUTOS, DP_TOLERANCIA_PONTO_MINUTOS
+(variações até a tolerância não geram extra nem falta - CLT art. 58 §1º).
+"""
+
+from datetime import date
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .models import Colaborador, EspelhoPontoMensal, RegistroPonto
+
+# Campos de batida em ordem cronológica
+BATIDAS = ('entrada', 'saida_almoco', 'retorno_almoco', 'saida')
+
+TOTAIS = ('minutos_trabalhados', 'minutos_extras', 'minutos_faltantes')
+
+ORIGENS_PONTO = frozenset(dict(RegistroPonto._meta.get_field('tipo_registro').choices))
+
+CAMPOS_DIA = ('data', 'tipo_registro', 'status') + BATIDAS + TOTAIS
+
+
+def inicio_do_mes(data: date) -> date:
+    return data.replace(day=1)
+
+
+def proxima_competencia(competencia: date) -> date:
+    return date(competencia.year + competencia.month // 12, competencia.month % 12 + 1, 1)
+
+
+def _minutos(inicio, fim) -> int:
+    if inicio is None or fim is None or fim <= inicio:
+        return 0
+    return int((fim - inicio).total_seconds() // 60)
+
+
+def calcular_dia(entrada, saida_almoco, retorno_almoco, saida) -> Tuple[int, int, int]:
+    """
+    (trabalhados, extras, faltantes) em minutos para as batidas do dia
+
+    Só períodos fechados contam; dia em aberto (sem saída) não gera falta.
+    """
+    if saida_almoco is not None:
+        trabalhados = _minutos(entrada, saida_almoco) + _minutos(retorno_almoco, saida)
+    else:
+        trabalhados = _minutos(entrada, saida)
+
+    if saida is None:
+        return trabalhados, 0, 0
+
+    jornada = getattr(settings, 'DP_JORNADA_DIARIA_MINUTOS', 480)
+    tolerancia = getattr(settings, 'DP_TOLERANCIA_PONTO_MINUTOS', 10)
+    saldo = trabalhados - jornada
+    if abs(saldo) <= tolerancia:
+        return trabalhados, 0, 0
+    return trabalhados, max(saldo, 0), max(-saldo, 0)
+
+
+def atualizar_dia(registro: RegistroPonto) -> None:
+    """Preenche os totais diários do registro (sem salvar)"""
+    trabalhados, extras, faltantes = calcular_dia(*(getattr(registro, campo) for campo in BATIDAS))
+    registro.minutos_trabalhados = trabalhados
+    registro.minutos_extras = extras
+    registro.minutos_faltantes = faltantes
+    registro.horas_trabalhadas = (Decimal(trabalhados) / 60).quantize(Decimal('0.01'))
+    registro.horas_extras = (Decimal(extras) / 60).quantize(Decimal('0.01'))
+    registro.horas_faltantes = (Decimal(faltantes) / 60).quantize(Decimal('0.01'))
+
+
+def recalcular_mensal(competencia: date, colaborador_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Refaz EspelhoPontoMensal da competência (todos ou alguns colaboradores)
+
+    Um aggregate agrupado por colaborador + um upsert (bulk_create com
+    update_conflicts). Idempotente - usado a cada batida e no backfill.
+    """
+    registros = RegistroPonto.objects.filter(
+        data__gte=competencia, data__lt=proxima_competencia(competencia), is_active=True
+    )
+    if colaborador_ids is not None:
+        colaborador_ids = list(colaborador_ids)
+        registros = registros.filter(colaborador_id__in=colaborador_ids)
+
+    linhas = {
+        linha['colaborador_id']: linha
+        for linha in registros.order_by().values('colaborador_id', 'colaborador__departamento_id').annotate(
+            dias_trabalhados=Count('id', filter=Q(minutos_trabalhados__gt=0)),
+            total_trabalhados=Sum('minutos_trabalhados'),
+            total_extras=Sum('minutos_extras'),
+            total_faltantes=Sum('minutos_faltantes'),
+        )
+    }
+    # Colaboradores sem registros no mês (ex.: registro excluído) voltam a zero
+    for colaborador_id, departamento_id in Colaborador.objects.filter(
+        pk__in=[pk for pk in colaborador_ids or () if pk not in linhas]
+    ).values_list('id', 'departamento_id'):
+        linhas[colaborador_id] = {'colaborador__departamento_id': departamento_id}
+
+    agora = timezone.now()
+    espelhos = [
+        EspelhoPontoMensal(
+            colaborador_id=colaborador_id,
+            departamento_id=linha['colaborador__departamento_id'],
+            competencia=competencia,
+            dias_trabalhados=linha.get('dias_trabalhados') or 0,
+            minutos_trabalhados=linha.get('total_trabalhados') or 0,
+            minutos_extras=linha.get('total_extras') or 0,
+            minutos_faltantes=linha.get('total_faltantes') or 0,
+            updated_at=agora,
+        )
+        for colaborador_id, linha in linhas.items()
+    ]
+    if espelhos:
+        EspelhoPontoMensal.objects.bulk_create(
+            espelhos,
+            update_conflicts=True,
+            unique_fields=['colaborador', 'competencia'],
+            update_fields=['departamento', 'dias_trabalhados', *TOTAIS, 'updated_at'],
+        )
+    return len(espelhos)
+
+
+def _batidas(linha: Dict) -> List[Dict]:
+    origem = linha['tipo_registro']
+    return [
+        {'hora': timezone.localtime(linha[campo]).strftime('%H:%M'), 'tipo': campo, 'origem': origem}
+        for campo in BATIDAS if linha[campo] is not None
+    ]
+
+
+def espelho_colaborador(colaborador: Colaborador, mes: int, ano: int) -> Dict:
+    """Espelho de um colaborador: uma query por faixa de data"""
+    competencia = date(ano, mes, 1)
+    linhas = RegistroPonto.objects.filter(
+        colaborador=colaborador, data__gte=competencia, data__lt=proxima_competencia(competencia), is_active=True
+    ).order_by('data').values(*CAMPOS_DIA)
+
+    dias = {}
+    totais = dict.fromkeys(TOTAIS, 0)
+    for linha in linhas:
+        for campo in TOTAIS:
+            totais[campo] += linha[campo]
+        dias[linha['data'].isoformat()] = {
+            'batidas': _batidas(linha),
+            'status': linha['status'],
+            **{campo: linha[campo] for campo in TOTAIS},
+        }
+
+    return {
+        'colaborador': colaborador.nome_completo,
+        'mes': mes,
+        'ano': ano,
+        'dias': dias,
+        'total_dias': len(dias),
+        'total_horas': formatar_minutos(totais['minutos_trabalhados']),
+        **totais,
+        'gerado_em': timezone.now().isoformat(),
+    }
+
+
+def espelho_departamento(departamento_id: int, mes: int, ano: int) -> Dict:
+    """Totais do mês de todos os colaboradores do departamento (uma query)"""
+    competencia = date(ano, mes, 1)
+    linhas = list(
+        EspelhoPontoMensal.objects.filter(departamento_id=departamento_id, competencia=competencia)
+        .order_by('colaborador__nome_completo')
+        .values('colaborador_id', 'colaborador__nome_completo', 'dias_trabalhados', *TOTAIS)
+    )
+    return {
+        'departamento': departamento_id,
+        'mes': mes,
+        'ano': ano,
+        'colaboradores': [
+            {
+                'colaborador': linha['colaborador_id'],
+                'nome': linha['colaborador__nome_completo'],
+                'dias_trabalhados': linha['dias_trabalhados'],
+                'total_horas': formatar_minutos(linha['minutos_trabalhados']),
+                **{campo: linha[campo] for campo in TOTAIS},
+            }
+            for linha in linhas
+        ],
+        **{campo: sum(linha[campo] for linha in linhas) for campo in TOTAIS},
+        'gerado_em': timezone.now().isoformat(),
+    }
+
+
+def formatar_minutos(minutos: int) -> str:
+    """'HH:MM' (horas podem passar de 24)"""
+    return f'{minutos // 60:02d}:{minutos % 60:02d}'
@@ -19,12 +19,15 @@ router.register(r'registros-ponto', views.RegistroPontoViewSet, basename='regist
 router.register(r'folhas-pagamento', views.FolhaPagamentoViewSet, basename='folha-pagamento')
 router.register(r'ferias', views.SolicitacaoFeriasViewSet, basename='ferias')
 router.register(r'documentos', views.DocumentoGEDViewSet, basename='documento')
+router.register(r'exportacoes', views.ExportacaoContabilViewSet, basename='exportacao-contabil')
 
 urlpatterns = [
     path('api/', include(router.urls)),
     
     # Endpoints customizados
     path('api/ponto/registrar/', views.RegistrarPontoView.as_view(), name='registrar-ponto'),
+    path('api/ponto/sincronizar/', views.SincronizarPontoView.as_view(), name='sincronizar-ponto'),
     path('api/ponto/meu-espelho/', views.MeuEspelhoPontoView.as_view(), name='meu-espelho-ponto'),
+    path('api/ponto/espelho-departamento/<int:departamento_id>/', views.EspelhoDepartamentoView.as_view(), name='espelho-departamento'),
     path('api/dashboard/', views.DashboardDPView.as_view(), name='dashboard'),
 ]
@@ -5,24 +5,32 @@ SyncRH - Departamento Pessoal - Views
 Views e ViewSets do módulo Departamento Pessoal.
 """
 
-from rest_framework import viewsets, status, permissions
+import uuid
+
+from rest_framework import viewsets, mixins, status, permissions
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from django.conf import settings
 from django.utils import timezone
+from django.core.exceptions import ValidationError
 from django.db.models import Count, Sum, Q
-from datetime import date, timedelta
 
 from .models import (
     Colaborador, Departamento, Cargo, RegistroPonto,
-    FolhaPagamento, SolicitacaoFerias, DocumentoGED
+    FolhaPagamento, SolicitacaoFerias, DocumentoGED, ExportacaoContabil
 )
 from .serializers import (
     ColaboradorSerializer, ColaboradorListSerializer,
     DepartamentoSerializer, CargoSerializer,
     RegistroPontoSerializer, FolhaPagamentoSerializer,
-    SolicitacaoFeriasSerializer, DocumentoGEDSerializer
+    SolicitacaoFeriasSerializer, DocumentoGEDSerializer,
+    ExportacaoContabilSerializer
 )
+from .dashboard import metricas_dashboard
+from .exports import agendar_exportacao, empresa_do_contador, resposta_download, retomar_exportacoes_paradas
+from .ingestion import IngestaoPonto, colaborador_id_do_usuario, normalizar_batida
 from .services import PontoService, FeriasService
 
 
@@ -131,27 +139,111 @@ class RegistrarPontoView(APIView):
     Endpoint para registrar ponto do colaborador.
     
     POST /api/ponto/registrar/
+    
+    Chave de idempotência no header Idempotency-Key ou em `chave`; com
+    DP_PONTO_INGESTAO_ASSINCRONA a batida vai para o buffer (202).
     """
     permission_classes = [permissions.IsAuthenticated]
     
     def post(self, request):
+        colaborador_id = colaborador_id_do_usuario(request.user)
+        if colaborador_id is None:
+            return Response(
+                {'error': 'Usuário não possui cadastro de colaborador'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        chave = request.headers.get('Idempotency-Key') or request.data.get('chave') or uuid.uuid4().hex
+        
+        if not IngestaoPonto.assincrona():
+            service = PontoService()
+            try:
+                resultado = service.registrar_ponto(
+                    colaborador=Colaborador(pk=colaborador_id),
+                    origem=request.data.get('origem', 'web'),
+                    localizacao=request.data.get('localizacao'),
+                    observacao=request.data.get('observacao', ''),
+                    chave=chave
+                )
+            except ValidationError as e:
+                return Response({'error': e.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+            return Response(resultado, status=status.HTTP_201_CREATED)
+        
         try:
-            colaborador = request.user.colaborador
-        except Colaborador.DoesNotExist:
+            linha = normalizar_batida(colaborador_id, {
+                'chave': chave,
+                'origem': request.data.get('origem', 'web'),
+                'localizacao': request.data.get('localizacao'),
+                'observacao': request.data.get('observacao', ''),
+            })
+        except ValidationError as e:
+            return Response({'error': e.messages[0]}, status=status.HTTP_400_BAD_REQUEST)
+        
+        if not IngestaoPonto.submit(linha):
+            return Response(
+                {'error': 'Registro de ponto indisponível, tente novamente.', 'chave': chave},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        return Response({
+            'chave': chave,
+            'status': 'recebida',
+            'hora': timezone.localtime().strftime('%H:%M:%S'),
+        }, status=status.HTTP_202_ACCEPTED)
+
+
+class SincronizarPontoView(APIView):
+    """
+    Sincronização em lote das batidas feitas offline (fila do PWA).
+    
+    POST /api/ponto/sincronizar/
+    {"batidas": [{"chave", "momento", "origem", "localizacao", "observacao"}]}
+    
+    Batidas já recebidas (mesmo colaborador e chave) são ignoradas na
+    gravação, então o cliente pode reenviar o lote inteiro com segurança.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        colaborador_id = colaborador_id_do_usuario(request.user)
+        if colaborador_id is None:
             return Response(
                 {'error': 'Usuário não possui cadastro de colaborador'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        service = PontoService()
-        resultado = service.registrar_ponto(
-            colaborador=colaborador,
-            origem=request.data.get('origem', 'web'),
-            localizacao=request.data.get('localizacao'),
-            observacao=request.data.get('observacao', '')
-        )
+        batidas = request.data.get('batidas')
+        limite = getattr(settings, 'DP_PONTO_SYNC_MAX_BATCH', 500)
+        if not isinstance(batidas, list) or not batidas:
+            return Response({'error': 'Informe a lista de batidas.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(batidas) > limite:
+            return Response(
+                {'error': f'Máximo de {limite} batidas por sincronização.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        return Response(resultado, status=status.HTTP_201_CREATED)
+        agora = timezone.now()
+        aceitas, rejeitadas, pendentes = [], [], []
+        vistas = set()
+        for dados in batidas:
+            chave = dados.get('chave') if isinstance(dados, dict) else None
+            try:
+                if chave is None:
+                    raise ValidationError('Chave de idempotência obrigatória.')
+                linha = normalizar_batida(colaborador_id, dados, agora)
+            except ValidationError as e:
+                rejeitadas.append({'chave': chave, 'erro': e.messages[0]})
+                continue
+            # Mesma chave repetida no lote: uma única batida (colaborador, chave)
+            if linha[0] in vistas:
+                continue
+            vistas.add(linha[0])
+            (aceitas if IngestaoPonto.submit(linha) else pendentes).append(linha[0])
+        
+        request.pwa_synced = not pendentes
+        return Response(
+            {'aceitas': aceitas, 'rejeitadas': rejeitadas, 'pendentes': pendentes},
+            status=status.HTTP_202_ACCEPTED
+        )
 
 
 class MeuEspelhoPontoView(APIView):
@@ -164,7 +256,7 @@ class MeuEspelhoPontoView(APIView):
     
     def get(self, request):
         try:
-            colaborador = request.user.colaborador
+            colaborador = request.user.colaborador_dp
         except Colaborador.DoesNotExist:
             return Response(
                 {'error': 'Usuário não possui cadastro de colaborador'},
@@ -180,6 +272,24 @@ class MeuEspelhoPontoView(APIView):
         return Response(espelho)
 
 
+class EspelhoDepartamentoView(APIView):
+    """
+    Espelho de ponto consolidado de um departamento.
+    
+    GET /api/ponto/espelho-departamento/<departamento_id>/?mes=&ano=
+    """
+    permission_classes = [permissions.IsAdminUser]
+    
+    def get(self, request, departamento_id):
+        mes = request.query_params.get('mes', timezone.now().month)
+        ano = request.query_params.get('ano', timezone.now().year)
+        
+        service = PontoService()
+        espelho = service.gerar_espelho_departamento(departamento_id, int(mes), int(ano))
+        
+        return Response(espelho)
+
+
 class FolhaPagamentoViewSet(viewsets.ModelViewSet):
     """ViewSet para folhas de pagamento"""
     queryset = FolhaPagamento.objects.all()
@@ -261,48 +371,90 @@ class DocumentoGEDViewSet(viewsets.ModelViewSet):
         return queryset.select_related('colaborador', 'categoria')
 
 
-class DashboardDPView(APIView):
+class ExportacaoContabilViewSet(mixins.CreateModelMixin,
+                                mixins.ListModelMixin,
+                                mixins.RetrieveModelMixin,
+                                viewsets.GenericViewSet):
     """
-    Dashboard do Departamento Pessoal.
+    Exportações para o contador.
     
-    GET /api/dashboard/
+    Endpoints:
+    - POST /api/exportacoes/ - Solicita exportação (gerada em segundo plano)
+    - GET /api/exportacoes/{id}/ - Status e progresso
+    - GET /api/exportacoes/{id}/download/ - Arquivo (streaming)
     """
+    queryset = ExportacaoContabil.objects.all()
+    serializer_class = ExportacaoContabilSerializer
     permission_classes = [permissions.IsAuthenticated]
     
-    def get(self, request):
-        hoje = date.today()
-        
-        # Estatísticas gerais
-        total_colaboradores = Colaborador.objects.filter(
-            is_active=True,
-            data_demissao__isnull=True
-        ).count()
+    def get_queryset(self):
+        queryset = super().get_queryset()
         
-        admissoes_mes = Colaborador.objects.filter(
-            data_admissao__month=hoje.month,
-            data_admissao__year=hoje.year
-        ).count()
+        # Contador vê só as próprias exportações
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(contador__user=self.request.user)
         
-        demissoes_mes = Colaborador.objects.filter(
-            data_demissao__month=hoje.month,
-            data_demissao__year=hoje.year
-        ).count()
+        competencia = self.request.query_params.get('competencia')
+        tipo = self.request.query_params.get('tipo')
         
-        ferias_pendentes = SolicitacaoFerias.objects.filter(
-            status='pendente'
-        ).count()
+        if competencia:
+            queryset = queryset.filter(competencia=competencia)
+        if tipo:
+            queryset = queryset.filter(tipo=tipo)
         
-        # Aniversariantes do mês
-        aniversariantes = Colaborador.objects.filter(
-            is_active=True,
-            data_nascimento__month=hoje.month
-        ).values('nome_completo', 'data_nascimento')[:10]
+        return queryset.select_related('contador')
+    
+    def perform_create(self, serializer):
+        contador = serializer.validated_data['contador']
+        user = self.request.user
+        if not user.is_staff and contador.user_id != user.pk:
+            raise PermissionDenied('Exportação restrita ao próprio contador.')
+        # Dados exportados são os da empresa do contador
+        empresa_id = empresa_do_contador(contador)
+        if empresa_id is None:
+            raise PermissionDenied('Contador sem empresa vinculada.')
+        if not user.is_superuser and empresa_id != getattr(user, 'company_id', None):
+            raise PermissionDenied('Contador de outra empresa.')
+        exportacao = serializer.save(status='gerando')
+        agendar_exportacao(exportacao.pk)
+    
+    def retrieve(self, request, *args, **kwargs):
+        retomar_exportacoes_paradas(self.get_object().pk)
+        return super().retrieve(request, *args, **kwargs)
+    
+    @action(detail=True, methods=['get'])
+    def download(self, request, pk=None):
+        """Baixa o arquivo gerado"""
+        exportacao = self.get_object()
+        if retomar_exportacoes_paradas(exportacao.pk):
+            exportacao.refresh_from_db()
+        if exportacao.status not in ('disponivel', 'baixado') or not exportacao.arquivo:
+            return Response(
+                {'error': 'Exportação ainda não disponível.', 'status': exportacao.status,
+                 'progresso': exportacao.progresso},
+                status=status.HTTP_409_CONFLICT
+            )
+        return resposta_download(exportacao)
+
+
+class DashboardDPView(APIView):
+    """
+    Dashboard do Departamento Pessoal.
+    
+    GET /api/dashboard/
+    
+    Métricas em cache por tenant (dashboard.py), invalidadas pelos signals.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        metricas = metricas_dashboard()
         
         return Response({
-            'total_colaboradores': total_colaboradores,
-            'admissoes_mes': admissoes_mes,
-            'demissoes_mes': demissoes_mes,
-            'ferias_pendentes': ferias_pendentes,
-            'aniversariantes': list(aniversariantes),
-            'data_atualizacao': timezone.now()
+            'total_colaboradores': metricas['total_colaboradores'],
+            'admissoes_mes': metricas['admissoes_mes'],
+            'demissoes_mes': metricas['demissoes_mes'],
+            'ferias_pendentes': metricas['ferias_pendentes'],
+            'aniversariantes': metricas['aniversariantes'],
+            'data_atualizacao': metricas['data_atualizacao']
         })
@@ -11,5 +11,4 @@ class NistConfig(AppConfig):
     verbose_name = 'NIST - Cybersecurity Framework'
     
     def ready(self):
-        # Importa signals se necessário
-        pass
+        from . import signals  # noqa: F401
@@ -0,0 +1,326 @@
+"""
+SyncRH - Motor de Regras de Detecção
+====================================
+RegraDeteccao compiladas uma vez para o DeteccaoService (DE.AE, DE.CM).
+
+Compilação:
+- cada condição de `condicoes` vira uma closure (valor da regra já
+  convertido: float para greater_than/less_than, frozenset para in,
+  regex pré-compilada para regex)
+- condições baratas primeiro (equals/in), regex por último
+- índice por tipo_evento (regras sem tipo_evento valem para todos) e,
+  dentro dele, pelo campo/valor(es) de uma condição equals (ou in) da
+  regra: só são avaliadas as regras cujo valor-chave coincide com o do
+  evento, mais as regras sem chave cujos campos estão todos no evento
+
+Formato de condicoes:
+    {"campo": {"operador": "equals|contains|greater_than|less_than|in|regex",
+               "valor": ...}}
+Campo ausente no evento = regra não casa (como antes).
+
+Hot swap: stamp de versão no cache (DETECTION_ENGINE_VERSION_KEY,
+incrementado pelos signals de RegraDeteccao), consultado a cada
+NIST_DETECTION_CHECK_INTERVAL segundos. Com o LocMemCache padrão o
+stamp não sai do processo que salvou a regra: os demais workers
+recompilam quando o snapshot passa de NIST_DETECTION_MAX_AGE segundos.
+"""
+
+import re
+import time
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+DETECTION_ENGINE_VERSION_KEY = 'nist:detection_engine:version'
+
+OPERATORS = ('equals', 'contains', 'greater_than', 'less_than', 'in', 'regex')
+
+# Ordem de avaliação (mais barato primeiro)
+_COST = {'equals': 0, 'in': 1, 'greater_than': 2, 'less_than': 2, 'contains': 3, 'regex': 4}
+
+RULE_FIELDS = ('id', 'nome', 'descricao', 'severidade', 'tipo_evento', 'condicoes')
+
+Predicate = Callable[[Dict], bool]
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def compile_condition(field: str, config: Dict) -> Predicate:
+    """Closure da condição (ValueError/re.error se inválida)"""
+    operator = config.get('operador', 'equals')
+    expected = config.get('valor')
+    missing = object()
+
+    if operator == 'equals':
+        def predicate(data):
+            return data.get(field, missing) == expected
+    elif operator == 'contains':
+        needle = str(expected)
+
+        def predicate(data):
+            value = data.get(field)
+            return value is not None and needle in str(value)
+    elif operator in ('greater_than', 'less_than'):
+        limit = float(expected)
+        greater = operator == 'greater_than'
+
+        def predicate(data):
+            value = _number(data.get(field))
+            if value is None:
+                return False
+            return value > limit if greater else value < limit
+    elif operator == 'in':
+        try:
+            options = frozenset(expected)
+        except TypeError:
+            options = tuple(expected)
+
+        def predicate(data):
+            value = data.get(field, missing)
+            if value is missing or value is None:
+                return False
+            try:
+                return value in options
+            except TypeError:
+                return False
+    elif operator == 'regex':
+        pattern = re.compile(str(expected))
+
+        def predicate(data):
+            value = data.get(field)
+            return value is not None and pattern.search(str(value)) is not None
+    else:
+        raise ValueError(f"operador desconhecido '{operator}'")
+    return predicate
+
+
+@dataclass(frozen=True)
+class CompiledRule:
+    """Regra pronta para avaliação (sem referência ao model)"""
+
+    id: Optional[int]
+    nome: str
+    descricao: str
+    severidade: str
+    tipo_evento: str
+    campos: Tuple[str, ...]
+    predicates: Tuple[Predicate, ...]
+    # Condição equals/in usada no índice (campo, valores) - None se não houver
+    chave: Optional[Tuple[str, Tuple]] = None
+
+    def matches(self, data: Dict) -> bool:
+        for predicate in self.predicates:
+            if not predicate(data):
+                return False
+        return True
+
+
+def compile_rule(row: Dict) -> Optional[CompiledRule]:
+    """Compila uma linha de RegraDeteccao (None se vazia ou inválida)"""
+    condicoes = row.get('condicoes') or {}
+    if not condicoes:
+        return None
+    try:
+        ordered = sorted(condicoes.items(), key=lambda item: _COST.get(item[1].get('operador', 'equals'), 5))
+        predicates = tuple(compile_condition(field, config) for field, config in ordered)
+    except (ValueError, TypeError, AttributeError, re.error) as e:
+        logger.warning(f"Regra de detecção {row.get('id')} ignorada: {e}")
+        return None
+
+    chave = None
+    for operator in ('equals', 'in'):
+        for field, config in ordered:
+            if config.get('operador', 'equals') != operator or config.get('valor') is None:
+                continue
+            values = (config['valor'],) if operator == 'equals' else tuple(config['valor'])
+            try:
+                values = tuple(frozenset(values))
+            except TypeError:
+                continue
+            chave = (field, values)
+            break
+        if chave:
+            break
+
+    return CompiledRule(
+        id=row.get('id'),
+        nome=row.get('nome', ''),
+        descricao=row.get('descricao', ''),
+        severidade=row.get('severidade', 'media'),
+        tipo_evento=row.get('tipo_evento') or '',
+        campos=tuple(field for field, _ in ordered),
+        predicates=predicates,
+        chave=chave,
+    )
+
+
+class _EventIndex:
+    """Regras de um tipo de evento: por campo -> valor + sem chave"""
+
+    __slots__ = ('keyed', 'unkeyed')
+
+    def __init__(self, rules: Iterable[CompiledRule]):
+        self.keyed: Dict[str, Dict[object, List[CompiledRule]]] = {}
+        self.unkeyed: List[CompiledRule] = []
+        for rule in rules:
+            if rule.chave is None:
+                self.unkeyed.append(rule)
+            else:
+                field, values = rule.chave
+                by_value = self.keyed.setdefault(field, {})
+                for value in values:
+                    by_value.setdefault(value, []).append(rule)
+
+    def candidates(self, data: Dict) -> List[CompiledRule]:
+        found = []
+        for field, by_value in self.keyed.items():
+            value = data.get(field)
+            if value is None:
+                continue
+            try:
+                rules = by_value.get(value)
+            except TypeError:
+                continue
+            if rules:
+                found.extend(rules)
+        for rule in self.unkeyed:
+            for field in rule.campos:
+                if field not in data:
+                    break
+            else:
+                found.append(rule)
+        return found
+
+
+class DetectionEngine:
+    """
+    Snapshot compilado e imutável das regras ativas
+
+    Uso:
+        engine = DetectionEngine.current()
+        engine.match(tipo_evento, dados) -> [CompiledRule, ...]
+    """
+
+    _current: Optional['DetectionEngine'] = None
+    _checked_at = 0.0
+    _lock = threading.Lock()
+
+    def __init__(self, rows: Iterable[Dict] = (), version=None):
+        self.version = version
+        self.built_at = time.time()
+        rules = [rule for rule in map(compile_rule, rows) if rule is not None]
+        self.size = len(rules)
+        by_type: Dict[str, List[CompiledRule]] = {}
+        for rule in rules:
+            by_type.setdefault(rule.tipo_evento, []).append(rule)
+        wildcard = by_type.pop('', [])
+        self._wildcard = _EventIndex(wildcard)
+        self._by_type = {tipo: _EventIndex(type_rules) for tipo, type_rules in by_type.items()}
+
+    def match(self, tipo_evento: str, data: Dict) -> List[CompiledRule]:
+        """Regras que casam com o evento"""
+        index = self._by_type.get(tipo_evento)
+        candidates = self._wildcard.candidates(data)
+        if index is not None:
+            candidates = index.candidates(data) + candidates
+        matched = []
+        for rule in candidates:
+            try:
+                if rule.matches(data):
+                    matched.append(rule)
+            except Exception as e:
+                logger.error(f"Erro ao verificar regra {rule.id}: {e}")
+        return matched
+
+    def stats(self) -> Dict:
+        return {
+            'version': self.version,
+            'built_at': self.built_at,
+            'rules': self.size,
+            'event_types': sorted(self._by_type),
+        }
+
+    # ------------------------------------------------------------------
+    # Carga e hot swap
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def check_interval() -> float:
+        return getattr(settings, 'NIST_DETECTION_CHECK_INTERVAL', 5)
+
+    @staticmethod
+    def max_age() -> float:
+        return getattr(settings, 'NIST_DETECTION_MAX_AGE', 60)
+
+    @staticmethod
+    def load(version=None) -> 'DetectionEngine':
+        """Compila as regras habilitadas a partir do banco (1 query)"""
+        from .models import RegraDeteccao
+
+        rows = RegraDeteccao.objects.filter(habilitada=True, is_active=True).values(*RULE_FIELDS)
+        return DetectionEngine(list(rows), version=version)
+
+    @staticmethod
+    def current() -> 'DetectionEngine':
+        """Snapshot vigente (recompilado quando a versão no cache muda ou após NIST_DETECTION_MAX_AGE)"""
+        engine = DetectionEngine._current
+        now = time.monotonic()
+        if engine is not None and now - DetectionEngine._checked_at < DetectionEngine.check_interval():
+            return engine
+
+        if not DetectionEngine._lock.acquire(blocking=engine is None):
+            return engine
+        try:
+            if DetectionEngine._current is not engine:
+                return DetectionEngine._current
+            DetectionEngine._checked_at = now
+            try:
+                version = cache.get(DETECTION_ENGINE_VERSION_KEY)
+            except Exception as e:
+                logger.warning(f"Detection engine version unavailable: {e}")
+                return engine or DetectionEngine()
+            if (
+                engine is not None and engine.version == version
+                and time.time() - engine.built_at < DetectionEngine.max_age()
+            ):
+                return engine
+            try:
+                DetectionEngine._current = DetectionEngine.load(version)
+                logger.info(f"Regras de detecção recompiladas: {DetectionEngine._current.stats()}")
+            except Exception as e:
+                logger.warning(f"Regras de detecção não puderam ser carregadas: {e}")
+                if engine is None:
+                    DetectionEngine._current = DetectionEngine(version=object())
+            return DetectionEngine._current
+        finally:
+            DetectionEngine._lock.release()
+
+    @staticmethod
+    def bump_version() -> None:
+        """Invalida o snapshot (outros workers: via cache compartilhado ou MAX_AGE)"""
+        try:
+            cache.incr(DETECTION_ENGINE_VERSION_KEY)
+        except ValueError:
+            cache.set(DETECTION_ENGINE_VERSION_KEY, int(time.time() * 1000), None)
+        except Exception as e:
+            logger.warning(f"Detection engine version unavailable: {e}")
+        DetectionEngine._checked_at = 0.0
+
+    @staticmethod
+    def reset() -> None:
+        with DetectionEngine._lock:
+            DetectionEngine._current = None
+            DetectionEngine._checked_at = 0.0
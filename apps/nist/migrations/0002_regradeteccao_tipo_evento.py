@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-17 05:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('nist', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='regradeteccao',
+            name='tipo_evento',
+            field=models.CharField(blank=True, db_index=True, help_text='Tipo de evento avaliado pela regra (vazio = todos)', max_length=50),
+        ),
+    ]
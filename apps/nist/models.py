@@ -362,6 +362,12 @@ class RegraDeteccao(BaseModel):
             ('correlacao', 'Correlação de Eventos'),
         ]
     )
+    tipo_evento = models.CharField(
+        max_length=50,
+        blank=True,
+        db_index=True,
+        help_text='Tipo de evento avaliado pela regra (vazio = todos)'
+    )
     
     # Configuração da regra
     condicoes = models.JSONField(
@@ -9,9 +9,12 @@ from django.utils import timezone
 from django.core.mail import send_mail
 from django.conf import settings
 from datetime import timedelta
+from typing import Iterable, Optional
 import logging
 import json
 
+from .detection import DetectionEngine
+
 logger = logging.getLogger(__name__)
 
 
@@ -117,6 +120,9 @@ class AvaliacaoRiscoService:
 class DeteccaoService:
     """
     Serviço para detecção de ameaças e anomalias.
+    
+    As regras são compiladas e indexadas por DetectionEngine (detection.py);
+    os alertas são gravados com bulk_create.
     """
     
     @staticmethod
@@ -124,68 +130,88 @@ class DeteccaoService:
         """
         Processa evento e verifica contra regras de detecção.
         """
-        from .models import RegraDeteccao, AlertaSeguranca
-        
-        # Busca regras ativas
-        regras = RegraDeteccao.objects.filter(
-            ativa=True,
-            tipo_evento=tipo_evento
-        )
-        
-        alertas_gerados = []
-        
-        for regra in regras:
-            if DeteccaoService._verificar_regra(regra, dados):
-                alerta = AlertaSeguranca.objects.create(
-                    regra=regra,
-                    titulo=f'Alerta: {regra.nome}',
-                    descricao=regra.descricao,
-                    severidade=regra.severidade,
-                    dados_evento=dados,
-                    origem=origem
-                )
-                alertas_gerados.append(alerta)
-                
-                # Notifica se severidade alta
-                if regra.severidade in ['alta', 'critica']:
-                    DeteccaoService._notificar_alerta(alerta)
-        
-        return alertas_gerados
+        engine = DetectionEngine.current()
+        modelo = DeteccaoService._modelo_alerta()
+        alertas = [
+            DeteccaoService._novo_alerta(modelo, regra, dados, origem)
+            for regra in engine.match(tipo_evento, dados)
+        ]
+        if alertas:
+            DeteccaoService._gravar_alertas(modelo, alertas)
+        return alertas
     
     @staticmethod
-    def _verificar_regra(regra, dados: dict) -> bool:
+    def processar_eventos(eventos: Iterable, origem: str = '', batch_size: Optional[int] = None) -> dict:
         """
-        Verifica se os dados correspondem às condições da regra.
-        Suporta operadores: equals, contains, greater_than, less_than, in, regex
+        Processa um fluxo de eventos (auditoria, zero-trust) em lote.
+        
+        Cada evento é (tipo_evento, dados), (tipo_evento, dados, origem) ou
+        {'tipo_evento': ..., 'dados': ..., 'origem': ...}. Os eventos são
+        consumidos sob demanda e os alertas gravados a cada `batch_size`
+        (NIST_DETECTION_BATCH_SIZE), sem manter o fluxo inteiro em memória.
+        
+        Returns:
+            {'eventos': n, 'alertas': n}
         """
-        try:
-            condicoes = regra.condicoes
-            if not condicoes:
-                return False
+        batch_size = batch_size or getattr(settings, 'NIST_DETECTION_BATCH_SIZE', 500)
+        engine = DetectionEngine.current()
+        modelo = DeteccaoService._modelo_alerta()
+        novo_alerta = DeteccaoService._novo_alerta
+        match = engine.match
+        
+        pendentes = []
+        total_eventos = 0
+        total_alertas = 0
+        for evento in eventos:
+            total_eventos += 1
+            if isinstance(evento, dict):
+                tipo_evento = evento.get('tipo_evento', '')
+                dados = evento.get('dados') or {}
+                fonte = evento.get('origem') or origem
+            elif len(evento) == 3:
+                tipo_evento, dados, fonte = evento
+            else:
+                tipo_evento, dados = evento
+                fonte = origem
             
-            for campo, config in condicoes.items():
-                valor_dado = dados.get(campo)
-                if valor_dado is None:
-                    return False
-                
-                operador = config.get('operador', 'equals')
-                valor_regra = config.get('valor')
-                
-                if operador == 'equals' and valor_dado != valor_regra:
-                    return False
-                elif operador == 'contains' and valor_regra not in str(valor_dado):
-                    return False
-                elif operador == 'greater_than' and float(valor_dado) <= float(valor_regra):
-                    return False
-                elif operador == 'less_than' and float(valor_dado) >= float(valor_regra):
-                    return False
-                elif operador == 'in' and valor_dado not in valor_regra:
-                    return False
+            for regra in match(tipo_evento, dados):
+                pendentes.append(novo_alerta(modelo, regra, dados, fonte))
             
-            return True
-        except Exception as e:
-            logger.error(f"Erro ao verificar regra {regra.id}: {e}")
-            return False
+            if len(pendentes) >= batch_size:
+                DeteccaoService._gravar_alertas(modelo, pendentes, batch_size)
+                total_alertas += len(pendentes)
+                pendentes = []
+        
+        if pendentes:
+            DeteccaoService._gravar_alertas(modelo, pendentes, batch_size)
+            total_alertas += len(pendentes)
+        
+        return {'eventos': total_eventos, 'alertas': total_alertas}
+    
+    @staticmethod
+    def _modelo_alerta():
+        from .models import AlertaSeguranca
+        return AlertaSeguranca
+    
+    @staticmethod
+    def _novo_alerta(modelo, regra, dados: dict, origem: str):
+        """AlertaSeguranca não salvo para uma regra compilada"""
+        return modelo(
+            regra_id=regra.id,
+            titulo=f'Alerta: {regra.nome}',
+            descricao=regra.descricao,
+            severidade=regra.severidade,
+            dados_evento=dados,
+            fonte=origem or ''
+        )
+    
+    @staticmethod
+    def _gravar_alertas(modelo, alertas: list, batch_size: Optional[int] = None):
+        """Grava os alertas e notifica os de severidade alta"""
+        modelo.objects.bulk_create(alertas, batch_size=batch_size)
+        for alerta in alertas:
+            if alerta.severidade in ('alta', 'critica'):
+                DeteccaoService._notificar_alerta(alerta)
     
     @staticmethod
     def _notificar_alerta(alerta):
@@ -195,7 +221,7 @@ class DeteccaoService:
             if security_email:
                 send_mail(
                     f'[SEGURANÇA] Alerta {alerta.severidade.upper()}: {alerta.titulo}',
-                    f'{alerta.descricao}\n\nOrigem: {alerta.origem}\n'
+                    f'{alerta.descricao}\n\nOrigem: {alerta.fonte}\n'
                     f'Data: {alerta.created_at}',
                     settings.DEFAULT_FROM_EMAIL,
                     [security_email],
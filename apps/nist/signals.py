@@ -0,0 +1,19 @@
+"""
+SyncRH - Signals NIST
+=====================
+Invalida as regras de detecção compiladas de todos os workers quando
+RegraDeteccao muda.
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .detection import DetectionEngine
+from .models import RegraDeteccao
+
+
+@receiver(post_save, sender=RegraDeteccao)
+@receiver(post_delete, sender=RegraDeteccao)
+def invalidate_detection_engine(sender, **kwargs):
+    """Incrementa o stamp de versão; as regras são recompiladas sob demanda"""
+    DetectionEngine.bump_version()
@@ -0,0 +1,185 @@
+"""
+SyncRH - Zero-Trust Access Log
+==============================
+Persistência assíncrona de AccessContext.
+
+O ZeroTrustMiddleware monta um dict por requisição e o entrega a um
+BatchWriter (apps.core.write_behind): fila limitada em memória drenada
+por uma thread que faz bulk_create em lotes. Custo na requisição: um
+put_nowait.
+
+Cada lote gravado também alimenta BehaviorProfileLearner (perfis
+comportamentais incrementais), fora do caminho da requisição - só com
+acessos permitidos e bem-sucedidos, na hora da requisição (o perfil
+não aprende com tentativas negadas ou que falharam).
+
+Decisões diferentes de 'allow' são críticas (esperam por espaço na
+fila); 'allow' é descartado primeiro quando o banco não acompanha.
+
+IP inválido (X-Forwarded-For é texto do cliente) vira NULL no build;
+uma linha que o banco ainda rejeite não derruba o lote: write() cai
+para inserts por linha e só ela é perdida (este writer não tem spill).
+
+Obs.: access_time/created_at são auto_now_add, portanto refletem o
+momento do flush (tipicamente < ZERO_TRUST_ACCESS_LOG_FLUSH_INTERVAL
+depois da requisição).
+"""
+
+import logging
+import threading
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from apps.core.request_context import valid_ip
+from apps.core.write_behind import UNAVAILABLE_ERRORS, BatchWriter
+
+from .behavior import BehaviorProfileLearner
+
+logger = logging.getLogger('security.zero_trust')
+
+# Campos da linha usados só pelo BehaviorProfileLearner (não são colunas)
+LEARNING_FIELDS = ('timestamp',)
+
+
+def risk_level(score: int) -> str:
+    """Faixa de AccessContext.RISK_LEVELS para o score (0-100)"""
+    if score >= 80:
+        return 'critical'
+    if score >= 60:
+        return 'high'
+    if score >= 30:
+        return 'medium'
+    return 'low'
+
+
+def resource_type(path: str) -> str:
+    if path.startswith('/api/'):
+        return 'api'
+    if path.startswith('/admin/'):
+        return 'admin'
+    if path.startswith('/media/'):
+        return 'file'
+    return 'view'
+
+
+class AccessContextLog:
+    """
+    Registro bufferizado de AccessContext
+
+    Uso:
+        AccessContextLog.record(request, context, decision, reason, response)
+    """
+
+    _writer: Optional[BatchWriter] = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def enabled() -> bool:
+        return getattr(settings, 'ZERO_TRUST_ACCESS_LOG_ENABLED', True)
+
+    @staticmethod
+    def writer() -> BatchWriter:
+        if AccessContextLog._writer is None:
+            with AccessContextLog._lock:
+                if AccessContextLog._writer is None:
+                    AccessContextLog._writer = BatchWriter(
+                        'access_context',
+                        AccessContextLog.write,
+                        max_queue=getattr(settings, 'ZERO_TRUST_ACCESS_LOG_QUEUE_SIZE', 10000),
+                        batch_size=getattr(settings, 'ZERO_TRUST_ACCESS_LOG_BATCH_SIZE', 500),
+                        flush_interval=getattr(settings, 'ZERO_TRUST_ACCESS_LOG_FLUSH_INTERVAL', 2.0),
+                        background=getattr(settings, 'ZERO_TRUST_ACCESS_LOG_BACKGROUND', True),
+                    )
+        return AccessContextLog._writer
+
+    @staticmethod
+    def build(request, context: Dict, decision: str, reason: str, response=None) -> Dict:
+        """Campos de AccessContext a partir do contexto do middleware"""
+        session = getattr(request, 'session', None)
+        path = context['path']
+        status_code = getattr(response, 'status_code', None)
+        return {
+            'session_id': (getattr(session, 'session_key', None) or '')[:255],
+            'request_id': context['request_id'],
+            'user_id': context.get('user_id'),
+            'ip_address': valid_ip(context['ip_address']),
+            'ip_type': context.get('ip_type', ''),
+            'is_business_hours': context.get('is_business_hours', True),
+            'is_unusual_time': not context.get('is_business_hours', True),
+            'resource_type': resource_type(path),
+            'resource_path': path[:500],
+            'resource_method': context['method'][:10],
+            'resource_sensitivity': context.get('resource_sensitivity', 'normal'),
+            'risk_score': context.get('risk_score', 0),
+            'risk_level': risk_level(context.get('risk_score', 0)),
+            'risk_factors': list(context.get('risk_factors', [])),
+            'decision': decision,
+            'decision_reason': reason,
+            'was_successful': status_code is not None and status_code < 400,
+            'response_code': status_code,
+            'timestamp': context.get('timestamp'),
+        }
+
+    @staticmethod
+    def record(request, context: Dict, decision: str, reason: str, response=None) -> bool:
+        """Enfileira o AccessContext da requisição (não bloqueia em 'allow')"""
+        if not AccessContextLog.enabled():
+            return False
+        row = AccessContextLog.build(request, context, decision, reason, response)
+        return AccessContextLog.writer().submit(row, critical=decision != 'allow')
+
+    @staticmethod
+    def write(rows: List[Dict]) -> None:
+        """Grava um lote (thread do BatchWriter)"""
+        from apps.security.zero_trust.models import AccessContext
+
+        try:
+            AccessContext.objects.bulk_create(
+                [AccessContextLog.model_instance(row) for row in rows],
+                batch_size=getattr(settings, 'ZERO_TRUST_ACCESS_LOG_BATCH_SIZE', 500),
+            )
+        except UNAVAILABLE_ERRORS:
+            raise  # banco fora: novas tentativas do BatchWriter
+        except Exception as e:
+            logger.warning(f"AccessContext batch rejected ({e}); retrying row by row")
+            rows = AccessContextLog.write_rows(rows)
+
+        if BehaviorProfileLearner.enabled():
+            try:
+                BehaviorProfileLearner.consume(
+                    [row for row in rows if row.get('decision') == 'allow' and row.get('was_successful')]
+                )
+            except Exception as e:
+                logger.warning(f"Behavior profiles not updated: {e}")
+
+    @staticmethod
+    def model_instance(row: Dict):
+        from apps.security.zero_trust.models import AccessContext
+
+        return AccessContext(**{key: value for key, value in row.items() if key not in LEARNING_FIELDS})
+
+    @staticmethod
+    def write_rows(rows: List[Dict]) -> List[Dict]:
+        """Um INSERT (savepoint) por linha; devolve as linhas gravadas"""
+        saved = []
+        for row in rows:
+            try:
+                with transaction.atomic():
+                    AccessContextLog.model_instance(row).save(force_insert=True)
+            except UNAVAILABLE_ERRORS:
+                raise
+            except Exception as e:
+                logger.error(f"AccessContext dropped ({row.get('request_id')}): {e}")
+                continue
+            saved.append(row)
+        return saved
+
+    @staticmethod
+    def flush() -> int:
+        return AccessContextLog.writer().flush()
+
+    @staticmethod
+    def stats() -> Dict:
+        return AccessContextLog.writer().stats()
@@ -367,10 +367,14 @@ class ThreatIndicatorViewSet(viewsets.ModelViewSet):
         if not ip:
             return Response({'error': 'IP não fornecido'}, status=400)
         
-        is_threat, indicators = ThreatIntelligenceService.check_ip_reputation(ip)
+        result = ThreatIntelligenceService.check_ip(ip)
+        indicators = ThreatIndicator.objects.filter(
+            id__in=[i['id'] for i in result['indicators'] if i['source'] == 'indicator']
+        )
         return Response({
             'ip': ip,
-            'is_threat': is_threat,
+            'is_threat': result['is_threat'],
+            'threat_level': result['threat_level'],
             'indicators': ThreatIndicatorSerializer(indicators, many=True).data
         })
     
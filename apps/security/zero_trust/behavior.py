@@ -0,0 +1,236 @@
+"""
+SyncRH - Aprendizado de Perfil Comportamental
+=============================================
+Atualização incremental de UserBehaviorProfile a partir do fluxo de
+acessos (AccessContextLog), com memória constante por usuário.
+
+Sketch por usuário (UserBehaviorProfile.behavior_sketch):
+- TopK (Space-Saving) de IPs, recursos (path normalizado) e países
+- histograma de 168 posições por hora da semana (horário local)
+- HyperLogLog de IPs e recursos distintos
+
+Os campos legados (typical_ips, typical_resources, typical_locations,
+typical_login_hours) passam a ser projeções limitadas do sketch.
+
+calculate_anomaly_score consulta o sketch com lookups de dict e um
+índice de lista: O(1) por requisição, independente do histórico.
+"""
+
+import re
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from apps.core.sketches import HyperLogLog, TopK
+
+logger = logging.getLogger('security.zero_trust')
+
+HOURS_OF_WEEK = 168
+DAY_NAMES = ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+
+# Segmentos variáveis do path (ids, uuids, hashes) - mantêm o TopK de recursos estável
+_ID_SEGMENT = re.compile(r'/(?:\d+|[0-9a-f]{8}-[0-9a-f-]{27}|[0-9a-f]{24,})(?=/|$)', re.IGNORECASE)
+
+PROFILE_FIELDS = [
+    'behavior_sketch', 'typical_ips', 'typical_resources', 'typical_locations',
+    'typical_login_hours', 'data_points_collected', 'profile_maturity', 'last_profile_update',
+]
+
+
+def normalize_resource(path: str) -> str:
+    return _ID_SEGMENT.sub('/:id', path.split('?', 1)[0])
+
+
+def hour_of_week(moment) -> int:
+    local = timezone.localtime(moment) if timezone.is_aware(moment) else moment
+    return local.weekday() * 24 + local.hour
+
+
+def _setting(name: str, default):
+    return getattr(settings, name, default)
+
+
+class BehaviorSketch:
+    """Resumo de tamanho fixo dos acessos de um usuário"""
+
+    __slots__ = ('count', 'ips', 'resources', 'locations', 'hours', '_hll')
+
+    def __init__(self, data: Optional[Dict] = None):
+        data = data or {}
+        capacity = _setting('ZERO_TRUST_BEHAVIOR_TOP_K', 32)
+        self.count = int(data.get('n', 0))
+        self.ips = TopK.from_dict(data.get('ips'), capacity)
+        self.resources = TopK.from_dict(data.get('resources'), capacity)
+        self.locations = TopK.from_dict(data.get('locations'), capacity)
+        hours = data.get('hours')
+        self.hours: List[int] = list(hours) if hours and len(hours) == HOURS_OF_WEEK else [0] * HOURS_OF_WEEK
+        # HyperLogLog só é decodificado quando atualizado ou consultado
+        self._hll = {'ips': data.get('hll_ips'), 'resources': data.get('hll_resources')}
+
+    @classmethod
+    def from_legacy(cls, profile) -> 'BehaviorSketch':
+        """Sketch equivalente às listas legadas (perfis sem behavior_sketch)"""
+        sketch = cls()
+        support = _setting('ZERO_TRUST_BEHAVIOR_MIN_SUPPORT', 2)
+        for topk, values in ((sketch.ips, profile.typical_ips), (sketch.resources, profile.typical_resources),
+                             (sketch.locations, profile.typical_locations)):
+            for value in values or []:
+                topk.add(str(value), support)
+        for day, hours in (profile.typical_login_hours or {}).items():
+            if day in DAY_NAMES:
+                for hour in hours:
+                    sketch.hours[DAY_NAMES.index(day) * 24 + int(hour)] += 1
+                    sketch.count += 1
+        return sketch
+
+    def hll(self, name: str) -> HyperLogLog:
+        value = self._hll[name]
+        if not isinstance(value, HyperLogLog):
+            value = self._hll[name] = HyperLogLog.from_dict(value, _setting('ZERO_TRUST_BEHAVIOR_HLL_PRECISION', 10))
+        return value
+
+    def add(self, event: Dict, moment) -> None:
+        self.count += 1
+        self.hours[hour_of_week(event.get('timestamp') or moment)] += 1
+        ip = event.get('ip_address')
+        if ip:
+            self.ips.add(ip)
+            self.hll('ips').add(ip)
+        path = event.get('resource_path')
+        if path:
+            resource = normalize_resource(path)
+            self.resources.add(resource)
+            self.hll('resources').add(resource)
+        country = event.get('geo_country')
+        if country:
+            self.locations.add(country)
+
+    # ------------------------------------------------------------------
+    # Consultas (O(1))
+    # ------------------------------------------------------------------
+
+    def is_known(self, topk: TopK, key) -> bool:
+        return topk.guaranteed(key) >= _setting('ZERO_TRUST_BEHAVIOR_MIN_SUPPORT', 2)
+
+    def is_usual_hour(self, moment) -> bool:
+        share = _setting('ZERO_TRUST_BEHAVIOR_MIN_HOUR_SHARE', 0.01)
+        return self.hours[hour_of_week(moment)] >= max(1, self.count * share)
+
+    def distinct_ips(self) -> int:
+        return self.hll('ips').count()
+
+    def distinct_resources(self) -> int:
+        return self.hll('resources').count()
+
+    # ------------------------------------------------------------------
+    # Persistência
+    # ------------------------------------------------------------------
+
+    def to_dict(self) -> Dict:
+        data = {
+            'n': self.count,
+            'ips': self.ips.to_dict(),
+            'resources': self.resources.to_dict(),
+            'locations': self.locations.to_dict(),
+            'hours': self.hours,
+        }
+        for name in ('ips', 'resources'):
+            value = self._hll[name]
+            data[f'hll_{name}'] = value.to_dict() if isinstance(value, HyperLogLog) else value
+        return data
+
+    def apply_to(self, profile, now) -> None:
+        """Grava o sketch e as projeções legadas no perfil"""
+        support = _setting('ZERO_TRUST_BEHAVIOR_MIN_SUPPORT', 2)
+        share = max(1, self.count * _setting('ZERO_TRUST_BEHAVIOR_MIN_HOUR_SHARE', 0.01))
+        profile.behavior_sketch = self.to_dict()
+        profile.typical_ips = [key for key, _ in self.ips.top() if self.ips.guaranteed(key) >= support]
+        profile.typical_resources = [key for key, _ in self.resources.top() if self.resources.guaranteed(key) >= support]
+        profile.typical_locations = [key for key, _ in self.locations.top() if self.locations.guaranteed(key) >= support]
+        profile.typical_login_hours = {
+            day: [hour for hour in range(24) if self.hours[index * 24 + hour] >= share]
+            for index, day in enumerate(DAY_NAMES)
+        }
+        profile.data_points_collected = self.count
+        profile.profile_maturity = maturity(self.count)
+        profile.last_profile_update = now
+        profile._sketch = self
+
+
+def maturity(data_points: int) -> str:
+    thresholds = _setting('ZERO_TRUST_BEHAVIOR_MATURITY', {'baseline': 50, 'mature': 500})
+    if data_points >= thresholds.get('mature', 500):
+        return 'mature'
+    if data_points >= thresholds.get('baseline', 50):
+        return 'baseline'
+    return 'learning'
+
+
+def profile_sketch(profile) -> BehaviorSketch:
+    """Sketch do perfil, decodificado uma vez por instância"""
+    sketch = getattr(profile, '_sketch', None)
+    if sketch is None:
+        sketch = BehaviorSketch(profile.behavior_sketch) if profile.behavior_sketch else BehaviorSketch.from_legacy(profile)
+        profile._sketch = sketch
+    return sketch
+
+
+class BehaviorProfileLearner:
+    """
+    Consome lotes de eventos de acesso e atualiza os perfis
+
+    Uso:
+        BehaviorProfileLearner.consume(rows)  # dicts com user_id, ip_address,
+                                              # resource_path, geo_country, timestamp
+    """
+
+    @staticmethod
+    def enabled() -> bool:
+        return _setting('ZERO_TRUST_BEHAVIOR_LEARNING_ENABLED', True)
+
+    @staticmethod
+    def group(events: Iterable[Dict]) -> Dict[int, List[Dict]]:
+        by_user: Dict[int, List[Dict]] = defaultdict(list)
+        for event in events:
+            user_id = event.get('user_id')
+            if user_id:
+                by_user[user_id].append(event)
+        return by_user
+
+    @staticmethod
+    def consume(events: Iterable[Dict]) -> int:
+        """Atualiza os perfis dos usuários do lote (2 queries + gravação em lote)"""
+        from apps.security.zero_trust.models import UserBehaviorProfile
+
+        by_user = BehaviorProfileLearner.group(events)
+        if not by_user:
+            return 0
+
+        now = timezone.now()
+        with transaction.atomic():
+            # Ordem fixa de lock: flushes concorrentes de outros workers não se travam
+            locked = UserBehaviorProfile.objects.select_for_update().filter(
+                user_id__in=list(by_user)
+            ).order_by('user_id')
+            existing = {profile.user_id: profile for profile in locked}
+            created = []
+            for user_id, user_events in by_user.items():
+                profile = existing.get(user_id)
+                if profile is None:
+                    profile = UserBehaviorProfile(user_id=user_id)
+                    created.append(profile)
+                sketch = profile_sketch(profile)
+                for event in user_events:
+                    sketch.add(event, now)
+                sketch.apply_to(profile, now)
+
+            if existing:
+                UserBehaviorProfile.objects.bulk_update(existing.values(), PROFILE_FIELDS)
+            if created:
+                # Concorrência com outro worker: o lote do perdedor é descartado
+                UserBehaviorProfile.objects.bulk_create(created, ignore_conflicts=True)
+        return len(by_user)
@@ -12,15 +12,30 @@ Fluxo:
 """
 
 import uuid
-import hashlib
 import logging
 from datetime import timedelta
+from urllib.parse import unquote_plus
 from django.conf import settings
 from django.http import JsonResponse
 from django.utils import timezone
 from django.core.cache import cache
 from django.contrib.auth import get_user_model
 
+from apps.core.rate_limit import RateLimiter
+from apps.core.request_context import (
+    ROUTE_SENSITIVITY,
+    apply_security_headers,
+    get_request_context,
+    prefix_matcher,
+)
+from apps.security.zero_trust.access_log import AccessContextLog
+from apps.security.zero_trust.policy_engine import PolicyEngine, user_roles
+from apps.security.zero_trust.threat_matcher import (
+    THREAT_LEVEL_SCORES,
+    ThreatMatcher,
+    classify_ip,
+)
+
 logger = logging.getLogger('security.zero_trust')
 User = get_user_model()
 
@@ -48,19 +63,24 @@ class ZeroTrustMiddleware:
         '/media/',
         '/api/pwa/',
         '/health/',
+        '/metrics',
         '/__debug__/',
     ]
     
     # Recursos sensíveis que requerem verificação extra
-    SENSITIVE_RESOURCES = {
-        '/api/lgpd/': 'high',
-        '/api/nist/': 'high',
-        '/api/security/': 'high',
-        '/admin/': 'elevated',
-        '/api/finance/': 'elevated',
-        '/api/hrm/employees/': 'elevated',
-        '/api/users/': 'elevated',
-    }
+    # (settings.SECURITY_ROUTE_SENSITIVITY, ver apps.core.request_context)
+    SENSITIVE_RESOURCES = ROUTE_SENSITIVITY
+    
+    # CSP para PWA
+    PWA_CSP = (
+        "default-src 'self'; "
+        "script-src 'self' 'unsafe-inline' 'unsafe-eval'; "
+        "style-src 'self' 'unsafe-inline'; "
+        "img-src 'self' data: https:; "
+        "font-src 'self' data:; "
+        "connect-src 'self' https:; "
+        "manifest-src 'self';"
+    )
     
     def __init__(self, get_response):
         self.get_response = get_response
@@ -84,93 +104,85 @@ class ZeroTrustMiddleware:
         # Aplicar políticas
         decision, reason = self._apply_policies(request, context)
         
-        # Registrar contexto de acesso
-        self._log_access_context(request, context, decision, reason)
-        
         # Executar decisão
         if decision == 'deny':
-            return self._deny_access(request, reason)
+            response = self._deny_access(request, reason)
         elif decision == 'challenge':
-            return self._challenge_mfa(request, reason)
+            response = self._challenge_mfa(request, reason)
         elif decision == 'step_up':
-            return self._require_step_up(request, reason)
-        
-        # Permitir acesso
-        response = self.get_response(request)
+            response = self._require_step_up(request, reason)
+        else:
+            # Permitir acesso
+            response = self.get_response(request)
+            
+            # Adicionar headers de segurança
+            response = self._add_security_headers(response, context)
         
-        # Adicionar headers de segurança
-        response = self._add_security_headers(response, context)
+        # Registrar contexto de acesso (com o status da resposta)
+        self._log_access_context(request, context, decision, reason, response)
         
         return response
     
     def _is_exempt(self, path):
         """Verifica se path está isento de verificação."""
-        for exempt in self.EXEMPT_PATHS:
-            if path.startswith(exempt):
-                return True
-        return False
+        return prefix_matcher(self.EXEMPT_PATHS).matches(path)
     
     def _collect_context(self, request):
         """Coleta contexto completo da requisição."""
+        # Fatos já derivados (IP, fingerprint, sensibilidade) são compartilhados
+        # com os demais middlewares via request.request_context
+        request_context = get_request_context(request)
         context = {
             'request_id': request.zero_trust_id,
             'timestamp': timezone.now(),
-            'ip_address': self._get_client_ip(request),
-            'user_agent': request.META.get('HTTP_USER_AGENT', ''),
-            'method': request.method,
-            'path': request.path,
-            'is_authenticated': request.user.is_authenticated,
-            'user_id': request.user.id if request.user.is_authenticated else None,
+            'ip_address': request_context.ip or '0.0.0.0',
+            'user_agent': request_context.user_agent,
+            'method': request_context.method,
+            'path': request_context.path,
+            'is_authenticated': request_context.is_authenticated,
+            'user_id': request_context.user_id,
+            'tier': request_context.tier,
         }
         
-        # Identificar dispositivo
-        context['device_fingerprint'] = self._generate_fingerprint(request)
+        # Identificar dispositivo (lido pelo DeviceTrustMiddleware)
+        context['device_fingerprint'] = request_context.fingerprint
+        request.device_fingerprint = context['device_fingerprint']
         
         # Identificar tipo de IP
-        context['ip_type'] = self._classify_ip(context['ip_address'])
+        context['ip_type'] = request_context.ip_type
         
         # Verificar horário
-        context['is_business_hours'] = self._is_business_hours()
+        now = timezone.localtime()
+        context['hour'] = now.hour
+        context['is_business_hours'] = self._is_business_hours(now)
         
         # Identificar sensibilidade do recurso
-        context['resource_sensitivity'] = self._get_resource_sensitivity(request.path)
+        context['resource_sensitivity'] = request_context.sensitivity
         
         # PWA context
-        context['is_pwa'] = request.META.get('HTTP_X_PWA', 'false') == 'true'
+        context['is_pwa'] = request_context.is_pwa
+        
+        # Resultado do RateLimitMiddleware, se já executado
+        context['rate_limit'] = getattr(request, 'rate_limit', None)
         
         return context
     
     def _get_client_ip(self, request):
         """Extrai IP real do cliente."""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            return x_forwarded_for.split(',')[0].strip()
-        return request.META.get('REMOTE_ADDR', '0.0.0.0')
+        return get_request_context(request).ip or '0.0.0.0'
     
     def _generate_fingerprint(self, request):
         """Gera fingerprint do dispositivo."""
-        components = [
-            request.META.get('HTTP_USER_AGENT', ''),
-            request.META.get('HTTP_ACCEPT_LANGUAGE', ''),
-            request.META.get('HTTP_ACCEPT_ENCODING', ''),
-            request.META.get('HTTP_SEC_CH_UA', ''),
-            request.META.get('HTTP_SEC_CH_UA_PLATFORM', ''),
-        ]
-        raw = '|'.join(components)
-        return hashlib.sha256(raw.encode()).hexdigest()[:32]
+        return get_request_context(request).fingerprint
     
     def _classify_ip(self, ip):
         """Classifica tipo de IP."""
-        # Simplificado - em produção usar GeoIP
-        if ip.startswith('10.') or ip.startswith('192.168.') or ip.startswith('172.'):
-            return 'private'
-        if ip.startswith('127.'):
-            return 'localhost'
-        return 'public'
-    
-    def _is_business_hours(self):
+        # Faixas reais (172.16.0.0/12, não 172.0.0.0/8) - em produção usar GeoIP
+        return classify_ip(ip)
+    
+    def _is_business_hours(self, now=None):
         """Verifica se está em horário comercial."""
-        now = timezone.localtime()
+        now = now or timezone.localtime()
         # Segunda a Sexta, 7h às 20h
         if now.weekday() < 5 and 7 <= now.hour <= 20:
             return True
@@ -178,10 +190,7 @@ class ZeroTrustMiddleware:
     
     def _get_resource_sensitivity(self, path):
         """Determina sensibilidade do recurso."""
-        for pattern, level in self.SENSITIVE_RESOURCES.items():
-            if path.startswith(pattern):
-                return level
-        return 'normal'
+        return prefix_matcher(self.SENSITIVE_RESOURCES).match(path, 'normal')
     
     def _evaluate_risk(self, request, context):
         """
@@ -230,6 +239,14 @@ class ZeroTrustMiddleware:
             score += 100
             factors.append('blocked_ip')
         
+        # 8. Verificar indicadores de ameaça (IP/CIDR, user agent, path)
+        threats = self._match_threats(request, context)
+        if threats:
+            level = ThreatMatcher.highest_level(threats)
+            score += THREAT_LEVEL_SCORES.get(level, 0)
+            factors.append(f'threat_indicator_{level}')
+            context['threat_indicators'] = [t.indicator_id for t in threats]
+        
         # Normalizar score (0-100)
         score = min(100, score)
         
@@ -237,13 +254,18 @@ class ZeroTrustMiddleware:
     
     def _is_rate_limited(self, context):
         """Verifica se está chegando perto do rate limit."""
-        if not context['is_authenticated']:
-            key = f"rl:ip:{context['ip_address']}"
-        else:
-            key = f"rl:user:{context['user_id']}"
-        
-        count = cache.get(key, 0)
-        return count > 50  # Threshold de alerta
+        # Mesmos contadores dos middlewares de rate limit; se um deles já
+        # rodou nesta requisição, reaproveita o resultado (sem I/O)
+        result = context.get('rate_limit')
+        if result is None:
+            client_id = (
+                f"user:{context['user_id']}" if context['is_authenticated']
+                else f"ip:{context['ip_address']}"
+            )
+            policy = RateLimiter.resolve_policy(context['path'], context['is_authenticated'], context.get('tier'))
+            result = RateLimiter.peek(client_id, policy)
+        warn_ratio = getattr(settings, 'RATE_LIMIT_WARN_RATIO', 0.5)  # Threshold de alerta
+        return not result.allowed or result.usage >= warn_ratio
     
     def _is_known_device(self, user_id, fingerprint):
         """Verifica se dispositivo é conhecido."""
@@ -252,56 +274,43 @@ class ZeroTrustMiddleware:
     
     def _is_ip_blocked(self, ip):
         """Verifica se IP está bloqueado."""
-        cache_key = f"blocked_ip:{ip}"
-        if cache.get(cache_key):
-            return True
-        
-        # Verificar no banco (com cache)
-        try:
-            from apps.security.models import IpBlocklist
-            is_blocked = IpBlocklist.objects.filter(
-                ip_address=ip,
-                is_active=True
-            ).exists()
-            if is_blocked:
-                cache.set(cache_key, True, 300)  # Cache por 5 min
-            return is_blocked
-        except Exception:
-            return False
+        # Índice em memória do IpBlocklist (sem query por requisição)
+        return ThreatMatcher.current().is_ip_blocked(ip)
+    
+    def _match_threats(self, request, context):
+        """Indicadores de ameaça que casam com a requisição."""
+        return ThreatMatcher.current().match(
+            ip=context['ip_address'],
+            user_agent=context['user_agent'],
+            path=unquote_plus(request.get_full_path()),
+        )
     
     def _apply_policies(self, request, context):
         """
         Aplica políticas de segurança e retorna decisão.
-        """
-        risk_score = context['risk_score']
-        
-        # Bloquear se IP na lista negra
-        if 'blocked_ip' in context.get('risk_factors', []):
-            return 'deny', 'IP address is blocked'
-        
-        # Score crítico = negar
-        if risk_score >= 80:
-            return 'deny', f'Risk score too high: {risk_score}'
         
-        # Score alto = solicitar MFA
-        if risk_score >= 60:
-            if context['is_authenticated'] and self._has_active_mfa(request.user):
-                return 'allow', 'MFA already verified'
-            return 'challenge', f'High risk score: {risk_score}'
-        
-        # Recurso sensível + risco médio = step-up auth
-        if context['resource_sensitivity'] in ['high', 'elevated'] and risk_score >= 40:
-            return 'step_up', 'Sensitive resource requires additional verification'
-        
-        # Default: permitir
-        return 'allow', 'Within acceptable risk threshold'
+        SecurityPolicy ativas + regras padrão de risco, compiladas em
+        PolicyEngine (sem acesso ao banco por requisição).
+        """
+        engine = PolicyEngine.current()
+        user = getattr(request, 'user', None)
+        context['mfa_verified'] = bool(context['is_authenticated'] and self._has_active_mfa(user))
+        decision = engine.evaluate(context, user_roles(user, engine.roles))
+        context['policy'] = decision.policy
+        context['policy_audit'] = decision.audit
+        
+        # Score alto com MFA já verificado na sessão = permitir
+        if decision.action == 'challenge' and context['mfa_verified']:
+            return 'allow', 'MFA already verified'
+        
+        return decision.action, decision.reason
     
     def _has_active_mfa(self, user):
         """Verifica se usuário tem MFA ativo e verificado na sessão."""
         # Implementação simplificada
         return False
     
-    def _log_access_context(self, request, context, decision, reason):
+    def _log_access_context(self, request, context, decision, reason, response=None):
         """Registra contexto de acesso para auditoria."""
         logger.info(
             f"ZeroTrust Access | "
@@ -314,8 +323,8 @@ class ZeroTrustMiddleware:
             f"Reason: {reason}"
         )
         
-        # Em produção, salvar no banco assincronamente
-        # AccessContext.objects.create(...)
+        # Persistência assíncrona em lote (bulk_create em background)
+        AccessContextLog.record(request, context, decision, reason, response)
     
     def _deny_access(self, request, reason):
         """Retorna resposta de acesso negado."""
@@ -346,25 +355,10 @@ class ZeroTrustMiddleware:
     
     def _add_security_headers(self, response, context):
         """Adiciona headers de segurança à resposta."""
-        response['X-Request-ID'] = context['request_id']
-        response['X-Content-Type-Options'] = 'nosniff'
-        response['X-Frame-Options'] = 'DENY'
-        response['X-XSS-Protection'] = '1; mode=block'
-        response['Referrer-Policy'] = 'strict-origin-when-cross-origin'
-        
-        # CSP para PWA
+        extra = {'X-Request-ID': context['request_id']}
         if context.get('is_pwa'):
-            response['Content-Security-Policy'] = (
-                "default-src 'self'; "
-                "script-src 'self' 'unsafe-inline' 'unsafe-eval'; "
-                "style-src 'self' 'unsafe-inline'; "
-                "img-src 'self' data: https:; "
-                "font-src 'self' data:; "
-                "connect-src 'self' https:; "
-                "manifest-src 'self';"
-            )
-        
-        return response
+            extra['Content-Security-Policy'] = self.PWA_CSP
+        return apply_security_headers(response, extra)
 
 
 class DeviceTrustMiddleware:
@@ -384,9 +378,7 @@ class DeviceTrustMiddleware:
     
     def _track_device(self, request):
         """Registra/atualiza dispositivo do usuário."""
-        fingerprint = getattr(request, 'device_fingerprint', None)
-        if not fingerprint:
-            return
+        fingerprint = getattr(request, 'device_fingerprint', None) or get_request_context(request).fingerprint
         
         # Atualizar cache de dispositivo conhecido
         cache_key = f"known_device:{request.user.id}:{fingerprint}"
@@ -397,37 +389,18 @@ class RateLimitMiddleware:
     """
     Rate limiting por usuário/IP.
     Zero-Trust: limitar mesmo usuários autenticados.
-    """
     
-    LIMITS = {
-        'anonymous': {
-            'per_minute': 30,
-            'per_hour': 300,
-        },
-        'authenticated': {
-            'per_minute': 100,
-            'per_hour': 2000,
-        },
-        'api': {
-            'per_minute': 60,
-            'per_hour': 1000,
-        }
-    }
+    Políticas (por minuto e por hora) em settings.RATE_LIMIT_POLICIES:
+    'anonymous', 'authenticated' e 'api' (rotas /api/, via RATE_LIMIT_ROUTES).
+    Contadores compartilhados com apps.core.middleware.RateLimitMiddleware.
+    """
     
     def __init__(self, get_response):
         self.get_response = get_response
     
     def __call__(self, request):
-        # Determinar tipo de cliente
-        if request.path.startswith('/api/'):
-            client_type = 'api'
-        elif request.user.is_authenticated:
-            client_type = 'authenticated'
-        else:
-            client_type = 'anonymous'
-        
         # Verificar limite
-        is_limited, retry_after = self._check_rate_limit(request, client_type)
+        is_limited, retry_after = self._check_rate_limit(request)
         
         if is_limited:
             response = JsonResponse({
@@ -440,34 +413,7 @@ class RateLimitMiddleware:
         
         return self.get_response(request)
     
-    def _check_rate_limit(self, request, client_type):
+    def _check_rate_limit(self, request):
         """Verifica e incrementa contadores de rate limit."""
-        limits = self.LIMITS[client_type]
-        
-        # Identificador do cliente
-        if request.user.is_authenticated:
-            client_id = f"user:{request.user.id}"
-        else:
-            ip = request.META.get('HTTP_X_FORWARDED_FOR', '').split(',')[0].strip()
-            ip = ip or request.META.get('REMOTE_ADDR', 'unknown')
-            client_id = f"ip:{ip}"
-        
-        # Verificar limite por minuto
-        minute_key = f"rl:{client_id}:minute"
-        minute_count = cache.get(minute_key, 0)
-        
-        if minute_count >= limits['per_minute']:
-            return True, 60
-        
-        # Verificar limite por hora
-        hour_key = f"rl:{client_id}:hour"
-        hour_count = cache.get(hour_key, 0)
-        
-        if hour_count >= limits['per_hour']:
-            return True, 3600
-        
-        # Incrementar contadores
-        cache.set(minute_key, minute_count + 1, 60)
-        cache.set(hour_key, hour_count + 1, 3600)
-        
-        return False, 0
+        result = RateLimiter.check(request)
+        return not result.allowed, result.retry_after
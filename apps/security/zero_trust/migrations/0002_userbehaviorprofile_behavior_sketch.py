@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-17 05:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zero_trust', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userbehaviorprofile',
+            name='behavior_sketch',
+            field=models.JSONField(blank=True, default=dict, help_text='Sketches de tamanho fixo (top-K, hora da semana, HyperLogLog) - ver behavior.py'),
+        ),
+    ]
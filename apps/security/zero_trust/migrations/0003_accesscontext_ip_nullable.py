@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-17 06:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('zero_trust', '0002_userbehaviorprofile_behavior_sketch'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='accesscontext',
+            name='ip_address',
+            field=models.GenericIPAddressField(blank=True, db_index=True, null=True),
+        ),
+    ]
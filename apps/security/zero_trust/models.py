@@ -170,7 +170,7 @@ class AccessContext(BaseZeroTrustModel):
     )
     
     # Contexto de rede
-    ip_address = models.GenericIPAddressField(db_index=True)
+    ip_address = models.GenericIPAddressField(null=True, blank=True, db_index=True)  # None: IP inválido no header
     ip_type = models.CharField(max_length=20, blank=True)  # corporate, vpn, public, tor
     geo_country = models.CharField(max_length=2, blank=True)
     geo_city = models.CharField(max_length=100, blank=True)
@@ -352,10 +352,10 @@ class SecurityPolicy(BaseZeroTrustModel):
         help_text='Condições para ativação da política'
     )
     """
-    Exemplo de conditions:
+    Exemplo de conditions (política 'allow': casa quando a requisição
+    atende TODAS as condições - ver policy_engine):
     {
         "require_mfa": true,
-        "min_trust_level": "standard",
         "allowed_countries": ["BR"],
         "allowed_hours": {"start": 8, "end": 18},
         "max_risk_score": 50,
@@ -452,6 +452,11 @@ class UserBehaviorProfile(BaseZeroTrustModel):
     )
     data_points_collected = models.IntegerField(default=0)
     last_profile_update = models.DateTimeField(auto_now=True)
+    behavior_sketch = models.JSONField(
+        default=dict,
+        blank=True,
+        help_text='Sketches de tamanho fixo (top-K, hora da semana, HyperLogLog) - ver behavior.py'
+    )
     
     class Meta:
         app_label = 'zero_trust'
@@ -462,26 +467,25 @@ class UserBehaviorProfile(BaseZeroTrustModel):
         return f"Behavior Profile - {self.user.username}"
     
     def calculate_anomaly_score(self, context):
-        """Calcula score de anomalia baseado no contexto atual."""
+        """Calcula score de anomalia baseado no contexto atual (O(1) via sketch)."""
+        from .behavior import profile_sketch
+
+        sketch = profile_sketch(self)
         score = 0
         factors = []
         
         # Verificar horário
-        current_hour = timezone.now().hour
-        if self.typical_login_hours:
-            day = timezone.now().strftime('%A').lower()
-            typical = self.typical_login_hours.get(day, [])
-            if current_hour not in typical:
-                score += 15
-                factors.append('unusual_time')
+        if sketch.count and not sketch.is_usual_hour(timezone.now()):
+            score += 15
+            factors.append('unusual_time')
         
         # Verificar localização
-        if context.get('geo_country') and context['geo_country'] not in self.typical_locations:
+        if context.get('geo_country') and not sketch.is_known(sketch.locations, context['geo_country']):
             score += 25
             factors.append('new_location')
         
         # Verificar IP
-        if context.get('ip_address') and context['ip_address'] not in self.typical_ips:
+        if context.get('ip_address') and not sketch.is_known(sketch.ips, context['ip_address']):
             score += 10
             factors.append('new_ip')
         
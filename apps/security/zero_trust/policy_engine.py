@@ -0,0 +1,435 @@
+"""
+SyncRH - Zero-Trust Policy Engine
+=================================
+SecurityPolicy ativas compiladas numa tabela de decisão em memória para
+o ZeroTrustMiddleware (sem acesso ao banco por requisição).
+
+Compilação (uma vez por versão):
+- conditions -> tupla de predicados sobre o contexto da requisição
+- applies_to_resources -> uma regex (alternância) pré-compilada
+- applies_to_roles -> frozenset
+- Índice (sensibilidade, método) -> políticas candidatas já ordenadas
+  por priority (maior primeiro); a avaliação só percorre as candidatas
+
+Avaliação: a primeira política *enforced* cuja ação é terminal
+(allow / deny / challenge) decide. 'log' e 'alert' registram e seguem;
+políticas em modo auditoria (is_enforced=False) só são registradas
+em context['policy_audit']. Sem decisão, valem as regras padrão
+(ZERO_TRUST_RISK_THRESHOLDS: deny >= 80, challenge >= 60, step-up >= 40
+em recurso sensível) - o comportamento anterior do middleware.
+
+Um 'allow' do banco nunca passa por cima dos limites de risco: antes de
+permitir, builtin:critical_risk (deny) e builtin:high_risk (challenge)
+são verificadas; deny/challenge do banco continuam valendo antes delas.
+
+Condições: cada uma descreve a requisição que a política alcança, e a
+política casa quando TODAS são verdadeiras para a requisição (nunca
+"casa quando a exigência é violada"). Ex.: {"allowed_countries": ["BR"],
+"max_risk_score": 50} casa com acessos do Brasil com risco <= 50 - uma
+política 'allow'; para negar fora do horário use allowed_hours com o
+intervalo complementar ou business_hours: false.
+
+    min_risk_score / max_risk_score   risk score dentro da faixa
+    methods                           método HTTP na lista
+    sensitivity                       sensibilidade do recurso na lista
+    authenticated                     autenticado == valor
+    ip_types                          tipo de IP na lista (public/private/...)
+    risk_factors                      algum dos fatores presente
+    mfa_verified                      MFA verificado == valor
+    require_mfa                       true: MFA verificado
+    allowed_hours {start, end}        hora dentro de [start, end) (pode
+                                      atravessar a meia-noite: 22-6)
+    business_hours                    horário comercial == valor
+    allowed_countries                 país conhecido e na lista
+    require_corporate_device          true: dispositivo conhecido (sem
+                                      new_device/unauthenticated)
+
+'min_trust_level' (exemplo do model) não é suportado: exigiria consultar
+TrustedDevice a cada requisição.
+
+Política com condição desconhecida ou regex inválida é ignorada (com
+warning) - nunca aplicada com semântica parcial.
+
+Hot swap: igual ao ThreatMatcher - stamp de versão no cache
+(POLICY_ENGINE_VERSION_KEY, incrementado pelos signals de
+SecurityPolicy), consultado a cada ZERO_TRUST_POLICY_CHECK_INTERVAL
+segundos; a nova tabela substitui a anterior numa única atribuição.
+"""
+
+import re
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger('security.zero_trust')
+
+POLICY_ENGINE_VERSION_KEY = 'zero_trust:policy_engine:version'
+
+SENSITIVITIES = ('normal', 'elevated', 'high')
+METHODS = ('GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE')
+ANY_METHOD = '*'
+
+TERMINAL_ACTIONS = frozenset({'allow', 'deny', 'challenge', 'step_up'})
+
+DEFAULT_RISK_THRESHOLDS = {'deny': 80, 'challenge': 60, 'step_up': 40}
+
+# Papéis derivados do usuário sem consulta ao banco
+BUILTIN_ROLES = frozenset({'anonymous', 'authenticated', 'staff', 'superuser', 'employee', 'contractor'})
+
+POLICY_FIELDS = (
+    'id', 'name', 'applies_to_roles', 'applies_to_resources', 'conditions',
+    'action_on_match', 'priority', 'is_enforced',
+)
+
+
+Predicate = Callable[[Dict], bool]
+
+
+def _member(key, values) -> Predicate:
+    allowed = frozenset(values)
+    return lambda ctx: ctx.get(key) in allowed
+
+
+def _equals(key, value) -> Predicate:
+    return lambda ctx: bool(ctx.get(key)) == value
+
+
+def _any_factor(values) -> Predicate:
+    wanted = frozenset(values)
+    return lambda ctx: not wanted.isdisjoint(ctx.get('risk_factors', ()))
+
+
+def _no_factor(values) -> Predicate:
+    unwanted = frozenset(values)
+    return lambda ctx: unwanted.isdisjoint(ctx.get('risk_factors', ()))
+
+
+def _within_hours(spec) -> Predicate:
+    start, end = int(spec['start']), int(spec['end'])
+    if start <= end:
+        return lambda ctx: start <= ctx.get('hour', 12) < end
+    # Intervalo que atravessa a meia-noite (ex.: 22-6)
+    return lambda ctx: not (end <= ctx.get('hour', 12) < start)
+
+
+def _country_in(values) -> Predicate:
+    allowed = frozenset(value.upper() for value in values)
+    return lambda ctx: bool(ctx.get('country')) and ctx['country'].upper() in allowed
+
+
+CONDITIONS: Dict[str, Callable[[object], Optional[Predicate]]] = {
+    'min_risk_score': None,  # comparação numérica direta (CompiledPolicy)
+    'max_risk_score': None,
+    'methods': None,  # resolvido pelo índice
+    'sensitivity': None,  # resolvido pelo índice
+    'authenticated': lambda v: _equals('is_authenticated', bool(v)),
+    'ip_types': lambda v: _member('ip_type', v),
+    'risk_factors': _any_factor,
+    'mfa_verified': lambda v: _equals('mfa_verified', bool(v)),
+    'require_mfa': lambda v: _equals('mfa_verified', True) if v else None,
+    'allowed_hours': _within_hours,
+    'business_hours': lambda v: _equals('is_business_hours', bool(v)),
+    'allowed_countries': _country_in,
+    'require_corporate_device': lambda v: _no_factor(['new_device', 'unauthenticated']) if v else None,
+}
+
+# Limites de risco que um 'allow' do banco não pode contornar
+RISK_GUARDS = ('builtin:critical_risk', 'builtin:high_risk')
+
+
+@dataclass(frozen=True)
+class CompiledPolicy:
+    """Política pronta para avaliação"""
+
+    name: str
+    action: str
+    priority: float
+    enforced: bool
+    predicates: Tuple[Predicate, ...] = ()
+    min_risk: float = float('-inf')
+    max_risk: float = float('inf')
+    resources: Optional[re.Pattern] = None
+    roles: frozenset = frozenset()
+    methods: frozenset = frozenset()
+    sensitivities: frozenset = frozenset()
+    reason: str = ''
+    # reason com '{risk_score}' (regras padrão)
+    templated: bool = False
+    policy_id: Optional[int] = None
+
+    def applies(self, context: Dict, roles: frozenset) -> bool:
+        risk_score = context.get('risk_score', 0)
+        if risk_score < self.min_risk or risk_score > self.max_risk:
+            return False
+        if self.resources is not None and self.resources.match(context['path']) is None:
+            return False
+        if self.roles and self.roles.isdisjoint(roles):
+            return False
+        for predicate in self.predicates:
+            if not predicate(context):
+                return False
+        return True
+
+
+@dataclass
+class Decision:
+    action: str
+    reason: str
+    policy: Optional[str] = None
+    audit: List[str] = field(default_factory=list)
+
+
+def compile_policy(row: Dict) -> Optional[CompiledPolicy]:
+    """Compila uma linha de SecurityPolicy (None se inválida)"""
+    name = row['name']
+    conditions = row.get('conditions') or {}
+    predicates = []
+    try:
+        for key, value in conditions.items():
+            if key not in CONDITIONS:
+                raise ValueError(f"condição desconhecida '{key}'")
+            builder = CONDITIONS[key]
+            predicate = builder(value) if builder is not None else None
+            if predicate is not None:
+                predicates.append(predicate)
+        min_risk = float(conditions.get('min_risk_score', float('-inf')))
+        max_risk = float(conditions.get('max_risk_score', float('inf')))
+        patterns = row.get('applies_to_resources') or []
+        resources = re.compile('|'.join(f'(?:{pattern})' for pattern in patterns)) if patterns else None
+    except (ValueError, TypeError, KeyError, re.error) as e:
+        logger.warning(f"SecurityPolicy '{name}' ignorada: {e}")
+        return None
+
+    action = row.get('action_on_match') or 'allow'
+    return CompiledPolicy(
+        name=name,
+        action=action,
+        priority=row.get('priority', 100),
+        enforced=bool(row.get('is_enforced')),
+        predicates=tuple(predicates),
+        min_risk=min_risk,
+        max_risk=max_risk,
+        resources=resources,
+        roles=frozenset(row.get('applies_to_roles') or ()),
+        methods=frozenset(method.upper() for method in conditions.get('methods') or ()),
+        sensitivities=frozenset(conditions.get('sensitivity') or ()),
+        reason=f"Policy '{name}'",
+        policy_id=row.get('id'),
+    )
+
+
+def default_policies(thresholds: Dict = None) -> List[CompiledPolicy]:
+    """Regras padrão (antes fixas no middleware), após as políticas do banco"""
+    thresholds = {**DEFAULT_RISK_THRESHOLDS, **(thresholds or {})}
+    sensitive = frozenset({'high', 'elevated'})
+    return [
+        CompiledPolicy(
+            name='builtin:blocked_ip', action='deny', priority=float('inf'), enforced=True,
+            predicates=(_any_factor(['blocked_ip']),), reason='IP address is blocked',
+        ),
+        CompiledPolicy(
+            name='builtin:critical_risk', action='deny', priority=float('-inf'), enforced=True,
+            min_risk=thresholds['deny'],
+            reason='Risk score too high: {risk_score}', templated=True,
+        ),
+        CompiledPolicy(
+            name='builtin:high_risk', action='challenge', priority=float('-inf'), enforced=True,
+            min_risk=thresholds['challenge'],
+            reason='High risk score: {risk_score}', templated=True,
+        ),
+        CompiledPolicy(
+            name='builtin:sensitive_resource', action='step_up', priority=float('-inf'), enforced=True,
+            min_risk=thresholds['step_up'], sensitivities=sensitive,
+            reason='Sensitive resource requires additional verification',
+        ),
+    ]
+
+
+class PolicyEngine:
+    """
+    Tabela de decisão compilada e imutável
+
+    Uso:
+        engine = PolicyEngine.current()
+        decision = engine.evaluate(context, roles)
+    """
+
+    _current: Optional['PolicyEngine'] = None
+    _checked_at = 0.0
+    _lock = threading.Lock()
+
+    def __init__(self, rows: Iterable[Dict] = (), version=None, thresholds: Dict = None):
+        self.version = version
+        self.built_at = time.time()
+        compiled = [policy for policy in map(compile_policy, rows) if policy is not None]
+        defaults = default_policies(thresholds)
+        # Ordem estável: priority desc; regras padrão no topo/fim via ±inf
+        policies = sorted(compiled + defaults, key=lambda p: -p.priority)
+        self._guards = tuple(policy for policy in defaults if policy.name in RISK_GUARDS)
+        self.size = len(compiled)
+        self.roles = frozenset().union(*(policy.roles for policy in policies))
+
+        self._table: Dict[Tuple[str, str], Tuple[CompiledPolicy, ...]] = {}
+        for sensitivity in SENSITIVITIES + (None,):
+            for method in METHODS + (ANY_METHOD,):
+                self._table[(sensitivity, method)] = tuple(
+                    policy for policy in policies
+                    if (not policy.sensitivities or sensitivity in policy.sensitivities)
+                    and (not policy.methods or method in policy.methods)
+                )
+
+    def candidates(self, sensitivity: str, method: str) -> Tuple[CompiledPolicy, ...]:
+        table = self._table
+        key = (sensitivity if sensitivity in SENSITIVITIES else None, method)
+        found = table.get(key)
+        if found is None:
+            found = table[(key[0], ANY_METHOD)]
+        return found
+
+    def evaluate(self, context: Dict, roles: frozenset = frozenset()) -> Decision:
+        """Decisão para o contexto (primeira política enforced terminal)"""
+        audit = []
+        for policy in self.candidates(context.get('resource_sensitivity'), context.get('method')):
+            if not policy.applies(context, roles):
+                continue
+            if not policy.enforced:
+                audit.append(policy.name)
+                continue
+            if policy.action in TERMINAL_ACTIONS:
+                if policy.action == 'allow':
+                    policy = next((guard for guard in self._guards if guard.applies(context, roles)), policy)
+                reason = policy.reason
+                if policy.templated:
+                    reason = reason.format(risk_score=context.get('risk_score', 0))
+                return Decision(policy.action, reason, policy.name, audit)
+            if policy.action == 'alert':
+                logger.warning(f"ZeroTrust policy alert: {policy.name} | Path: {context.get('path')}")
+            # 'log': registrado com o AccessContext (context['policy_audit'])
+            audit.append(policy.name)
+        return Decision('allow', 'Within acceptable risk threshold', None, audit)
+
+    def stats(self) -> Dict:
+        return {
+            'version': self.version,
+            'built_at': self.built_at,
+            'policies': self.size,
+            'roles': sorted(self.roles),
+        }
+
+    # ------------------------------------------------------------------
+    # Carga e hot swap
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def check_interval() -> float:
+        return getattr(settings, 'ZERO_TRUST_POLICY_CHECK_INTERVAL', 5)
+
+    @staticmethod
+    def max_age() -> float:
+        return getattr(settings, 'ZERO_TRUST_POLICY_MAX_AGE', 60)
+
+    @staticmethod
+    def thresholds() -> Dict:
+        return getattr(settings, 'ZERO_TRUST_RISK_THRESHOLDS', DEFAULT_RISK_THRESHOLDS)
+
+    @staticmethod
+    def load(version=None) -> 'PolicyEngine':
+        """Compila a tabela a partir do banco (1 query)"""
+        from apps.security.zero_trust.models import SecurityPolicy
+
+        rows = SecurityPolicy.objects.filter(is_active=True).values(*POLICY_FIELDS)
+        return PolicyEngine(list(rows), version=version, thresholds=PolicyEngine.thresholds())
+
+    @staticmethod
+    def current() -> 'PolicyEngine':
+        """
+        Tabela vigente (recompilada quando a versão no cache muda)
+
+        Entre verificações nenhuma I/O é feita; se o banco falhar mantém
+        a tabela anterior (ou só as regras padrão). Sem cache
+        compartilhado o stamp é por processo, então a tabela também é
+        recompilada após ZERO_TRUST_POLICY_MAX_AGE segundos.
+        """
+        engine = PolicyEngine._current
+        now = time.monotonic()
+        if engine is not None and now - PolicyEngine._checked_at < PolicyEngine.check_interval():
+            return engine
+
+        if not PolicyEngine._lock.acquire(blocking=engine is None):
+            return engine
+        try:
+            if PolicyEngine._current is not engine:
+                return PolicyEngine._current
+            PolicyEngine._checked_at = now
+            try:
+                version = cache.get(POLICY_ENGINE_VERSION_KEY)
+            except Exception as e:
+                logger.warning(f"Policy engine version unavailable: {e}")
+                return engine or PolicyEngine(thresholds=PolicyEngine.thresholds())
+            if (
+                engine is not None and engine.version == version
+                and time.time() - engine.built_at < PolicyEngine.max_age()
+            ):
+                return engine
+            try:
+                PolicyEngine._current = PolicyEngine.load(version)
+                logger.info(f"Policy engine recompilado: {PolicyEngine._current.stats()}")
+            except Exception as e:
+                logger.warning(f"Policy engine não pôde ser carregado: {e}")
+                if engine is None:
+                    # Só regras padrão, sem versão: nova tentativa no próximo intervalo
+                    PolicyEngine._current = PolicyEngine(version=object(), thresholds=PolicyEngine.thresholds())
+            return PolicyEngine._current
+        finally:
+            PolicyEngine._lock.release()
+
+    @staticmethod
+    def bump_version() -> None:
+        """Invalida a tabela (outros workers: via cache compartilhado ou MAX_AGE)"""
+        try:
+            cache.incr(POLICY_ENGINE_VERSION_KEY)
+        except ValueError:
+            cache.set(POLICY_ENGINE_VERSION_KEY, int(time.time() * 1000), None)
+        except Exception as e:
+            logger.warning(f"Policy engine version unavailable: {e}")
+        # Este worker verifica já na próxima requisição
+        PolicyEngine._checked_at = 0.0
+
+    @staticmethod
+    def reset() -> None:
+        with PolicyEngine._lock:
+            PolicyEngine._current = None
+            PolicyEngine._checked_at = 0.0
+
+
+def user_roles(user, needed: frozenset = frozenset()) -> frozenset:
+    """
+    Papéis do usuário para applies_to_roles
+
+    Atributos do usuário (sem I/O); nomes de grupos só quando alguma
+    política os referencia (cacheados por ZERO_TRUST_ROLE_CACHE_TTL).
+    """
+    if user is None or not user.is_authenticated:
+        return frozenset({'anonymous'})
+    roles = {'authenticated'}
+    if getattr(user, 'is_staff', False):
+        roles.add('staff')
+    if getattr(user, 'is_superuser', False):
+        roles.add('superuser')
+    if getattr(user, 'is_employee', False):
+        roles.add('employee')
+    if getattr(user, 'is_contractor', False):
+        roles.add('contractor')
+    if needed - BUILTIN_ROLES:
+        key = f'zero_trust:roles:{user.pk}'
+        groups = cache.get(key)
+        if groups is None:
+            groups = list(user.groups.values_list('name', flat=True))
+            cache.set(key, groups, getattr(settings, 'ZERO_TRUST_ROLE_CACHE_TTL', 300))
+        roles.update(groups)
+    return frozenset(roles)
@@ -13,6 +13,8 @@ from django.utils import timezone
 from django.core.cache import cache
 from django.conf import settings
 
+from .threat_matcher import ThreatMatcher, classify_ip
+
 logger = logging.getLogger('security.zero_trust')
 
 
@@ -192,10 +194,11 @@ class ZeroTrustService:
         factors = []
         
         # IP privado/corporativo
-        if ip_address.startswith(('10.', '192.168.', '172.')):
+        ip_type = classify_ip(ip_address)
+        if ip_type == 'private':
             score += 30
             factors.append('private_network')
-        elif ip_address.startswith('127.'):
+        elif ip_type == 'localhost':
             score += 40
             factors.append('localhost')
         else:
@@ -526,24 +529,28 @@ class ThreatIntelligenceService:
     @staticmethod
     def check_ip(ip_address: str) -> Dict:
         """Verifica IP contra indicadores de ameaça."""
-        result = {
+        # Índice em memória de IpBlocklist + ThreatIndicator (sem query)
+        matcher = ThreatMatcher.current()
+        matches = matcher.match(ip=ip_address)
+        blocked = matcher.blocked_entry(ip_address)
+        if blocked is not None:
+            matches.append(blocked)
+        
+        return {
             'ip': ip_address,
-            'is_threat': False,
-            'threat_level': 'none',
-            'indicators': [],
+            'is_threat': bool(matches),
+            'threat_level': ThreatMatcher.highest_level(matches) or 'none',
+            'indicators': [
+                {
+                    'id': m.indicator_id,
+                    'source': m.source,
+                    'type': m.indicator_type,
+                    'value': m.value,
+                    'threat_level': m.threat_level,
+                }
+                for m in matches
+            ],
         }
-        
-        # Verificar cache
-        cache_key = f"threat_intel:ip:{ip_address}"
-        cached = cache.get(cache_key)
-        if cached:
-            return cached
-        
-        # Em produção, consultar APIs de threat intelligence
-        # Exemplo: AbuseIPDB, VirusTotal, etc.
-        
-        cache.set(cache_key, result, 3600)
-        return result
     
     @staticmethod
     def report_threat(
@@ -0,0 +1,32 @@
+"""
+SyncRH - Zero-Trust Signals
+===========================
+Invalida os índices em memória de todos os workers:
+- ThreatMatcher quando IpBlocklist ou ThreatIndicator mudam
+- PolicyEngine quando SecurityPolicy muda (inclusive o toggle da API)
+"""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.security.models import IpBlocklist
+
+from .models import SecurityPolicy, ThreatIndicator
+from .policy_engine import PolicyEngine
+from .threat_matcher import ThreatMatcher
+
+
+@receiver(post_save, sender=IpBlocklist)
+@receiver(post_delete, sender=IpBlocklist)
+@receiver(post_save, sender=ThreatIndicator)
+@receiver(post_delete, sender=ThreatIndicator)
+def invalidate_threat_matcher(sender, **kwargs):
+    """Incrementa o stamp de versão; o matcher é recompilado sob demanda"""
+    ThreatMatcher.bump_version()
+
+
+@receiver(post_save, sender=SecurityPolicy)
+@receiver(post_delete, sender=SecurityPolicy)
+def invalidate_policy_engine(sender, **kwargs):
+    """Incrementa o stamp de versão; a tabela é recompilada sob demanda"""
+    PolicyEngine.bump_version()
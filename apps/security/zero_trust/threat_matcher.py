@@ -0,0 +1,435 @@
+"""
+SyncRH - Zero-Trust Threat Matcher
+==================================
+Índice em memória de IpBlocklist e ThreatIndicator para o caminho
+quente do ZeroTrustMiddleware (sem acesso ao banco por requisição).
+
+Estruturas compiladas:
+- IpBlocklist: hash set de IPs exatos
+- ThreatIndicator 'ip': árvore radix binária (IPv4/IPv6, aceita CIDR)
+- ThreatIndicator 'domain' / 'email' / 'hash': hash sets (domínio casa
+  também subdomínios)
+- ThreatIndicator 'user_agent' / 'pattern': autômatos Aho-Corasick
+  (substring, sem distinção de maiúsculas) sobre user agent e path
+
+Hot swap: o matcher é reconstruído quando o stamp de versão no cache
+(THREAT_MATCHER_VERSION_KEY, incrementado pelos signals de save/delete)
+muda. A versão é consultada no máximo a cada
+ZERO_TRUST_MATCHER_CHECK_INTERVAL segundos; a reconstrução roda em uma
+única thread enquanto as demais seguem usando o snapshot anterior.
+
+O stamp só alcança outros workers com um cache compartilhado (Redis,
+Memcached); com o LocMemCache padrão cada processo tem o seu. Por isso
+o snapshot também é reconstruído quando tem mais de
+ZERO_TRUST_MATCHER_MAX_AGE segundos: um bloqueio novo vale em todos os
+workers no máximo depois desse prazo.
+"""
+
+import time
+import logging
+import ipaddress
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger('security.zero_trust')
+
+THREAT_MATCHER_VERSION_KEY = 'zero_trust:threat_matcher:version'
+
+# Pontos de risco somados pelo ZeroTrustMiddleware por nível do indicador
+THREAT_LEVEL_SCORES = {
+    'info': 0,
+    'low': 10,
+    'medium': 20,
+    'high': 40,
+    'critical': 100,
+}
+
+
+@lru_cache(maxsize=4096)
+def parse_ip(value: str):
+    """ip_address(value) ou None para valores inválidos"""
+    try:
+        return ipaddress.ip_address(value.strip())
+    except (ValueError, AttributeError):
+        return None
+
+
+# RFC 1918, RFC 4193 e link-local (ip.is_private também inclui faixas
+# de documentação como 203.0.113.0/24, que não são redes corporativas)
+PRIVATE_NETWORKS = tuple(ipaddress.ip_network(net) for net in (
+    '10.0.0.0/8',
+    '172.16.0.0/12',
+    '192.168.0.0/16',
+    '169.254.0.0/16',
+    'fc00::/7',
+    'fe80::/10',
+))
+
+
+@lru_cache(maxsize=4096)
+def classify_ip(value: str) -> str:
+    """Classifica IP em 'localhost', 'private' ou 'public'"""
+    ip = parse_ip(value)
+    if ip is None:
+        return 'public'
+    if ip.is_loopback:
+        return 'localhost'
+    if any(ip in network for network in PRIVATE_NETWORKS):
+        return 'private'
+    return 'public'
+
+
+@dataclass(frozen=True)
+class ThreatMatch:
+    """Entrada que casou com a requisição"""
+    source: str  # 'blocklist' ou 'indicator'
+    indicator_id: int
+    indicator_type: str
+    value: str
+    threat_level: str
+    expires_at: Optional[float] = None  # timestamp; None = sem expiração
+
+    def is_expired(self, now: float) -> bool:
+        return self.expires_at is not None and self.expires_at <= now
+
+
+class CidrTrie:
+    """
+    Árvore radix binária para longest-prefix match de CIDRs
+
+    Um nó é [filho_0, filho_1, entradas]; a busca percorre no máximo
+    32 (IPv4) / 128 (IPv6) bits e para no primeiro ramo ausente.
+    """
+
+    def __init__(self):
+        self._roots = {4: [None, None, None], 6: [None, None, None]}
+        self.size = 0
+
+    def insert(self, network, item) -> None:
+        network = ipaddress.ip_network(network, strict=False)
+        bits = network.max_prefixlen
+        value = int(network.network_address)
+        node = self._roots[network.version]
+        for i in range(network.prefixlen):
+            bit = (value >> (bits - 1 - i)) & 1
+            if node[bit] is None:
+                node[bit] = [None, None, None]
+            node = node[bit]
+        if node[2] is None:
+            node[2] = []
+        node[2].append(item)
+        self.size += 1
+
+    def match(self, address) -> List:
+        """Todas as entradas cujos prefixos cobrem address (mais curto primeiro)"""
+        ip = address if not isinstance(address, str) else parse_ip(address)
+        if ip is None:
+            return []
+        bits = ip.max_prefixlen
+        value = int(ip)
+        node = self._roots[ip.version]
+        found = list(node[2]) if node[2] else []
+        for i in range(bits):
+            node = node[(value >> (bits - 1 - i)) & 1]
+            if node is None:
+                break
+            if node[2]:
+                found.extend(node[2])
+        return found
+
+
+class AhoCorasick:
+    """
+    Autômato Aho-Corasick para busca simultânea de padrões (substring)
+
+    Busca em O(len(texto) + ocorrências), independente do número de
+    padrões. Padrões e texto são comparados em casefold.
+    """
+
+    def __init__(self, patterns: Iterable[Tuple[str, object]]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List] = [[]]
+        self.size = 0
+        for pattern, item in patterns:
+            self._add(pattern.casefold(), item)
+        self._build()
+
+    def _add(self, pattern: str, item) -> None:
+        if not pattern:
+            return
+        state = 0
+        for char in pattern:
+            following = self._goto[state].get(char)
+            if following is None:
+                following = len(self._goto)
+                self._goto[state][char] = following
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = following
+        self._out[state].append(item)
+        self.size += 1
+
+    def _build(self) -> None:
+        """Links de falha em BFS; saídas herdadas do sufixo"""
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, following in self._goto[state].items():
+                queue.append(following)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[following] = target if target != following else 0
+                self._out[following] = self._out[following] + self._out[self._fail[following]]
+
+    def search(self, text: str) -> List:
+        if not self.size or not text:
+            return []
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        found = []
+        for char in text.casefold():
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found.extend(out[state])
+        return found
+
+
+def _timestamp(value: Optional[datetime]) -> Optional[float]:
+    return value.timestamp() if value is not None else None
+
+
+class ThreatMatcher:
+    """
+    Snapshot compilado e imutável de IpBlocklist + ThreatIndicator
+
+    Uso:
+        matcher = ThreatMatcher.current()
+        matcher.is_ip_blocked(ip)
+        matcher.match(ip=ip, user_agent=ua, path=path)
+    """
+
+    _current: Optional['ThreatMatcher'] = None
+    _checked_at = 0.0
+    _lock = threading.Lock()
+
+    def __init__(self, blocked: Iterable[ThreatMatch] = (), indicators: Iterable[ThreatMatch] = (), version=None):
+        self.version = version
+        self.built_at = time.time()
+        self._blocked: Dict[str, ThreatMatch] = {}
+        self._networks = CidrTrie()
+        self._exact: Dict[str, Dict[str, List[ThreatMatch]]] = {'domain': {}, 'email': {}, 'hash': {}}
+        user_agents, patterns = [], []
+
+        for entry in blocked:
+            ip = parse_ip(entry.value)
+            if ip is not None:
+                self._blocked[str(ip)] = entry
+
+        for entry in indicators:
+            kind = entry.indicator_type
+            value = entry.value.strip()
+            try:
+                if kind == 'ip':
+                    self._networks.insert(value, entry)
+                elif kind in self._exact:
+                    key = value.lower().lstrip('*.') if kind == 'domain' else value.lower()
+                    self._exact[kind].setdefault(key, []).append(entry)
+                elif kind == 'user_agent':
+                    user_agents.append((value, entry))
+                elif kind == 'pattern':
+                    patterns.append((value, entry))
+            except ValueError:
+                logger.warning(f"Threat indicator ignorado (valor inválido): {kind}={value[:50]}")
+
+        self._user_agents = AhoCorasick(user_agents)
+        self._patterns = AhoCorasick(patterns)
+
+    def blocked_entry(self, ip: str, now: float = None) -> Optional[ThreatMatch]:
+        """Entrada vigente do IpBlocklist para o IP, se houver"""
+        parsed = parse_ip(ip) if ip else None
+        if parsed is None:
+            return None
+        entry = self._blocked.get(str(parsed))
+        if entry is None or entry.is_expired(time.time() if now is None else now):
+            return None
+        return entry
+
+    def is_ip_blocked(self, ip: str, now: float = None) -> bool:
+        return self.blocked_entry(ip, now) is not None
+
+    def match(
+        self,
+        ip: str = None,
+        user_agent: str = None,
+        path: str = None,
+        domain: str = None,
+        email: str = None,
+        file_hash: str = None,
+        now: float = None,
+    ) -> List[ThreatMatch]:
+        """Indicadores vigentes que casam com qualquer um dos valores"""
+        now = time.time() if now is None else now
+        found: List[ThreatMatch] = []
+        if ip:
+            found.extend(self._networks.match(ip))
+        if user_agent:
+            found.extend(self._user_agents.search(user_agent))
+        if path:
+            found.extend(self._patterns.search(path))
+        if domain:
+            labels = domain.lower().rstrip('.').split('.')
+            # evil.com casa também login.evil.com
+            for i in range(len(labels) - 1):
+                found.extend(self._exact['domain'].get('.'.join(labels[i:]), ()))
+        if email:
+            found.extend(self._exact['email'].get(email.lower(), ()))
+        if file_hash:
+            found.extend(self._exact['hash'].get(file_hash.lower(), ()))
+
+        unique = {}
+        for entry in found:
+            if not entry.is_expired(now):
+                unique.setdefault(entry.indicator_id, entry)
+        return list(unique.values())
+
+    @staticmethod
+    def highest_level(matches: List[ThreatMatch]) -> Optional[str]:
+        if not matches:
+            return None
+        return max((m.threat_level for m in matches), key=lambda level: THREAT_LEVEL_SCORES.get(level, 0))
+
+    def stats(self) -> Dict:
+        return {
+            'version': self.version,
+            'built_at': self.built_at,
+            'blocked_ips': len(self._blocked),
+            'ip_indicators': self._networks.size,
+            'exact_indicators': sum(len(values) for values in self._exact.values()),
+            'user_agent_patterns': self._user_agents.size,
+            'path_patterns': self._patterns.size,
+        }
+
+    # ------------------------------------------------------------------
+    # Carga e hot swap
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def check_interval() -> float:
+        return getattr(settings, 'ZERO_TRUST_MATCHER_CHECK_INTERVAL', 5)
+
+    @staticmethod
+    def max_age() -> float:
+        return getattr(settings, 'ZERO_TRUST_MATCHER_MAX_AGE', 30)
+
+    @staticmethod
+    def load(version=None) -> 'ThreatMatcher':
+        """Compila o matcher a partir do banco (2 queries)"""
+        from apps.security.models import IpBlocklist
+        from apps.security.zero_trust.models import ThreatIndicator
+
+        now = timezone.now()
+        blocked = [
+            ThreatMatch(
+                source='blocklist',
+                indicator_id=pk,
+                indicator_type='ip',
+                value=ip_address,
+                threat_level='critical',
+                expires_at=None if is_permanent else _timestamp(blocked_until),
+            )
+            for pk, ip_address, blocked_until, is_permanent in IpBlocklist.objects.filter(
+                is_active=True
+            ).values_list('id', 'ip_address', 'blocked_until', 'is_permanent')
+        ]
+        indicators = [
+            ThreatMatch(
+                source='indicator',
+                indicator_id=pk,
+                indicator_type=indicator_type,
+                value=value,
+                threat_level=threat_level,
+                expires_at=_timestamp(expires_at),
+            )
+            for pk, indicator_type, value, threat_level, expires_at in ThreatIndicator.objects.filter(
+                is_active=True
+            ).exclude(
+                expires_at__lte=now
+            ).values_list('id', 'indicator_type', 'indicator_value', 'threat_level', 'expires_at')
+        ]
+        return ThreatMatcher(blocked, indicators, version=version)
+
+    @staticmethod
+    def current() -> 'ThreatMatcher':
+        """
+        Snapshot vigente (reconstruído quando a versão no cache muda ou
+        o snapshot passa de ZERO_TRUST_MATCHER_MAX_AGE)
+
+        Entre verificações (ZERO_TRUST_MATCHER_CHECK_INTERVAL) nenhuma
+        I/O é feita; se o banco falhar mantém o snapshot anterior.
+        """
+        matcher = ThreatMatcher._current
+        now = time.monotonic()
+        if matcher is not None and now - ThreatMatcher._checked_at < ThreatMatcher.check_interval():
+            return matcher
+
+        # Só uma thread verifica/reconstrói; as outras usam o snapshot atual
+        if not ThreatMatcher._lock.acquire(blocking=matcher is None):
+            return matcher
+        try:
+            if ThreatMatcher._current is not matcher:
+                return ThreatMatcher._current
+            ThreatMatcher._checked_at = now
+            try:
+                version = cache.get(THREAT_MATCHER_VERSION_KEY)
+            except Exception as e:
+                logger.warning(f"Threat matcher version unavailable: {e}")
+                return matcher or ThreatMatcher()
+            if (
+                matcher is not None and matcher.version == version
+                and time.time() - matcher.built_at < ThreatMatcher.max_age()
+            ):
+                return matcher
+            try:
+                ThreatMatcher._current = ThreatMatcher.load(version)
+                logger.info(f"Threat matcher reconstruído: {ThreatMatcher._current.stats()}")
+            except Exception as e:
+                logger.warning(f"Threat matcher não pôde ser carregado: {e}")
+                if matcher is None:
+                    # Vazio, mas sem versão: nova tentativa no próximo intervalo
+                    ThreatMatcher._current = ThreatMatcher(version=object())
+            return ThreatMatcher._current
+        finally:
+            ThreatMatcher._lock.release()
+
+    @staticmethod
+    def bump_version() -> None:
+        """
+        Invalida o snapshot (chamado pelos signals)
+
+        Imediato neste worker e nos que compartilham o cache; nos demais
+        vale após ZERO_TRUST_MATCHER_MAX_AGE.
+        """
+        try:
+            cache.incr(THREAT_MATCHER_VERSION_KEY)
+        except ValueError:
+            cache.set(THREAT_MATCHER_VERSION_KEY, int(time.time() * 1000), None)
+        except Exception as e:
+            logger.warning(f"Threat matcher version unavailable: {e}")
+
+    @staticmethod
+    def reset() -> None:
+        with ThreatMatcher._lock:
+            ThreatMatcher._current = None
+            ThreatMatcher._checked_at = 0.0
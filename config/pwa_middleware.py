@@ -9,6 +9,8 @@ from django.http import HttpResponse
 from django.conf import settings
 import hashlib
 
+from apps.core.request_context import apply_security_headers
+
 
 class PWAMiddleware(MiddlewareMixin):
     """
@@ -91,33 +93,22 @@ class PWASecurityMiddleware(MiddlewareMixin):
     def process_response(self, request, response):
         """Adicionar headers de segurança"""
 
+        # Headers padrão escritos uma vez (apps.core.request_context);
+        # aqui só o que difere para o PWA
+        extra = {
+            # Prevenir clickjacking (PWA pode ser embutido na mesma origem)
+            "X-Frame-Options": "SAMEORIGIN",
+            # PWA specific header
+            "X-PWA": "true",
+        }
+
         # HTTPS redirect (em produção)
         if not settings.DEBUG:
-            response["Strict-Transport-Security"] = (
+            extra["Strict-Transport-Security"] = (
                 "max-age=31536000; includeSubDomains; preload"
             )
 
-        # Prevenir clickjacking
-        response["X-Frame-Options"] = "SAMEORIGIN"
-
-        # Prevenir MIME type sniffing
-        response["X-Content-Type-Options"] = "nosniff"
-
-        # XSS Protection
-        response["X-XSS-Protection"] = "1; mode=block"
-
-        # Referrer Policy
-        response["Referrer-Policy"] = "strict-origin-when-cross-origin"
-
-        # Permissions Policy (Feature-Policy)
-        response["Permissions-Policy"] = (
-            "geolocation=(), microphone=(), camera=(), usb=(), payment=()"
-        )
-
-        # PWA specific header
-        response["X-PWA"] = "true"
-
-        return response
+        return apply_security_headers(response, extra)
 
 
 class OfflineQueueMiddleware(MiddlewareMixin):
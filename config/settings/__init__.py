@@ -80,6 +80,7 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 TENANT_APPS = DJANGO_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
+    "apps.core.request_context.RequestContextMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -262,3 +263,187 @@ except ImportError:
 # Django Tenants Configuration
 TENANT_MODEL = "core.Tenant"
 TENANT_DOMAIN_MODEL = "core.TenantDomain"
+
+# ============================================================================
+# RATE LIMITING (apps.core.rate_limit)
+# ============================================================================
+
+# Política -> [(limite, janela em segundos)]; 'default' = RATE_LIMIT_REQUESTS / RATE_LIMIT_WINDOW
+RATE_LIMIT_POLICIES = {
+    "anonymous": [(30, 60), (300, 3600)],
+    "authenticated": [(100, 60), (2000, 3600)],
+    "api": [(60, 60), (1000, 3600)],
+}
+RATE_LIMIT_ROUTES = {"/api/": "api"}  # prefixo de path -> política (maior prefixo vence)
+RATE_LIMIT_WARN_RATIO = 0.5  # uso a partir do qual o ZeroTrust soma risco 'rate_limit_approaching'
+RATE_LIMIT_LOCAL_BATCH = 0.01  # fração dos limites longos contada em memória antes do incr
+RATE_LIMIT_LOCAL_MAX_KEYS = 10000  # contadores rastreados por processo (LRU)
+
+# Threat matcher (apps.security.zero_trust.threat_matcher) - IpBlocklist/ThreatIndicator em memória
+ZERO_TRUST_MATCHER_CHECK_INTERVAL = 5  # segundos entre leituras do stamp de versão no cache
+ZERO_TRUST_MATCHER_MAX_AGE = 30  # recompila após N s mesmo sem stamp novo (LocMemCache é por processo)
+
+# Policy engine (apps.security.zero_trust.policy_engine) - SecurityPolicy compiladas em memória
+ZERO_TRUST_POLICY_CHECK_INTERVAL = 5  # segundos entre leituras do stamp de versão no cache
+ZERO_TRUST_POLICY_MAX_AGE = 60  # recompila após N s mesmo sem stamp novo (LocMemCache é por processo)
+ZERO_TRUST_RISK_THRESHOLDS = {"deny": 80, "challenge": 60, "step_up": 40}  # regras padrão (sem política)
+ZERO_TRUST_ROLE_CACHE_TTL = 300  # grupos do usuário (applies_to_roles não embutidos)
+
+# AccessContext (apps.security.zero_trust.access_log) - gravação assíncrona em lote
+ZERO_TRUST_ACCESS_LOG_ENABLED = os.getenv("ZERO_TRUST_ACCESS_LOG_ENABLED", "True") == "True"
+ZERO_TRUST_ACCESS_LOG_QUEUE_SIZE = 10000  # fila em memória por processo
+ZERO_TRUST_ACCESS_LOG_BATCH_SIZE = 500  # linhas por bulk_create
+ZERO_TRUST_ACCESS_LOG_FLUSH_INTERVAL = 2.0  # segundos máximos até o flush
+
+# Perfis comportamentais (apps.security.zero_trust.behavior) - sketches alimentados pelo AccessContextLog
+ZERO_TRUST_BEHAVIOR_LEARNING_ENABLED = True
+ZERO_TRUST_BEHAVIOR_TOP_K = 32  # IPs/recursos/países monitorados por usuário
+ZERO_TRUST_BEHAVIOR_HLL_PRECISION = 10  # 2^p registradores (~3% de erro nos distintos)
+ZERO_TRUST_BEHAVIOR_MIN_SUPPORT = 2  # ocorrências garantidas para IP/país ser conhecido
+ZERO_TRUST_BEHAVIOR_MIN_HOUR_SHARE = 0.01  # fração dos acessos para hora da semana ser usual
+ZERO_TRUST_BEHAVIOR_MATURITY = {"baseline": 50, "mature": 500}  # data_points_collected
+
+# ============================================================================
+# AUDITORIA (apps.core.audit) - captura única, gravação em lote, spill em disco
+# ============================================================================
+
+AUDIT_QUEUE_SIZE = 10000  # eventos em memória por processo
+AUDIT_BATCH_SIZE = 200  # AuditoriaLog por bulk_create
+AUDIT_FLUSH_INTERVAL = 1.0  # segundos máximos até o flush
+AUDIT_SPILL_DIR = os.getenv("AUDIT_SPILL_DIR", str(BASE_DIR / "var" / "audit_spill"))  # banco indisponível
+AUDIT_REPLAY_INTERVAL = 30  # segundos entre tentativas de regravar o spill
+
+# ============================================================================
+# MÉTRICAS DE PERFORMANCE (apps.core.monitoring) - histogramas por worker
+# ============================================================================
+
+PERFORMANCE_METRICS_FLUSH_INTERVAL = 10  # segundos entre publicações do snapshot do worker no cache
+PERFORMANCE_METRICS_TTL = 300  # worker sem publicar por este tempo sai da agregação
+PERFORMANCE_METRICS_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)  # ms, /metrics
+PERFORMANCE_METRICS_TOKEN = os.getenv("PERFORMANCE_METRICS_TOKEN", "")  # Bearer do scraper Prometheus
+
+# SQL (apps.core.query_tracker) - execute_wrapper, funciona com DEBUG=False
+SQL_INSTRUMENTATION_ENABLED = True
+SQL_SLOW_QUERY_MS = 100  # query individual registrada como lenta
+SQL_N_PLUS_ONE_THRESHOLD = 10  # mesmo fingerprint N vezes numa requisição = N+1 suspeito
+SQL_SAMPLE_RATE = 0.01  # fração das requisições normais guardada no ring buffer
+SQL_RING_BUFFER_SIZE = 200  # amostras por worker
+
+# ============================================================================
+# REQUEST CONTEXT (apps.core.request_context) - fatos da requisição calculados uma vez
+# ============================================================================
+
+# Prefixo de path -> sensibilidade do recurso (maior prefixo vence; padrão 'normal')
+SECURITY_ROUTE_SENSITIVITY = {
+    "/api/lgpd/": "high",
+    "/api/nist/": "high",
+    "/api/security/": "high",
+    "/admin/": "elevated",
+    "/api/finance/": "elevated",
+    "/api/hrm/employees/": "elevated",
+    "/api/users/": "elevated",
+}
+
+# ============================================================================
+# DEPARTAMENTO PESSOAL - folha, ponto, exportação contábil e dashboard
+# ============================================================================
+
+# Folha (apps.departamento_pessoal.payroll) - competência inteira em lote
+DP_FOLHA_WORKERS = int(os.getenv("DP_FOLHA_WORKERS", "4"))  # processos paralelos (um departamento por vez)
+DP_FOLHA_CHUNK_SIZE = 500  # colaboradores por transação (bulk_create/bulk_update)
+
+# Espelho de ponto (apps.departamento_pessoal.timesheet) - agregados diários/mensais
+DP_JORNADA_DIARIA_MINUTOS = 480  # jornada padrão para extras/faltas
+DP_TOLERANCIA_PONTO_MINUTOS = 10  # variação diária desconsiderada (CLT art. 58 §1º)
+
+# Ingestão de ponto (apps.departamento_pessoal.ingestion) - batidas idempotentes em lote
+DP_PONTO_INGESTAO_ASSINCRONA = True  # /api/ponto/registrar/ responde 202 e grava via buffer
+DP_PONTO_QUEUE_SIZE = 50000  # batidas em memória por processo (pico de início de turno)
+DP_PONTO_BATCH_SIZE = 1000  # batidas por flush (bulk_create + consolidação dos dias)
+DP_PONTO_FLUSH_INTERVAL = 0.5  # segundos máximos até o flush
+DP_PONTO_SPILL_DIR = os.getenv("DP_PONTO_SPILL_DIR", str(BASE_DIR / "var" / "ponto_spill"))  # banco indisponível
+DP_PONTO_REPLAY_INTERVAL = 30  # segundos entre tentativas de regravar o spill
+DP_PONTO_SYNC_MAX_BATCH = 500  # batidas por requisição de /api/ponto/sincronizar/
+DP_PONTO_SYNC_MAX_DIAS = 7  # batidas offline mais antigas são rejeitadas
+DP_PONTO_MAX_ADIANTAMENTO = 300  # segundos de relógio adiantado tolerados no cliente
+DP_PONTO_COLABORADOR_CACHE_TTL = 300  # cache usuário -> colaborador
+
+# Exportação contábil (apps.departamento_pessoal.exports) - geração em streaming
+DP_EXPORT_CHUNK_SIZE = 2000  # linhas por fetch do cursor do servidor
+DP_EXPORT_PROGRESS_INTERVAL = 5000  # linhas entre atualizações de linhas_processadas
+DP_EXPORT_BACKGROUND = True  # gera em segundo plano após o commit (False: na requisição)
+DP_EXPORT_CELERY = os.getenv("DP_EXPORT_CELERY", "true").lower() == "true"  # gerar_exportacao_task (sem broker: thread)
+DP_EXPORT_STALE_SECONDS = 900  # 'gerando' sem progresso por mais tempo é reagendada
+DP_EXPORT_TMP_DIR = os.getenv("DP_EXPORT_TMP_DIR") or None  # temporário em disco (None: padrão do sistema)
+DP_EXPORT_DOWNLOAD_BLOCK_SIZE = 64 * 1024  # bytes por bloco no download
+
+# Dashboard (apps.departamento_pessoal.dashboard) - métricas em cache por tenant
+DP_DASHBOARD_CACHE_TTL = 300  # segundos (invalidado antes pelos signals de Colaborador/SolicitacaoFerias)
+
+# ============================================================================
+# DETECÇÃO NIST (apps.nist.detection) - RegraDeteccao compiladas em memória
+# ============================================================================
+
+NIST_DETECTION_CHECK_INTERVAL = 5  # segundos entre leituras do stamp de versão no cache
+NIST_DETECTION_MAX_AGE = 60  # recompila após N s mesmo sem stamp novo (LocMemCache é por processo)
+NIST_DETECTION_BATCH_SIZE = 500  # AlertaSeguranca por bulk_create em processar_eventos
+
+# ============================================================================
+# HELIX ASSISTANT CONFIGURATION
+# ============================================================================
+
+# Status snapshot (apps.assistant.status) - refreshed in background, read from cache
+HELIX_STATUS_TTL = int(os.getenv("HELIX_STATUS_TTL", "30"))  # seconds
+HELIX_STATUS_JITTER = int(os.getenv("HELIX_STATUS_JITTER", "5"))  # seconds (±)
+HELIX_STATUS_PROBE_TIMEOUT = float(os.getenv("HELIX_STATUS_PROBE_TIMEOUT", "2"))
+HELIX_STATUS_FAILURE_THRESHOLD = 3  # consecutive failures before opening the circuit
+HELIX_STATUS_COOLDOWN = 120  # seconds the circuit stays open
+HELIX_STATUS_BACKGROUND_REFRESH = os.getenv("HELIX_STATUS_BACKGROUND_REFRESH", "True") == "True"
+
+# Vector index (apps.assistant.vector_index) - pgvector HNSW or local NumPy fallback
+HELIX_EMBEDDING_DIMENSIONS = int(os.getenv("HELIX_EMBEDDING_DIMENSIONS", "1536"))
+HELIX_VECTOR_INDEX_DIR = os.getenv("HELIX_VECTOR_INDEX_DIR", str(BASE_DIR / "var" / "helix_index"))
+HELIX_HNSW_EF_SEARCH = 40
+HELIX_IVFFLAT_PROBES = 10
+
+# Document ingestion (DocumentoIngestion) - incremental, batched embeddings
+HELIX_INGEST_PARSE_WORKERS = int(os.getenv("HELIX_INGEST_PARSE_WORKERS", "4"))
+HELIX_EMBED_BATCH_SIZE = int(os.getenv("HELIX_EMBED_BATCH_SIZE", "32"))  # texts per Ollama call
+HELIX_EMBED_CONCURRENCY = int(os.getenv("HELIX_EMBED_CONCURRENCY", "2"))  # batches in flight
+HELIX_EMBED_MAX_RETRIES = 3
+HELIX_EMBED_BACKOFF = 1.0  # seconds, doubled per retry (with jitter)
+HELIX_CHUNK_BULK_SIZE = 500  # chunks per bulk_create flush
+
+# Semantic response cache (apps.assistant.response_cache)
+HELIX_RESPONSE_CACHE_ENABLED = os.getenv("HELIX_RESPONSE_CACHE_ENABLED", "True") == "True"
+HELIX_RESPONSE_CACHE_THRESHOLD = float(os.getenv("HELIX_RESPONSE_CACHE_THRESHOLD", "0.95"))  # cosine
+HELIX_RESPONSE_CACHE_TTL = 3600  # seconds
+HELIX_RESPONSE_CACHE_MAX_ENTRIES = 1000  # per tenant, per worker (LRU)
+
+# Query embedding cache (apps.assistant.embedding_cache)
+HELIX_EMBEDDING_CACHE_SIZE = 2048  # in-process LRU entries per worker
+HELIX_EMBEDDING_CACHE_TTL = 86400  # seconds in the shared Django cache
+
+# Prompt assembly (RAGPipeline.assemble_prompt) - token budget
+HELIX_CONTEXT_WINDOW = 4096  # num_ctx of the Ollama model
+HELIX_COMPLETION_TOKEN_RESERVE = 512  # left free for the answer
+HELIX_HISTORY_TOKEN_BUDGET = 768  # max tokens of conversation history
+HELIX_HISTORY_MAX_MESSAGES = 10
+HELIX_TOKENIZER_ENCODING = os.getenv("HELIX_TOKENIZER_ENCODING", "cl100k_base")
+HELIX_TOKENIZER_CACHE_DIR = os.getenv("HELIX_TOKENIZER_CACHE_DIR", str(BASE_DIR / "var" / "tiktoken"))
+os.environ.setdefault("TIKTOKEN_CACHE_DIR", HELIX_TOKENIZER_CACHE_DIR)  # lido pelo tiktoken
+HELIX_TOKENIZER_PRELOAD = os.getenv("HELIX_TOKENIZER_PRELOAD", "False") == "True"  # carrega no ready(); deploy.sh roda warm_tokenizer
+
+# LLM gateway (apps.assistant.llm_gateway) - queue, limits, routing
+HELIX_GATEWAY_MAX_IN_FLIGHT = {"default": int(os.getenv("HELIX_GATEWAY_MAX_IN_FLIGHT", "2"))}  # per model
+HELIX_GATEWAY_MAX_QUEUE = int(os.getenv("HELIX_GATEWAY_MAX_QUEUE", "32"))  # waiting requests per model
+HELIX_GATEWAY_QUEUE_TIMEOUT = 30  # seconds before a queued request is shed
+HELIX_LIGHT_MODEL_ENABLED = os.getenv("HELIX_LIGHT_MODEL_ENABLED", "True") == "True"  # used only once listed by the status probe (ollama pull)
+HELIX_LIGHT_MODEL = os.getenv("HELIX_LIGHT_MODEL", "")  # empty = ModelQuantizer tag below
+HELIX_LIGHT_MODEL_QUANTIZATION = "q3"  # QuantizationType value for simple queries
+HELIX_ROUTER_SIMPLE_MAX_TOKENS = 32  # max question tokens routed to the light model
+HELIX_ROUTER_LIGHT_MAX_PROMPT_TOKENS = 2048
+
+# Retrieval diversification (apps.assistant.similarity.mmr)
+HELIX_RETRIEVAL_MMR_LAMBDA = None  # e.g. 0.7 to rerank the top-k by MMR; None = off
+HELIX_RETRIEVAL_MMR_FETCH_K = 20  # candidates fetched before MMR
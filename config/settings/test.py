@@ -72,6 +72,12 @@ EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
 CELERY_ALWAYS_EAGER = True
 CELERY_EAGER_PROPAGATES_EXCEPTIONS = True
 
+# No background Ollama probing during tests
+HELIX_STATUS_BACKGROUND_REFRESH = False
+
+# Local vector index outside the repo
+HELIX_VECTOR_INDEX_DIR = os.path.join(tempfile.gettempdir(), 'syncrh_helix_index')
+
 # Set SECRET_KEY if not defined
 SECRET_KEY = 'test-secret-key-do-not-use-in-production'
 
@@ -84,3 +90,6 @@ LOGOUT_REDIRECT_URL = '/login/'
 
 
 
+
+# Keep every generation on the (mocked) primary model
+HELIX_LIGHT_MODEL_ENABLED = False
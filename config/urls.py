@@ -23,6 +23,7 @@ from django.contrib.auth import views as auth_views
 from django.shortcuts import redirect
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from apps.core.health_check import health_check, readiness_check, liveness_check
+from apps.core.metrics import metrics
 from config.pwa_views import manifest, pwa_metadata, service_worker
 
 urlpatterns = [
@@ -38,6 +39,9 @@ urlpatterns = [
     path("health/ready/", readiness_check, name="readiness_check"),
     path("health/live/", liveness_check, name="liveness_check"),
     
+    # Prometheus scrape endpoint
+    path("metrics", metrics, name="metrics"),
+    
     # Service Worker (must be served from root for proper scope)
     path("service-worker.js", service_worker, name="service_worker"),
     
@@ -52,6 +52,10 @@ python manage.py collectstatic --noinput --quiet
 log_message "🗄️  Aplicando migrations..."
 python manage.py migrate --noinput
 
+# Vocabulário do tokenizer do Helix em disco (workers não baixam em runtime)
+log_message "🔤 Preparando tokenizer do Helix..."
+python manage.py warm_tokenizer || log_message "⚠️  Tokenizer indisponível - contagem heurística"
+
 # Reiniciar Gunicorn
 log_message "🔄 Reiniciando Gunicorn..."
 pkill -f "gunicorn.*config.wsgi" || true
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark for apps.nist.detection
+
+Measures detection throughput (events/second) with hundreds of
+RegraDeteccao rows: the compiled rules indexed by tipo_evento and equals
+key against interpreting every rule's JSON conditions per event (the
+previous DeteccaoService._verificar_regra loop).
+
+Usage:
+    SECRET_KEY=x ALLOWED_HOSTS=localhost python scripts/benchmark_detection.py
+    SECRET_KEY=x ALLOWED_HOSTS=localhost python scripts/benchmark_detection.py --rules 100 1000 --events 50000
+
+No database is needed: rules are generated in memory with the same shape
+as RegraDeteccao.objects.values(); alert persistence is not measured.
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.test')
+
+import django  # noqa: E402
+
+django.setup()
+
+from apps.nist.detection import DetectionEngine  # noqa: E402
+
+EVENT_TYPES = ['auditoria', 'zero_trust', 'autenticacao', 'lgpd']
+ACTIONS = [f'acao_{i}' for i in range(200)]
+
+
+def generate(count, rng):
+    rows = []
+    for i in range(count):
+        condicoes = {}
+        if rng.random() < 0.85:
+            condicoes['acao'] = {'operador': 'equals', 'valor': rng.choice(ACTIONS)}
+        condicoes['risco'] = {'operador': 'greater_than', 'valor': rng.randint(10, 90)}
+        if rng.random() < 0.3:
+            condicoes['ip'] = {'operador': 'regex', 'valor': rf'^10\.{rng.randint(0, 255)}\.'}
+        if rng.random() < 0.3:
+            condicoes['metodo'] = {'operador': 'in', 'valor': rng.sample(['GET', 'POST', 'PUT', 'DELETE'], 2)}
+        rows.append({
+            'id': i, 'nome': f'regra-{i}', 'descricao': '', 'severidade': 'media',
+            'tipo_evento': rng.choice(EVENT_TYPES) if rng.random() < 0.8 else '',
+            'condicoes': condicoes,
+        })
+    return rows
+
+
+def interpret(rows, tipo_evento, dados):
+    """Baseline: filter by tipo_evento and interpret every rule's JSON per event"""
+    matched = 0
+    for row in rows:
+        if row['tipo_evento'] not in ('', tipo_evento):
+            continue
+        ok = True
+        for campo, config in row['condicoes'].items():
+            valor = dados.get(campo)
+            if valor is None:
+                ok = False
+                break
+            operador, esperado = config['operador'], config['valor']
+            try:
+                if operador == 'equals' and valor != esperado:
+                    ok = False
+                elif operador == 'greater_than' and float(valor) <= float(esperado):
+                    ok = False
+                elif operador == 'in' and valor not in esperado:
+                    ok = False
+                elif operador == 'regex' and not re.search(esperado, str(valor)):
+                    ok = False
+            except (TypeError, ValueError):
+                ok = False
+            if not ok:
+                break
+        matched += ok
+    return matched
+
+
+def events(count, rng):
+    return [(rng.choice(EVENT_TYPES), {
+        'acao': rng.choice(ACTIONS),
+        'risco': rng.randint(0, 100),
+        'ip': f'10.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}',
+        'metodo': rng.choice(['GET', 'POST', 'PUT', 'DELETE']),
+    }) for _ in range(count)]
+
+
+def throughput(func, items):
+    start = time.perf_counter()
+    for tipo_evento, dados in items:
+        func(tipo_evento, dados)
+    return len(items) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rules', type=int, nargs='+', default=[100, 500, 1000])
+    parser.add_argument('--events', type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    samples = events(args.events, rng)
+    print(f"{'rules':>7}{'compile ms':>12}{'interpreted ev/s':>18}{'compiled ev/s':>15}{'speedup':>9}")
+    for count in args.rules:
+        rows = generate(count, rng)
+        start = time.perf_counter()
+        engine = DetectionEngine(rows)
+        compile_ms = (time.perf_counter() - start) * 1000
+        baseline = throughput(lambda t, d: interpret(rows, t, d), samples[: max(500, args.events // 20)])
+        compiled = throughput(engine.match, samples)
+        print(f"{count:>7}{compile_ms:>12.1f}{baseline:>18,.0f}{compiled:>15,.0f}{compiled / baseline:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark for apps.core.request_context
+
+Measures the per-request cost of deriving request facts (client IP, IP
+class, device fingerprint, route sensitivity, exempt/sensitive path
+checks, security headers) the old way - each middleware re-parsing
+X-Forwarded-For, hashing headers and scanning prefix lists - against
+the shared RequestContext, then times the full security middleware
+stack end to end.
+
+Usage:
+    SECRET_KEY=x ALLOWED_HOSTS=localhost python scripts/benchmark_middleware.py
+    SECRET_KEY=x ALLOWED_HOSTS=localhost python scripts/benchmark_middleware.py --requests 50000
+
+The stack run uses config.settings.test (LocMem cache, no database
+writes: AccessContext logging is disabled and the threat matcher is
+empty).
+"""
+
+import argparse
+import hashlib
+import logging
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.test')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.contrib.auth.models import AnonymousUser  # noqa: E402
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory, override_settings  # noqa: E402
+
+from apps.core import middleware as core_middleware  # noqa: E402
+from apps.core.request_context import (  # noqa: E402
+    ROUTE_SENSITIVITY,
+    RequestContextMiddleware,
+    apply_security_headers,
+    get_request_context,
+    prefix_matcher,
+)
+from apps.security.middleware import AuditoriaLoggingMiddleware  # noqa: E402
+from apps.security.zero_trust import middleware as zt_middleware  # noqa: E402
+from apps.security.zero_trust.threat_matcher import ThreatMatcher, classify_ip  # noqa: E402
+from config.pwa_middleware import PWASecurityMiddleware  # noqa: E402
+
+PATHS = [
+    '/api/v1/dp/colaboradores/42/',
+    '/api/hrm/employees/7/',
+    '/dashboard/',
+    '/admin/core/user/',
+    '/api/lgpd/consentimentos/',
+]
+
+HEADERS = {
+    'HTTP_X_FORWARDED_FOR': '203.0.113.9, 10.0.0.1',
+    'HTTP_USER_AGENT': 'Mozilla/5.0 (X11; Linux x86_64) Chrome/120.0',
+    'HTTP_ACCEPT_LANGUAGE': 'pt-BR,pt;q=0.9',
+    'HTTP_ACCEPT_ENCODING': 'gzip, br',
+    'HTTP_SEC_CH_UA': '"Chromium";v="120"',
+    'HTTP_SEC_CH_UA_PLATFORM': '"Linux"',
+}
+
+BASE_HEADERS = (
+    ('X-Content-Type-Options', 'nosniff'),
+    ('X-Frame-Options', 'DENY'),
+    ('X-XSS-Protection', '1; mode=block'),
+    ('Referrer-Policy', 'strict-origin-when-cross-origin'),
+)
+
+# Headers each middleware wrote on its own: core, zero trust, PWA
+LEGACY_HEADERS = (
+    BASE_HEADERS + (
+        ('Strict-Transport-Security', 'max-age=31536000; includeSubDomains'),
+        ('Permissions-Policy', 'accelerometer=(), camera=(), geolocation=(), gyroscope=(), '
+                               'magnetometer=(), microphone=(), payment=(), usb=()'),
+    ),
+    (('X-Request-ID', 'x' * 36),) + BASE_HEADERS,
+    BASE_HEADERS + (
+        ('Strict-Transport-Security', 'max-age=31536000; includeSubDomains; preload'),
+        ('X-Frame-Options', 'SAMEORIGIN'),
+        ('Permissions-Policy', 'geolocation=(), microphone=(), camera=(), usb=(), payment=()'),
+        ('X-PWA', 'true'),
+    ),
+)
+
+PWA_EXTRA = {
+    'X-Frame-Options': 'SAMEORIGIN',
+    'X-PWA': 'true',
+    'Strict-Transport-Security': 'max-age=31536000; includeSubDomains; preload',
+}
+
+
+def legacy_ip(request):
+    """Baseline: the XFF parse each middleware carried its own copy of"""
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if x_forwarded_for:
+        return x_forwarded_for.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR')
+
+
+def legacy_derive(request, response):
+    """Baseline: per-middleware derivations before the shared context"""
+    meta = request.META
+    path = request.path
+    for _ in range(5):  # rate limit, audit x2, session security, zero trust
+        ip = legacy_ip(request)
+    classify_ip(ip)
+    hashlib.sha256((meta.get('HTTP_USER_AGENT', '') + meta.get('HTTP_ACCEPT_LANGUAGE', '')
+                    + meta.get('HTTP_ACCEPT_ENCODING', '')).encode()).hexdigest()
+    hashlib.sha256('|'.join(meta.get(h, '') for h in (
+        'HTTP_USER_AGENT', 'HTTP_ACCEPT_LANGUAGE', 'HTTP_ACCEPT_ENCODING',
+        'HTTP_SEC_CH_UA', 'HTTP_SEC_CH_UA_PLATFORM',
+    )).encode()).hexdigest()
+    any(path.startswith(p) for p in zt_middleware.ZeroTrustMiddleware.EXEMPT_PATHS)
+    any(path.startswith(p) for p in AuditoriaLoggingMiddleware.EXCLUDE_PATHS)
+    any(path.startswith(p) for p in core_middleware.AuditLogMiddleware.SENSITIVE_PATHS)
+    next((level for prefix, level in ROUTE_SENSITIVITY.items() if path.startswith(prefix)), 'normal')
+    for headers in LEGACY_HEADERS:
+        for header, value in headers:
+            response[header] = value
+
+
+def context_derive(request, response):
+    """Same facts through request.request_context"""
+    context = get_request_context(request)
+    for _ in range(5):
+        context.ip
+    context.ip_type
+    context.fingerprint
+    context.fingerprint
+    prefix_matcher(zt_middleware.ZeroTrustMiddleware.EXEMPT_PATHS).matches(context.path)
+    prefix_matcher(AuditoriaLoggingMiddleware.EXCLUDE_PATHS).matches(context.path)
+    prefix_matcher(core_middleware.AuditLogMiddleware.SENSITIVE_PATHS).matches(context.path)
+    context.sensitivity
+    apply_security_headers(response)
+    apply_security_headers(response, {'X-Request-ID': 'x' * 36})
+    apply_security_headers(response, PWA_EXTRA)
+
+
+def bench(func, requests):
+    factory = RequestFactory()
+    batch = [factory.get(PATHS[i % len(PATHS)], **HEADERS) for i in range(requests)]
+    responses = [HttpResponse() for _ in range(requests)]
+    start = time.perf_counter()
+    for request, response in zip(batch, responses):
+        func(request, response)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def bench_stack(requests):
+    """Full security stack (new code) with a no-op view, µs per request"""
+    view = lambda request: HttpResponse('ok')  # noqa: E731
+    chain = view
+    for cls in (
+        PWASecurityMiddleware,
+        zt_middleware.DeviceTrustMiddleware,
+        zt_middleware.ZeroTrustMiddleware,
+        AuditoriaLoggingMiddleware,
+        core_middleware.RateLimitMiddleware,
+        core_middleware.SecurityHeadersMiddleware,
+        RequestContextMiddleware,
+    ):
+        chain = cls(chain)
+
+    factory = RequestFactory()
+    batch = []
+    for i in range(requests):
+        request = factory.get(PATHS[i % len(PATHS)], **dict(HEADERS, HTTP_X_FORWARDED_FOR=f'203.0.113.{i % 250}'))
+        request.user = AnonymousUser()
+        batch.append(request)
+
+    with override_settings(ZERO_TRUST_ACCESS_LOG_ENABLED=False,
+                           RATE_LIMIT_ROUTES={'/api/': 'bulk'},
+                           RATE_LIMIT_POLICIES={'bulk': [(10 ** 9, 60)],
+                                                'anonymous': [(10 ** 9, 60)]}):
+        logging.disable(logging.CRITICAL)  # ZeroTrust logs every decision
+        ThreatMatcher._current = ThreatMatcher()
+        ThreatMatcher._checked_at = float('inf')
+        start = time.perf_counter()
+        for request in batch:
+            chain(request)
+        return (time.perf_counter() - start) / requests * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=20_000)
+    args = parser.parse_args()
+
+    legacy = bench(legacy_derive, args.requests)
+    shared = bench(context_derive, args.requests)
+    print(f"{args.requests:,} requests, {len(PATHS)} paths")
+    print(f"{'derivations':<22}{'µs/request':>12}")
+    print(f"{'legacy (per middleware)':<22}{legacy:>12.2f}")
+    print(f"{'RequestContext':<22}{shared:>12.2f}  ({legacy / shared:.1f}x)")
+    print(f"\nFull security stack (new): {bench_stack(args.requests):.1f} µs/request")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark for apps.security.zero_trust.policy_engine
+
+Measures per-request policy evaluation with hundreds of SecurityPolicy
+rows: the compiled, (sensitivity, method)-indexed decision table against
+interpreting every policy's JSON conditions and regexes per request.
+
+Usage:
+    SECRET_KEY=x ALLOWED_HOSTS=localhost python scripts/benchmark_policies.py
+    SECRET_KEY=x ALLOWED_HOSTS=localhost python scripts/benchmark_policies.py --policies 100 500 2000
+
+No database is needed: policies are generated in memory with the same
+shape as SecurityPolicy.objects.values().
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.test')
+
+import django  # noqa: E402
+
+django.setup()
+
+from apps.security.zero_trust.policy_engine import (  # noqa: E402
+    METHODS,
+    SENSITIVITIES,
+    PolicyEngine,
+)
+
+RESOURCES = ['/api/v1/dp/', '/api/v1/hrm/', '/api/lgpd/', '/api/v1/finance/', '/admin/', '/api/v1/work/']
+ROLES = ['staff', 'employee', 'contractor', 'authenticated']
+
+
+def generate(count, rng):
+    rows = []
+    for i in range(count):
+        conditions = {'min_risk_score': rng.randint(20, 95)}
+        if rng.random() < 0.6:
+            conditions['methods'] = rng.sample(METHODS, rng.randint(1, 3))
+        if rng.random() < 0.6:
+            conditions['sensitivity'] = rng.sample(SENSITIVITIES, rng.randint(1, 2))
+        if rng.random() < 0.3:
+            conditions['allowed_hours'] = {'start': 7, 'end': 20}
+        if rng.random() < 0.2:
+            conditions['ip_types'] = ['public']
+        rows.append({
+            'id': i,
+            'name': f'policy-{i}',
+            'applies_to_roles': rng.sample(ROLES, 1) if rng.random() < 0.4 else [],
+            'applies_to_resources': [f'^{rng.choice(RESOURCES)}'] if rng.random() < 0.7 else [],
+            'conditions': conditions,
+            'action_on_match': rng.choice(['deny', 'challenge', 'log', 'allow']),
+            'priority': rng.randint(1, 1000),
+            'is_enforced': rng.random() < 0.8,
+        })
+    return rows
+
+
+def interpret(rows, context, roles):
+    """Baseline: walk every policy (priority order) and interpret its JSON per request"""
+    for row in rows:
+        conditions = row['conditions']
+        if row['applies_to_resources'] and not any(
+            re.match(pattern, context['path']) for pattern in row['applies_to_resources']
+        ):
+            continue
+        if row['applies_to_roles'] and not set(row['applies_to_roles']) & roles:
+            continue
+        if 'methods' in conditions and context['method'] not in conditions['methods']:
+            continue
+        if 'sensitivity' in conditions and context['resource_sensitivity'] not in conditions['sensitivity']:
+            continue
+        if context['risk_score'] < conditions.get('min_risk_score', 0):
+            continue
+        hours = conditions.get('allowed_hours')
+        if hours and not hours['start'] <= context['hour'] < hours['end']:
+            continue
+        if 'ip_types' in conditions and context['ip_type'] not in conditions['ip_types']:
+            continue
+        if row['is_enforced'] and row['action_on_match'] in ('allow', 'deny', 'challenge'):
+            return row['action_on_match']
+    return 'allow'
+
+
+def contexts(count, rng):
+    return [{
+        'path': rng.choice(RESOURCES) + 'x/1/',
+        'method': rng.choice(METHODS),
+        'resource_sensitivity': rng.choice(SENSITIVITIES),
+        'risk_score': rng.randint(0, 100),
+        'risk_factors': [],
+        'hour': rng.randint(0, 23),
+        'ip_type': rng.choice(['public', 'private']),
+        'is_authenticated': True,
+    } for _ in range(count)]
+
+
+def timed(func, items):
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    return (time.perf_counter() - start) / len(items) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--policies', type=int, nargs='+', default=[100, 500, 1000])
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    samples = contexts(args.requests, rng)
+    roles = frozenset({'authenticated', 'employee'})
+    print(f"{'policies':>9}{'compile ms':>12}{'interpreted µs':>16}{'compiled µs':>13}{'speedup':>9}")
+    for count in args.policies:
+        rows = sorted(generate(count, rng), key=lambda row: -row['priority'])
+        start = time.perf_counter()
+        engine = PolicyEngine(rows)
+        compile_ms = (time.perf_counter() - start) * 1000
+        baseline = timed(lambda ctx: interpret(rows, ctx, roles), samples[: max(200, args.requests // 10)])
+        compiled = timed(lambda ctx: engine.evaluate(ctx, roles), samples)
+        print(f"{count:>9}{compile_ms:>12.1f}{baseline:>16.1f}{compiled:>13.2f}{baseline / compiled:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark for apps.departamento_pessoal.ingestion
+
+Measures the CPU side of a shift-start burst (punches/second):
+
+- request path: normalizar_batida + IngestaoPonto-style submit into a
+  BatchWriter queue (what /api/ponto/registrar/ does before answering 202)
+- flush path: grouping a batch by employee-day, time ordering and
+  resolver_dia (slot assignment + daily totals) for every affected day
+
+Usage:
+    SECRET_KEY=x ALLOWED_HOSTS=localhost python scripts/benchmark_punch_ingestion.py
+    SECRET_KEY=x ALLOWED_HOSTS=localhost python scripts/benchmark_punch_ingestion.py --employees 5000 --punches 4
+
+No database is needed: bulk_create/upsert round trips are not measured
+(one BatidaPonto insert, one SELECT and one RegistroPonto upsert per
+batch of DP_PONTO_BATCH_SIZE punches).
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.test')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.utils import timezone  # noqa: E402
+
+from apps.core.write_behind import BatchWriter  # noqa: E402
+from apps.departamento_pessoal.ingestion import PUNCH_FIELDS, normalizar_batida, resolver_dia  # noqa: E402
+
+
+def punches(employees, per_day, now, rng):
+    """Offline-style punches (shuffled: arrival order != time order)"""
+    rows = []
+    start = now - timedelta(hours=10)
+    for colaborador_id in range(1, employees + 1):
+        for slot in range(per_day):
+            momento = start + timedelta(hours=slot * 2.5, minutes=rng.randint(0, 20))
+            rows.append((colaborador_id, {
+                'chave': f'{colaborador_id}-{slot}',
+                'momento': momento.isoformat(),
+                'origem': 'app',
+                'localizacao': {'latitude': -23.5, 'longitude': -46.6},
+            }))
+    rng.shuffle(rows)
+    return rows
+
+
+def resolve(batch, now):
+    por_dia = defaultdict(list)
+    for linha in batch:
+        row = dict(zip(PUNCH_FIELDS, linha))
+        momento = datetime.fromtimestamp(row['momento'], tz=dt_timezone.utc)
+        row['momento'] = momento
+        por_dia[(row['colaborador_id'], timezone.localdate(momento))].append(row)
+    for (colaborador_id, data), day in por_dia.items():
+        day.sort(key=lambda row: row['momento'])
+        resolver_dia(colaborador_id, data, day, now)
+    return len(por_dia)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--employees', type=int, default=5000)
+    parser.add_argument('--punches', type=int, default=4, help='punches per employee')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    now = timezone.now()
+    samples = punches(args.employees, args.punches, now, rng)
+
+    batches = []
+    writer = BatchWriter('bench', batches.append, max_queue=len(samples) + 1,
+                         batch_size=args.batch_size, background=False)
+    start = time.perf_counter()
+    for colaborador_id, dados in samples:
+        writer.submit(normalizar_batida(colaborador_id, dados, now), critical=True)
+    writer.flush()
+    request_rate = len(samples) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    days = sum(resolve(batch, now) for batch in batches)
+    flush_rate = len(samples) / (time.perf_counter() - start)
+
+    print(f'{len(samples):,} punches, {len(batches)} batches, {days:,} employee-days resolved')
+    print(f'request path (validate + enqueue): {request_rate:>12,.0f} punches/s')
+    print(f'flush path (group + resolve):      {flush_rate:>12,.0f} punches/s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Micro-benchmark for apps.assistant.similarity
+
+Measures query-vs-matrix cosine scoring + top-k over 1536-dim float32
+embeddings, against the old pure-Python pairwise loop as a baseline.
+
+Usage:
+    python scripts/benchmark_similarity.py                    # 10k, 100k, 1M rows
+    python scripts/benchmark_similarity.py --sizes 10000 --queries 16
+    python scripts/benchmark_similarity.py --block 50000      # lower peak memory
+
+Rows above --block are scored block by block (same as scanning a
+memory-mapped index), so 1M x 1536 never needs 6 GB resident.
+"""
+
+import argparse
+import math
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np  # noqa: E402
+
+from apps.assistant import similarity  # noqa: E402
+
+DIMS = 1536
+
+
+def python_cosine(vec1, vec2):
+    """Baseline: the original pure-Python calculate_cosine_similarity"""
+    dot_product = sum(a * b for a, b in zip(vec1, vec2))
+    norm1 = math.sqrt(sum(a ** 2 for a in vec1))
+    norm2 = math.sqrt(sum(b ** 2 for b in vec2))
+    if norm1 == 0 or norm2 == 0:
+        return 0.0
+    return dot_product / (norm1 * norm2)
+
+
+def timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def bench_python(rng, rows=500):
+    matrix = rng.standard_normal((rows, DIMS)).astype(np.float32).tolist()
+    query = matrix[0]
+    elapsed = timed(lambda: [python_cosine(query, row) for row in matrix], 1)
+    return rows / elapsed
+
+
+def bench_size(rng, rows, block, queries, k, repeat):
+    block_rows = min(rows, block)
+    matrix = similarity.normalize_rows(rng.standard_normal((block_rows, DIMS)))
+    blocks = math.ceil(rows / block_rows)
+    query = rng.standard_normal(DIMS).astype(np.float32)
+    batch = rng.standard_normal((queries, DIMS)).astype(np.float32)
+
+    def single():
+        for _ in range(blocks):
+            similarity.top_k(similarity.score(query, matrix), k)
+
+    def batched():
+        for _ in range(blocks):
+            scores = similarity.batch_score(batch, matrix)
+            for row in scores:
+                similarity.top_k(row, k)
+
+    single_time = timed(single, repeat)
+    batch_time = timed(batched, repeat)
+    return {
+        'rows': rows,
+        'single_ms': single_time * 1000,
+        'single_rows_per_s': rows / single_time,
+        'batch_ms_per_query': batch_time * 1000 / queries,
+        'batch_rows_per_s': rows * queries / batch_time,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--block', type=int, default=100_000, help="Rows scored per block")
+    parser.add_argument('--queries', type=int, default=8, help="Queries per batch_score call")
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    print(f"NumPy {np.__version__}, {DIMS} dims, float32, k={args.k}")
+    print(f"Pure-Python baseline: {bench_python(rng):,.0f} rows/s\n")
+
+    print(f"{'rows':>10} | {'1 query (ms)':>12} | {'rows/s':>14} | {'batched ms/query':>16} | {'rows/s':>14}")
+    print('-' * 78)
+    for rows in args.sizes:
+        result = bench_size(rng, rows, args.block, args.queries, args.k, args.repeat)
+        print(
+            f"{result['rows']:>10,} | {result['single_ms']:>12.2f} | {result['single_rows_per_s']:>14,.0f} | "
+            f"{result['batch_ms_per_query']:>16.2f} | {result['batch_rows_per_s']:>14,.0f}"
+        )
+
+
+if __name__ == '__main__':
+    main()
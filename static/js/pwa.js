@@ -3,6 +3,11 @@
  * Handles service worker registration, offline detection, and PWA interactions
  */
 
+// Batidas de ponto feitas offline (apps.departamento_pessoal)
+const PUNCH_URL = "/api/v1/dp/api/ponto/registrar/";
+const PUNCH_SYNC_URL = "/api/v1/dp/api/ponto/sincronizar/";
+const PUNCH_SYNC_BATCH = 500; // DP_PONTO_SYNC_MAX_BATCH
+
 class WorksuitePWA {
   constructor() {
     this.swRegistration = null;
@@ -227,6 +232,7 @@ class WorksuitePWA {
       method,
       url,
       data,
+      key: this.newIdempotencyKey(),
       timestamp: new Date().toISOString(),
     };
 
@@ -247,7 +253,13 @@ class WorksuitePWA {
 
     console.log("[PWA] Syncing offline queue...");
 
-    const queue = [...this.offlineQueue];
+    // Batidas de ponto vão num único POST idempotente
+    const punches = this.offlineQueue.filter((r) => r.url.endsWith(PUNCH_URL));
+    if (punches.length > 0) {
+      await this.syncPunches(punches);
+    }
+
+    const queue = this.offlineQueue.filter((r) => !r.url.endsWith(PUNCH_URL));
 
     for (const request of queue) {
       try {
@@ -256,6 +268,7 @@ class WorksuitePWA {
           headers: {
             "Content-Type": "application/json",
             Authorization: `Bearer ${this.getAuthToken()}`,
+            ...(request.key ? { "Idempotency-Key": request.key } : {}),
           },
           body: request.data ? JSON.stringify(request.data) : null,
         });
@@ -277,6 +290,56 @@ class WorksuitePWA {
     this.saveOfflineQueueToStorage();
   }
 
+  /**
+   * Sync queued punches in batches (aceitas/rejeitadas leave the queue)
+   */
+  async syncPunches(punches) {
+    for (let i = 0; i < punches.length; i += PUNCH_SYNC_BATCH) {
+      const batch = punches.slice(i, i + PUNCH_SYNC_BATCH);
+      try {
+        const response = await fetch(PUNCH_SYNC_URL, {
+          method: "POST",
+          headers: {
+            "Content-Type": "application/json",
+            Authorization: `Bearer ${this.getAuthToken()}`,
+          },
+          body: JSON.stringify({
+            batidas: batch.map((r) => ({
+              ...(r.data || {}),
+              chave: r.key,
+              momento: r.timestamp,
+            })),
+          }),
+        });
+        if (!response.ok) {
+          console.warn("[PWA] Punch sync failed with status:", response.status);
+          return;
+        }
+        const result = await response.json();
+        const done = new Set([
+          ...result.aceitas,
+          ...result.rejeitadas.map((r) => r.chave),
+        ]);
+        result.rejeitadas.forEach((r) => console.warn("[PWA] Punch rejected:", r.chave, r.erro));
+        this.offlineQueue = this.offlineQueue.filter((r) => !done.has(r.key));
+        console.log("[PWA] Punches synced:", result.aceitas.length);
+      } catch (error) {
+        console.error("[PWA] Failed to sync punches:", error);
+        return;
+      }
+    }
+  }
+
+  /**
+   * Client-generated idempotency key for queued requests
+   */
+  newIdempotencyKey() {
+    if (window.crypto && typeof window.crypto.randomUUID === "function") {
+      return window.crypto.randomUUID();
+    }
+    return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+  }
+
   /**
    * Save offline queue to localStorage
    */
@@ -296,6 +359,14 @@ class WorksuitePWA {
       const stored = localStorage.getItem("worksuite-offline-queue");
       if (stored) {
         this.offlineQueue = JSON.parse(stored);
+        // Requests queued before idempotency keys existed get a stable key now
+        const missing = this.offlineQueue.filter((r) => !r.key);
+        missing.forEach((r) => {
+          r.key = this.newIdempotencyKey();
+        });
+        if (missing.length > 0) {
+          this.saveOfflineQueueToStorage();
+        }
       }
     } catch (error) {
       console.warn("[PWA] Failed to load offline queue:", error);
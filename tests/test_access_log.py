@@ -0,0 +1,174 @@
+"""
+Testes para a gravação em lote de AccessContext (apps.core.write_behind,
+apps.security.zero_trust.access_log)
+"""
+
+import time
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.db import IntegrityError
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+from django.utils import timezone
+
+from apps.core.write_behind import BatchWriter
+from apps.security.zero_trust.access_log import AccessContextLog, risk_level
+from apps.security.zero_trust.behavior import BehaviorProfileLearner
+from apps.security.zero_trust.middleware import ZeroTrustMiddleware
+from apps.security.zero_trust.threat_matcher import ThreatMatcher
+
+
+class BatchWriterTests(SimpleTestCase):
+    """Testes para a fila write-behind"""
+
+    def test_flush_writes_in_batches(self):
+        """flush() grava a fila em lotes de batch_size"""
+        batches = []
+        writer = BatchWriter('test', batches.append, batch_size=3, background=False)
+        for i in range(7):
+            writer.submit(i)
+
+        self.assertEqual(writer.flush(), 7)
+        self.assertEqual(batches, [[0, 1, 2], [3, 4, 5], [6]])
+        self.assertEqual(writer.stats()['batches'], 3)
+
+    def test_background_thread_flushes_on_interval(self):
+        """Lote incompleto é gravado após flush_interval"""
+        batches = []
+        writer = BatchWriter('test', batches.append, batch_size=100, flush_interval=0.05)
+        try:
+            writer.submit('a')
+            writer.submit('b')
+            deadline = time.monotonic() + 2
+            while not batches and time.monotonic() < deadline:
+                time.sleep(0.01)
+        finally:
+            writer.stop()
+
+        self.assertEqual(batches, [['a', 'b']])
+
+    def test_backpressure_sheds_non_critical_first(self):
+        """Acima do high water só itens críticos entram; fila cheia descarta"""
+        writer = BatchWriter('test', mock.Mock(), max_queue=4, high_water=0.5, put_timeout=0.01, background=False)
+
+        accepted = [writer.submit(i) for i in range(3)]
+        critical = [writer.submit('deny', critical=True) for _ in range(3)]
+
+        self.assertEqual(accepted, [True, True, False])
+        self.assertEqual(critical, [True, True, False])
+        stats = writer.stats()
+        self.assertEqual((stats['shed'], stats['dropped'], stats['queued']), (1, 1, 4))
+
+    def test_failed_batch_is_retried_then_dropped(self):
+        """Banco fora: novas tentativas com backoff e depois descarte contabilizado"""
+        write = mock.Mock(side_effect=RuntimeError('db down'))
+        writer = BatchWriter('test', write, max_retries=2, backoff=0, background=False)
+        writer.submit(1)
+
+        self.assertEqual(writer.flush(), 0)
+        self.assertEqual(write.call_count, 3)
+        self.assertEqual(writer.stats()['failed'], 1)
+
+
+class AccessContextLogTests(SimpleTestCase):
+    """Testes para o registro de AccessContext pelo ZeroTrustMiddleware"""
+
+    def setUp(self):
+        self.writer = BatchWriter('access_context', AccessContextLog.write, background=False)
+        patcher = mock.patch.object(AccessContextLog, '_writer', self.writer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(ThreatMatcher, 'current', return_value=ThreatMatcher())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_risk_level(self):
+        self.assertEqual([risk_level(s) for s in (0, 30, 60, 80)], ['low', 'medium', 'high', 'critical'])
+
+    def test_middleware_enqueues_without_db_write(self):
+        """Requisição só enfileira; bulk_create acontece no flush, com o status"""
+        middleware = ZeroTrustMiddleware(lambda request: HttpResponse('ok'))
+        request = RequestFactory().get('/dashboard/', REMOTE_ADDR='10.0.0.5', HTTP_USER_AGENT='Mozilla')
+        request.user = AnonymousUser()
+
+        with mock.patch('apps.security.zero_trust.models.AccessContext.objects.bulk_create') as bulk_create:
+            response = middleware(request)
+            bulk_create.assert_not_called()
+            self.assertEqual(self.writer.stats()['queued'], 1)
+
+            self.assertEqual(AccessContextLog.flush(), 1)
+
+        self.assertEqual(response.status_code, 200)
+        (objs,), _ = bulk_create.call_args
+        row = objs[0]
+        self.assertEqual(row.decision, 'allow')
+        self.assertEqual(row.response_code, 200)
+        self.assertEqual(row.ip_type, 'private')
+        self.assertEqual(row.resource_type, 'view')
+        self.assertEqual(str(row.request_id), request.zero_trust_id)
+
+    def test_denied_requests_are_critical(self):
+        """Decisões != 'allow' entram mesmo acima do high water"""
+        request = RequestFactory().get('/api/nist/')
+        context = {
+            'request_id': 'a' * 32, 'path': '/api/nist/', 'method': 'GET',
+            'ip_address': '203.0.113.9', 'risk_score': 90, 'risk_factors': ['blocked_ip'],
+        }
+
+        with mock.patch.object(self.writer, 'submit') as submit:
+            AccessContextLog.record(request, context, 'deny', 'IP address is blocked')
+
+        row = submit.call_args[0][0]
+        self.assertTrue(submit.call_args[1]['critical'])
+        self.assertEqual(row['risk_level'], 'critical')
+        self.assertFalse(row['was_successful'])
+
+    def test_invalid_forwarded_ip_is_nulled(self):
+        request = RequestFactory().get('/api/x/')
+        context = {'request_id': 'b' * 32, 'path': '/api/x/', 'method': 'GET', 'ip_address': '<script>'}
+
+        row = AccessContextLog.build(request, context, 'allow', 'ok')
+
+        self.assertIsNone(row['ip_address'])
+
+    def test_rejected_batch_falls_back_to_row_inserts(self):
+        """Só a linha rejeitada é perdida; as demais são gravadas e aprendidas"""
+        rows = [{'request_id': f'{i:032x}', 'decision': 'allow', 'was_successful': True} for i in range(3)]
+
+        def save(instance, **kwargs):
+            if str(instance.request_id).endswith('1'):
+                raise IntegrityError('bad row')
+
+        with mock.patch('apps.security.zero_trust.models.AccessContext.objects.bulk_create',
+                        side_effect=IntegrityError('bad row')), \
+                mock.patch('apps.security.zero_trust.models.AccessContext.save', autospec=True,
+                           side_effect=save) as saved, \
+                mock.patch('apps.security.zero_trust.access_log.transaction.atomic'), \
+                mock.patch.object(BehaviorProfileLearner, 'consume') as consume:
+            AccessContextLog.write(rows)
+
+        self.assertEqual(saved.call_count, 3)
+        (learned,), _ = consume.call_args
+        self.assertEqual([row['request_id'] for row in learned], [rows[0]['request_id'], rows[2]['request_id']])
+
+    def test_learner_only_sees_successful_allowed_access_at_request_time(self):
+        requested_at = timezone.now() - timedelta(hours=3)
+        request = RequestFactory().get('/api/x/')
+        base = {'request_id': 'c' * 32, 'path': '/api/x/', 'method': 'GET', 'ip_address': '10.0.0.1',
+                'user_id': 5, 'timestamp': requested_at}
+        rows = [
+            AccessContextLog.build(request, base, 'allow', 'ok', HttpResponse(status=200)),
+            AccessContextLog.build(request, base, 'allow', 'ok', HttpResponse(status=404)),
+            AccessContextLog.build(request, base, 'deny', 'blocked', HttpResponse(status=403)),
+        ]
+
+        with mock.patch('apps.security.zero_trust.models.AccessContext.objects.bulk_create') as bulk_create, \
+                mock.patch.object(BehaviorProfileLearner, 'consume') as consume:
+            AccessContextLog.write(rows)
+
+        (learned,), _ = consume.call_args
+        self.assertEqual(learned, rows[:1])
+        self.assertEqual(learned[0]['timestamp'], requested_at)
+        self.assertFalse(hasattr(bulk_create.call_args.args[0][0], 'timestamp'))
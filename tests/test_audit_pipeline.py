@@ -0,0 +1,185 @@
+"""
+Testes para o pipeline de auditoria (apps.core.audit) e o spill em disco
+(apps.core.write_behind)
+"""
+
+import os
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+from django.db import IntegrityError
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+
+from apps.core.audit import AUDIT_FIELDS, AuditPipeline
+from apps.core.middleware import AuditLogMiddleware
+from apps.core.write_behind import BatchWriter
+from apps.security.middleware import AuditoriaLoggingMiddleware
+
+
+def make_user(pk=7, company_id=3):
+    return SimpleNamespace(pk=pk, id=pk, company_id=company_id, is_authenticated=True)
+
+
+class AuditPipelineTests(SimpleTestCase):
+    """Testes para a captura única e a gravação em lote"""
+
+    def setUp(self):
+        self.writer = BatchWriter('audit', AuditPipeline.write, background=False)
+        patcher = mock.patch.object(AuditPipeline, '_writer', self.writer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _request(self, method='post', path='/api/v1/dp/colaboradores/42/'):
+        request = getattr(RequestFactory(), method)(path, REMOTE_ADDR='10.0.0.8', HTTP_USER_AGENT='pytest')
+        request.user = make_user()
+        return request
+
+    def test_stacked_middlewares_capture_once(self):
+        """Core + security na mesma requisição geram um único evento"""
+        view = mock.Mock(return_value=HttpResponse(status=201))
+        security = AuditoriaLoggingMiddleware(view)
+        app = AuditLogMiddleware(security)
+
+        response = app(self._request())
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.writer.stats()['queued'], 1)
+        event = dict(zip(AUDIT_FIELDS, self.writer._queue.get_nowait()))
+        self.assertEqual(event['status_code'], 201)
+        self.assertEqual((event['module'], event['object_type'], event['object_id']), ('dp', 'colaboradores', '42'))
+        self.assertEqual((event['company_id'], event['user_id'], event['action']), (3, 7, 'create'))
+        self.assertIsNotNone(event['duration_ms'])
+
+    def test_response_path_does_not_touch_db(self):
+        """Requisição só enfileira; bulk_create acontece no flush"""
+        middleware = AuditoriaLoggingMiddleware(lambda request: HttpResponse(status=204))
+
+        with mock.patch('apps.core.models.AuditoriaLog.objects.bulk_create') as bulk_create:
+            middleware(self._request(method='delete'))
+            bulk_create.assert_not_called()
+
+            self.assertEqual(AuditPipeline.flush(), 1)
+
+        (logs,), _ = bulk_create.call_args
+        self.assertEqual(logs[0].action, 'delete')
+        self.assertEqual(logs[0].status_code, 204)
+        self.assertIsNotNone(logs[0].occurred_at)
+
+    def test_invalid_ip_and_long_path_are_sanitized(self):
+        """IP forjado vira None; segmentos do path cabem nos campos"""
+        request = RequestFactory().post(
+            '/api/v1/' + 'm' * 80 + '/' + 't' * 150 + '/' + 'i' * 300 + '/',
+            HTTP_X_FORWARDED_FOR='not-an-ip, 10.0.0.1',
+        )
+        request.user = make_user()
+
+        event = dict(zip(AUDIT_FIELDS, AuditPipeline.build_event(request, HttpResponse(), 1.0)))
+
+        self.assertIsNone(event['ip_address'])
+        self.assertEqual(
+            (len(event['module']), len(event['object_type']), len(event['object_id'])), (50, 100, 255)
+        )
+
+    def test_events_without_company_are_only_logged(self):
+        """Sem tenant não há AuditoriaLog (como antes)"""
+        request = self._request()
+        request.user = make_user(company_id=None)
+
+        self.assertFalse(AuditPipeline.capture(request, HttpResponse()))
+        self.assertEqual(self.writer.stats()['queued'], 0)
+
+
+class SpillToDiskTests(SimpleTestCase):
+    """Testes para o fallback em disco com o banco indisponível"""
+
+    def setUp(self):
+        self.spill_dir = tempfile.mkdtemp()
+        self.written = []
+        self.available = False
+
+        def write(batch):
+            if not self.available:
+                raise RuntimeError('db down')
+            self.written.extend(batch)
+
+        self.writer = BatchWriter(
+            'audit', write, max_retries=1, backoff=0, background=False, spill_dir=self.spill_dir
+        )
+
+    def test_failed_batch_spills_and_replays(self):
+        """Lote que falhou vai para disco e é regravado quando o banco volta"""
+        self.writer.submit([1, 'a'], critical=True)
+        self.writer.submit([2, 'b'], critical=True)
+
+        self.assertEqual(self.writer.flush(), 0)
+        self.assertEqual(self.writer.stats()['spilled'], 2)
+        self.assertEqual(len(os.listdir(self.spill_dir)), 1)
+
+        self.available = True
+        self.assertEqual(self.writer.replay(), 2)
+        self.assertEqual(self.written, [[1, 'a'], [2, 'b']])
+        self.assertEqual(os.listdir(self.spill_dir), [])
+
+    def test_full_queue_spills_critical_items(self):
+        """Fila cheia: item crítico vai direto para disco (nunca descartado)"""
+        writer = BatchWriter('audit', mock.Mock(), max_queue=1, put_timeout=0.01, background=False,
+                             spill_dir=self.spill_dir)
+        self.assertTrue(writer.submit([1], critical=True))
+        self.assertTrue(writer.submit([2], critical=True))
+
+        stats = writer.stats()
+        self.assertEqual((stats['queued'], stats['spilled'], stats['dropped']), (1, 1, 0))
+
+    def test_failed_replay_keeps_events(self):
+        """Banco ainda fora durante o replay: eventos continuam em disco"""
+        self.writer.spill([[1, 'a']])
+
+        self.assertEqual(self.writer.replay(), 0)
+        self.assertEqual(self.writer.stats()['spilled'], 2)
+        self.assertEqual(len(os.listdir(self.spill_dir)), 1)
+
+
+class PoisonedBatchTests(SimpleTestCase):
+    """Testes para o isolamento de itens que o banco rejeita"""
+
+    def setUp(self):
+        self.spill_dir = tempfile.mkdtemp()
+        self.written = []
+
+        def write(batch):
+            if any(item[0] < 0 for item in batch):
+                raise IntegrityError('violates constraint')
+            self.written.extend(batch)
+
+        self.writer = BatchWriter('audit', write, batch_size=4, backoff=0, background=False,
+                                  spill_dir=self.spill_dir)
+
+    def test_bad_item_is_quarantined_and_batch_survives(self):
+        """Só o item rejeitado fica de fora; o resto do lote é gravado"""
+        for item in ([1], [-2], [3], [4]):
+            self.writer.submit(item, critical=True)
+
+        self.assertEqual(self.writer.flush(), 3)
+        self.assertEqual(self.written, [[1], [3], [4]])
+        stats = self.writer.stats()
+        self.assertEqual((stats['quarantined'], stats['spilled'], stats['retries']), (1, 0, 0))
+        self.assertEqual(os.listdir(os.path.join(self.spill_dir, 'quarantine')), [f'audit-{os.getpid()}.jsonl'])
+
+    def test_replay_continues_past_poisoned_batch(self):
+        """Lote envenenado no spill não bloqueia os seguintes"""
+        self.writer.spill([[-1], [2], [3], [4], [5], [6]])
+
+        self.assertEqual(self.writer.replay(), 5)
+        self.assertEqual(self.written, [[2], [3], [4], [5], [6]])
+        self.assertEqual(self.writer.stats()['quarantined'], 1)
+        self.assertEqual(os.listdir(self.spill_dir), ['quarantine'])
+
+    def test_quarantine_without_spill_dir_is_logged(self):
+        writer = BatchWriter('audit', self.writer.write, background=False)
+        writer.submit([-1], critical=True)
+
+        with self.assertLogs('apps.core.write_behind', 'ERROR'):
+            self.assertEqual(writer.flush(), 0)
+        self.assertEqual(writer.stats()['quarantined'], 1)
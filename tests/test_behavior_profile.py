@@ -0,0 +1,98 @@
+"""
+Testes para os sketches de streaming (apps.core.sketches) e o aprendizado
+de perfil comportamental (apps.security.zero_trust.behavior)
+"""
+
+from datetime import datetime
+from unittest import mock
+
+from django.test import SimpleTestCase
+from django.utils import timezone
+
+from apps.core.sketches import HyperLogLog, TopK
+from apps.security.zero_trust.behavior import BehaviorProfileLearner, BehaviorSketch, normalize_resource
+from apps.security.zero_trust.models import UserBehaviorProfile
+
+
+class SketchTests(SimpleTestCase):
+    """Testes para TopK e HyperLogLog"""
+
+    def test_topk_keeps_heavy_hitters_in_fixed_memory(self):
+        topk = TopK(capacity=5)
+        for i in range(2000):
+            topk.add('10.0.0.1' if i % 3 else f'198.51.100.{i % 250}')
+
+        self.assertEqual(len(topk), 5)
+        self.assertEqual(topk.top(1)[0][0], '10.0.0.1')
+        self.assertGreaterEqual(topk.guaranteed('10.0.0.1'), 1300)
+
+    def test_topk_round_trip_and_merge(self):
+        a, b = TopK(3), TopK(3)
+        a.update(['x', 'x', 'y'])
+        b.update(['x', 'z', 'z', 'z'])
+
+        merged = TopK.from_dict(a.to_dict(), 3).merge(b)
+        self.assertEqual(merged.top(), [('x', 3), ('z', 3), ('y', 1)])
+
+    def test_hyperloglog_estimate(self):
+        hll = HyperLogLog(10)
+        hll.update(f'user-{i}' for i in range(5000))
+        other = HyperLogLog.from_dict(hll.to_dict())
+        other.update(f'user-{i}' for i in range(2500, 10000))
+
+        self.assertAlmostEqual(hll.count(), 5000, delta=500)
+        self.assertAlmostEqual(other.count(), 10000, delta=1000)
+        self.assertEqual(len(other.registers), 1024)
+
+
+class BehaviorProfileTests(SimpleTestCase):
+    """Testes para o sketch por usuário e o score de anomalia"""
+
+    def learn(self, events, profile=None):
+        profile = profile or UserBehaviorProfile(user_id=1)
+        sketch = BehaviorSketch(profile.behavior_sketch)
+        now = timezone.now()
+        for event in events:
+            sketch.add(event, now)
+        sketch.apply_to(profile, now)
+        return profile
+
+    def test_profile_size_is_constant(self):
+        events = [{'ip_address': f'10.0.{i // 250}.{i % 250}', 'resource_path': f'/api/v1/dp/colaboradores/{i}/'}
+                  for i in range(3000)]
+        profile = self.learn(events)
+
+        self.assertLessEqual(len(profile.behavior_sketch['ips']), 32)
+        self.assertEqual(list(profile.behavior_sketch['resources']), ['/api/v1/dp/colaboradores/:id/'])
+        self.assertEqual(len(profile.behavior_sketch['hours']), 168)
+        self.assertAlmostEqual(profile._sketch.distinct_ips(), 3000, delta=300)
+        self.assertEqual((profile.data_points_collected, profile.profile_maturity), (3000, 'mature'))
+
+    def test_anomaly_score_uses_sketch(self):
+        moment = timezone.make_aware(datetime(2026, 3, 2, 10))
+        events = [{'ip_address': '10.0.0.1', 'geo_country': 'BR', 'timestamp': moment}] * 60
+        profile = self.learn(events)
+
+        with mock.patch('django.utils.timezone.now', return_value=moment):
+            self.assertEqual(profile.calculate_anomaly_score({'ip_address': '10.0.0.1', 'geo_country': 'BR'}),
+                             (0, []))
+        with mock.patch('django.utils.timezone.now', return_value=moment.replace(hour=3)):
+            self.assertEqual(profile.calculate_anomaly_score({'ip_address': '203.0.113.9', 'geo_country': 'US'}),
+                             (50, ['unusual_time', 'new_location', 'new_ip']))
+        self.assertEqual(profile.profile_maturity, 'baseline')
+        self.assertEqual(profile.typical_login_hours['monday'], [10])
+
+    def test_legacy_lists_are_still_honoured(self):
+        profile = UserBehaviorProfile(user_id=1, typical_ips=['10.0.0.1'], typical_locations=['BR'])
+
+        score, factors = profile.calculate_anomaly_score({'ip_address': '10.0.0.1', 'geo_country': 'AR'})
+        self.assertEqual((score, factors), (25, ['new_location']))
+
+    def test_normalize_resource(self):
+        self.assertEqual(normalize_resource('/api/v1/x/42/?page=2'), '/api/v1/x/:id/')
+        self.assertEqual(normalize_resource('/api/v1/x/3f2a1b4c-1111-2222-3333-444455556666'), '/api/v1/x/:id')
+
+    def test_consume_groups_events_by_user(self):
+        self.assertEqual(BehaviorProfileLearner.consume([{'user_id': None, 'ip_address': '10.0.0.1'}]), 0)
+        grouped = BehaviorProfileLearner.group([{'user_id': 1}, {'user_id': 2}, {'user_id': 1}, {}])
+        self.assertEqual({user: len(events) for user, events in grouped.items()}, {1: 2, 2: 1})
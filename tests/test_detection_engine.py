@@ -0,0 +1,127 @@
+"""
+Testes para as regras de detecção compiladas (apps.nist.detection)
+"""
+
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.nist.detection import DetectionEngine, compile_rule
+from apps.nist.services import DeteccaoService
+
+
+def regra(id, condicoes, tipo_evento='', severidade='media'):
+    return {
+        'id': id, 'nome': f'regra-{id}', 'descricao': '', 'severidade': severidade,
+        'tipo_evento': tipo_evento, 'condicoes': condicoes,
+    }
+
+
+class DetectionEngineTests(SimpleTestCase):
+    """Testes para compilação e índice"""
+
+    def test_operators(self):
+        engine = DetectionEngine([
+            regra(1, {'acao': {'operador': 'equals', 'valor': 'login'},
+                      'tentativas': {'operador': 'greater_than', 'valor': '5'}}),
+            regra(2, {'path': {'operador': 'regex', 'valor': r'^/admin/.*\.php$'}}),
+            regra(3, {'pais': {'operador': 'in', 'valor': ['KP', 'IR']},
+                      'agente': {'operador': 'contains', 'valor': 'curl'}}),
+            regra(4, {'latencia': {'operador': 'less_than', 'valor': 1}}),
+        ])
+
+        def ids(dados):
+            return sorted(r.id for r in engine.match('acesso', dados))
+
+        self.assertEqual(ids({'acao': 'login', 'tentativas': 6}), [1])
+        self.assertEqual(ids({'acao': 'login', 'tentativas': '5'}), [])
+        self.assertEqual(ids({'path': '/admin/shell.php'}), [2])
+        self.assertEqual(ids({'pais': 'KP', 'agente': 'curl/8.0'}), [3])
+        self.assertEqual(ids({'latencia': 'abc'}), [])
+        self.assertEqual(ids({'latencia': 0.5}), [4])
+
+    def test_index_by_event_type_and_key(self):
+        engine = DetectionEngine([
+            regra(1, {'acao': {'operador': 'equals', 'valor': 'login'}}, tipo_evento='auth'),
+            regra(2, {'acao': {'operador': 'equals', 'valor': 'logout'}}, tipo_evento='auth'),
+            regra(3, {'acao': {'operador': 'equals', 'valor': 'login'}}),
+        ])
+
+        self.assertEqual([r.id for r in engine.match('auth', {'acao': 'login'})], [1, 3])
+        self.assertEqual([r.id for r in engine.match('zero_trust', {'acao': 'login'})], [3])
+        self.assertEqual(engine.match('auth', {'usuario': 7}), [])
+
+    def test_invalid_rules_are_skipped(self):
+        self.assertIsNone(compile_rule(regra(1, {})))
+        self.assertIsNone(compile_rule(regra(2, {'path': {'operador': 'regex', 'valor': '(unclosed'}})))
+        self.assertIsNone(compile_rule(regra(3, {'x': {'operador': 'greater_than', 'valor': 'alto'}})))
+        self.assertIsNone(compile_rule(regra(4, {'x': {'operador': 'between', 'valor': [1, 2]}})))
+
+
+class DetectionEngineReloadTests(SimpleTestCase):
+    """Testes para o hot swap"""
+
+    def setUp(self):
+        DetectionEngine.reset()
+        self.addCleanup(DetectionEngine.reset)
+
+    def test_rebuilds_when_version_changes(self):
+        first = DetectionEngine([], version=1)
+        second = DetectionEngine([regra(1, {'a': {'valor': 1}})], version=2)
+        with mock.patch.object(DetectionEngine, 'load', side_effect=[first, second]) as load:
+            self.assertIs(DetectionEngine.current(), first)
+            self.assertIs(DetectionEngine.current(), first)
+            DetectionEngine.bump_version()
+            self.assertIs(DetectionEngine.current(), second)
+        self.assertEqual(load.call_count, 2)
+
+    @override_settings(NIST_DETECTION_MAX_AGE=60)
+    def test_stale_snapshot_rebuilds_without_bump(self):
+        with mock.patch.object(DetectionEngine, 'load', side_effect=lambda version=None: DetectionEngine([], version=version)) as load:
+            first = DetectionEngine.current()
+            first.built_at -= 61
+            DetectionEngine._checked_at = 0.0
+            self.assertIsNot(DetectionEngine.current(), first)
+        self.assertEqual(load.call_count, 2)
+
+
+class ProcessarEventosTests(SimpleTestCase):
+    """Testes para o processamento em lote (bulk_create mockado: nist fora do INSTALLED_APPS de teste)"""
+
+    def setUp(self):
+        self.engine = DetectionEngine([
+            regra(1, {'acao': {'operador': 'equals', 'valor': 'login_falhou'}}, severidade='alta'),
+            regra(2, {'ip': {'operador': 'regex', 'valor': r'^203\.0\.113\.'}}, tipo_evento='zero_trust'),
+        ])
+        self.modelo = mock.Mock(side_effect=lambda **campos: SimpleNamespace(**campos))
+        patches = [
+            mock.patch.object(DetectionEngine, 'current', return_value=self.engine),
+            mock.patch.object(DeteccaoService, '_modelo_alerta', return_value=self.modelo),
+            mock.patch.object(DeteccaoService, '_notificar_alerta'),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_streams_and_bulk_creates_per_batch(self):
+        eventos = (
+            ('auditoria', {'acao': 'login_falhou'}) if i % 2 else
+            {'tipo_evento': 'zero_trust', 'dados': {'ip': f'203.0.113.{i}'}, 'origem': 'zt'}
+            for i in range(10)
+        )
+
+        resultado = DeteccaoService.processar_eventos(eventos, origem='auditoria', batch_size=4)
+
+        self.assertEqual(resultado, {'eventos': 10, 'alertas': 10})
+        lotes = [call.args[0] for call in self.modelo.objects.bulk_create.call_args_list]
+        self.assertEqual([len(lote) for lote in lotes], [4, 4, 2])
+        self.assertEqual({a.fonte for a in lotes[0]}, {'auditoria', 'zt'})
+        self.assertEqual(DeteccaoService._notificar_alerta.call_count, 5)
+
+    def test_processar_evento_keeps_single_event_api(self):
+        (alerta,) = DeteccaoService.processar_evento('auditoria', {'acao': 'login_falhou'}, 'auditoria')
+
+        self.assertEqual((alerta.regra_id, alerta.titulo, alerta.fonte), (1, 'Alerta: regra-1', 'auditoria'))
+        self.modelo.objects.bulk_create.assert_called_once()
+        self.assertEqual(DeteccaoService.processar_evento('auditoria', {'acao': 'login'}, 'x'), [])
@@ -0,0 +1,132 @@
+"""
+Testes para a ingestão incremental de documentos (DocumentoIngestion)
+"""
+
+import tempfile
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import pytest
+from django.test import TestCase
+
+from apps.assistant import services
+from apps.assistant.models import Documento
+from apps.assistant.services import DocumentoIngestion
+
+
+CONFIG = {
+    'parse_workers': 2,
+    'embed_batch_size': 2,
+    'embed_concurrency': 2,
+    'embed_max_retries': 2,
+    'embed_backoff': 0.0,
+    'bulk_size': 500,
+}
+
+
+class EmbeddingBatchTests(TestCase):
+    """Testes para embeddings em lote com retry"""
+
+    def test_embed_batches_preserves_order(self):
+        """Lotes de embed_batch_size, resultado na ordem dos textos"""
+        fake = mock.Mock()
+        fake.embed_documents.side_effect = lambda texts: [[float(len(t))] for t in texts]
+
+        with mock.patch.object(services, 'embeddings', fake), ThreadPoolExecutor(2) as pool:
+            vectors = DocumentoIngestion.embed_batches(['a', 'bb', 'ccc', 'dddd', 'eeeee'], CONFIG, pool)
+
+        self.assertEqual(vectors, [[1.0], [2.0], [3.0], [4.0], [5.0]])
+        self.assertEqual(fake.embed_documents.call_count, 3)
+
+    def test_embed_with_retry_backs_off(self):
+        """Falhas transitórias são repetidas com backoff"""
+        fake = mock.Mock()
+        fake.embed_documents.side_effect = [ConnectionError('busy'), [[0.1]]]
+
+        with mock.patch.object(services, 'embeddings', fake), \
+                mock.patch.object(services.time, 'sleep') as sleep:
+            vectors = DocumentoIngestion.embed_with_retry(['x'], max_retries=2, backoff=1.0)
+
+        self.assertEqual(vectors, [[0.1]])
+        sleep.assert_called_once()
+
+    def test_embed_with_retry_gives_up(self):
+        """Após max_retries o erro é propagado"""
+        fake = mock.Mock()
+        fake.embed_documents.side_effect = ConnectionError('down')
+
+        with mock.patch.object(services, 'embeddings', fake), \
+                mock.patch.object(services.time, 'sleep'):
+            with self.assertRaises(ConnectionError):
+                DocumentoIngestion.embed_with_retry(['x'], max_retries=2, backoff=1.0)
+
+        self.assertEqual(fake.embed_documents.call_count, 3)
+
+
+@pytest.mark.django_db
+class IncrementalIngestionTests(TestCase):
+    """Testes para detecção de mudanças por content_hash"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.folder = Path(self.tmp.name)
+        (self.folder / 'ferias.md').write_text('# Férias\n\n30 dias corridos.', encoding='utf-8')
+        self.embeddings = mock.Mock()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _ingest(self):
+        with mock.patch.object(services, 'check_ollama_connection', return_value=True), \
+                mock.patch.object(services, 'embeddings', self.embeddings), \
+                mock.patch.object(DocumentoIngestion, 'get_pipeline_config', return_value=CONFIG), \
+                mock.patch.object(DocumentoIngestion, 'chunk_text') as chunk_text:
+            stats = DocumentoIngestion.ingest_documents(company_id=1, folder=self.folder)
+        return stats, chunk_text
+
+    def test_unchanged_documents_are_skipped(self):
+        """Reingestão sem mudanças não re-chunka nem re-embeda"""
+        content = (self.folder / 'ferias.md').read_text(encoding='utf-8')
+        Documento.objects.create(
+            title='ferias', source_path='ferias.md', content=content,
+            content_hash=DocumentoIngestion.content_hash(content),
+        )
+
+        stats, chunk_text = self._ingest()
+
+        self.assertEqual(stats['documents_skipped'], 1)
+        self.assertEqual(stats['chunks_created'], 0)
+        chunk_text.assert_not_called()
+        self.embeddings.embed_documents.assert_not_called()
+
+    def test_removed_files_are_deactivated(self):
+        """Documentos cujo arquivo sumiu de docs/ são desativados"""
+        content = (self.folder / 'ferias.md').read_text(encoding='utf-8')
+        Documento.objects.create(
+            title='ferias', source_path='ferias.md', content=content,
+            content_hash=DocumentoIngestion.content_hash(content),
+        )
+        Documento.objects.create(title='antigo', source_path='antigo.md', content='x')
+
+        stats, _ = self._ingest()
+
+        self.assertEqual(stats['documents_deactivated'], 1)
+        self.assertFalse(Documento.objects.get(source_path='antigo.md').is_active)
+
+    def test_restored_unchanged_file_is_reactivated(self):
+        """Arquivo que voltou com o mesmo conteúdo reativa o documento (sem re-embed)"""
+        content = (self.folder / 'ferias.md').read_text(encoding='utf-8')
+        documento = Documento.objects.create(
+            title='ferias', source_path='ferias.md', content=content,
+            content_hash=DocumentoIngestion.content_hash(content), is_active=False,
+        )
+
+        with mock.patch.object(services.LocalVectorIndex, 'invalidate') as invalidate:
+            stats, chunk_text = self._ingest()
+
+        self.assertEqual((stats['documents_skipped'], stats['documents_reactivated']), (1, 1))
+        documento.refresh_from_db()
+        self.assertTrue(documento.is_active)
+        chunk_text.assert_not_called()
+        invalidate.assert_called_once()
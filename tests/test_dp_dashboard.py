@@ -0,0 +1,61 @@
+"""
+Testes para as métricas do dashboard de DP (apps.departamento_pessoal.dashboard)
+
+departamento_pessoal fica fora do INSTALLED_APPS de teste: cache,
+invalidação por signal e isolamento por tenant com o cálculo simulado.
+"""
+
+from datetime import date
+from unittest import mock
+
+from django.core.cache import cache
+from django.db.models.signals import post_save
+from django.test import SimpleTestCase
+
+from apps.departamento_pessoal import dashboard, signals  # noqa: F401 (conecta os receivers)
+from apps.departamento_pessoal.models import Colaborador, SolicitacaoFerias
+
+HOJE = date(2024, 5, 15)
+
+
+class DashboardCacheTests(SimpleTestCase):
+    """Testes para o cache por tenant"""
+
+    def setUp(self):
+        cache.clear()
+        patcher = mock.patch.object(dashboard, 'calcular_metricas', side_effect=lambda hoje: {'hoje': hoje})
+        self.calcular = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cached_until_invalidated(self):
+        self.assertEqual(dashboard.metricas_dashboard(HOJE), {'hoje': HOJE})
+        dashboard.metricas_dashboard(HOJE)
+        self.assertEqual(self.calcular.call_count, 1)
+
+        dashboard.invalidar_dashboard()
+        dashboard.metricas_dashboard(HOJE)
+        self.assertEqual(self.calcular.call_count, 2)
+
+    def test_new_day_recomputes(self):
+        dashboard.metricas_dashboard(HOJE)
+        dashboard.metricas_dashboard(date(2024, 5, 16))
+        self.assertEqual(self.calcular.call_count, 2)
+
+    def test_tenants_are_isolated(self):
+        with mock.patch.object(dashboard, 'tenant_atual', return_value='empresa_a'):
+            dashboard.metricas_dashboard(HOJE)
+        with mock.patch.object(dashboard, 'tenant_atual', return_value='empresa_b'):
+            dashboard.metricas_dashboard(HOJE)
+            dashboard.invalidar_dashboard()
+        with mock.patch.object(dashboard, 'tenant_atual', return_value='empresa_a'):
+            dashboard.metricas_dashboard(HOJE)
+        self.assertEqual(self.calcular.call_count, 2)
+
+    def test_save_signals_invalidate(self):
+        for model in (Colaborador, SolicitacaoFerias):
+            with self.subTest(model=model.__name__):
+                dashboard.metricas_dashboard(HOJE)
+                calls = self.calcular.call_count
+                post_save.send(sender=model, instance=model(), created=False)
+                dashboard.metricas_dashboard(HOJE)
+                self.assertEqual(self.calcular.call_count, calls + 1)
@@ -0,0 +1,64 @@
+"""
+Testes para o cache de embeddings de consulta (apps.assistant.embedding_cache)
+"""
+
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from apps.assistant.embedding_cache import QueryEmbeddingCache, normalize_query
+
+
+class QueryEmbeddingCacheTests(SimpleTestCase):
+    """Testes para as duas camadas (LRU + Django cache)"""
+
+    def setUp(self):
+        cache.clear()
+        QueryEmbeddingCache.clear()
+        self.embed = mock.Mock(side_effect=lambda text: [0.5, 0.25, 1.0])
+
+    def test_normalize_query(self):
+        """Maiúsculas e espaços não alteram a chave"""
+        self.assertEqual(normalize_query('  Quantos   DIAS de Férias? '), 'quantos dias de férias?')
+        self.assertEqual(
+            QueryEmbeddingCache.cache_key('Férias', 'nomic'),
+            QueryEmbeddingCache.cache_key(' férias ', 'nomic'),
+        )
+        self.assertNotEqual(
+            QueryEmbeddingCache.cache_key('férias', 'nomic'),
+            QueryEmbeddingCache.cache_key('férias', 'outro-modelo'),
+        )
+
+    def test_local_hit_skips_embedding(self):
+        """Segunda chamada normalizada-idêntica vem do LRU"""
+        first = QueryEmbeddingCache.get_or_embed('Férias', 'nomic', self.embed)
+        second = QueryEmbeddingCache.get_or_embed('  férias', 'nomic', self.embed)
+
+        self.assertEqual(first, second)
+        self.embed.assert_called_once()
+        self.assertEqual(QueryEmbeddingCache.stats()['local_hits'], 1)
+
+    def test_shared_tier_stores_float32_bytes(self):
+        """Outro worker (LRU vazio) lê os bytes float32 do Django cache"""
+        QueryEmbeddingCache.get_or_embed('Férias', 'nomic', self.embed)
+        stored = cache.get(QueryEmbeddingCache.cache_key('Férias', 'nomic'))
+        self.assertIsInstance(stored, bytes)
+        self.assertEqual(len(stored), 3 * 4)
+
+        QueryEmbeddingCache._lru.clear()
+        vector = QueryEmbeddingCache.get_or_embed('Férias', 'nomic', self.embed)
+
+        self.assertEqual(vector, [0.5, 0.25, 1.0])
+        self.embed.assert_called_once()
+        stats = QueryEmbeddingCache.stats()
+        self.assertEqual((stats['shared_hits'], stats['misses']), (1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    @override_settings(HELIX_EMBEDDING_CACHE_SIZE=1)
+    def test_lru_eviction(self):
+        """LRU limitado a HELIX_EMBEDDING_CACHE_SIZE entradas"""
+        QueryEmbeddingCache.get_or_embed('a', 'nomic', self.embed)
+        QueryEmbeddingCache.get_or_embed('b', 'nomic', self.embed)
+
+        self.assertEqual(QueryEmbeddingCache.stats()['entries'], 1)
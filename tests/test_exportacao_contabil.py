@@ -0,0 +1,151 @@
+"""
+Testes para a exportação contábil (apps.departamento_pessoal.exports)
+
+departamento_pessoal fica fora do INSTALLED_APPS de teste: os escritores
+recebem linhas de consultas simuladas e gravam num arquivo temporário.
+"""
+
+import io
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+from unittest import mock, skipUnless
+from xml.etree import ElementTree
+
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+
+from apps.departamento_pessoal import exports
+from apps.departamento_pessoal.exports import Secao, escrever_exportacao, secoes_da_exportacao
+from apps.departamento_pessoal.models import ExportacaoContabil
+
+LINHAS = [
+    ('123.456.789-00', 'Ana Souza', date(2024, 5, 6), timezone.make_aware(datetime(2024, 5, 6, 8, 0)), Decimal('480')),
+    ('987.654.321-00', 'João; Lima', date(2024, 5, 7), None, Decimal('0')),
+]
+
+
+def secao_simulada(nome='ponto', linhas=LINHAS):
+    consulta = mock.Mock()
+    consulta.count.return_value = len(linhas)
+    consulta.values_list.return_value.iterator.return_value = iter(linhas)
+    return Secao(nome, nome.title(), lambda competencia, empresa_id: consulta if empresa_id == 9 else None,
+                 (('cpf', 'cpf'), ('nome', 'nome'), ('data', 'data'), ('entrada', 'entrada'), ('minutos', 'minutos')))
+
+
+def exportar(formato, secoes, tipo='ponto'):
+    exportacao = ExportacaoContabil(pk=1, tipo=tipo, formato=formato, competencia=date(2024, 5, 1))
+    with mock.patch.object(exports, 'secoes_da_exportacao', return_value=secoes), \
+            mock.patch.object(exports, 'empresa_do_contador', return_value=9), \
+            mock.patch.object(exports, '_atualizar') as atualizar, \
+            tempfile.TemporaryFile() as arquivo:
+        total = escrever_exportacao(exportacao, arquivo)
+        arquivo.seek(0)
+        return total, arquivo.read(), atualizar
+
+
+class SecoesTests(SimpleTestCase):
+    """Testes para as combinações tipo/formato"""
+
+    def test_supported_and_rejected(self):
+        self.assertEqual([s.nome for s in secoes_da_exportacao('folha', 'csv')], ['folha'])
+        self.assertEqual(len(secoes_da_exportacao('completo', 'xml')), 5)
+        for tipo, formato in (('completo', 'csv'), ('esocial', 'xml'), ('folha', 'pdf')):
+            with self.subTest(tipo=tipo, formato=formato), self.assertRaises(ValidationError):
+                secoes_da_exportacao(tipo, formato)
+
+    def test_queries_scoped_to_company(self):
+        for nome, secao in exports.SECOES.items():
+            with self.subTest(secao=nome):
+                sql = str(secao.consulta(date(2024, 5, 1), 9).query)
+                self.assertIn('"company_id" = 9', sql)
+
+    def test_contador_without_company_is_refused(self):
+        exportacao = ExportacaoContabil(pk=1, tipo='ponto', formato='csv', competencia=date(2024, 5, 1))
+        with mock.patch.object(exports, 'empresa_do_contador', return_value=None), \
+                mock.patch.object(exports, '_atualizar') as atualizar, \
+                self.assertRaises(ValidationError):
+            escrever_exportacao(exportacao, io.BytesIO())
+        atualizar.assert_not_called()
+
+
+@override_settings(DP_EXPORT_PROGRESS_INTERVAL=1)
+class EscritoresTests(SimpleTestCase):
+    """Testes para a gravação incremental"""
+
+    def test_csv_and_progress(self):
+        total, conteudo, atualizar = exportar('csv', [secao_simulada()])
+
+        linhas = conteudo.decode('utf-8-sig').splitlines()
+        self.assertEqual(total, 2)
+        self.assertEqual(linhas[0], 'cpf;nome;data;entrada;minutos')
+        self.assertEqual(linhas[1], '123.456.789-00;Ana Souza;2024-05-06;2024-05-06 08:00;480')
+        self.assertEqual(linhas[2], '987.654.321-00;"João; Lima";2024-05-07;;0')
+        self.assertEqual(atualizar.call_args_list[0].kwargs['total_linhas'], 2)
+        self.assertEqual([c.kwargs.get('linhas_processadas') for c in atualizar.call_args_list[1:]], [1, 2])
+
+    def test_xml_sections(self):
+        total, conteudo, _ = exportar('xml', [secao_simulada('folha'), secao_simulada('ponto')], tipo='completo')
+
+        raiz = ElementTree.fromstring(conteudo)
+        self.assertEqual((total, raiz.get('competencia')), (4, '2024-05'))
+        self.assertEqual([s.get('tipo') for s in raiz.findall('secao')], ['folha', 'ponto'])
+        registro = raiz.find('secao/registro[2]')
+        self.assertEqual(registro.findtext('nome'), 'João; Lima')
+        self.assertIsNone(registro.find('entrada'))
+
+    @skipUnless(exports.Workbook is not None, 'openpyxl não instalado')
+    def test_xlsx_write_only(self):
+        from openpyxl import load_workbook
+
+        _, conteudo, _ = exportar('xlsx', [secao_simulada()])
+
+        aba = load_workbook(io.BytesIO(conteudo), read_only=True)['Ponto']
+        linhas = list(aba.iter_rows(values_only=True))
+        self.assertEqual(linhas[0][:2], ('cpf', 'nome'))
+        self.assertEqual(linhas[1][3], datetime(2024, 5, 6, 8, 0))
+        self.assertEqual(len(linhas), 3)
+
+
+class GerarExportacaoTests(SimpleTestCase):
+    """Testes para o ciclo de status"""
+
+    def test_failure_sets_error_status(self):
+        exportacao = ExportacaoContabil(pk=3, tipo='esocial', formato='xml', competencia=date(2024, 5, 1))
+
+        with mock.patch.object(ExportacaoContabil, 'objects') as objects:
+            objects.select_related.return_value.get.return_value = exportacao
+            exports.gerar_exportacao(3)
+
+        self.assertEqual(exportacao.status, 'erro')
+        self.assertIn('esocial', exportacao.erro_mensagem)
+        self.assertEqual(objects.filter.return_value.update.call_args.kwargs['status'], 'erro')
+
+
+class RetomadaTests(SimpleTestCase):
+    """Testes para exportações interrompidas"""
+
+    @override_settings(DP_EXPORT_BACKGROUND=True, DP_EXPORT_STALE_SECONDS=60)
+    def test_stale_export_is_rescheduled_once(self):
+        with mock.patch.object(ExportacaoContabil, 'objects') as objects, \
+                mock.patch.object(exports, 'agendar_exportacao') as agendar:
+            objects.filter.return_value.filter.return_value.values_list.return_value = [4]
+            objects.filter.return_value.update.side_effect = [1]
+            self.assertEqual(exports.retomar_exportacoes_paradas(4), 1)
+
+        agendar.assert_called_once_with(4)
+        self.assertEqual(objects.filter.call_args.kwargs['status'], 'gerando')
+
+    @override_settings(DP_EXPORT_CELERY=True)
+    def test_dispatch_prefers_celery(self):
+        task = mock.Mock()
+        with mock.patch.dict(exports.__dict__, {'gerar_exportacao_task': task}), \
+                mock.patch.object(exports.threading, 'Thread') as thread:
+            exports._despachar(5)
+            task.delay.side_effect = OSError('broker')
+            exports._despachar(6)
+
+        task.delay.assert_any_call(5)
+        thread.assert_called_once()
+        self.assertEqual(thread.call_args.kwargs['args'], (6,))
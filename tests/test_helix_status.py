@@ -0,0 +1,100 @@
+"""
+Testes para o snapshot de status do Helix (apps.assistant.status)
+"""
+
+from unittest import mock
+
+import pytest
+from django.core.cache import cache
+from django.test import TestCase, RequestFactory, override_settings
+from django.contrib.auth import get_user_model
+
+from apps.assistant.context_processors import helix_context
+from apps.assistant.status import (
+    HelixStatusMonitor,
+    get_helix_status_snapshot,
+    SNAPSHOT_CACHE_KEY,
+    CIRCUIT_OPEN,
+    CIRCUIT_CLOSED,
+)
+
+User = get_user_model()
+
+
+def _tags_response(models):
+    response = mock.Mock()
+    response.raise_for_status.return_value = None
+    response.json.return_value = {'models': [{'name': name} for name in models]}
+    return response
+
+
+@pytest.mark.django_db
+@override_settings(HELIX_STATUS_BACKGROUND_REFRESH=False, HELIX_STATUS_FAILURE_THRESHOLD=2)
+class HelixStatusSnapshotTests(TestCase):
+    """Testes para leitura/atualização do snapshot"""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_context_processor_never_hits_network(self):
+        """Context processor apenas lê o cache"""
+        user = User.objects.create_user(username='status_user', email='s@test.com', password='x')
+        request = RequestFactory().get('/')
+        request.user = user
+
+        with mock.patch('requests.get') as requests_get:
+            context = helix_context(request)
+
+        requests_get.assert_not_called()
+        self.assertEqual(context['helix']['status']['status'], 'unknown')
+        self.assertFalse(context['helix']['ollama_available'])
+
+    def test_refresh_stores_shared_snapshot(self):
+        """refresh() faz uma única chamada a /api/tags e grava no cache"""
+        with mock.patch('requests.get', return_value=_tags_response(['qwen2.5:14b', 'nomic-embed-text:latest'])) as requests_get:
+            HelixStatusMonitor.refresh(force=True)
+
+        self.assertEqual(requests_get.call_count, 1)
+        snapshot = get_helix_status_snapshot()
+        self.assertTrue(snapshot['ollama_running'])
+        self.assertTrue(snapshot['models_available']['nomic-embed-text'])
+        self.assertFalse(snapshot['stale'])
+
+    def test_fresh_snapshot_skips_probe(self):
+        """Snapshot dentro do TTL não gera nova sondagem"""
+        with mock.patch('requests.get', return_value=_tags_response([])):
+            HelixStatusMonitor.refresh(force=True)
+        with mock.patch('requests.get') as requests_get:
+            HelixStatusMonitor.refresh()
+        requests_get.assert_not_called()
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        """Circuit breaker abre após falhas consecutivas e suspende sondagens"""
+        with mock.patch('requests.get', side_effect=ConnectionError('down')):
+            HelixStatusMonitor.refresh(force=True)
+            self.assertEqual(cache.get(SNAPSHOT_CACHE_KEY)['circuit_state'], CIRCUIT_CLOSED)
+            HelixStatusMonitor.refresh(force=True)
+
+        snapshot = cache.get(SNAPSHOT_CACHE_KEY)
+        self.assertEqual(snapshot['circuit_state'], CIRCUIT_OPEN)
+        self.assertFalse(snapshot['ollama_running'])
+
+        with mock.patch('requests.get') as requests_get:
+            HelixStatusMonitor.refresh(force=True)
+        requests_get.assert_not_called()
+
+    def test_half_open_probe_closes_circuit(self):
+        """Após o cooldown, uma sondagem bem-sucedida fecha o circuito"""
+        with mock.patch('requests.get', side_effect=ConnectionError('down')):
+            HelixStatusMonitor.refresh(force=True)
+            HelixStatusMonitor.refresh(force=True)
+
+        snapshot = cache.get(SNAPSHOT_CACHE_KEY)
+        snapshot['circuit_open_until'] = 1
+        cache.set(SNAPSHOT_CACHE_KEY, snapshot)
+
+        with mock.patch('requests.get', return_value=_tags_response(['qwen2.5:14b'])):
+            snapshot = HelixStatusMonitor.refresh(force=True)
+
+        self.assertEqual(snapshot['circuit_state'], CIRCUIT_CLOSED)
+        self.assertEqual(snapshot['consecutive_failures'], 0)
@@ -0,0 +1,118 @@
+"""
+Testes para respostas em streaming do Helix (SSE)
+"""
+
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, AsyncClient
+from django.urls import reverse
+from asgiref.sync import sync_to_async
+
+from apps.assistant import services
+from apps.assistant.models import Conversa, Mensagem
+from apps.assistant.embedding_cache import QueryEmbeddingCache
+from apps.assistant.response_cache import SemanticResponseCache
+from apps.assistant.services import HelixAssistant, format_sse
+from apps.assistant.tokenization import count_tokens
+
+User = get_user_model()
+
+
+class _FakeLLM:
+    """LLM that emits a fixed sequence of tokens"""
+
+    tokens = ['Você tem ', '30 dias ', 'de férias.']
+
+    def stream(self, prompt, config=None):
+        return iter(self.tokens)
+
+    async def astream(self, prompt, config=None):
+        for token in self.tokens:
+            yield token
+
+
+class _ReportingLLM(_FakeLLM):
+    """Like _FakeLLM, but reports Ollama's token counts at the end"""
+
+    def stream(self, prompt, config=None):
+        yield from self.tokens
+        result = SimpleNamespace(generations=[[SimpleNamespace(
+            generation_info={'prompt_eval_count': 321, 'eval_count': 7},
+        )]])
+        for callback in (config or {}).get('callbacks', []):
+            callback.on_llm_end(result)
+
+
+@pytest.mark.django_db
+class HelixStreamingTests(TestCase):
+    """Testes para stream_chat/astream_chat e o endpoint SSE"""
+
+    def setUp(self):
+        cache.clear()
+        SemanticResponseCache.clear()
+        QueryEmbeddingCache.clear()
+        self.user = User.objects.create_user(username='stream_user', email='s@test.com', password='x')
+        self.conversation = Conversa.objects.create(user=self.user)
+        embeddings = mock.Mock()
+        embeddings.embed_query.return_value = [1.0, 0.0]
+        self.patches = [
+            mock.patch.object(services, 'llm', _FakeLLM()),
+            mock.patch.object(services, 'embeddings', embeddings),
+            mock.patch.object(services.VectorIndex, 'retrieve', return_value=[]),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def tearDown(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def test_format_sse(self):
+        """Eventos SSE com dados JSON"""
+        self.assertEqual(format_sse('token', 'olá'), 'event: token\ndata: "olá"\n\n')
+
+    def test_stream_chat_persists_message_on_completion(self):
+        """Tokens chegam incrementalmente e a Mensagem é salva ao final"""
+        events = list(HelixAssistant.stream_chat('Quantos dias de férias?', self.conversation))
+
+        self.assertEqual([data for name, data in events if name == 'token'], _FakeLLM.tokens)
+        name, done = events[-1]
+        self.assertEqual(name, 'done')
+        message = Mensagem.objects.get(id=done['message_id'])
+        self.assertEqual(message.role, 'assistant')
+        self.assertEqual(message.content, ''.join(_FakeLLM.tokens))
+        self.assertGreater(message.prompt_tokens, 0)
+        self.assertEqual(message.completion_tokens, count_tokens(message.content))
+        self.assertEqual(message.tokens_used, message.prompt_tokens + message.completion_tokens)
+        self.assertEqual(Mensagem.objects.filter(conversation=self.conversation).count(), 2)
+
+    def test_ollama_counts_are_recorded(self):
+        """Contagens do Ollama prevalecem sobre o tokenizer local"""
+        with mock.patch.object(services, 'llm', _ReportingLLM()):
+            events = list(HelixAssistant.stream_chat('Quantos dias de férias?', self.conversation))
+
+        message = Mensagem.objects.get(id=events[-1][1]['message_id'])
+        self.assertEqual((message.prompt_tokens, message.completion_tokens), (321, 7))
+        self.assertEqual(message.tokens_used, 328)
+
+    async def test_async_view_streams_sse(self):
+        """Endpoint assíncrono devolve text/event-stream"""
+        client = AsyncClient()
+        await sync_to_async(client.force_login)(self.user)
+
+        response = await client.post(
+            reverse('assistant:chat_stream'),
+            {'conversation_id': self.conversation.id, 'message': 'Quantos dias de férias?'},
+        )
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertIn('event: token\ndata: "30 dias "', body)
+        self.assertIn('event: done', body)
+        self.assertEqual(
+            await Mensagem.objects.filter(conversation=self.conversation, role='assistant').acount(), 1
+        )
@@ -0,0 +1,142 @@
+"""
+Testes para o gateway de inferência (apps.assistant.llm_gateway)
+"""
+
+import asyncio
+import threading
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.assistant.llm_gateway import LLMGateway, GatewayOverloaded
+
+
+class _EchoClient:
+    def invoke(self, prompt):
+        return f"eco: {prompt}"
+
+    async def astream(self, prompt):
+        for token in prompt.split():
+            yield token
+
+
+@override_settings(
+    HELIX_GATEWAY_MAX_IN_FLIGHT={'default': 1},
+    HELIX_GATEWAY_MAX_QUEUE=2,
+    HELIX_GATEWAY_QUEUE_TIMEOUT=0.05,
+)
+class LLMGatewayTests(SimpleTestCase):
+    """Testes para admissão, fairness, shedding e roteamento"""
+
+    def setUp(self):
+        LLMGateway.reset()
+        LLMGateway.register_client('m', _EchoClient())
+
+    def tearDown(self):
+        LLMGateway.reset()
+
+    def test_invoke_through_slot(self):
+        """invoke ocupa e libera um slot do modelo"""
+        self.assertEqual(LLMGateway.invoke('olá', 'm', 't1'), 'eco: olá')
+        stats = LLMGateway.stats()
+        self.assertEqual(stats['models']['m']['in_flight'], 0)
+        self.assertEqual(stats['admitted'], 1)
+
+    def test_usage_passes_collector_callback(self):
+        """Com usage, o cliente recebe o callback que copia as contagens do Ollama"""
+        client = mock.Mock()
+        LLMGateway.register_client('u', client)
+        usage = {}
+
+        LLMGateway.invoke('olá', 'u', 't1', usage=usage)
+        collector = client.invoke.call_args.kwargs['config']['callbacks'][0]
+        collector.on_llm_end(SimpleNamespace(generations=[[SimpleNamespace(
+            generation_info={'prompt_eval_count': 12, 'eval_count': 3},
+        )]]))
+
+        self.assertEqual(usage, {'prompt_tokens': 12, 'completion_tokens': 3})
+
+    def test_queue_timeout_sheds(self):
+        """Esperar além do timeout gera GatewayOverloaded"""
+        with LLMGateway.slot('m', 't1'):
+            with self.assertRaises(GatewayOverloaded):
+                LLMGateway.invoke('olá', 'm', 't2')
+        self.assertEqual(LLMGateway.stats()['timeouts'], 1)
+        self.assertEqual(LLMGateway.stats()['queued'], 0)
+
+    def test_full_queue_sheds_immediately(self):
+        """Fila cheia descarta sem esperar"""
+        lane = LLMGateway._lane('m')
+        lane.in_flight = 1
+        lane.queued = 2
+        with self.assertRaises(GatewayOverloaded):
+            LLMGateway.invoke('olá', 'm', 't1')
+        self.assertEqual(LLMGateway.stats()['shed'], 1)
+
+    @override_settings(HELIX_GATEWAY_MAX_QUEUE=10, HELIX_GATEWAY_QUEUE_TIMEOUT=5)
+    def test_round_robin_between_tenants(self):
+        """Um tenant com rajada não passa na frente dos outros"""
+        order = []
+        tick = threading.Event()
+
+        def worker(tenant):
+            with LLMGateway.slot('m', tenant):
+                order.append(tenant)
+
+        with LLMGateway.slot('m', 'holder'):
+            threads = []
+            for tenant in ['a', 'a', 'a', 'b']:
+                thread = threading.Thread(target=worker, args=(tenant,))
+                thread.start()
+                threads.append(thread)
+                while LLMGateway.stats()['queued'] < len(threads):
+                    tick.wait(0.001)
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(order, ['a', 'b', 'a', 'a'])
+
+    def test_async_stream(self):
+        """astream respeita o mesmo limite e libera ao final"""
+        async def collect():
+            return [token async for token in LLMGateway.astream('um dois', 'm', 't1')]
+
+        self.assertEqual(asyncio.run(collect()), ['um', 'dois'])
+        self.assertEqual(LLMGateway.stats()['models']['m']['in_flight'], 0)
+
+    @override_settings(HELIX_LIGHT_MODEL='qwen2.5:7b-instruct-q3_K', HELIX_LIGHT_MODEL_ENABLED=True)
+    def test_route_simple_queries_to_light_model(self):
+        """Perguntas curtas sem histórico vão para o modelo quantizado"""
+        with mock.patch.object(LLMGateway, 'primary_model', return_value='principal'), \
+                mock.patch.object(LLMGateway, 'is_installed', return_value=True):
+            self.assertEqual(LLMGateway.route('Quantos dias de férias?'), 'qwen2.5:7b-instruct-q3_K')
+            self.assertEqual(LLMGateway.route('Quantos dias de férias?', has_history=True), 'principal')
+            self.assertEqual(LLMGateway.route('Como funciona? E o abono?'), 'principal')
+
+    @override_settings(HELIX_LIGHT_MODEL='qwen2.5:7b-instruct-q3_K', HELIX_LIGHT_MODEL_ENABLED=True)
+    def test_light_model_requires_installation(self):
+        """Modelo leve fora do snapshot de status não recebe tráfego"""
+        snapshot = {'installed_models': ['qwen2.5:14b']}
+        with mock.patch.object(LLMGateway, 'primary_model', return_value='principal'), \
+                mock.patch('apps.assistant.status.HelixStatusMonitor.read', return_value=snapshot):
+            self.assertEqual(LLMGateway.route('Quantos dias de férias?'), 'principal')
+            snapshot['installed_models'].append('qwen2.5:7b-instruct-q3_K')
+            self.assertEqual(LLMGateway.route('Quantos dias de férias?'), 'qwen2.5:7b-instruct-q3_K')
+
+    def test_model_not_found_falls_back_to_primary(self):
+        """'model not found' do Ollama: repete no modelo principal e deixa de rotear"""
+        missing = mock.Mock()
+        missing.invoke.side_effect = ValueError('model "leve" not found, try pulling it first')
+        missing.astream.side_effect = ValueError('model "leve" not found, try pulling it first')
+        LLMGateway.register_client('leve', missing)
+
+        with mock.patch.object(LLMGateway, 'primary_model', return_value='m'):
+            self.assertEqual(LLMGateway.invoke('olá', 'leve', 't1'), 'eco: olá')
+            self.assertFalse(LLMGateway.is_installed('leve'))
+
+            async def collect():
+                return [token async for token in LLMGateway.astream('um dois', 'leve', 't1')]
+
+            self.assertEqual(asyncio.run(collect()), ['um', 'dois'])
+        self.assertEqual(LLMGateway.stats()['models']['leve']['in_flight'], 0)
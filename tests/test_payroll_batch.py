@@ -0,0 +1,90 @@
+"""
+Testes para a folha em lote (apps.departamento_pessoal.payroll)
+
+departamento_pessoal fica fora do INSTALLED_APPS de teste: os testes
+cobrem o cálculo e a orquestração, sem banco.
+"""
+
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from apps.departamento_pessoal import payroll
+from apps.departamento_pessoal.models import FolhaPagamento
+from apps.departamento_pessoal.payroll import CalculadoraFolha, TabelaProgressiva, fim_do_mes, tabela_vigente
+
+
+class CalculadoraFolhaTests(SimpleTestCase):
+    """Testes para as tabelas pré-compiladas"""
+
+    def setUp(self):
+        self.calculadora = CalculadoraFolha(date(2024, 5, 1))
+
+    def test_inss_and_irrf_brackets(self):
+        calculo = self.calculadora.calcular(Decimal('3000.00'))
+        self.assertEqual((calculo.inss, calculo.aliquota_inss), (Decimal('360.00'), Decimal('0.12')))
+        # base 2640.00 -> 7,5% - 169,44
+        self.assertEqual(calculo.irrf, Decimal('28.56'))
+
+        self.assertEqual(self.calculadora.calcular(Decimal('1412.00')).irrf, Decimal('0'))
+        self.assertEqual(self.calculadora.calcular(Decimal('20000.00')).inss, Decimal('1090.04'))
+
+    def test_versioned_tables(self):
+        antiga = TabelaProgressiva.compilar('T-2023', date(2023, 1, 1), (('1000', '0.1', '0'), (None, '0.2', '0')))
+        nova = TabelaProgressiva.compilar('T-2024', date(2024, 1, 1), (('1000', '0.05', '0'), (None, '0.1', '0')))
+
+        self.assertIs(tabela_vigente((nova, antiga), date(2023, 12, 1)), antiga)
+        self.assertIs(tabela_vigente((nova, antiga), date(2024, 2, 1)), nova)
+        self.assertEqual(nova.calcular(Decimal('1000')), (Decimal('50.00'), Decimal('0.05')))
+        self.assertEqual(nova.calcular(Decimal('1000.01')), (Decimal('100.00'), Decimal('0.1')))
+
+    def test_aplicar_updates_totals_and_items(self):
+        folha = FolhaPagamento(colaborador_id=1, competencia=date(2024, 5, 1), salario_base=Decimal('3000.00'),
+                               vale_transporte=Decimal('180.00'))
+
+        itens = self.calculadora.aplicar(folha, None)
+
+        self.assertEqual([item.codigo for item in itens], ['001', '101', '102'])
+        self.assertEqual(itens[1].referencia, Decimal('12.00'))
+        self.assertEqual(folha.total_descontos, Decimal('568.56'))
+        self.assertEqual((folha.salario_liquido, folha.status), (Decimal('2431.44'), 'calculada'))
+
+    def test_fim_do_mes(self):
+        self.assertEqual(fim_do_mes(date(2024, 2, 1)), date(2024, 2, 29))
+        self.assertEqual(fim_do_mes(date(2024, 12, 1)), date(2024, 12, 31))
+
+
+class ProcessarCompetenciaTests(SimpleTestCase):
+    """Testes para a orquestração por departamento"""
+
+    def test_runs_each_department_and_sums(self):
+        colaboradores = mock.Mock()
+        colaboradores.values_list.return_value.distinct.return_value = [1, 2, None]
+        parcial = {'criadas': 2, 'recalculadas': 1, 'ignoradas': 0, 'total_liquido': Decimal('10'),
+                   'departamentos': 1}
+
+        with mock.patch.object(payroll, 'colaboradores_da_competencia', return_value=colaboradores) as query, \
+                mock.patch.object(payroll, 'processar_departamento', return_value=parcial) as departamento:
+            resultado = payroll.processar_competencia(mock.Mock(pk=7), 5, 2024, workers=1)
+
+        query.assert_called_once_with(date(2024, 5, 1), 7)
+        self.assertEqual([c.args[0] for c in departamento.call_args_list], [1, 2, None])
+        self.assertEqual((resultado['criadas'], resultado['departamentos']), (6, 3))
+        self.assertEqual(resultado['total_liquido'], Decimal('30'))
+        self.assertEqual(resultado['tabelas'], {'inss': 'INSS-2024', 'irrf': 'IRRF-2024'})
+
+    def test_daemon_process_runs_sequentially(self):
+        """Worker prefork do Celery (daemônico) não pode criar processos"""
+        colaboradores = mock.Mock()
+        colaboradores.values_list.return_value.distinct.return_value = [1, 2]
+
+        with mock.patch.object(payroll, 'colaboradores_da_competencia', return_value=colaboradores), \
+                mock.patch.object(payroll, 'processar_departamento', return_value={}) as departamento, \
+                mock.patch.object(payroll.multiprocessing, 'current_process', return_value=mock.Mock(daemon=True)), \
+                mock.patch.object(payroll, 'ProcessPoolExecutor') as pool:
+            payroll.processar_competencia(7, 5, 2024, workers=4)
+
+        pool.assert_not_called()
+        self.assertEqual(departamento.call_count, 2)
@@ -0,0 +1,107 @@
+"""
+Testes para os histogramas de latência (apps.core.histogram) e o
+PerformanceMonitor (apps.core.monitoring)
+"""
+
+import random
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from apps.core.histogram import LatencyHistogram
+from apps.core.metrics import metrics, metrics_summary
+from apps.core.monitoring import PerformanceMiddleware, PerformanceMonitor, UNRESOLVED_ROUTE
+
+
+class LatencyHistogramTests(SimpleTestCase):
+    """Testes para quantis e merge"""
+
+    def test_quantiles_within_bucket_error(self):
+        rng = random.Random(7)
+        values = sorted(rng.lognormvariate(3, 1) for _ in range(5000))
+        histogram = LatencyHistogram()
+        for value in values:
+            histogram.record(value)
+
+        for q in (0.5, 0.95, 0.99):
+            exact = values[int(q * len(values)) - 1]
+            self.assertAlmostEqual(histogram.quantile(q) / exact, 1, delta=0.25)
+
+    def test_merge_equals_single_histogram(self):
+        """Merge de workers = histograma de todas as amostras"""
+        left, right, combined = LatencyHistogram(), LatencyHistogram(), LatencyHistogram()
+        for value in range(1, 200):
+            (left if value % 2 else right).record(value)
+            combined.record(value)
+
+        merged = LatencyHistogram.merged([left, LatencyHistogram.from_dict(right.to_dict())])
+        self.assertEqual(merged.counts, combined.counts)
+        self.assertEqual((merged.count, merged.min, merged.max), (199, 1, 199))
+        self.assertEqual(merged.quantile(0.95), combined.quantile(0.95))
+
+
+@override_settings(PERFORMANCE_METRICS_FLUSH_INTERVAL=3600, PERFORMANCE_METRICS_TOKEN='s3cret')
+class PerformanceMonitorTests(SimpleTestCase):
+    """Testes para a coleta por worker e a exposição"""
+
+    def setUp(self):
+        cache.clear()
+        PerformanceMonitor.reset()
+        self.addCleanup(PerformanceMonitor.reset)
+
+    def test_record_does_not_touch_cache(self):
+        with mock.patch('apps.core.monitoring.cache') as mocked:
+            for _ in range(50):
+                PerformanceMonitor.record_api_call('core:x', 12.0, 'GET')
+        mocked.get.assert_not_called()
+        mocked.set.assert_not_called()
+
+    def test_keyed_by_route_name(self):
+        """Paths com IDs diferentes caem na mesma série"""
+        middleware = PerformanceMiddleware(lambda request: HttpResponse())
+        for pk in (1, 2, 3):
+            request = RequestFactory().get(f'/api/v1/dp/colaboradores/{pk}/')
+            request.resolver_match = SimpleNamespace(view_name='dp:colaborador-detail', route=None)
+            middleware(request)
+        middleware(RequestFactory().get('/nao-existe/'))
+
+        keys = set(PerformanceMonitor.snapshot())
+        self.assertEqual(keys, {('dp:colaborador-detail', 'GET'), (UNRESOLVED_ROUTE, 'GET')})
+        self.assertEqual(PerformanceMonitor.snapshot()[('dp:colaborador-detail', 'GET')].count, 3)
+
+    def test_aggregates_published_workers(self):
+        PerformanceMonitor.record_api_call('core:x', 10.0, 'GET')
+        with mock.patch.object(PerformanceMonitor, 'worker_id', return_value='host:1'):
+            PerformanceMonitor.flush()
+        PerformanceMonitor.reset()
+        PerformanceMonitor.record_api_call('core:x', 30.0, 'GET')
+
+        summary = PerformanceMonitor.summary()
+        self.assertEqual(summary['workers'], 2)
+        self.assertEqual(summary['routes'][0]['count'], 2)
+        self.assertEqual(summary['routes'][0]['max_ms'], 30.0)
+
+    def test_prometheus_exposition(self):
+        for value in (3, 40, 700):
+            PerformanceMonitor.record_api_call('core:x', value, 'POST')
+
+        request = RequestFactory().get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret')
+        response = metrics(request)
+
+        body = response.content.decode()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('# TYPE syncrh_http_request_duration_seconds histogram', body)
+        self.assertIn('_bucket{route="core:x",method="POST",le="0.05"} 2', body)
+        self.assertIn('_bucket{route="core:x",method="POST",le="+Inf"} 3', body)
+        self.assertIn('_count{route="core:x",method="POST"} 3', body)
+
+    def test_endpoints_require_staff_or_token(self):
+        request = RequestFactory().get('/api/v1/core/metrics/', HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(metrics(request).status_code, 403)
+        self.assertEqual(metrics_summary(request).status_code, 403)
+
+        request.user = SimpleNamespace(is_authenticated=True, is_staff=True)
+        self.assertEqual(metrics_summary(request).status_code, 200)
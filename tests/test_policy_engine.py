@@ -0,0 +1,151 @@
+"""
+Testes para a tabela de decisão compilada (apps.security.zero_trust.policy_engine)
+"""
+
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from apps.security.zero_trust.access_log import AccessContextLog
+from apps.security.zero_trust.middleware import ZeroTrustMiddleware
+from apps.security.zero_trust.policy_engine import PolicyEngine, compile_policy
+from apps.security.zero_trust.threat_matcher import ThreatMatcher
+
+
+def policy(name, action='deny', priority=100, enforced=True, conditions=None, resources=(), roles=()):
+    return {
+        'id': None, 'name': name, 'applies_to_roles': list(roles),
+        'applies_to_resources': list(resources), 'conditions': conditions or {},
+        'action_on_match': action, 'priority': priority, 'is_enforced': enforced,
+    }
+
+
+def context(**values):
+    base = {
+        'path': '/api/v1/dp/colaboradores/', 'method': 'GET', 'resource_sensitivity': 'normal',
+        'risk_score': 0, 'risk_factors': [], 'hour': 10, 'is_authenticated': True,
+    }
+    base.update(values)
+    return base
+
+
+class PolicyEngineTests(SimpleTestCase):
+    """Testes para compilação e avaliação"""
+
+    def test_default_rules_match_previous_thresholds(self):
+        engine = PolicyEngine()
+
+        self.assertEqual(engine.evaluate(context(risk_score=85)).action, 'deny')
+        self.assertEqual(engine.evaluate(context(risk_score=65)).reason, 'High risk score: 65')
+        self.assertEqual(engine.evaluate(context(risk_score=45, resource_sensitivity='high')).action, 'step_up')
+        self.assertEqual(engine.evaluate(context(risk_score=45)).action, 'allow')
+        self.assertEqual(engine.evaluate(context(risk_factors=['blocked_ip'])).reason, 'IP address is blocked')
+
+    def test_priority_order_and_index(self):
+        engine = PolicyEngine([
+            policy('low', action='allow', priority=10, conditions={'methods': ['DELETE']}),
+            policy('high', action='challenge', priority=500, conditions={'methods': ['DELETE']},
+                   resources=[r'^/api/v1/dp/']),
+            policy('other-method', priority=900, conditions={'methods': ['POST']}),
+        ])
+
+        self.assertEqual(engine.evaluate(context(method='DELETE')).policy, 'high')
+        self.assertEqual(engine.evaluate(context(method='DELETE', path='/api/v1/work/')).policy, 'low')
+        self.assertNotIn('other-method', [p.name for p in engine.candidates('normal', 'GET')])
+
+    def test_audit_mode_and_log_do_not_decide(self):
+        engine = PolicyEngine([
+            policy('audit', priority=300, enforced=False),
+            policy('log-only', action='log', priority=200),
+        ])
+
+        decision = engine.evaluate(context())
+        self.assertEqual((decision.action, decision.audit), ('allow', ['audit', 'log-only']))
+
+    def test_conditions(self):
+        engine = PolicyEngine([
+            policy('after-hours', conditions={'allowed_hours': {'start': 18, 'end': 8}}, roles=['contractor']),
+            policy('mfa', action='challenge', conditions={'mfa_verified': False, 'sensitivity': ['high']}),
+        ])
+
+        self.assertEqual(engine.evaluate(context(hour=22), frozenset({'contractor'})).policy, 'after-hours')
+        self.assertIsNone(engine.evaluate(context(hour=10), frozenset({'contractor'})).policy)
+        self.assertIsNone(engine.evaluate(context(hour=22), frozenset({'employee'})).policy)
+        self.assertEqual(engine.evaluate(context(resource_sensitivity='high')).policy, 'mfa')
+        self.assertIsNone(engine.evaluate(context(resource_sensitivity='high', mfa_verified=True)).policy)
+
+    def test_conditions_describe_matching_request(self):
+        """Todas as condições casam quando a requisição as atende (exemplo do model)"""
+        engine = PolicyEngine([policy('trusted', action='log', conditions={
+            'require_mfa': True, 'allowed_countries': ['BR'], 'allowed_hours': {'start': 8, 'end': 18},
+            'max_risk_score': 50, 'ip_types': ['private'], 'authenticated': True,
+        })])
+        trusted = context(mfa_verified=True, country='br', ip_type='private', risk_score=20)
+
+        self.assertEqual(engine.evaluate(trusted).audit, ['trusted'])
+        for change in ({'mfa_verified': False}, {'country': 'US'}, {'country': None}, {'hour': 20},
+                       {'risk_score': 51}, {'ip_type': 'public'}, {'is_authenticated': False}):
+            with self.subTest(**change):
+                self.assertEqual(engine.evaluate({**trusted, **change}).audit, [])
+
+    def test_allow_does_not_bypass_risk_thresholds(self):
+        engine = PolicyEngine([
+            policy('allow-all', action='allow', priority=1000),
+            policy('deny-high', priority=500, conditions={'min_risk_score': 60}),
+        ])
+
+        decision = engine.evaluate(context(risk_score=85))
+        self.assertEqual((decision.action, decision.policy), ('deny', 'builtin:critical_risk'))
+        self.assertEqual(engine.evaluate(context(risk_score=65)).reason, 'High risk score: 65')
+        self.assertEqual(engine.evaluate(context(risk_score=45, resource_sensitivity='high')).policy, 'allow-all')
+
+        engine = PolicyEngine([policy('deny-high', priority=500, conditions={'min_risk_score': 60})])
+        self.assertEqual(engine.evaluate(context(risk_score=65)).policy, 'deny-high')
+
+    def test_invalid_policies_are_skipped(self):
+        self.assertIsNone(compile_policy(policy('bad-regex', resources=['(unclosed'])))
+        self.assertIsNone(compile_policy(policy('unknown', conditions={'min_trust_level': 'high'})))
+
+
+class PolicyEngineReloadTests(SimpleTestCase):
+    """Testes para o hot swap e a integração com o middleware"""
+
+    def setUp(self):
+        PolicyEngine.reset()
+        self.addCleanup(PolicyEngine.reset)
+
+    def test_rebuilds_when_version_changes(self):
+        first = PolicyEngine([], version=1)
+        second = PolicyEngine([policy('new')], version=2)
+        with mock.patch.object(PolicyEngine, 'load', side_effect=[first, second]) as load:
+            self.assertIs(PolicyEngine.current(), first)
+            self.assertIs(PolicyEngine.current(), first)
+            PolicyEngine.bump_version()
+            self.assertIs(PolicyEngine.current(), second)
+        self.assertEqual(load.call_count, 2)
+
+    @override_settings(ZERO_TRUST_POLICY_MAX_AGE=60)
+    def test_stale_table_rebuilds_without_bump(self):
+        with mock.patch.object(PolicyEngine, 'load', side_effect=lambda version=None: PolicyEngine([], version=version)) as load:
+            first = PolicyEngine.current()
+            first.built_at -= 61
+            PolicyEngine._checked_at = 0.0
+            self.assertIsNot(PolicyEngine.current(), first)
+        self.assertEqual(load.call_count, 2)
+
+    def test_middleware_uses_compiled_policies(self):
+        engine = PolicyEngine([policy('block-dashboard', resources=[r'^/dashboard/'])])
+        middleware = ZeroTrustMiddleware(lambda request: HttpResponse('ok'))
+        request = RequestFactory().get('/dashboard/', REMOTE_ADDR='10.0.0.5')
+        request.user = AnonymousUser()
+
+        with mock.patch.object(PolicyEngine, 'current', return_value=engine), \
+                mock.patch.object(ThreatMatcher, 'current', return_value=ThreatMatcher()), \
+                mock.patch.object(AccessContextLog, 'record') as record:
+            response = middleware(request)
+
+        self.assertEqual(response.status_code, 403)
+        decision, reason = record.call_args[0][2:4]
+        self.assertEqual((decision, reason), ('deny', "Policy 'block-dashboard'"))
@@ -0,0 +1,163 @@
+"""
+Testes para a ingestão de batidas (apps.departamento_pessoal.ingestion)
+
+departamento_pessoal fica fora do INSTALLED_APPS de teste: validação,
+resolução dos campos do dia e endpoint de sincronização sem banco.
+"""
+
+from datetime import date, datetime, timedelta
+from unittest import mock
+
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from apps.departamento_pessoal import ingestion
+from apps.departamento_pessoal.ingestion import IngestaoPonto, consolidar_dias, normalizar_batida
+from apps.departamento_pessoal.views import SincronizarPontoView
+
+
+def hora(h, m=0):
+    return timezone.make_aware(datetime(2024, 5, 6, h, m))
+
+
+def batida(momento, origem='app', latitude=None):
+    return {'colaborador_id': 1, 'data': date(2024, 5, 6), 'momento': momento, 'origem': origem,
+            'latitude': latitude, 'longitude': None}
+
+
+@override_settings(DP_PONTO_SYNC_MAX_DIAS=7, DP_PONTO_MAX_ADIANTAMENTO=300)
+class NormalizarBatidaTests(SimpleTestCase):
+    """Testes para a validação das batidas"""
+
+    def test_valid_punch(self):
+        linha = normalizar_batida(3, {
+            'chave': 'k1', 'momento': '2024-05-06T08:00:00', 'origem': 'desconhecida',
+            'localizacao': {'latitude': '-23.5', 'longitude': -46.6},
+        }, agora=hora(9))
+
+        self.assertEqual(linha[:2], ['k1', 3])
+        self.assertEqual(linha[2], hora(8).timestamp())
+        self.assertEqual(linha[3:6], ['web', -23.5, -46.6])
+
+    def test_rejections(self):
+        agora = hora(9)
+        for dados in ({'momento': hora(8)}, {'chave': 'x' * 65},
+                      {'chave': 'k', 'momento': 'ontem'},
+                      {'chave': 'k', 'momento': agora + timedelta(minutes=10)},
+                      {'chave': 'k', 'momento': agora - timedelta(days=8)}):
+            with self.subTest(dados=dados), self.assertRaises(ValidationError):
+                normalizar_batida(1, dados, agora=agora)
+
+
+def existente(colaborador_id, status='pendente', **batidas):
+    slots = dict.fromkeys(('entrada', 'saida_almoco', 'retorno_almoco', 'saida'))
+    slots.update(batidas)
+    return {'colaborador_id': colaborador_id, 'data': date(2024, 5, 6), 'status': status, **slots}
+
+
+class ConsolidacaoTests(SimpleTestCase):
+    """Testes para a resolução dos campos do dia a partir do log"""
+
+    def consolidar(self, dias, log, existentes):
+        with mock.patch.object(ingestion.BatidaPonto, 'objects') as batidas, \
+                mock.patch.object(ingestion.RegistroPonto, 'objects') as registros, \
+                mock.patch.object(ingestion.Colaborador, 'objects') as colaboradores, \
+                mock.patch.object(ingestion, 'recalcular_mensal') as recalcular:
+            batidas.filter.return_value.order_by.return_value.values.return_value = log
+            registros.select_for_update.return_value.filter.return_value.values.return_value = existentes
+
+            resultado = consolidar_dias(dias)
+
+        colaboradores.select_for_update.assert_called_once_with(no_key=True)
+        self.assertEqual(colaboradores.select_for_update.return_value.filter.call_args.kwargs['id__in'],
+                         {colaborador_id for colaborador_id, _ in dias})
+        return resultado, registros, recalcular
+
+    def test_slots_in_time_order_and_preserved_days(self):
+        dias = {(1, date(2024, 5, 6)), (2, date(2024, 5, 6))}
+        log = [batida(hora(8), latitude=1.5), batida(hora(12)), batida(hora(13)), batida(hora(17, 30)),
+               batida(hora(18)), dict(batida(hora(8)), colaborador_id=2)]
+
+        resultado, registros, recalcular = self.consolidar(dias, log, [existente(2, status='aprovado')])
+
+        self.assertEqual(len(resultado), 1)
+        registro = resultado[0]
+        self.assertEqual((registro.entrada, registro.saida_almoco, registro.retorno_almoco, registro.saida),
+                         (hora(8), hora(12), hora(13), hora(17, 30)))
+        self.assertEqual((registro.minutos_trabalhados, registro.latitude_entrada), (510, 1.5))
+        kwargs = registros.bulk_create.call_args.kwargs
+        self.assertTrue(kwargs['update_conflicts'])
+        self.assertEqual(kwargs['unique_fields'], ['colaborador', 'data'])
+        recalcular.assert_called_once_with(date(2024, 5, 1), {1})
+
+    def test_days_with_slots_outside_log_are_kept(self):
+        """Horário lançado antes do log (ou editado) não é sobrescrito"""
+        dias = {(1, date(2024, 5, 6)), (2, date(2024, 5, 6))}
+        log = [batida(hora(8)), batida(hora(12)), dict(batida(hora(8)), colaborador_id=2),
+               dict(batida(hora(12)), colaborador_id=2)]
+        existentes = [existente(1, entrada=hora(7, 55)), existente(2, entrada=hora(8))]
+
+        resultado, _, _ = self.consolidar(dias, log, existentes)
+
+        self.assertEqual([(r.colaborador_id, r.entrada, r.saida_almoco) for r in resultado],
+                         [(2, hora(8), hora(12))])
+
+    def test_write_deduplicates_by_employee_and_key(self):
+        linha = ['k1', 1, hora(8).timestamp(), 'app', None, None, '']
+
+        with mock.patch.object(ingestion.BatidaPonto, 'objects') as batidas, \
+                mock.patch.object(ingestion, 'transaction'), \
+                mock.patch.object(ingestion, 'consolidar_dias', return_value=[]) as consolidar:
+            IngestaoPonto.write([linha, list(linha), ['k2', 1, hora(12).timestamp(), 'app', None, None, ''],
+                                 ['k1', 2, hora(8).timestamp(), 'app', None, None, '']])
+
+        criadas = batidas.bulk_create.call_args.args[0]
+        self.assertEqual([(b.colaborador_id, b.chave) for b in criadas], [(1, 'k1'), (1, 'k2'), (2, 'k1')])
+        self.assertTrue(batidas.bulk_create.call_args.kwargs['ignore_conflicts'])
+        consolidar.assert_called_once_with({(1, timezone.localdate(hora(8))), (2, timezone.localdate(hora(8)))})
+
+
+@override_settings(DP_PONTO_SYNC_MAX_BATCH=3)
+class SincronizarPontoViewTests(SimpleTestCase):
+    """Testes para o endpoint de sincronização do PWA"""
+
+    def post(self, batidas):
+        request = APIRequestFactory().post('/api/ponto/sincronizar/', {'batidas': batidas}, format='json')
+        force_authenticate(request, user=mock.Mock(pk=7, is_authenticated=True))
+        return SincronizarPontoView.as_view()(request)
+
+    def test_accepts_rejects_and_pending(self):
+        agora = timezone.now()
+        batidas = [
+            {'chave': 'a', 'momento': (agora - timedelta(hours=2)).isoformat()},
+            {'chave': 'b', 'momento': (agora - timedelta(days=30)).isoformat()},
+            {'chave': 'c', 'momento': (agora - timedelta(hours=1)).isoformat()},
+        ]
+        with mock.patch('apps.departamento_pessoal.views.colaborador_id_do_usuario', return_value=4), \
+                mock.patch.object(IngestaoPonto, 'submit', side_effect=[True, False]) as submit:
+            response = self.post(batidas)
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['aceitas'], ['a'])
+        self.assertEqual(response.data['pendentes'], ['c'])
+        self.assertEqual([r['chave'] for r in response.data['rejeitadas']], ['b'])
+        self.assertEqual(submit.call_args_list[0].args[0][1], 4)
+
+    def test_repeated_key_is_submitted_once(self):
+        momento = (timezone.now() - timedelta(hours=1)).isoformat()
+        with mock.patch('apps.departamento_pessoal.views.colaborador_id_do_usuario', return_value=4), \
+                mock.patch.object(IngestaoPonto, 'submit', return_value=True) as submit:
+            response = self.post([{'chave': 'a', 'momento': momento}, {'chave': 'a', 'momento': momento}])
+
+        self.assertEqual(response.data['aceitas'], ['a'])
+        submit.assert_called_once()
+
+    def test_batch_limit(self):
+        with mock.patch('apps.departamento_pessoal.views.colaborador_id_do_usuario', return_value=4), \
+                mock.patch.object(IngestaoPonto, 'submit') as submit:
+            response = self.post([{'chave': str(i)} for i in range(4)])
+
+        self.assertEqual(response.status_code, 400)
+        submit.assert_not_called()
@@ -0,0 +1,87 @@
+"""
+Testes para montagem de prompt com histórico e orçamento de tokens
+"""
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from apps.assistant.models import Conversa, Mensagem
+from apps.assistant.services import RAGPipeline
+from apps.assistant.tokenization import count_tokens, truncate_to_tokens
+from apps.assistant.vector_index import RetrievedChunk
+
+User = get_user_model()
+
+
+def _chunk(idx, content):
+    return RetrievedChunk(idx, 1, idx, content, 'Política de Férias', 'ferias.md', score=0.9)
+
+
+class TokenizationTests(TestCase):
+    """Testes para contagem e truncamento de tokens"""
+
+    def test_count_and_truncate(self):
+        text = 'Férias de 30 dias corridos após 12 meses de trabalho. ' * 20
+        self.assertGreater(count_tokens(text), 0)
+        self.assertEqual(count_tokens(''), 0)
+
+        truncated = truncate_to_tokens(text, 10)
+        self.assertLessEqual(count_tokens(truncated), 10)
+        self.assertTrue(text.startswith(truncated))
+
+
+class PromptBudgetTests(TestCase):
+    """Testes para assemble_prompt"""
+
+    def test_chunks_packed_under_budget(self):
+        """Chunks além do orçamento ficam de fora (e das citações)"""
+        chunks = [_chunk(i, f'Trecho {i}: ' + 'regra de férias ' * 60) for i in range(10)]
+
+        assembled = RAGPipeline.assemble_prompt('Quantos dias?', chunks, token_budget=600)
+
+        self.assertLessEqual(assembled['prompt_tokens'], 600)
+        self.assertGreater(len(assembled['chunks']), 0)
+        self.assertLess(len(assembled['chunks']), 10)
+        self.assertEqual(assembled['chunks'], chunks[:len(assembled['chunks'])])
+
+    def test_oversized_first_chunk_is_truncated(self):
+        """O trecho mais relevante é truncado em vez de descartado"""
+        chunks = [_chunk(0, 'regra de férias ' * 2000)]
+
+        assembled = RAGPipeline.assemble_prompt('Quantos dias?', chunks, token_budget=500)
+
+        self.assertEqual(len(assembled['chunks']), 1)
+        self.assertLessEqual(assembled['prompt_tokens'], 500)
+
+    def test_history_keeps_newest_turns(self):
+        """Histórico entra do mais recente para o mais antigo até o limite"""
+        history = [('user', 'pergunta antiga ' * 50), ('assistant', 'resposta antiga ' * 50),
+                   ('user', 'Posso vender férias?'), ('assistant', 'Sim, até 10 dias.')]
+
+        assembled = RAGPipeline.assemble_prompt(
+            'E quando?', [], history=history, token_budget=2000, history_budget=60
+        )
+
+        self.assertEqual(assembled['history_turns'], 2)
+        self.assertIn('Usuário: Posso vender férias?', assembled['prompt'])
+        self.assertIn('Assistente: Sim, até 10 dias.', assembled['prompt'])
+        self.assertNotIn('pergunta antiga', assembled['prompt'])
+
+
+@pytest.mark.django_db
+class ConversationHistoryTests(TestCase):
+    """Testes para get_history"""
+
+    def test_history_single_query_oldest_first(self):
+        user = User.objects.create_user(username='hist_user', email='h@test.com', password='x')
+        conversation = Conversa.objects.create(user=user)
+        Mensagem.objects.create(conversation=conversation, role='user', content='um')
+        Mensagem.objects.create(conversation=conversation, role='assistant', content='dois')
+        current = Mensagem.objects.create(conversation=conversation, role='user', content='três')
+
+        with self.assertNumQueries(1):
+            history = RAGPipeline.get_history(conversation, limit=10, exclude_message_id=current.id)
+
+        self.assertEqual(history, [('user', 'um'), ('assistant', 'dois')])
+        self.assertEqual(RAGPipeline.get_history(conversation, limit=1), [('user', 'três')])
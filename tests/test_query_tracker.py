@@ -0,0 +1,84 @@
+"""
+Testes para a instrumentação de SQL (apps.core.query_tracker)
+"""
+
+from types import SimpleNamespace
+from unittest import mock
+
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from apps.core.monitoring import PerformanceMiddleware, PerformanceMonitor
+from apps.core.query_tracker import QueryStats, QueryTracker, fingerprint
+
+
+class FingerprintTests(SimpleTestCase):
+    """Testes para a normalização de SQL"""
+
+    def test_literals_are_normalized(self):
+        self.assertEqual(
+            fingerprint("SELECT * FROM  t1 WHERE id = 42 AND name = 'o''brien'"),
+            "SELECT * FROM t1 WHERE id = ? AND name = ?",
+        )
+
+    def test_in_lists_collapse(self):
+        self.assertEqual(
+            fingerprint('SELECT "a"."id" FROM "a" WHERE "a"."id" IN (%s, %s, %s)'),
+            fingerprint('SELECT "a"."id" FROM "a" WHERE "a"."id" IN (%s)'),
+        )
+
+    def test_repeated_fingerprints(self):
+        stats = QueryStats()
+        for pk in range(12):
+            stats.record(f'SELECT * FROM item WHERE order_id = {pk}', 1.0)
+        stats.record('SELECT * FROM "order"', 2.0)
+
+        (row,) = stats.repeated(10)
+        self.assertEqual((row['sql'], row['count']), ('SELECT * FROM item WHERE order_id = ?', 12))
+
+
+@override_settings(DEBUG=False, SQL_SAMPLE_RATE=0, SQL_N_PLUS_ONE_THRESHOLD=5)
+class QueryTrackerTests(TestCase):
+    """Testes para o execute_wrapper com DEBUG=False"""
+
+    def setUp(self):
+        QueryTracker.reset()
+        PerformanceMonitor.reset()
+        self.addCleanup(QueryTracker.reset)
+        self.addCleanup(PerformanceMonitor.reset)
+
+    def test_counts_queries_without_debug(self):
+        with QueryTracker.track() as stats:
+            with connection.cursor() as cursor:
+                for value in range(3):
+                    cursor.execute('SELECT %s', [value])
+            self.assertEqual(PerformanceMonitor.get_db_query_count(), 3)
+
+        self.assertEqual(connection.queries, [])
+        self.assertEqual(stats.count, 3)
+        self.assertEqual(list(stats.fingerprints), ['SELECT ?'])
+        self.assertIsNone(QueryTracker.current())
+
+    def test_middleware_reports_n_plus_one(self):
+        def view(request):
+            with connection.cursor() as cursor:
+                for pk in range(6):
+                    cursor.execute('SELECT %s', [pk])
+            return HttpResponse()
+
+        request = RequestFactory().get('/api/v1/dp/colaboradores/')
+        request.resolver_match = SimpleNamespace(view_name='dp:colaborador-list', route=None)
+
+        with mock.patch('apps.core.query_tracker.logger') as logger:
+            PerformanceMiddleware(view)(request)
+
+        self.assertIn('dp:colaborador-list', logger.warning.call_args[0][0])
+        (sample,) = QueryTracker.recent()
+        self.assertEqual((sample['view'], sample['queries']), ('dp:colaborador-list', 6))
+        self.assertEqual(sample['n_plus_one'][0]['count'], 6)
+
+    def test_unremarkable_requests_are_sampled(self):
+        """Sem N+1 nem lentidão, com SQL_SAMPLE_RATE=0 nada entra no buffer"""
+        PerformanceMiddleware(lambda request: HttpResponse())(RequestFactory().get('/'))
+        self.assertEqual(QueryTracker.recent(), [])
@@ -0,0 +1,173 @@
+"""
+Testes para o motor de rate limiting (apps.core.rate_limit)
+"""
+
+import threading
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from apps.core import rate_limit
+from apps.core.middleware import RateLimitMiddleware
+from apps.core.rate_limit import RateLimiter
+from apps.security.zero_trust.middleware import (
+    RateLimitMiddleware as ZeroTrustRateLimitMiddleware,
+    ZeroTrustMiddleware,
+)
+
+POLICIES = {
+    'anonymous': [(5, 60), (500, 3600)],
+    'authenticated': [(10, 60)],
+    'api': [(3, 60)],
+    'bulk': [(1000, 60)],
+}
+NOW = 1_700_000_000 - (1_700_000_000 % 3600) + 5  # 5s após o início de uma hora
+
+
+@override_settings(RATE_LIMIT_POLICIES=POLICIES, RATE_LIMIT_ROUTES={'/api/': 'api'})
+class RateLimiterTests(SimpleTestCase):
+    """Testes para contagem, decisão e pré-filtro local"""
+
+    def setUp(self):
+        cache.clear()
+        RateLimiter.reset()
+
+    def test_denies_after_limit(self):
+        """Sexto hit anônimo no minuto é negado com Retry-After"""
+        results = [RateLimiter.hit('ip:1.2.3.4', 'anonymous', now=NOW) for _ in range(6)]
+
+        self.assertTrue(all(r.allowed for r in results[:5]))
+        self.assertEqual(results[4].remaining, 0)
+        self.assertFalse(results[5].allowed)
+        self.assertEqual(results[5].retry_after, 55)
+
+    def test_counters_are_atomic_across_threads(self):
+        """Hits concorrentes não se perdem (incr, não get + set)"""
+        def worker():
+            for _ in range(25):
+                RateLimiter.hit('user:1', 'bulk', now=NOW)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        key = RateLimiter.cache_key('bulk', 'user:1', 60, NOW - NOW % 60)
+        self.assertEqual(cache.get(key), 100)
+
+    def test_one_round_trip_per_request(self):
+        """Em regime estável cada hit custa um único incr (limite por hora em lote)"""
+        RateLimiter.hit('ip:1.2.3.4', 'anonymous', now=NOW)
+
+        with mock.patch.object(rate_limit, 'cache', wraps=cache) as spy:
+            RateLimiter.hit('ip:1.2.3.4', 'anonymous', now=NOW + 1)
+
+        self.assertEqual([call[0] for call in spy.method_calls], ['incr'])
+
+    def test_blocked_client_skips_cache(self):
+        """Cliente bloqueado é rejeitado localmente até o Retry-After"""
+        for _ in range(4):
+            RateLimiter.hit('ip:9.9.9.9', 'api', now=NOW)
+
+        with mock.patch.object(rate_limit, 'cache', wraps=cache) as spy:
+            result = RateLimiter.hit('ip:9.9.9.9', 'api', now=NOW + 10)
+
+        self.assertFalse(result.allowed)
+        self.assertEqual(spy.method_calls, [])
+        self.assertEqual(RateLimiter.stats()['local_rejects'], 1)
+
+    @override_settings(RATE_LIMIT_LOCAL_MAX_KEYS=2)
+    def test_blocked_clients_are_bounded(self):
+        """Bloqueios expirados saem no próximo registro; o total respeita o limite local"""
+        for ip in ('1.1.1.1', '2.2.2.2', '3.3.3.3'):
+            for _ in range(4):
+                RateLimiter.hit(f'ip:{ip}', 'api', now=NOW)
+        self.assertEqual(RateLimiter.stats()['blocked_clients'], 2)
+
+        for _ in range(4):
+            RateLimiter.hit('ip:4.4.4.4', 'api', now=NOW + 3600)
+        self.assertEqual(RateLimiter.stats()['blocked_clients'], 1)
+
+    def test_sliding_window_weights_previous(self):
+        """Contagem da janela anterior decai linearmente"""
+        start = NOW - NOW % 60
+        for _ in range(3):
+            RateLimiter.hit('ip:5.5.5.5', 'api', now=start + 1)
+        RateLimiter.reset()
+
+        # 30s na janela seguinte: 3 * 0.5 + 1 = 2.5 <= 3
+        self.assertTrue(RateLimiter.hit('ip:5.5.5.5', 'api', now=start + 90).allowed)
+        # 3 * 0.5 + 2 = 3.5 > 3
+        self.assertFalse(RateLimiter.hit('ip:5.5.5.5', 'api', now=start + 90).allowed)
+
+    def test_resolve_policy(self):
+        """Rota vence o tier; tier sem política usa 'default'"""
+        self.assertEqual(RateLimiter.resolve_policy('/api/v1/x/', True), 'api')
+        self.assertEqual(RateLimiter.resolve_policy('/dashboard/', True), 'authenticated')
+        self.assertEqual(RateLimiter.resolve_policy('/dashboard/', False), 'anonymous')
+        with override_settings(RATE_LIMIT_POLICIES={}):
+            self.assertEqual(RateLimiter.resolve_policy('/dashboard/', False), 'default')
+
+
+@override_settings(RATE_LIMIT_POLICIES=POLICIES, RATE_LIMIT_ROUTES={'/api/': 'api'})
+class RateLimitMiddlewareTests(SimpleTestCase):
+    """Testes para os middlewares que consomem o RateLimiter"""
+
+    def setUp(self):
+        cache.clear()
+        RateLimiter.reset()
+        self.factory = RequestFactory()
+
+    def _request(self, path='/api/v1/ponto/'):
+        request = self.factory.get(path, REMOTE_ADDR='8.8.8.8')
+        request.user = AnonymousUser()
+        return request
+
+    def test_core_middleware_headers_and_429(self):
+        """Headers X-RateLimit-* e 429 ao estourar a política da rota"""
+        middleware = RateLimitMiddleware(lambda request: HttpResponse('ok'))
+
+        responses = [middleware(self._request()) for _ in range(4)]
+
+        self.assertEqual(responses[0]['X-RateLimit-Limit'], '3')
+        self.assertEqual(responses[0]['X-RateLimit-Remaining'], '2')
+        self.assertEqual(responses[3].status_code, 429)
+        self.assertIn('Retry-After', responses[3])
+
+    def test_stacked_middlewares_charge_once(self):
+        """Core + zero-trust na mesma requisição contam um único hit"""
+        app = RateLimitMiddleware(ZeroTrustRateLimitMiddleware(lambda request: HttpResponse('ok')))
+
+        statuses = [app(self._request()).status_code for _ in range(4)]
+
+        self.assertEqual(statuses, [200, 200, 200, 429])
+
+    def test_zero_trust_sees_shared_counters(self):
+        """_is_rate_limited lê os mesmos contadores do middleware"""
+        middleware = ZeroTrustRateLimitMiddleware(lambda request: HttpResponse('ok'))
+        zero_trust = ZeroTrustMiddleware(lambda request: HttpResponse('ok'))
+        context = {
+            'is_authenticated': False,
+            'user_id': None,
+            'ip_address': '8.8.8.8',
+            'path': '/api/v1/ponto/',
+        }
+
+        self.assertFalse(zero_trust._is_rate_limited(context))
+        middleware(self._request())
+        middleware(self._request())
+        self.assertTrue(zero_trust._is_rate_limited(context))
+
+    @override_settings(RATE_LIMIT_POLICIES={**POLICIES, 'staff': [(10, 60)]})
+    def test_zero_trust_uses_client_tier(self):
+        """Cliente com tier próprio é medido na política do tier, como em check()"""
+        zero_trust = ZeroTrustMiddleware(lambda request: HttpResponse('ok'))
+        context = {'is_authenticated': True, 'user_id': 1, 'tier': 'staff', 'ip_address': '8.8.8.8', 'path': '/painel/'}
+        for _ in range(6):
+            RateLimiter.hit('user:1', 'staff')
+
+        self.assertTrue(zero_trust._is_rate_limited(context))
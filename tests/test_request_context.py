@@ -0,0 +1,132 @@
+"""
+Testes para o contexto de requisição compartilhado (apps.core.request_context)
+"""
+
+from types import SimpleNamespace
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from apps.core.middleware import SecurityHeadersMiddleware
+from apps.core.rate_limit import RateLimiter
+from apps.core.request_context import (
+    PrefixMatcher,
+    RequestContext,
+    RequestContextMiddleware,
+    apply_security_headers,
+    get_request_context,
+    prefix_matcher,
+)
+from apps.security.zero_trust.access_log import AccessContextLog
+from apps.security.zero_trust.middleware import ZeroTrustMiddleware
+from apps.security.zero_trust.threat_matcher import ThreatMatcher
+
+
+class PrefixMatcherTests(SimpleTestCase):
+    """Testes para o casamento de prefixos pré-compilado"""
+
+    def test_longest_prefix_wins(self):
+        matcher = PrefixMatcher({'/api/': 'api', '/api/lgpd/': 'high', '/admin/': 'elevated'})
+
+        self.assertEqual(matcher.match('/api/lgpd/consentimentos/'), 'high')
+        self.assertEqual(matcher.match('/api/v1/x/'), 'api')
+        self.assertEqual(matcher.match('/dashboard/', 'normal'), 'normal')
+
+    def test_same_semantics_as_startswith(self):
+        prefixes = ['/api/v', '/static/', '/health/']
+        matcher = PrefixMatcher(prefixes)
+        for path in ('/api/v1/', '/api/x/', '/static/app.js', '/staticfiles/', '/health', '/'):
+            self.assertEqual(matcher.matches(path), any(path.startswith(p) for p in prefixes), path)
+
+    def test_compiled_once_per_object(self):
+        prefixes = ['/a/']
+        matcher = prefix_matcher(prefixes)
+        self.assertIs(prefix_matcher(prefixes), matcher)
+
+        prefixes.append('/b/')
+        self.assertTrue(prefix_matcher(prefixes).matches('/b/x'))
+
+
+class RequestContextTests(SimpleTestCase):
+    """Testes para os fatos derivados uma vez por requisição"""
+
+    def _request(self, **extra):
+        return RequestFactory().get('/api/lgpd/x/', HTTP_X_FORWARDED_FOR='203.0.113.9, 10.0.0.1',
+                                    HTTP_USER_AGENT='Mozilla', **extra)
+
+    def test_derived_once(self):
+        request = self._request()
+        context = get_request_context(request)
+
+        self.assertIs(get_request_context(request), context)
+        self.assertEqual((context.ip, context.ip_type), ('203.0.113.9', 'public'))
+        self.assertEqual(context.sensitivity, 'high')
+        fingerprint = context.fingerprint
+        with mock.patch('apps.core.request_context.hashlib.sha256') as sha256:
+            self.assertEqual(context.fingerprint, fingerprint)
+            sha256.assert_not_called()
+
+    def test_user_facts_read_lazily(self):
+        """Contexto criado antes do AuthenticationMiddleware vê o usuário depois"""
+        request = self._request()
+        context = get_request_context(request)
+        self.assertEqual(context.tier, 'anonymous')
+
+        request.user = SimpleNamespace(pk=7, is_authenticated=True, is_staff=True, company_id=3)
+        self.assertEqual((context.user_id, context.tier, context.tenant), (7, 'staff', 3))
+
+    @override_settings(RATE_LIMIT_POLICIES={'staff': [(5, 60)], 'authenticated': [(1, 60)]},
+                       RATE_LIMIT_ROUTES={})
+    def test_rate_limit_uses_staff_tier(self):
+        request = self._request()
+        request.user = SimpleNamespace(pk=7, id=7, is_authenticated=True, is_staff=True)
+        context = get_request_context(request)
+
+        self.assertEqual(RateLimiter.client_id(request), 'user:7')
+        self.assertEqual(
+            RateLimiter.resolve_policy(context.path, context.is_authenticated, context.tier), 'staff'
+        )
+
+
+class SharedContextMiddlewareTests(SimpleTestCase):
+    """Testes para os middlewares lendo o mesmo contexto"""
+
+    def setUp(self):
+        patcher = mock.patch.object(ThreatMatcher, 'current', return_value=ThreatMatcher())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(AccessContextLog, 'record')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_headers_written_once(self):
+        response = apply_security_headers(HttpResponse())
+        response['X-Frame-Options'] = 'SAMEORIGIN'
+
+        apply_security_headers(response, {'X-Request-ID': 'abc'})
+        self.assertEqual(response['X-Frame-Options'], 'SAMEORIGIN')
+        self.assertEqual(response['X-Request-ID'], 'abc')
+
+    def test_stack_shares_one_context(self):
+        """ZeroTrust reutiliza IP/fingerprint do contexto e expõe o fingerprint"""
+        seen = []
+
+        def view(request):
+            seen.append(request)
+            return HttpResponse('ok')
+
+        app = RequestContextMiddleware(SecurityHeadersMiddleware(ZeroTrustMiddleware(view)))
+        request = RequestFactory().get('/dashboard/', REMOTE_ADDR='10.0.0.5', HTTP_USER_AGENT='Mozilla')
+        request.user = AnonymousUser()
+
+        with mock.patch('apps.core.request_context.RequestContext', wraps=RequestContext) as factory:
+            response = app(request)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(factory.call_count, 1)
+        context = request.request_context
+        self.assertEqual(seen[0].device_fingerprint, context.fingerprint)
+        self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+        self.assertEqual(response['X-Request-ID'], request.zero_trust_id)
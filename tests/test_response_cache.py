@@ -0,0 +1,73 @@
+"""
+Testes para o cache semântico de respostas (apps.assistant.response_cache)
+"""
+
+import pytest
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from apps.assistant.models import Documento
+from apps.assistant.response_cache import SemanticResponseCache
+
+
+def _citation(document_id):
+    return {'document_id': document_id, 'title': 'Férias', 'chunk_index': 0, 'score': 0.9}
+
+
+@pytest.mark.django_db
+@override_settings(HELIX_RESPONSE_CACHE_THRESHOLD=0.95, HELIX_RESPONSE_CACHE_MAX_ENTRIES=2)
+class SemanticResponseCacheTests(TestCase):
+    """Testes para lookup, invalidação e evicção"""
+
+    def setUp(self):
+        cache.clear()
+        SemanticResponseCache.clear()
+
+    def test_similar_query_hits(self):
+        """Consulta quase idêntica retorna resposta e citações armazenadas"""
+        SemanticResponseCache.store([1.0, 0.0, 0.0], '30 dias', [_citation(1)], tenant='t1')
+
+        cached = SemanticResponseCache.lookup([0.99, 0.05, 0.0], tenant='t1')
+
+        self.assertEqual(cached['response'], '30 dias')
+        self.assertEqual(cached['citations'][0]['document_id'], 1)
+        self.assertEqual(SemanticResponseCache.stats('t1')['hits'], 1)
+
+    def test_dissimilar_query_or_other_tenant_misses(self):
+        """Abaixo do limiar, outro tenant ou outro namespace não acertam"""
+        SemanticResponseCache.store([1.0, 0.0, 0.0], '30 dias', [_citation(1)], namespace='a', tenant='t1')
+
+        self.assertIsNone(SemanticResponseCache.lookup([0.0, 1.0, 0.0], namespace='a', tenant='t1'))
+        self.assertIsNone(SemanticResponseCache.lookup([1.0, 0.0, 0.0], namespace='a', tenant='t2'))
+        self.assertIsNone(SemanticResponseCache.lookup([1.0, 0.0, 0.0], namespace='b', tenant='t1'))
+        self.assertEqual(SemanticResponseCache.stats('t1')['misses'], 2)
+
+    def test_reingested_document_invalidates_entry(self):
+        """Salvar/desativar um Documento citado invalida a resposta"""
+        documento = Documento.objects.create(title='Férias', source_path='ferias.md', content='x')
+        SemanticResponseCache.store([1.0, 0.0], '30 dias', [_citation(documento.id)])
+
+        documento.is_active = False
+        documento.save()
+
+        self.assertIsNone(SemanticResponseCache.lookup([1.0, 0.0]))
+        self.assertEqual(SemanticResponseCache.stats()['invalidations'], 1)
+
+    def test_lru_eviction(self):
+        """Acima de MAX_ENTRIES a entrada menos usada é descartada"""
+        SemanticResponseCache.store([1.0, 0.0, 0.0], 'a', [_citation(1)], tenant='t1')
+        SemanticResponseCache.store([0.0, 1.0, 0.0], 'b', [_citation(1)], tenant='t1')
+        SemanticResponseCache.lookup([1.0, 0.0, 0.0], tenant='t1')  # 'a' vira a mais recente
+        SemanticResponseCache.store([0.0, 0.0, 1.0], 'c', [_citation(1)], tenant='t1')
+
+        self.assertIsNotNone(SemanticResponseCache.lookup([1.0, 0.0, 0.0], tenant='t1'))
+        self.assertIsNone(SemanticResponseCache.lookup([0.0, 1.0, 0.0], tenant='t1'))
+        self.assertEqual(SemanticResponseCache.stats('t1')['evictions'], 1)
+
+    @override_settings(HELIX_RESPONSE_CACHE_TTL=-1)
+    def test_expired_entries_miss(self):
+        """Entradas além do TTL não são servidas"""
+        SemanticResponseCache.store([1.0, 0.0], '30 dias', [_citation(1)], tenant='t1')
+
+        self.assertIsNone(SemanticResponseCache.lookup([1.0, 0.0], tenant='t1'))
+        self.assertEqual(SemanticResponseCache.stats('t1')['entries'], 0)
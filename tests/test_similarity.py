@@ -0,0 +1,52 @@
+"""
+Testes para utilitários de similaridade vetorizada (apps.assistant.similarity)
+"""
+
+import numpy as np
+from django.test import SimpleTestCase
+
+from apps.assistant import similarity
+from apps.assistant.services import calculate_cosine_similarity
+
+
+class SimilarityTests(SimpleTestCase):
+    """Testes para normalização, scoring em lote, top-k e MMR"""
+
+    def setUp(self):
+        rng = np.random.default_rng(7)
+        self.matrix = rng.standard_normal((50, 16)).astype(np.float32)
+        self.query = rng.standard_normal(16).astype(np.float32)
+
+    def test_normalize_rows_keeps_zero_rows(self):
+        matrix = similarity.normalize_rows([[3.0, 4.0], [0.0, 0.0]])
+        self.assertEqual(matrix.dtype, np.float32)
+        np.testing.assert_allclose(matrix, [[0.6, 0.8], [0.0, 0.0]], rtol=1e-6)
+
+    def test_score_matches_pairwise(self):
+        """Scoring vetorizado == cosseno par a par"""
+        scores = similarity.score(self.query, self.matrix, normalized=False)
+        expected = [calculate_cosine_similarity(self.query.tolist(), row.tolist()) for row in self.matrix]
+        np.testing.assert_allclose(scores, expected, rtol=1e-5, atol=1e-6)
+
+    def test_batch_score_shape(self):
+        scores = similarity.batch_score(self.matrix[:3], similarity.normalize_rows(self.matrix))
+        self.assertEqual(scores.shape, (3, 50))
+        np.testing.assert_allclose(np.diag(scores[:, :3]), 1.0, rtol=1e-5)
+
+    def test_top_k_sorted_with_threshold(self):
+        scores = np.array([0.1, 0.9, 0.5, 0.7], dtype=np.float32)
+        self.assertEqual([i for i, _ in similarity.top_k(scores, 3)], [1, 3, 2])
+        self.assertEqual([i for i, _ in similarity.top_k(scores, 3, threshold=0.6)], [1, 3])
+        self.assertEqual(similarity.top_k(scores, 0), [])
+
+    def test_mmr_prefers_diverse_results(self):
+        """Quase-duplicatas cedem lugar a um candidato diferente"""
+        candidates = [[1.0, 0.0, 0.0], [0.99, 0.01, 0.0], [0.6, 0.0, 0.8]]
+        query = [1.0, 0.0, 0.3]
+
+        self.assertEqual(similarity.mmr(query, candidates, k=2, lambda_mult=1.0), [0, 1])
+        self.assertEqual(similarity.mmr(query, candidates, k=2, lambda_mult=0.5), [0, 2])
+
+    def test_zero_vectors(self):
+        self.assertEqual(calculate_cosine_similarity([0.0, 0.0], [1.0, 0.0]), 0.0)
+        self.assertEqual(calculate_cosine_similarity([], [1.0]), 0.0)
@@ -0,0 +1,152 @@
+"""
+Testes para o matcher de ameaças em memória (apps.security.zero_trust.threat_matcher)
+"""
+
+import time
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from apps.security.zero_trust.middleware import ZeroTrustMiddleware
+from apps.security.zero_trust.threat_matcher import (
+    AhoCorasick,
+    ThreatMatch,
+    ThreatMatcher,
+    classify_ip,
+)
+
+
+def indicator(pk, kind, value, level='high', expires_at=None):
+    return ThreatMatch('indicator', pk, kind, value, level, expires_at)
+
+
+class ThreatMatcherTests(SimpleTestCase):
+    """Testes para as estruturas compiladas"""
+
+    def setUp(self):
+        self.matcher = ThreatMatcher(
+            blocked=[
+                ThreatMatch('blocklist', 1, 'ip', '198.51.100.9', 'critical'),
+                ThreatMatch('blocklist', 2, 'ip', '198.51.100.10', 'critical', expires_at=time.time() - 1),
+            ],
+            indicators=[
+                indicator(10, 'ip', '203.0.113.0/24', 'medium'),
+                indicator(11, 'ip', '203.0.113.7', 'critical'),
+                indicator(12, 'ip', '2001:db8::/32', 'low'),
+                indicator(13, 'user_agent', 'sqlmap'),
+                indicator(14, 'pattern', 'union select'),
+                indicator(15, 'pattern', '../'),
+                indicator(16, 'domain', 'evil.example'),
+                indicator(17, 'hash', 'ABCDEF'),
+                indicator(18, 'ip', 'não-é-ip'),
+            ],
+        )
+
+    def test_classify_ip(self):
+        """Só 172.16.0.0/12 é privado (não todo 172.0.0.0/8)"""
+        self.assertEqual(classify_ip('172.16.0.1'), 'private')
+        self.assertEqual(classify_ip('172.31.255.1'), 'private')
+        self.assertEqual(classify_ip('172.15.0.1'), 'public')
+        self.assertEqual(classify_ip('172.32.0.1'), 'public')
+        self.assertEqual(classify_ip('10.1.2.3'), 'private')
+        self.assertEqual(classify_ip('127.0.0.1'), 'localhost')
+        self.assertEqual(classify_ip('::1'), 'localhost')
+        self.assertEqual(classify_ip('unknown'), 'public')
+
+    def test_blocklist_exact_and_expiry(self):
+        """IpBlocklist: IP exato, respeitando blocked_until"""
+        self.assertTrue(self.matcher.is_ip_blocked('198.51.100.9'))
+        self.assertFalse(self.matcher.is_ip_blocked('198.51.100.10'))
+        self.assertFalse(self.matcher.is_ip_blocked('198.51.100.11'))
+
+    def test_cidr_matches_all_covering_prefixes(self):
+        """Radix tree retorna /24 e /32; nível mais alto vence"""
+        matches = self.matcher.match(ip='203.0.113.7')
+        self.assertEqual({m.indicator_id for m in matches}, {10, 11})
+        self.assertEqual(ThreatMatcher.highest_level(matches), 'critical')
+
+        self.assertEqual([m.indicator_id for m in self.matcher.match(ip='203.0.113.200')], [10])
+        self.assertEqual([m.indicator_id for m in self.matcher.match(ip='2001:db8:1::5')], [12])
+        self.assertEqual(self.matcher.match(ip='203.0.114.1'), [])
+
+    def test_patterns_domains_and_hashes(self):
+        """Aho-Corasick em user agent/path; domínio casa subdomínios"""
+        self.assertEqual([m.indicator_id for m in self.matcher.match(user_agent='SQLMap/1.7')], [13])
+        path_matches = self.matcher.match(path='/api/x?q=1 UNION SELECT ../etc')
+        self.assertEqual({m.indicator_id for m in path_matches}, {14, 15})
+        self.assertEqual([m.indicator_id for m in self.matcher.match(domain='login.evil.example')], [16])
+        self.assertEqual(self.matcher.match(domain='notevil.example'), [])
+        self.assertEqual([m.indicator_id for m in self.matcher.match(file_hash='abcdef')], [17])
+
+    def test_aho_corasick_overlapping_patterns(self):
+        """Padrões sobrepostos são todos encontrados"""
+        automaton = AhoCorasick([('he', 1), ('she', 2), ('his', 3), ('hers', 4)])
+        self.assertEqual(sorted(automaton.search('ushers')), [1, 2, 4])
+
+
+@override_settings(ZERO_TRUST_MATCHER_CHECK_INTERVAL=0)
+class ThreatMatcherHotSwapTests(SimpleTestCase):
+    """Testes para a troca do snapshot por stamp de versão"""
+
+    def setUp(self):
+        cache.clear()
+        ThreatMatcher.reset()
+
+    def tearDown(self):
+        ThreatMatcher.reset()
+
+    def _loader(self, *indicators):
+        return mock.patch.object(
+            ThreatMatcher, 'load',
+            side_effect=lambda version=None: ThreatMatcher(indicators=indicators, version=version),
+        )
+
+    def test_version_bump_rebuilds(self):
+        """Snapshot só é recompilado quando o stamp de versão muda"""
+        with self._loader(indicator(1, 'user_agent', 'nikto')) as load:
+            first = ThreatMatcher.current()
+            self.assertIs(ThreatMatcher.current(), first)
+            self.assertEqual(load.call_count, 1)
+
+            ThreatMatcher.bump_version()
+            second = ThreatMatcher.current()
+
+        self.assertIsNot(second, first)
+        self.assertEqual(load.call_count, 2)
+        self.assertEqual(len(second.match(user_agent='Nikto scanner')), 1)
+
+    @override_settings(ZERO_TRUST_MATCHER_MAX_AGE=30)
+    def test_stale_snapshot_rebuilds_without_bump(self):
+        """Sem cache compartilhado o stamp não muda: a idade força a recompilação"""
+        with self._loader() as load:
+            first = ThreatMatcher.current()
+            first.built_at -= 31
+            ThreatMatcher._checked_at = 0.0
+            self.assertIsNot(ThreatMatcher.current(), first)
+        self.assertEqual(load.call_count, 2)
+
+    def test_load_failure_keeps_previous_snapshot(self):
+        """Banco indisponível não derruba o caminho quente"""
+        with self._loader(indicator(1, 'ip', '203.0.113.0/24')):
+            first = ThreatMatcher.current()
+        ThreatMatcher.bump_version()
+        with mock.patch.object(ThreatMatcher, 'load', side_effect=RuntimeError('db down')):
+            self.assertIs(ThreatMatcher.current(), first)
+
+    def test_middleware_scores_threat_indicator(self):
+        """ZeroTrustMiddleware soma o risco do indicador sem query por requisição"""
+        middleware = ZeroTrustMiddleware(lambda request: None)
+        request = RequestFactory().get('/dashboard/', REMOTE_ADDR='203.0.113.50')
+        request.user = AnonymousUser()
+        request.zero_trust_id = 'test'
+
+        with self._loader(indicator(1, 'ip', '203.0.113.0/24', 'high')):
+            context = middleware._collect_context(request)
+            score, factors = middleware._evaluate_risk(request, context)
+
+        self.assertIn('threat_indicator_high', factors)
+        self.assertNotIn('blocked_ip', factors)
+        self.assertEqual(context['threat_indicators'], [1])
+        self.assertEqual(context['ip_type'], 'public')
@@ -0,0 +1,72 @@
+"""
+Testes para os agregados de ponto (apps.departamento_pessoal.timesheet)
+
+departamento_pessoal fica fora do INSTALLED_APPS de teste: cálculo e
+montagem do espelho sem banco.
+"""
+
+from datetime import date, datetime
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase, override_settings
+from django.utils import timezone
+
+from apps.departamento_pessoal import timesheet
+from apps.departamento_pessoal.models import RegistroPonto
+from apps.departamento_pessoal.timesheet import calcular_dia, formatar_minutos, proxima_competencia
+
+
+def hora(h, m=0):
+    return timezone.make_aware(datetime(2024, 5, 6, h, m))
+
+
+@override_settings(DP_JORNADA_DIARIA_MINUTOS=480, DP_TOLERANCIA_PONTO_MINUTOS=10)
+class CalcularDiaTests(SimpleTestCase):
+    """Testes para os minutos diários"""
+
+    def test_full_day_with_overtime(self):
+        self.assertEqual(calcular_dia(hora(8), hora(12), hora(13), hora(18, 30)), (570, 90, 0))
+
+    def test_tolerance_and_missing(self):
+        self.assertEqual(calcular_dia(hora(8), hora(12), hora(13), hora(17, 8)), (488, 0, 0))
+        self.assertEqual(calcular_dia(hora(8), None, None, hora(14)), (360, 0, 120))
+
+    def test_open_day_counts_closed_periods_only(self):
+        self.assertEqual(calcular_dia(hora(8), hora(12), hora(13), None), (240, 0, 0))
+        self.assertEqual(calcular_dia(hora(8), None, None, None), (0, 0, 0))
+
+    def test_atualizar_dia_fills_minutes_and_hours(self):
+        registro = RegistroPonto(entrada=hora(8), saida_almoco=hora(12), retorno_almoco=hora(13), saida=hora(17, 45))
+
+        timesheet.atualizar_dia(registro)
+
+        self.assertEqual((registro.minutos_trabalhados, registro.minutos_extras), (525, 45))
+        self.assertEqual(str(registro.horas_trabalhadas), '8.75')
+
+    def test_helpers(self):
+        self.assertEqual(proxima_competencia(date(2024, 12, 1)), date(2025, 1, 1))
+        self.assertEqual(formatar_minutos(2 * 24 * 60 + 5), '48:05')
+
+
+class EspelhoColaboradorTests(SimpleTestCase):
+    """Testes para o espelho a partir das linhas pré-calculadas"""
+
+    def test_single_range_query(self):
+        linhas = [
+            {'data': date(2024, 5, 6), 'tipo_registro': 'app', 'status': 'aprovado', 'entrada': hora(8),
+             'saida_almoco': None, 'retorno_almoco': None, 'saida': hora(17),
+             'minutos_trabalhados': 540, 'minutos_extras': 60, 'minutos_faltantes': 0},
+            {'data': date(2024, 5, 7), 'tipo_registro': 'web', 'status': 'pendente', 'entrada': hora(9),
+             'saida_almoco': None, 'retorno_almoco': None, 'saida': hora(15),
+             'minutos_trabalhados': 360, 'minutos_extras': 0, 'minutos_faltantes': 120},
+        ]
+        with mock.patch.object(RegistroPonto, 'objects') as objects:
+            objects.filter.return_value.order_by.return_value.values.return_value = linhas
+            espelho = timesheet.espelho_colaborador(SimpleNamespace(nome_completo='Ana'), 5, 2024)
+
+        filtros = objects.filter.call_args.kwargs
+        self.assertEqual((filtros['data__gte'], filtros['data__lt']), (date(2024, 5, 1), date(2024, 6, 1)))
+        self.assertEqual((espelho['total_dias'], espelho['total_horas']), (2, '15:00'))
+        self.assertEqual((espelho['minutos_extras'], espelho['minutos_faltantes']), (60, 120))
+        self.assertEqual([b['tipo'] for b in espelho['dias']['2024-05-06']['batidas']], ['entrada', 'saida'])
@@ -0,0 +1,146 @@
+"""
+Testes para o índice vetorial do Helix (apps.assistant.vector_index)
+"""
+
+import tempfile
+
+import numpy as np
+import pytest
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from apps.assistant.services import RAGPipeline
+from apps.assistant.vector_index import (
+    INDEX_NAME,
+    LocalVectorIndex,
+    PgVectorIndex,
+    RetrievedChunk,
+    VectorIndex,
+    VECTOR_DIMENSIONS,
+    format_vector,
+)
+
+
+def _random_rows(count, seed=42):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, VECTOR_DIMENSIONS)).astype(np.float32)
+    return [(1000 + i, vectors[i].tolist()) for i in range(count)], vectors
+
+
+@pytest.mark.django_db
+class LocalVectorIndexTests(TestCase):
+    """Testes para o fallback NumPy (SQLite)"""
+
+    def setUp(self):
+        cache.clear()
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.override = override_settings(HELIX_VECTOR_INDEX_DIR=self.tmpdir.name)
+        self.override.enable()
+
+    def tearDown(self):
+        self.override.disable()
+        self.tmpdir.cleanup()
+
+    def test_sqlite_uses_local_backend(self):
+        """Sem pgvector o fallback local é usado"""
+        self.assertFalse(PgVectorIndex.is_available())
+        self.assertEqual(VectorIndex.backend(), 'local')
+
+    def test_topk_matches_brute_force(self):
+        """argpartition retorna o mesmo top-k que a ordenação completa"""
+        rows, vectors = _random_rows(500)
+        LocalVectorIndex.build('tenant_a', rows)
+
+        query = vectors[7] + 0.01
+        results = VectorIndex.search(query.tolist(), company_id='tenant_a', k=5)
+
+        normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        expected = np.argsort(normalized @ (query / np.linalg.norm(query)))[::-1][:5]
+        self.assertEqual([chunk_id for chunk_id, _ in results], [1000 + int(i) for i in expected])
+        self.assertEqual(results[0][0], 1007)
+        scores = [score for _, score in results]
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_threshold_filters_results(self):
+        """Chunks abaixo do limiar são descartados"""
+        rows, vectors = _random_rows(50)
+        LocalVectorIndex.build('tenant_b', rows)
+
+        results = VectorIndex.search(vectors[3].tolist(), company_id='tenant_b', k=10, threshold=0.9)
+        self.assertEqual([chunk_id for chunk_id, _ in results], [1003])
+
+    def test_tenants_are_isolated(self):
+        """Cada tenant tem sua própria matriz"""
+        rows_a, vectors_a = _random_rows(20, seed=1)
+        LocalVectorIndex.build('tenant_c', rows_a)
+        LocalVectorIndex.build('tenant_d', [])
+
+        self.assertTrue(VectorIndex.search(vectors_a[0].tolist(), company_id='tenant_c', k=3))
+        self.assertEqual(VectorIndex.search(vectors_a[0].tolist(), company_id='tenant_d', k=3), [])
+
+    def test_invalidate_triggers_rebuild_from_database(self):
+        """Nova versão no cache força reconstrução a partir do banco"""
+        rows, vectors = _random_rows(10)
+        LocalVectorIndex.build('tenant_e', rows)
+        self.assertTrue(VectorIndex.search(vectors[0].tolist(), company_id='tenant_e', k=1))
+
+        LocalVectorIndex.invalidate('tenant_e')
+        self.assertEqual(VectorIndex.search(vectors[0].tolist(), company_id='tenant_e', k=1), [])
+
+
+class PgVectorIndexSQLTests(TestCase):
+    """Testes para geração de SQL do índice pgvector"""
+
+    def test_hnsw_index_sql(self):
+        sql = PgVectorIndex.create_index_sql('hnsw', m=24, ef_construction=100)
+        self.assertIn('USING hnsw', sql)
+        self.assertIn(f'embedding::vector({VECTOR_DIMENSIONS})', sql)
+        self.assertIn('vector_cosine_ops', sql)
+        self.assertIn('m = 24, ef_construction = 100', sql)
+
+    def test_ivfflat_index_sql(self):
+        sql = PgVectorIndex.create_index_sql('ivfflat', lists=250, concurrently=True)
+        self.assertIn('CREATE INDEX CONCURRENTLY', sql)
+        self.assertIn('lists = 250', sql)
+
+    def test_index_dimension_must_match_setting(self):
+        self.assertTrue(PgVectorIndex.index_matches(PgVectorIndex.create_index_sql('hnsw')))
+        self.assertFalse(PgVectorIndex.index_matches(
+            f'CREATE INDEX {INDEX_NAME} USING hnsw ((embedding::vector({VECTOR_DIMENSIONS + 1})) vector_cosine_ops)'
+        ))
+
+    def test_unknown_method_rejected(self):
+        with self.assertRaises(ValueError):
+            PgVectorIndex.create_index_sql('flat')
+
+    def test_format_vector(self):
+        self.assertEqual(format_vector([0.5, 1, -0.25]), '[0.5,1,-0.25]')
+
+
+class RetrievedChunkTests(TestCase):
+    """Testes para o resultado de recuperação hidratado"""
+
+    def setUp(self):
+        self.chunks = [
+            RetrievedChunk(11, 1, 0, 'Política de férias: 30 dias.', 'Manual RH', 'rh/manual.md', score=0.91),
+            RetrievedChunk(7, 2, 3, 'Ponto eletrônico obrigatório.', 'Ponto', 'rh/ponto.md', score=0.84),
+        ]
+
+    def test_build_prompt_runs_no_queries(self):
+        """Montagem do prompt não acessa o banco"""
+        with self.assertNumQueries(0):
+            prompt = RAGPipeline.build_prompt('Quantos dias de férias?', self.chunks)
+
+        self.assertLess(prompt.index('[1] Política'), prompt.index('[2] Ponto'))
+        self.assertIn('Fonte: Manual RH (Seção 0)', prompt)
+
+    def test_citation(self):
+        citation = self.chunks[1].citation()
+        self.assertEqual(citation['document_id'], 2)
+        self.assertEqual(citation['source_path'], 'rh/ponto.md')
+        self.assertEqual(citation['chunk_index'], 3)
+        self.assertEqual(citation['score'], 0.84)
+
+    def test_hydrate_empty(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(RetrievedChunk.hydrate([]), [])